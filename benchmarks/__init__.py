@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: benchmarks/__init__.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+"""Performance benchmarks for `buildingid`.
+
+Run ``python -m benchmarks --help`` from the root of the repository.
+"""
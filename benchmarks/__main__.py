@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: benchmarks/__main__.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import json
+import sys
+import typing
+
+import click
+
+from .cases import CASES
+from .data import DEFAULT_SEED
+from .runner import DEFAULT_REPEAT, DEFAULT_SIZES, DEFAULT_THRESHOLD, compare, format_result, run_all, run_case
+
+def click_callback_sizes_(ctx: None, opt: click.core.Option, value: str) -> typing.List[int]:
+    """Callback for "--sizes" option (a comma-separated list of numbers of rows, e.g., "1e3,1e4").
+    """
+
+    try:
+        return [int(float(size)) for size in value.split(',') if size.strip()]
+    except ValueError:
+        raise click.BadParameter('Invalid list of sizes: {0}'.format(value))
+
+def report_regressions_(regressions: typing.List[typing.Tuple[typing.Dict[str, typing.Any], str, float, float, float]], threshold: float) -> None:
+    for (result, metric, old, new, change, ) in regressions:
+        click.echo('REGRESSION {0} (size={1}): {2} {3:.6g} -> {4:.6g} ({5:+.1%})'.format(result['name'], result['size'], metric, old, new, change), err=True)
+
+    if len(regressions) > 0:
+        raise click.ClickException('{0} metric(s) regressed by more than {1:.0%}'.format(len(regressions), threshold))
+
+@click.group(context_settings=dict(help_option_names=['-h', '--help']))
+def main() -> None:
+    """Performance benchmarks for \033[1mbuildingid\033[0m.
+
+    Each benchmark case is run in a new Python process on deterministic synthetic data, and reports its throughput (rows per second) and peak memory (resident set size).
+    """
+
+    pass
+
+@main.command('list', short_help='list benchmark cases')
+def run_list() -> None:
+    for name in CASES.keys():
+        click.echo(name)
+
+@main.command('run', short_help='run benchmark cases')
+@click.option('--case', 'names', type=click.Choice(list(CASES.keys()), case_sensitive=True), multiple=True, help='the name of a benchmark case (by default, all cases are run)')
+@click.option('--sizes', type=click.STRING, default=','.join(map(str, DEFAULT_SIZES)), show_default=True, callback=click_callback_sizes_, help='comma-separated list of numbers of rows, e.g., "1e3,1e4,1e5,1e6,1e7"')
+@click.option('--seed', type=click.INT, default=DEFAULT_SEED, show_default=True, help='the seed for the synthetic data')
+@click.option('--repeat', type=click.IntRange(1, None), default=DEFAULT_REPEAT, show_default=True, help='the number of times to repeat each case (the fastest run is reported)')
+@click.option('--output', 'output_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default=None, help='the path to the JSON file for the results')
+@click.option('--baseline', 'baseline_path', type=click.Path(exists=True, dir_okay=False), default=None, help='the path to the JSON file for the baseline results to compare against')
+@click.option('--threshold', type=click.FloatRange(0.0, None), default=DEFAULT_THRESHOLD, show_default=True, help='the maximum relative regression of a metric against the baseline')
+@click.option('--verbose', is_flag=True, default=False, show_default=True, help='show the standard error stream of each case')
+def run_run(names: typing.Sequence[str], sizes: typing.List[int], seed: int, repeat: int, output_path: typing.Optional[str], baseline_path: typing.Optional[str], threshold: float, verbose: bool) -> None:
+    """Run the benchmark cases, and (optionally) compare the results against a baseline.
+
+    Exits 1 if a metric regresses by more than the threshold.
+    """
+
+    results = run_all(names or list(CASES.keys()), sizes, seed, repeat, verbose=verbose, callback=lambda result: click.echo(format_result(result), err=True))
+
+    if output_path is not None:
+        with click.open_file(output_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+            f.write('\n')
+
+    if baseline_path is not None:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+        report_regressions_(compare(results, baseline, threshold=threshold), threshold)
+
+@main.command('compare', short_help='compare benchmark results against a baseline')
+@click.argument('baseline', type=click.File('r'))
+@click.argument('results', type=click.File('r'))
+@click.option('--threshold', type=click.FloatRange(0.0, None), default=DEFAULT_THRESHOLD, show_default=True, help='the maximum relative regression of a metric against the baseline')
+def run_compare(baseline: typing.TextIO, results: typing.TextIO, threshold: float) -> None:
+    """Compare the benchmark results against the baseline.
+
+    Exits 1 if a metric regresses by more than the threshold.
+    """
+
+    report_regressions_(compare(json.load(results), json.load(baseline), threshold=threshold), threshold)
+
+@main.command('run-one', hidden=True)
+@click.argument('name', type=click.Choice(list(CASES.keys()), case_sensitive=True))
+@click.argument('size', type=click.IntRange(1, None))
+@click.option('--seed', type=click.INT, default=DEFAULT_SEED)
+@click.option('--repeat', type=click.IntRange(1, None), default=DEFAULT_REPEAT)
+def run_run_one(name: str, size: int, seed: int, repeat: int) -> None:
+    sys.stdout.write(json.dumps(run_case(name, size, seed, repeat)) + '\n')
+
+if __name__ == '__main__':
+    main()
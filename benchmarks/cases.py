@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: benchmarks/cases.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import atexit
+import collections
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import typing
+
+from . import data
+
+from buildingid.code import decode, encode, isValid
+
+# A benchmark case is a function of the number of rows and the seed, which
+# prepares its inputs and returns a function that does the measured work and
+# returns the number of rows that were processed.
+Case = typing.Callable[[int, int], typing.Callable[[], int]]
+
+CASES: typing.Dict[str, Case] = collections.OrderedDict()
+
+# Benchmark cases that ignore the "--sizes" option, and their fixed sizes.
+FIXED_SIZES: typing.Dict[str, typing.List[int]] = {}
+
+def case(name: str, sizes: typing.Optional[typing.List[int]] = None) -> typing.Callable[[Case], Case]:
+    """Decorator that registers the given benchmark case (with the given fixed sizes, if any).
+    """
+
+    def decorator(f: Case) -> Case:
+        CASES[name] = f
+
+        if sizes is not None:
+            FIXED_SIZES[name] = sizes
+
+        return f
+
+    return decorator
+
+def make_tempdir_() -> str:
+    dirname = tempfile.mkdtemp(prefix='buildingid-benchmarks-')
+
+    atexit.register(shutil.rmtree, dirname, ignore_errors=True)
+
+    return dirname
+
+@case('code.encode')
+def case_code_encode_(size: int, seed: int) -> typing.Callable[[], int]:
+    bounds = data.make_bounds(size, seed=seed)
+
+    def run() -> int:
+        for (latitudeLo, longitudeLo, latitudeHi, longitudeHi, ) in bounds:
+            encode(latitudeLo, longitudeLo, latitudeHi, longitudeHi, (latitudeLo + latitudeHi) / 2, (longitudeLo + longitudeHi) / 2, codeLength=11)
+
+        return len(bounds)
+
+    return run
+
+@case('code.decode')
+def case_code_decode_(size: int, seed: int) -> typing.Callable[[], int]:
+    codes = data.make_codes(size, seed=seed)
+
+    def run() -> int:
+        for code in codes:
+            decode(code)
+
+        return len(codes)
+
+    return run
+
+@case('code.isValid')
+def case_code_isValid_(size: int, seed: int) -> typing.Callable[[], int]:
+    codes = data.make_codes(size, seed=seed)
+
+    def run() -> int:
+        for code in codes:
+            isValid(code)
+
+        return len(codes)
+
+    return run
+
+@case('code_area.jaccard')
+def case_code_area_jaccard_(size: int, seed: int) -> typing.Callable[[], int]:
+    # Pairs of overlapping code areas (viz., the same footprints, encoded at different code lengths).
+    pairs = list(zip(map(decode, data.make_codes(size, seed=seed, codeLength=11)), map(decode, data.make_codes(size, seed=seed, codeLength=10))))
+
+    def run() -> int:
+        for (codeArea, other, ) in pairs:
+            codeArea.jaccard(other)
+
+        return len(pairs)
+
+    return run
+
+def make_case_dict_pipe_(mode: str) -> Case:
+    def case_dict_pipe_(size: int, seed: int) -> typing.Callable[[], int]:
+        from buildingid.command_line.dict_decoders import LatLngDictDecoder, WKBDictDecoder, WKTDictDecoder
+        from buildingid.command_line.dict_encoders import BaseGeometryDictEncoder, ErrorDictEncoder
+        from buildingid.command_line.dict_pipe import DictPipe
+
+        text = data.make_csv(mode, size, seed=seed)
+
+        if mode == 'latlng':
+            decoder_in = LatLngDictDecoder('Latitude', 'Longitude')
+        elif mode == 'wkb':
+            decoder_in = WKBDictDecoder('WKB')
+        elif mode == 'wkt':
+            decoder_in = WKTDictDecoder('WKT')
+
+        dict_pipe = DictPipe(decoder_in, BaseGeometryDictEncoder('UBID', 11), ErrorDictEncoder('UBID'))
+
+        def run() -> int:
+            dict_pipe.run(io.StringIO(text), io.StringIO(), io.StringIO())
+
+            return size
+
+        return run
+
+    return case_dict_pipe_
+
+for mode in ['latlng', 'wkb', 'wkt']:
+    case('dict_pipe.{0}'.format(mode))(make_case_dict_pipe_(mode))
+
+@case('crossref')
+def case_crossref_(size: int, seed: int) -> typing.Callable[[], int]:
+    from buildingid.command_line import cli
+
+    dirname = make_tempdir_()
+
+    path_left = os.path.join(dirname, 'left.csv')
+    path_right = os.path.join(dirname, 'right.csv')
+    path_dst = os.path.join(dirname, 'dst.csv')
+
+    # The right input file has the same footprints as the left input file,
+    # encoded at a different code length (viz., every row has a match).
+    data.write_codes_csv(path_left, data.make_codes(size, seed=seed, codeLength=11))
+    data.write_codes_csv(path_right, data.make_codes(size, seed=seed, codeLength=10))
+
+    def run() -> int:
+        cli.main(['crossref', path_left, path_right, path_dst], standalone_mode=False)
+
+        return size
+
+    return run
+
+@case('crossref.query')
+def case_crossref_query_(size: int, seed: int) -> typing.Callable[[], int]:
+    from buildingid.crossref import CrossReferencer
+
+    # The index is built once (viz., not measured), and then queried.
+    crossreferencer = CrossReferencer.from_codes(data.make_codes(size, seed=seed, codeLength=11))
+
+    codes = data.make_codes(size, seed=seed, codeLength=10)
+
+    def run() -> int:
+        crossreferencer.query(codes)
+
+        return len(codes)
+
+    return run
+
+def make_case_import_(source: str) -> Case:
+    def case_import_(size: int, seed: int) -> typing.Callable[[], int]:
+        cwd = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+        def run() -> int:
+            # Each run is a new Python process (viz., the cost of a CLI invocation).
+            for _ in range(size):
+                subprocess.run([sys.executable, '-c', source], cwd=cwd, stdout=subprocess.DEVNULL, check=True)
+
+            return size
+
+        return run
+
+    return case_import_
+
+case('import.code', sizes=[1])(make_case_import_('import buildingid.code'))
+case('import.command_line', sizes=[1])(make_case_import_('import buildingid.command_line'))
+case('cli.help', sizes=[1])(make_case_import_('from buildingid.command_line import cli; cli([\'append2csv\', \'--help\'], standalone_mode=False)'))
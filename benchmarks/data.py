@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: benchmarks/data.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import binascii
+import csv
+import io
+import random
+import typing
+
+import shapely.geometry
+import shapely.wkb
+
+from buildingid.code import Code, encode
+
+DEFAULT_SEED = 0
+
+# South, west, north and east bounds of the synthetic footprints (viz., an area
+# of about 17km by 26km).
+BBOX_ = (38.80, -77.15, 38.95, -76.85, )
+
+# Minimum and maximum width and height of the synthetic footprints (in degrees,
+# viz., about 5m to 40m).
+SIZE_RANGE_ = (0.00005, 0.0004, )
+
+Bounds = typing.Tuple[float, float, float, float]
+
+def iter_bounds(size: int, seed: int = DEFAULT_SEED) -> typing.Iterator[Bounds]:
+    """Return an iterator over the (south, west, north, east) bounds of `size` deterministic, pseudo-random rectangular footprints.
+    """
+
+    rng = random.Random(seed)
+
+    (south, west, north, east, ) = BBOX_
+
+    for _ in range(size):
+        latitudeLo = rng.uniform(south, north)
+        longitudeLo = rng.uniform(west, east)
+
+        yield (latitudeLo, longitudeLo, latitudeLo + rng.uniform(*SIZE_RANGE_), longitudeLo + rng.uniform(*SIZE_RANGE_), )
+
+def make_bounds(size: int, seed: int = DEFAULT_SEED) -> typing.List[Bounds]:
+    return list(iter_bounds(size, seed=seed))
+
+def make_codes(size: int, seed: int = DEFAULT_SEED, codeLength: int = 11) -> typing.List[Code]:
+    return [
+        encode(latitudeLo, longitudeLo, latitudeHi, longitudeHi, (latitudeLo + latitudeHi) / 2, (longitudeLo + longitudeHi) / 2, codeLength=codeLength)
+        for (latitudeLo, longitudeLo, latitudeHi, longitudeHi, )
+        in iter_bounds(size, seed=seed)
+    ]
+
+def make_csv(mode: str, size: int, seed: int = DEFAULT_SEED) -> str:
+    """Return the text of a CSV file with `size` rows for the given `append2csv` decoder mode ("latlng", "wkb" or "wkt").
+
+    The fields are named using the defaults of the `append2csv` command.
+    """
+
+    io_out = io.StringIO()
+
+    csv_out = csv.writer(io_out)
+
+    if mode == 'latlng':
+        csv_out.writerow(['Latitude', 'Longitude'])
+
+        for (latitudeLo, longitudeLo, latitudeHi, longitudeHi, ) in iter_bounds(size, seed=seed):
+            csv_out.writerow([repr((latitudeLo + latitudeHi) / 2), repr((longitudeLo + longitudeHi) / 2)])
+    elif mode == 'wkb':
+        csv_out.writerow(['WKB'])
+
+        for (latitudeLo, longitudeLo, latitudeHi, longitudeHi, ) in iter_bounds(size, seed=seed):
+            csv_out.writerow([binascii.hexlify(shapely.wkb.dumps(shapely.geometry.box(longitudeLo, latitudeLo, longitudeHi, latitudeHi))).decode('ascii')])
+    elif mode == 'wkt':
+        csv_out.writerow(['WKT'])
+
+        for (latitudeLo, longitudeLo, latitudeHi, longitudeHi, ) in iter_bounds(size, seed=seed):
+            csv_out.writerow([shapely.geometry.box(longitudeLo, latitudeLo, longitudeHi, latitudeHi).wkt])
+    else:
+        raise ValueError(mode)
+
+    return io_out.getvalue()
+
+def write_codes_csv(path: str, codes: typing.Iterable[Code], fieldname_code: str = 'UBID') -> None:
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv_out = csv.writer(f)
+
+        csv_out.writerow([fieldname_code])
+
+        for code in codes:
+            csv_out.writerow([code])
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: benchmarks/runner.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import typing
+
+from .cases import CASES, FIXED_SIZES
+
+from buildingid.stats import peak_rss_bytes
+from buildingid.version import __version__
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+DEFAULT_REPEAT = 3
+
+DEFAULT_THRESHOLD = 0.1
+
+# Metrics that are compared against the baseline, and whether higher values are better.
+METRICS_ = [
+    ('rows_per_second', True, ),
+    ('peak_rss_bytes', False, ),
+]
+
+Result = typing.Dict[str, typing.Any]
+
+def run_case(name: str, size: int, seed: int, repeat: int) -> Result:
+    """Run the named benchmark case in the current process, and return the result.
+
+    The measured work is repeated `repeat` times and the fastest run is
+    reported.  The peak resident set size (RSS) of the process includes the
+    inputs of the case.
+    """
+
+    run = CASES[name](size, seed)
+
+    setup_peak_rss_bytes = peak_rss_bytes()
+
+    seconds = None
+
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+
+        rows = run()
+
+        elapsed = time.perf_counter() - started_at
+
+        if (seconds is None) or (elapsed < seconds):
+            seconds = elapsed
+
+    return {
+        'name': name,
+        'size': size,
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_second': (rows / seconds) if (seconds > 0) else None,
+        'setup_peak_rss_bytes': setup_peak_rss_bytes,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+def run_case_in_subprocess(name: str, size: int, seed: int, repeat: int, verbose: bool = False) -> Result:
+    """Run the named benchmark case in a new Python process (viz., so that the peak RSS is measured for the case alone).
+    """
+
+    cwd = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+    completed = subprocess.run([sys.executable, '-m', 'benchmarks', 'run-one', name, str(size), '--seed', str(seed), '--repeat', str(repeat)], cwd=cwd, stdout=subprocess.PIPE, stderr=None if verbose else subprocess.DEVNULL, check=True)
+
+    return json.loads(completed.stdout.decode('utf-8'))
+
+def run_all(names: typing.Sequence[str], sizes: typing.Sequence[int], seed: int, repeat: int, verbose: bool = False, callback: typing.Optional[typing.Callable[[Result], None]] = None) -> typing.Dict[str, typing.Any]:
+    results = []
+
+    for name in names:
+        for size in FIXED_SIZES.get(name, sizes):
+            result = run_case_in_subprocess(name, size, seed, repeat, verbose=verbose)
+
+            if callback is not None:
+                callback(result)
+
+            results.append(result)
+
+    return {
+        'version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'repeat': repeat,
+        'results': results,
+    }
+
+def compare(results: typing.Dict[str, typing.Any], baseline: typing.Dict[str, typing.Any], threshold: float = DEFAULT_THRESHOLD) -> typing.List[typing.Tuple[Result, str, float, float, float]]:
+    """Return the regressions of the given results against the given baseline.
+
+    A metric regresses if it is worse than the baseline by more than the
+    given fraction (e.g., 0.1 for 10%).  Cases and sizes that are not in the
+    baseline are ignored.  Each regression is a tuple of the result, the name
+    of the metric, the baseline value, the new value and the relative change.
+    """
+
+    baseline_results = dict([((result['name'], result['size'], ), result) for result in baseline['results']])
+
+    regressions = []
+
+    for result in results['results']:
+        baseline_result = baseline_results.get((result['name'], result['size'], ), None)
+
+        if baseline_result is None:
+            continue
+
+        for (metric, higher_is_better, ) in METRICS_:
+            old = baseline_result.get(metric, None)
+            new = result.get(metric, None)
+
+            if (old is None) or (new is None) or (old == 0):
+                continue
+
+            change = (new - old) / old
+
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append((result, metric, old, new, change, ))
+
+    return regressions
+
+def format_result(result: Result) -> str:
+    return '{0:<20} {1:>10} {2:>14.1f} rows/s {3:>8.1f} MiB'.format(result['name'], result['size'], result['rows_per_second'] or 0.0, (result['peak_rss_bytes'] or 0) / (1 << 20))
@@ -7,4 +7,4 @@
 #
 # See LICENSE.txt and WARRANTY.txt for details.
 
-__import__('pkg_resources').declare_namespace(__name__)
+__path__ = __import__('pkgutil').extend_path(__path__, __name__)
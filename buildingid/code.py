@@ -201,3 +201,16 @@ def isValid_(code: Code) -> typing.Optional[typing.Match[str]]:
         return None
 
     return match
+
+def cellSize_(codeLength: int) -> typing.Tuple[float, float]:
+    """Return the height and width (in degrees) of an OLC cell with the given number of digits.
+    """
+
+    if codeLength <= openlocationcode.PAIR_CODE_LENGTH_:
+        size = openlocationcode.ENCODING_BASE_ / pow(openlocationcode.ENCODING_BASE_, (codeLength // 2) - 1)
+
+        return (size, size, )
+    else:
+        size = openlocationcode.PAIR_RESOLUTIONS_[-1]
+
+        return (size / pow(openlocationcode.GRID_ROWS_, codeLength - openlocationcode.PAIR_CODE_LENGTH_), size / pow(openlocationcode.GRID_COLUMNS_, codeLength - openlocationcode.PAIR_CODE_LENGTH_), )
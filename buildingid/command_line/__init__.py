@@ -8,27 +8,46 @@
 # See LICENSE.txt and WARRANTY.txt for details.
 
 # import csv
+import collections
+import contextlib
+import functools
 import logging
+import mmap
+import os
+import sqlite3
 import typing
 
 import click
 import click_log
-import pandas
-import pyqtree
 
-from tqdm import tqdm
-tqdm.pandas()
+from openlocationcode import openlocationcode
 
-from .dict_decoders import LatLngDictDecoder, WKBDictDecoder, WKTDictDecoder
-from .dict_encoders import BaseGeometryDictEncoder, ErrorDictEncoder
-from .dict_pipe import DictPipe
+# NOTE: Heavy dependencies (viz., pandas, pyqtree, shapely and tqdm) are
+# imported by the commands that use them, so that each command loads only what
+# it needs.
+
+from .checkpoint import DEFAULT_CHECKPOINT_INTERVAL, Checkpoint, OffsetLineReader
+from .diff import DEFAULT_JACCARD_MIN, DEFAULT_MAX_DISTANCE, DEFAULT_REMAINDER_SHARD_LEVEL, DEFAULT_REMAINDER_SHARD_SIZE
+from .dict_pipe import DEFAULT_BATCH_SIZE, DEFAULT_CACHE_SIZE, DictPipe, fieldname_index, iter_batches
 from .exceptions import CustomException, FieldNotFoundError, FieldNotUniqueError
+from .external_sort import DEFAULT_CHUNK_SIZE, DEFAULT_FAN_IN
+from .geojson_seq_pipe import GeoJSONSeqPipe
+from .open_text_stream import DEFAULT_BUFFER_SIZE, compression_for_path, open_text_stream
+from .rollup import DEFAULT_MAX_GROUPS
+from .prefix_index import DEFAULT_LEVELS, DEFAULT_MAX_CELLS, INDEX_SUFFIX, PrefixIndex, intersects_, iter_records, olc_digits, parse_record_
 from .set_csv_field_size_limit import set_csv_field_size_limit
+from .sqlite_pipe import DEFAULT_TRANSACTION_SIZE, SQLitePipe, find_geometry_column
 
-from ..code import Code, CodeArea, decode
+from .. import hooks
+from ..code import decode
+from ..dtypes import DEFAULT_SAMPLE_SIZE, parse_dtype
+from ..stats import NullStats, Stats
 from ..validators import isValidCodeLength
 from ..version import __version__
 
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from .synth_writers import SynthWriter
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
@@ -36,6 +55,14 @@ click_log.basic_config(logger)
 
 set_csv_field_size_limit()
 
+# The length of the OLC prefixes of the cells that are assigned to shards (see
+# `buildingid.crossref.DEFAULT_SHARD_LEVEL`).
+DEFAULT_SHARD_LEVEL_ = 4
+
+# The height or width (in meters) above which UBID bounding boxes are kept in
+# a flat list (see `buildingid.crossref.DEFAULT_OVERSIZED_EXTENT`).
+DEFAULT_OVERSIZED_EXTENT_ = 1000.0
+
 def click_callback_code_length_(ctx: None, opt: click.core.Option, codeLength: int) -> int:
     """Callback for "--code-length" option (the number of digits in the OLC segment of the UBID string).
 
@@ -47,6 +74,40 @@ def click_callback_code_length_(ctx: None, opt: click.core.Option, codeLength: i
     else:
         raise click.BadParameter('Invalid Open Location Code length: {0}'.format(str(codeLength)))
 
+def open_text_stream_or_stderr_(path: typing.Optional[str], buffer_size: int, mode: str = 'w') -> typing.ContextManager[typing.TextIO]:
+    """Return `open_text_stream` for the given path, or the standard error stream if the path is `None` or "-".
+    """
+
+    if (path is None) or ('-' == path):
+        return contextlib.nullcontext(click.get_text_stream('stderr'))
+    else:
+        return open_text_stream(path, mode, buffer_size=buffer_size)
+
+def make_stats_(name: str, path: typing.Optional[str], interval: typing.Optional[float]) -> Stats:
+    """Return `Stats` for the "--stats" and "--stats-interval" options, or `NullStats` if the path is `None`.
+    """
+
+    if path is None:
+        return NullStats()
+    else:
+        return Stats(name, path=path, interval=interval)
+
+def click_profile_options_(f: typing.Callable[..., None]) -> typing.Callable[..., None]:
+    """Decorator that adds the "--profile", "--profile-every" and "--profile-output" options to the given command.
+
+    The selected profiling hooks (see `buildingid.hooks`) are registered for the duration of the command.
+    """
+
+    @click.option('--profile', type=click.Choice(hooks.HOOK_NAMES, case_sensitive=True), multiple=True, help='enable the named profiling hook ("tracemalloc", "timing" or "cprofile"); may be given more than once')
+    @click.option('--profile-every', type=click.IntRange(1, None), default=10, show_default=True, help='profile (or snapshot) every Nth batch of each hot path')
+    @click.option('--profile-output', type=click.Path(dir_okay=False, writable=True), default=None, show_default='standard error stream', help='the path prefix for profiling reports (viz., "PREFIX.cprofile", "PREFIX.timing.json" and "PREFIX.tracemalloc.txt")')
+    @functools.wraps(f)
+    def wrapper(*args, profile: typing.Sequence[str], profile_every: int, profile_output: typing.Optional[str], **kwargs) -> None:
+        with hooks.installed(hooks.make_hooks(profile, every=profile_every, prefix=profile_output)):
+            return f(*args, **kwargs)
+
+    return wrapper
+
 @click.group(context_settings=dict(help_option_names=['-h', '--help']))
 @click.pass_context
 @click.version_option(__version__)
@@ -77,11 +138,22 @@ def cli(ctx: None) -> None:
 @click.option('--reader-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the input file')
 @click.option('--writer-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the output file')
 @click.option('--writer-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the output file')
+@click.option('--input', 'input_path', type=click.Path(dir_okay=False, allow_dash=True), default='-', show_default=True, help='the path to the input file (gzip, bz2, xz and zstd compression is detected automatically)')
+@click.option('--output', 'output_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default='-', show_default=True, help='the path to the output file (compressed if the extension is ".gz", ".bz2", ".xz" or ".zst")')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default=None, show_default='standard error stream', help='the path to the error file (compressed if the extension is ".gz", ".bz2", ".xz" or ".zst"); use "-" for the standard error stream')
+@click.option('--buffer-size', type=click.IntRange(1, None), default=DEFAULT_BUFFER_SIZE, show_default=True, help='the size (in bytes) of the buffer for reading and writing files')
+@click.option('--batch-size', type=click.IntRange(1, None), default=DEFAULT_BATCH_SIZE, show_default=True, help='the number of rows of the input file that are processed and written at a time')
+@click.option('--cache-size', type=click.IntRange(0, None), default=DEFAULT_CACHE_SIZE, show_default=True, help='the maximum number of distinct geometries whose UBIDs (or errors) are cached, so that repeated geometries are not decoded and encoded again (0 for no cache)')
+@click.option('--checkpoint', 'checkpoint_path', type=click.Path(dir_okay=False, writable=True), default=None, help='the path to the checkpoint file (requires the --input, --output and --errors options)')
+@click.option('--checkpoint-interval', type=click.FloatRange(0.0, None), default=DEFAULT_CHECKPOINT_INTERVAL, show_default=True, help='the minimum number of seconds between updates of the checkpoint file')
+@click.option('--stats', 'stats_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default=None, help='the path to the JSON file for run statistics (wall and CPU time per stage, row and error counts, and peak memory); use "-" for the standard error stream')
+@click.option('--stats-interval', type=click.FloatRange(0.0, None), default=None, help='the number of seconds between periodic updates of the JSON file for run statistics (by default, the file is written at the end of the run)')
+@click_profile_options_
 @click.pass_context
-def run_append_to_csv(ctx: None, dict_decoder_id: str, code_length: int, fieldname_south_latitude: str, fieldname_west_longitude: str, fieldname_north_latitude: str, fieldname_east_longitude: str, fieldname_center_latitude: str, fieldname_center_longitude: str, fieldname_wkbstr: str, fieldname_wktstr: str, fieldname_code: str, reader_delimiter: str, reader_quotechar: str, writer_delimiter: str, writer_quotechar: str) -> None:
+def run_append_to_csv(ctx: None, dict_decoder_id: str, code_length: int, fieldname_south_latitude: str, fieldname_west_longitude: str, fieldname_north_latitude: str, fieldname_east_longitude: str, fieldname_center_latitude: str, fieldname_center_longitude: str, fieldname_wkbstr: str, fieldname_wktstr: str, fieldname_code: str, reader_delimiter: str, reader_quotechar: str, writer_delimiter: str, writer_quotechar: str, input_path: str, output_path: str, errors_path: typing.Optional[str], buffer_size: int, batch_size: int, cache_size: int, checkpoint_path: typing.Optional[str], checkpoint_interval: float, stats_path: typing.Optional[str], stats_interval: typing.Optional[float]) -> None:
     """The \033[1mappend2csv\033[0m command assigns a Unique Building Identifier (UBID) to each row in the input file.
 
-    The input, output and error files are represented in comma-separated values (CSV) format.  The input file is read from the standard input stream.  The output file is written to the standard output stream.  The error file is written to the standard error stream.
+    The input, output and error files are represented in comma-separated values (CSV) format.  By default, the input file is read from the standard input stream, the output file is written to the standard output stream and the error file is written to the standard error stream.  Otherwise, the paths to the files are specified by the \033[1m--input\033[0m, \033[1m--output\033[0m and \033[1m--errors\033[0m options.  Compressed input files (gzip, bz2, xz and zstd) are detected automatically.  Output and error files are compressed if their paths end with ".gz", ".bz2", ".xz" or ".zst".
 
     For each row in the input file, the geometry for the row is assigned a UBID.  If a UBID is successfully assigned, then the row is written to the output file with an added "UBID" field (the \033[1m--fieldname-code\033[0m option).  If a UBID is not assigned, for example, if an exception is raised, then the row is written to the error file.
 
@@ -95,9 +167,16 @@ def run_append_to_csv(ctx: None, dict_decoder_id: str, code_length: int, fieldna
 
     The number of digits in the Open Location Code (OLC) segment of the UBID string is specified by the \033[1m--code-length\033[0m option.
 
+    If the \033[1m--cache-size\033[0m option is greater than 0, then the UBIDs (or errors) of that many of the most recently used distinct geometries (viz., the raw WKB or WKT strings, or the latitude and longitude fields) are cached.  Rows with a cached geometry (e.g., one row per tenant or meter of a building) are neither decoded nor encoded again.  The numbers of cache hits and misses are recorded in the run statistics (the \033[1m--stats\033[0m option).
+
+    If the \033[1m--checkpoint\033[0m option is specified, then the progress of the command is periodically recorded in the checkpoint file.  If the command is interrupted, then running it again with the same options resumes from the last checkpoint: the output and error files are truncated to the recorded offsets and the remaining rows of the input file are appended.  The checkpoint file is deleted when the command succeeds.  The input file must not be the standard input stream, and the output and error files must be uncompressed files.  The path, size and modification time of the input file are recorded in the checkpoint file, and the command fails (rather than resumes) if they differ.
+
     The \033[1mappend2csv\033[0m command exits 0 on success, and >0 if an error occurs.
     """
 
+    from .dict_decoders import LatLngDictDecoder, WKBDictDecoder, WKTDictDecoder
+    from .dict_encoders import BaseGeometryDictEncoder, ErrorDictEncoder
+
     # Construct `DictDecoder[DictDatum]` for standard input stream.
     if 'latlng' == dict_decoder_id:
         decoder_in = LatLngDictDecoder(fieldname_center_latitude, fieldname_center_longitude, fieldname_north_latitude=fieldname_north_latitude, fieldname_south_latitude=fieldname_south_latitude, fieldname_east_longitude=fieldname_east_longitude, fieldname_west_longitude=fieldname_west_longitude)
@@ -115,21 +194,16 @@ def run_append_to_csv(ctx: None, dict_decoder_id: str, code_length: int, fieldna
     encoder_err = ErrorDictEncoder(fieldname_code)
 
     # Construct `DictPipe` for standard input, output and error streams.
-    dict_pipe = DictPipe(decoder_in, encoder_out, encoder_err)
+    dict_pipe = DictPipe(decoder_in, encoder_out, encoder_err, cache_size=cache_size)
 
-    # Standard input, output and error streams.
-    io_in = click.get_text_stream('stdin')
-    io_out = click.get_text_stream('stdout')
-    io_err = click.get_text_stream('stderr')
-
-    # Configuration for `csv.DictReader`.
+    # Configuration for `csv.reader`.
     args_in = []
     kwargs_in = {
         'delimiter': reader_delimiter,
         'quotechar': reader_quotechar,
     }
 
-    # Configuration for `csv.DictWriter`.
+    # Configuration for `csv.writer`.
     args_out = []
     kwargs_out = {
         'delimiter': writer_delimiter,
@@ -137,18 +211,246 @@ def run_append_to_csv(ctx: None, dict_decoder_id: str, code_length: int, fieldna
         # 'quoting': csv.QUOTE_NONNUMERIC,
     }
 
+    # Construct `Stats` for "--stats" option.
+    stats = make_stats_('append2csv', stats_path, stats_interval)
+
+    # Load checkpoint (if any) and truncate output and error files.
+    if checkpoint_path is None:
+        checkpoint = None
+
+        mode_out = 'w'
+    else:
+        if '-' == input_path:
+            raise click.BadParameter('requires the path to the input file', param_hint='--input')
+        for (param_hint, path, ) in [('--output', output_path, ), ('--errors', errors_path, )]:
+            if (path is None) or ('-' == path) or (compression_for_path(path) is not None):
+                raise click.BadParameter('requires the path to an uncompressed file', param_hint=param_hint)
+
+        try:
+            checkpoint = Checkpoint.load(checkpoint_path, path_in=input_path, interval=checkpoint_interval)
+        except (CustomException, OSError, ) as exception:
+            raise click.ClickException(exception)
+
+        if checkpoint.resuming:
+            logger.info('[append2csv] Resuming from checkpoint: {0} rows'.format(checkpoint.count_in))
+
+            checkpoint.truncate(output_path, errors_path)
+
+            mode_out = 'a'
+        else:
+            mode_out = 'w'
+
+    try:
+        # Input, output and error streams.
+        with open_text_stream(input_path, 'r', buffer_size=buffer_size) as io_in, open_text_stream(output_path, mode_out, buffer_size=buffer_size) as io_out, open_text_stream_or_stderr_(errors_path, buffer_size, mode=mode_out) as io_err:
+            if checkpoint is None:
+                dict_pipe.run(io_in, io_out, io_err, args_in=args_in, kwargs_in=kwargs_in, args_out=args_out, kwargs_out=kwargs_out, batch_size=batch_size, stats=stats)
+            else:
+                dict_pipe.run(OffsetLineReader(io_in.buffer, encoding=io_in.encoding), io_out, io_err, args_in=args_in, kwargs_in=kwargs_in, args_out=args_out, kwargs_out=kwargs_out, batch_size=batch_size, checkpoint=checkpoint, stats=stats)
+
+        if checkpoint is not None:
+            checkpoint.remove()
+
+        if dict_pipe.cache is not None:
+            logger.info('[append2csv] Cache: \033[1m{0}\033[0m hit{1} and \033[1m{2}\033[0m miss{3}'.format(dict_pipe.cache.hits, '' if dict_pipe.cache.hits == 1 else 's', dict_pipe.cache.misses, '' if dict_pipe.cache.misses == 1 else 'es'))
+    except (CustomException, OSError, ) as exception:
+        raise click.ClickException(exception)
+    finally:
+        stats.write()
+
+    # Done!
+    return
+
+@cli.command('append2geojson', short_help='append "UBID" property to features of newline-delimited GeoJSON file')
+@click.option('--code-length', type=click.IntRange(0, None), default=11, show_default=True, callback=click_callback_code_length_, help='the number of digits in the OLC segment of the UBID string')
+@click.option('--fieldname-code', type=click.STRING, default='UBID', show_default=True, help='the name of the UBID property in the output file')
+@click.option('--input', 'input_path', type=click.Path(dir_okay=False, allow_dash=True), default='-', show_default=True, help='the path to the input file (gzip, bz2, xz and zstd compression is detected automatically)')
+@click.option('--output', 'output_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default='-', show_default=True, help='the path to the output file (compressed if the extension is ".gz", ".bz2", ".xz" or ".zst")')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default=None, show_default='standard error stream', help='the path to the error file (compressed if the extension is ".gz", ".bz2", ".xz" or ".zst"); use "-" for the standard error stream')
+@click.option('--buffer-size', type=click.IntRange(1, None), default=DEFAULT_BUFFER_SIZE, show_default=True, help='the size (in bytes) of the buffer for reading and writing files')
+@click.option('--batch-size', type=click.IntRange(1, None), default=DEFAULT_BATCH_SIZE, show_default=True, help='the number of features of the input file that are processed and written at a time')
+@click.option('--stats', 'stats_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default=None, help='the path to the JSON file for run statistics (wall and CPU time per stage, row and error counts, and peak memory); use "-" for the standard error stream')
+@click.option('--stats-interval', type=click.FloatRange(0.0, None), default=None, help='the number of seconds between periodic updates of the JSON file for run statistics (by default, the file is written at the end of the run)')
+@click_profile_options_
+@click.pass_context
+def run_append_to_geojson(ctx: None, code_length: int, fieldname_code: str, input_path: str, output_path: str, errors_path: typing.Optional[str], buffer_size: int, batch_size: int, stats_path: typing.Optional[str], stats_interval: typing.Optional[float]) -> None:
+    """The \033[1mappend2geojson\033[0m command assigns a Unique Building Identifier (UBID) to each feature in the input file.
+
+    The input, output and error files are represented in newline-delimited GeoJSON (GeoJSONSeq) format, i.e., one GeoJSON Feature object per line.  By default, the input file is read from the standard input stream, the output file is written to the standard output stream and the error file is written to the standard error stream.  Otherwise, the paths to the files are specified by the \033[1m--input\033[0m, \033[1m--output\033[0m and \033[1m--errors\033[0m options.
+
+    For each feature in the input file, the geometry of the feature is assigned a UBID.  If a UBID is successfully assigned, then the feature is written to the output file with an added "UBID" property (the \033[1m--fieldname-code\033[0m option).  If a UBID is not assigned, for example, if an exception is raised, then the feature is written to the error file.
+
+    The number of digits in the Open Location Code (OLC) segment of the UBID string is specified by the \033[1m--code-length\033[0m option.
+
+    The \033[1mappend2geojson\033[0m command exits 0 on success, and >0 if an error occurs.
+    """
+
+    from .dict_decoders import GeoJSONDictDecoder
+    from .dict_encoders import BaseGeometryDictEncoder, ErrorDictEncoder
+
+    # Construct `Stats` for "--stats" option.
+    stats = make_stats_('append2geojson', stats_path, stats_interval)
+
+    # Construct `GeoJSONSeqPipe` for input, output and error streams.
+    geojson_seq_pipe = GeoJSONSeqPipe(GeoJSONDictDecoder(), BaseGeometryDictEncoder(fieldname_code, code_length), ErrorDictEncoder(fieldname_code))
+
+    try:
+        # Input, output and error streams.
+        with open_text_stream(input_path, 'r', buffer_size=buffer_size) as io_in, open_text_stream(output_path, 'w', buffer_size=buffer_size) as io_out, open_text_stream_or_stderr_(errors_path, buffer_size) as io_err:
+            geojson_seq_pipe.run(io_in, io_out, io_err, batch_size=batch_size, stats=stats)
+    except (CustomException, OSError, ) as exception:
+        raise click.ClickException(exception)
+    finally:
+        stats.write()
+
+    # Done!
+    return
+
+@cli.command('append2sqlite', short_help='append "UBID" column to table of SQLite database or GeoPackage')
+@click.argument('database', type=click.Path(exists=True, dir_okay=False, writable=True))
+@click.argument('table', type=click.STRING)
+@click.argument('dict-decoder-id', nargs=1, type=click.Choice(['gpkg', 'wkt'], case_sensitive=True), default='gpkg')
+@click.option('--code-length', type=click.IntRange(0, None), default=11, show_default=True, callback=click_callback_code_length_, help='the number of digits in the OLC segment of the UBID string')
+@click.option('--fieldname-geometry', type=click.STRING, default=None, show_default='from "gpkg_geometry_columns" table, or "geom"', help='the name of the geometry column in the table')
+@click.option('--fieldname-code', type=click.STRING, default='UBID', show_default=True, help='the name of the UBID column in the table')
+@click.option('--overwrite', is_flag=True, default=False, show_default=True, help='overwrite the UBID column if it is already present in the table')
+@click.option('--no-index', is_flag=True, default=False, show_default=True, help='do not create an index on the UBID column')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default=None, show_default='standard error stream', help='the path to the error file (compressed if the extension is ".gz", ".bz2", ".xz" or ".zst"); use "-" for the standard error stream')
+@click.option('--batch-size', type=click.IntRange(1, None), default=DEFAULT_BATCH_SIZE, show_default=True, help='the number of rows of the table that are read and updated at a time')
+@click.option('--transaction-size', type=click.IntRange(1, None), default=DEFAULT_TRANSACTION_SIZE, show_default=True, help='the number of rows of the table that are updated per transaction')
+@click.option('--writer-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the error file')
+@click.option('--writer-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the error file')
+@click_profile_options_
+@click.pass_context
+def run_append_to_sqlite(ctx: None, database: str, table: str, dict_decoder_id: str, code_length: int, fieldname_geometry: typing.Optional[str], fieldname_code: str, overwrite: bool, no_index: bool, errors_path: typing.Optional[str], batch_size: int, transaction_size: int, writer_delimiter: str, writer_quotechar: str) -> None:
+    """The \033[1mappend2sqlite\033[0m command assigns a Unique Building Identifier (UBID) to each row of a table in an SQLite database (or GeoPackage), in place.
+
+    The UBID is written to the "UBID" column (the \033[1m--fieldname-code\033[0m option), which is added to the table, and an index is created on the column.  The rows of the table are read and updated in pages of consecutive "rowid" values.  Rows for which a UBID is not assigned are written, with their "rowid", to the error file in comma-separated values (CSV) format.  By default, the error file is written to the standard error stream.
+
+    The following modes are available, where each mode corresponds to a geometry encoding:
+
+    \033[1mgpkg\033[0m\tShapes; represented as GeoPackage binary geometries or well-known binary (WKB) blobs (or hex-encoded WKB strings).
+
+    \033[1mwkt\033[0m\t\tShapes; represented as strings in well-known text (WKT) format.
+
+    The number of digits in the Open Location Code (OLC) segment of the UBID string is specified by the \033[1m--code-length\033[0m option.
+
+    The \033[1mappend2sqlite\033[0m command exits 0 on success, and >0 if an error occurs.
+    """
+
+    from .dict_decoders import GeoPackageDictDecoder, WKTDictDecoder
+    from .dict_encoders import BaseGeometryDictEncoder, ErrorDictEncoder
+
+    # Configuration for `csv.writer`.
+    args_out = []
+    kwargs_out = {
+        'delimiter': writer_delimiter,
+        'quotechar': writer_quotechar,
+    }
+
     try:
-        dict_pipe.run(io_in, io_out, io_err, args_in=args_in, kwargs_in=kwargs_in, args_out=args_out, kwargs_out=kwargs_out)
-    except CustomException as exception:
+        connection = sqlite3.connect(database)
+
+        try:
+            if fieldname_geometry is None:
+                fieldname_geometry = find_geometry_column(connection, table) or 'geom'
+
+            # Construct `DictDecoder[DictDatum]` for geometry column.
+            if 'gpkg' == dict_decoder_id:
+                decoder_in = GeoPackageDictDecoder(fieldname_geometry)
+            elif 'wkt' == dict_decoder_id:
+                decoder_in = WKTDictDecoder(fieldname_geometry)
+            else:
+                pass
+
+            # Construct `SQLitePipe` for table.
+            sqlite_pipe = SQLitePipe(decoder_in, BaseGeometryDictEncoder(fieldname_code, code_length), ErrorDictEncoder(fieldname_code))
+
+            with open_text_stream_or_stderr_(errors_path, DEFAULT_BUFFER_SIZE) as io_err:
+                (count_out, count_err, ) = sqlite_pipe.run(connection, table, io_err, args_out=args_out, kwargs_out=kwargs_out, batch_size=batch_size, transaction_size=transaction_size, overwrite=overwrite, create_index=not no_index)
+
+            logger.info('[append2sqlite] Updated \033[1m{0}/{1}\033[0m rows of table: "{2}"'.format(count_out, count_out + count_err, table.replace('"', '\\"')))
+        finally:
+            connection.close()
+    except (CustomException, OSError, sqlite3.Error, ) as exception:
         raise click.ClickException(exception)
 
     # Done!
     return
 
-@cli.command('crossref', short_help='cross-reference "UBID" fields in rows of two CSV files')
+def click_callback_dtypes_(ctx: None, opt: click.core.Option, value: typing.Tuple[str, ...]) -> typing.Dict[str, typing.Any]:
+    """Callback for "--left-dtype" and "--right-dtype" options (the name of a field and the name of its type, separated by an equals sign).
+
+    Returns the types by field name.
+    """
+
+    dtypes: typing.Dict[str, typing.Any] = {}
+
+    for part in value:
+        (fieldname, sep, dtype_name, ) = part.rpartition('=')
+
+        if (len(sep) == 0) or (len(fieldname) == 0):
+            raise click.BadParameter('Invalid field type: {0}'.format(part))
+
+        try:
+            dtypes[fieldname] = parse_dtype(dtype_name)
+        except ValueError:
+            raise click.BadParameter('Invalid field type: {0}'.format(part))
+
+    return dtypes
+
+def click_callback_shard_(ctx: None, opt: click.core.Option, value: typing.Optional[str]) -> typing.Optional[typing.Tuple[int, int]]:
+    """Callback for "--shard" option (the 1-based index and the number of shards, separated by a slash).
+
+    Returns the 0-based index and the number of shards.
+    """
+
+    if value is None:
+        return None
+
+    try:
+        (index, count, ) = [int(part) for part in value.split('/')]
+    except ValueError:
+        raise click.BadParameter('Invalid shard: {0}'.format(value))
+
+    if not (1 <= index <= count):
+        raise click.BadParameter('Invalid shard: {0}'.format(value))
+
+    return (index - 1, count, )
+
+# The names of the options of the "crossref" command for the fields of
+# `buildingid.crossref.CrossrefOptions` whose names differ (see
+# `crossref_option_name_`).
+CROSSREF_OPTION_NAMES_ = {
+    'sort_order': '--sort-by-jaccard',
+    'left.group_order': '--left-group-by-jaccard',
+    'right.group_order': '--right-group-by-jaccard',
+    'left.include_fields': '--include-left-field',
+    'right.include_fields': '--include-right-field',
+    'max_candidates': '--max-candidates-per-row',
+}
+
+def crossref_option_name_(name: str) -> str:
+    """Return the name of the option of the "crossref" command for the given field of `buildingid.crossref.CrossrefOptions` (e.g., "--left-fieldname-geometry" for "left.fieldname_geometry").
+    """
+
+    return '"{0}"'.format(CROSSREF_OPTION_NAMES_.get(name, '--{0}'.format(name.replace('.', '-').replace('_', '-'))))
+
+def tqdm_progress_(iterable: typing.Iterable[typing.Any], total: int) -> typing.Iterable[typing.Any]:
+    from tqdm import tqdm
+
+    return tqdm(iterable, total=total)
+
+@cli.command('crossref',short_help='cross-reference "UBID" fields in rows of two CSV files')
 @click.argument('left', type=click.File('r'))
 @click.argument('right', type=click.File('r'))
 @click.argument('dst', type=click.File('w'))
+@click.option('--mode', type=click.Choice(['intersects', 'nearest'], case_sensitive=True), default='intersects', show_default=True, help='cross-reference intersecting UBIDs, or the nearest UBIDs of the right input file for each row of the left input file')
+@click.option('--predicate', type=click.Choice(['intersects', 'contains', 'within'], case_sensitive=True), default='intersects', show_default=True, help='cross-reference UBIDs whose bounding boxes intersect, or whose left bounding box contains or is within the right bounding box (for "--mode intersects")')
+@click.option('--k', 'k', type=click.IntRange(min=1), default=1, show_default=True, help='the number of nearest UBIDs for each row of the left input file (for "--mode nearest")')
+@click.option('--max-distance', type=click.FloatRange(min=0.0), default=100.0, show_default=True, help='the maximum distance (in meters) to the nearest UBIDs (for "--mode nearest")')
+@click.option('--distance-metric', type=click.Choice(['bbox', 'centroid'], case_sensitive=True), default='bbox', show_default=True, help='measure the distance between UBID bounding boxes, or between the centers of their centroid cells (for "--mode nearest")')
+@click.option('--fieldname-distance', type=click.STRING, default='distance', show_default=True, help='the name of the distance (in meters) in the output file (for "--mode nearest")')
 @click.option('--fieldname-jaccard', type=click.STRING, default='IoU', show_default=True, help='the name of the Jaccard similarity coefficient (viz., "intersection over union" or "IoU") in the output file')
 @click.option('--include-jaccard-field', is_flag=True, default=False, show_default=True, help='include the Jaccard similarity coefficient in the output file')
 @click.option('--include-index-fields', is_flag=True, default=False, show_default=True, help='include the index field in the output file')
@@ -156,6 +458,9 @@ def run_append_to_csv(ctx: None, dict_decoder_id: str, code_length: int, fieldna
 @click.option('--include-right-field', type=click.STRING, multiple=True, help='include the named field of the right input file in the output file')
 @click.option('--jaccard-min', type=click.FloatRange(min=0.0, max=1.0), default=0.0, show_default=True, help='the minimum value of the Jaccard similarity coefficient')
 @click.option('--jaccard-max', type=click.FloatRange(min=0.0, max=1.0), default=1.0, show_default=True, help='the maximum value of the Jaccard similarity coefficient')
+@click.option('--fieldname-refined-jaccard', type=click.STRING, default='footprint_IoU', show_default=True, help='the name of the Jaccard similarity coefficient of the footprints in the output file (see the "--left-fieldname-geometry" and "--right-fieldname-geometry" options)')
+@click.option('--refined-jaccard-min', type=click.FloatRange(min=0.0, max=1.0), default=0.0, show_default=True, help='the minimum value of the Jaccard similarity coefficient of the footprints')
+@click.option('--refined-jaccard-max', type=click.FloatRange(min=0.0, max=1.0), default=1.0, show_default=True, help='the maximum value of the Jaccard similarity coefficient of the footprints')
 @click.option('--sort-by-jaccard', is_flag=True, default=False, show_default=True, help='sort the rows of the output file by the Jaccard similarity coefficient')
 @click.option('--sort-order', type=click.Choice(['ASC', 'DESC'], case_sensitive=True), default='ASC', show_default=True, help='the sort order for the rows of the output file')
 @click.option('--left-group-by-jaccard', is_flag=True, default=False, show_default=True, help='group the rows of the left input file by their UBID strings')
@@ -165,266 +470,834 @@ def run_append_to_csv(ctx: None, dict_decoder_id: str, code_length: int, fieldna
 @click.option('--left-fieldname-code', type=click.STRING, default='UBID', show_default=True, help='the name of the UBID field in the left input file')
 @click.option('--left-fieldname-index', type=click.STRING, default='index', show_default=True, help='the name of the index field in the left input file')
 @click.option('--left-fieldname-openlocationcode', type=click.STRING, default='__openlocationcode__', show_default=True, help='the name of the temporary field for decoded UBID strings in the left input file')
+@click.option('--left-fieldname-geometry', type=click.STRING, default=None, help='the name of the footprint field in the left input file (enables the refine stage)')
+@click.option('--left-geometry-format', type=click.Choice(['wkt', 'wkb'], case_sensitive=True), default='wkt', show_default=True, help='the format of the footprint field in the left input file (WKT or hex-encoded WKB)')
+@click.option('--left-partition-field', type=click.STRING, default=None, help='the name of the partition key field in the left input file (e.g., a county FIPS code or a postal code; rows are cross-referenced only with rows of the right input file that have the same key)')
 @click.option('--left-suffix', type=click.STRING, default='_x', show_default=True, help='the suffix for field names in the left input file')
 @click.option('--left-reader-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the left input file')
 @click.option('--left-reader-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the left input file')
+@click.option('--left-dtype', type=click.STRING, multiple=True, callback=click_callback_dtypes_, help='the type of a field of the left input file, e.g., "county=category", "UBID=string[pyarrow]" or "floor_area=float32" (overrides the inferred type)')
 @click.option('--right-fieldname-code', type=click.STRING, default='UBID', show_default=True, help='the name of the UBID field in the right input file')
 @click.option('--right-fieldname-index', type=click.STRING, default='index', show_default=True, help='the name of the index field in the right input file')
 @click.option('--right-fieldname-openlocationcode', type=click.STRING, default='__openlocationcode__', show_default=True, help='the name of the temporary field for decoded UBID strings in the right input file')
+@click.option('--right-fieldname-geometry', type=click.STRING, default=None, help='the name of the footprint field in the right input file (enables the refine stage)')
+@click.option('--right-geometry-format', type=click.Choice(['wkt', 'wkb'], case_sensitive=True), default='wkt', show_default=True, help='the format of the footprint field in the right input file (WKT or hex-encoded WKB)')
+@click.option('--right-partition-field', type=click.STRING, default=None, help='the name of the partition key field in the right input file')
 @click.option('--right-suffix', type=click.STRING, default='_y', show_default=True, help='the suffix for field names in the right input file')
 @click.option('--right-reader-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the right input file')
 @click.option('--right-reader-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the right input file')
+@click.option('--right-dtype', type=click.STRING, multiple=True, callback=click_callback_dtypes_, help='the type of a field of the right input file (overrides the inferred type)')
+@click.option('--infer-dtypes/--no-infer-dtypes', 'infer_types', default=True, show_default=True, help='infer the types of the text fields of the input files from a sample of their rows (categorical, or Arrow-backed strings)')
+@click.option('--dtype-sample-size', type=click.IntRange(min=1), default=DEFAULT_SAMPLE_SIZE, show_default=True, help='the number of rows of each input file that are read to infer the types of its fields')
+@click.option('--oversized-extent', type=click.FloatRange(min=0.0), default=DEFAULT_OVERSIZED_EXTENT_, show_default=True, help='the height or width (in meters) above which UBID bounding boxes are kept in a flat list, rather than in the spatial index')
+@click.option('--max-candidates-per-row', type=click.IntRange(min=1), default=None, help='the maximum number of candidate intersections for each row of the left and right input files (by default, unlimited)')
+@click.option('--candidates-policy', type=click.Choice(['top', 'error'], case_sensitive=True), default='top', show_default=True, help='the policy for rows with more than the maximum number of candidate intersections: keep the candidates with the greatest Jaccard similarity coefficients, or write the row to the error file')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default=None, show_default='standard error stream', help='the path to the error file (compressed if the extension is ".gz", ".bz2", ".xz" or ".zst"); use "-" for the standard error stream')
+@click.option('--shard', type=click.STRING, default=None, callback=click_callback_shard_, help='cross-reference only the I-th of N spatial shards, where 1 <= I <= N (e.g., "3/8"; see the "merge-shards" command)')
+@click.option('--shard-level', type=click.Choice(['2', '4', '6', '8'], case_sensitive=True), default=str(DEFAULT_SHARD_LEVEL_), show_default=True, help='the length of the OLC prefixes of the cells that are assigned to shards')
+@click.option('--partition-workers', type=click.IntRange(1, None), default=1, show_default=True, help='the number of worker processes for the partitions (see the "--left-partition-field" and "--right-partition-field" options)')
+@click.option('--previous', type=click.File('r'), default=None, help='the path to the previous output file (enables the incremental mode; see the "--left-changes" and "--right-changes" options)')
+@click.option('--left-changes', type=click.File('r'), multiple=True, help='the path to a file of added, removed or modified rows of the left input file (only the id field is read; for "--previous")')
+@click.option('--right-changes', type=click.File('r'), multiple=True, help='the path to a file of added, removed or modified rows of the right input file (only the id field is read; for "--previous")')
+@click.option('--left-fieldname-id', type=click.STRING, default=None, help='the name of the stable id field in the left input file (for "--previous")')
+@click.option('--right-fieldname-id', type=click.STRING, default=None, help='the name of the stable id field in the right input file (for "--previous")')
+@click.option('--changes-output', type=click.File('w'), default=None, help='the path to the change log of the pairs that are gained and lost (for "--previous")')
 @click.option('--writer-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the output file')
 @click.option('--writer-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the output file')
+@click.option('--stats', 'stats_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default=None, help='the path to the JSON file for run statistics (wall and CPU time per stage, row and error counts, and peak memory); use "-" for the standard error stream')
+@click.option('--stats-interval', type=click.FloatRange(0.0, None), default=None, help='the number of seconds between periodic updates of the JSON file for run statistics (by default, the file is written at the end of the run)')
+@click_profile_options_
 @click.pass_context
-def run_crossref(ctx: None, left: typing.TextIO, right: typing.TextIO, dst: typing.TextIO, fieldname_jaccard: str, include_jaccard_field: bool, include_index_fields: bool, include_left_field: typing.List[str], include_right_field: typing.List[str], jaccard_min: float, jaccard_max: float, sort_by_jaccard: bool, sort_order: str, left_group_by_jaccard: bool, left_group_order: str, right_group_by_jaccard: bool, right_group_order: str, left_fieldname_code: str, left_fieldname_index: str, left_fieldname_openlocationcode: str, left_suffix: str, left_reader_delimiter: str, left_reader_quotechar: str, right_fieldname_code: str, right_fieldname_index: str, right_fieldname_openlocationcode: str, right_suffix: str, right_reader_delimiter: str, right_reader_quotechar: str, writer_delimiter: str, writer_quotechar: str) -> None:
+def run_crossref(ctx: None, left: typing.TextIO, right: typing.TextIO, dst: typing.TextIO, mode: str, predicate: str, k: int, max_distance: float, distance_metric: str, fieldname_distance: str, fieldname_jaccard: str, include_jaccard_field: bool, include_index_fields: bool, include_left_field: typing.List[str], include_right_field: typing.List[str], jaccard_min: float, jaccard_max: float, fieldname_refined_jaccard: str, refined_jaccard_min: float, refined_jaccard_max: float, sort_by_jaccard: bool, sort_order: str, left_group_by_jaccard: bool, left_group_order: str, right_group_by_jaccard: bool, right_group_order: str, left_fieldname_code: str, left_fieldname_index: str, left_fieldname_openlocationcode: str, left_fieldname_geometry: typing.Optional[str], left_geometry_format: str, left_partition_field: typing.Optional[str], left_suffix: str, left_reader_delimiter: str, left_reader_quotechar: str, left_dtype: typing.Dict[str, typing.Any], right_fieldname_code: str, right_fieldname_index: str, right_fieldname_openlocationcode: str, right_fieldname_geometry: typing.Optional[str], right_geometry_format: str, right_partition_field: typing.Optional[str], right_suffix: str, right_reader_delimiter: str, right_reader_quotechar: str, right_dtype: typing.Dict[str, typing.Any], infer_types: bool, dtype_sample_size: int, oversized_extent: float, max_candidates_per_row: typing.Optional[int], candidates_policy: str, errors_path: typing.Optional[str], shard: typing.Optional[typing.Tuple[int, int]], shard_level: str, partition_workers: int, previous: typing.Optional[typing.TextIO], left_changes: typing.Tuple[typing.TextIO, ...], right_changes: typing.Tuple[typing.TextIO, ...], left_fieldname_id: typing.Optional[str], right_fieldname_id: typing.Optional[str], changes_output: typing.Optional[typing.TextIO], writer_delimiter: str, writer_quotechar: str, stats_path: typing.Optional[str], stats_interval: typing.Optional[float]) -> None:
     """The \033[1mcrossref\033[0m command cross-references the Unique Building Identifiers (UBIDs) in the rows of the left and right input files.
 
     The left input, right input and output files are represented in comma-separated values (CSV) format.  The left and right input files are read from either the standard input stream (using "-") or the specified path.  The output file is written to either the standard output stream (using "-") or the specified path.
 
-    The larger of the two input files is used to construct a quadtree-based spatial index.  The smaller of the two input files is traversed, row at a time, to identify intersecting UBID bounding boxes.  For each intersection, the Jaccard similarity coefficient (viz., "intersection over union" or "IoU") is calculated, and the row is written to the output file.
+    The larger of the two input files is used to construct a quadtree-based spatial index.  The smaller of the two input files is traversed, row at a time, to identify intersecting UBID bounding boxes.  For each intersection, the Jaccard similarity coefficient (viz., "intersection over union" or "IoU") is calculated, and the row is written to the output file.  Each distinct UBID (e.g., of the rows for the units, meters or years of a building) is decoded, indexed, traversed and compared once, and the intersections are then written for each of its rows.
 
-    The \033[1mcrossref\033[0m command exits 0 on success, and >0 if an error occurs.
-    """
+    If the \033[1m--mode\033[0m option is "nearest", then the right input file is used to construct the spatial index, and, for each row of the left input file, the \033[1m--k\033[0m nearest rows of the right input file within the \033[1m--max-distance\033[0m option (in meters) are written to the output file, with the distance and the Jaccard similarity coefficient (zero for non-intersecting UBIDs).  The distance is measured between UBID bounding boxes (zero if they intersect), or between the centers of their centroid cells (the \033[1m--distance-metric\033[0m option).  The spatial index is searched in expanding rings, rather than by scanning all rows.
 
-    # Configuration for `pandas.read_csv` for left input file.
-    kwargs_for_read_csv_left: typing.Dict[str, typing.Any] = {
-        'dtype': {
-            left_fieldname_code: str,
-        },
-        'quotechar': left_reader_quotechar,
-        'sep': left_reader_delimiter,
-        'usecols': [
-            left_fieldname_code,
-        ] + list(include_left_field),
-    }
+    If the \033[1m--left-fieldname-geometry\033[0m and \033[1m--right-fieldname-geometry\033[0m options are specified, then the intersections that are selected by the \033[1m--jaccard-min\033[0m and \033[1m--jaccard-max\033[0m options are refined: the Jaccard similarity coefficient of the footprints (WKT or WKB) is calculated, and the intersections are selected again by the \033[1m--refined-jaccard-min\033[0m and \033[1m--refined-jaccard-max\033[0m options.  The refined coefficient is written to the output file, and is used for sorting and grouping.
 
-    # Configuration for `pandas.read_csv` for right input file.
-    kwargs_for_read_csv_right: typing.Dict[str, typing.Any] = {
-        'dtype': {
-            right_fieldname_code: str,
-        },
-        'quotechar': right_reader_quotechar,
-        'sep': right_reader_delimiter,
-        'usecols': [
-            right_fieldname_code,
-        ] + list(include_right_field),
-    }
+    If the \033[1m--left-partition-field\033[0m and \033[1m--right-partition-field\033[0m options are specified, then rows are cross-referenced only with rows that have the same partition key (e.g., a county FIPS code).  A spatial index is constructed for each partition, and the partitions are processed independently (by \033[1m--partition-workers\033[0m worker processes).  Rows whose partition keys are missing are not cross-referenced.
 
-    # Configuration for `pandas.to_csv` for output file.
-    kwargs_for_to_csv_dst: typing.Dict[str, typing.Any] = {
-        'quotechar': writer_quotechar,
-        # 'quoting': csv.QUOTE_NONNUMERIC,
-        'sep': writer_delimiter,
-    }
+    If the \033[1m--predicate\033[0m option is "contains" or "within", then only the intersections where the left UBID bounding box contains or is within (respectively) the right UBID bounding box are written to the output file (e.g., parcels that contain buildings).  The predicate is evaluated on the candidates from the spatial index, and the Jaccard similarity coefficient is only calculated if it is needed (viz., the \033[1m--include-jaccard-field\033[0m, \033[1m--jaccard-min\033[0m, \033[1m--jaccard-max\033[0m, sort and group options).
 
-    # Names for "index" fields for left and right input files.
-    left_fieldname_index_with_suffix: str = '{0}{1}'.format(left_fieldname_index, left_suffix)
-    right_fieldname_index_with_suffix: str = '{0}{1}'.format(right_fieldname_index, right_suffix)
+    UBID bounding boxes whose heights or widths are greater than the \033[1m--oversized-extent\033[0m option (in meters; e.g., campuses, or mis-geocoded footprints) are kept in a flat list, rather than in the spatial index.  If the \033[1m--max-candidates-per-row\033[0m option is specified, then each row of the left and right input files has at most that many candidate intersections: either the candidates with the greatest Jaccard similarity coefficients are kept, or the row is written to the error file (the \033[1m--candidates-policy\033[0m option).  The \033[1m--max-candidates-per-row\033[0m option cannot be used with the \033[1m--shard\033[0m option.
 
-    # Names for "__openlocationcode__" fields for left and right input files.
-    left_fieldname_openlocationcode_with_suffix: str = '{0}{1}'.format(left_fieldname_openlocationcode, left_suffix)
-    right_fieldname_openlocationcode_with_suffix: str = '{0}{1}'.format(right_fieldname_openlocationcode, right_suffix)
+    If the \033[1m--shard\033[0m option is specified (e.g., "3/8"), then space is divided into OLC cells, which are assigned to N shards.  Only the rows whose UBID bounding boxes touch the cells of the I-th shard (and, for nearest-neighbor queries, the rows of the right input file within the \033[1m--max-distance\033[0m option of them) are read, and only the intersections that are owned by the shard are written (viz., the shard that owns the south-west corner of the intersection of the UBID bounding boxes or, for nearest-neighbor queries, the centroid of the left UBID).  Use the \033[1mmerge-shards\033[0m command to combine the output files for all N shards, which are the output file without sharding.
 
-    def callback_decode_(code: Code) -> typing.Optional[CodeArea]:
-        """Return the decoded 'CodeArea' for the given 'Code', or 'None' if an error occurs.
-        """
+    The types of the text fields of the input files are inferred from a sample of their rows (the \033[1m--dtype-sample-size\033[0m option): the UBID and footprint fields, and the fields with many distinct values, are stored as Arrow-backed strings (if the "pyarrow" package is installed), and the other text fields are categorical.  The types of other fields (e.g., numbers) are inferred by \033[1mpandas.read_csv\033[0m.  The values in the output file are the same.  Use the \033[1m--left-dtype\033[0m and \033[1m--right-dtype\033[0m options to override the type of a field (e.g., "county=category"), or the \033[1m--no-infer-dtypes\033[0m option to disable inference (e.g., if the input files are not seekable).  The memory use of the input and output files is logged and recorded in the run statistics.
 
-        if code is None:
-            return None
+    If the \033[1m--previous\033[0m option is specified, then the output file is updated incrementally: the rows of the left and right input files are identified by stable ids (the \033[1m--left-fieldname-id\033[0m and \033[1m--right-fieldname-id\033[0m options, which must be included in the output file), and the ids of the added, removed and modified rows are read from the files of the \033[1m--left-changes\033[0m and \033[1m--right-changes\033[0m options.  Only the pairs with a changed row are cross-referenced; the other rows of the previous output file are kept.  The rows of the output file are ordered by the rows of the left and right input files, and are otherwise the rows of a full cross-reference.  The pairs that are gained and lost are written to the file of the \033[1m--changes-output\033[0m option.
 
-        try:
-            codeArea = decode(code)
-        except (AssertionError, ValueError, ):
-            return None
+    The \033[1mcrossref\033[0m command exits 0 on success, and >0 if an error occurs.
+    """
 
-        return codeArea
+    import csv
+
+    from ..crossref import CrossrefOptions, InputOptions, crossref_csv
+
+    # Configuration for `buildingid.crossref.crossref_csv`.
+    options = CrossrefOptions(
+        left=InputOptions(
+            fieldname_code=left_fieldname_code,
+            fieldname_index=left_fieldname_index,
+            fieldname_openlocationcode=left_fieldname_openlocationcode,
+            fieldname_geometry=left_fieldname_geometry,
+            geometry_format=left_geometry_format,
+            partition_field=left_partition_field,
+            suffix=left_suffix,
+            include_fields=include_left_field,
+            group_order=left_group_order if left_group_by_jaccard else None,
+            dtype=left_dtype,
+            delimiter=left_reader_delimiter,
+            quotechar=left_reader_quotechar,
+            fieldname_id=left_fieldname_id,
+            changes=left_changes,
+        ),
+        right=InputOptions(
+            fieldname_code=right_fieldname_code,
+            fieldname_index=right_fieldname_index,
+            fieldname_openlocationcode=right_fieldname_openlocationcode,
+            fieldname_geometry=right_fieldname_geometry,
+            geometry_format=right_geometry_format,
+            partition_field=right_partition_field,
+            suffix=right_suffix,
+            include_fields=include_right_field,
+            group_order=right_group_order if right_group_by_jaccard else None,
+            dtype=right_dtype,
+            delimiter=right_reader_delimiter,
+            quotechar=right_reader_quotechar,
+            fieldname_id=right_fieldname_id,
+            changes=right_changes,
+        ),
+        mode=mode,
+        predicate=predicate,
+        k=k,
+        max_distance=max_distance,
+        distance_metric=distance_metric,
+        fieldname_distance=fieldname_distance,
+        fieldname_jaccard=fieldname_jaccard,
+        include_jaccard_field=include_jaccard_field,
+        include_index_fields=include_index_fields,
+        jaccard_min=jaccard_min,
+        jaccard_max=jaccard_max,
+        fieldname_refined_jaccard=fieldname_refined_jaccard,
+        refined_jaccard_min=refined_jaccard_min,
+        refined_jaccard_max=refined_jaccard_max,
+        sort_order=sort_order if sort_by_jaccard else None,
+        oversized_extent=oversized_extent,
+        max_candidates=max_candidates_per_row,
+        candidates_policy=candidates_policy,
+        shard=shard,
+        shard_level=int(shard_level),
+        partition_workers=partition_workers,
+        infer_dtypes=infer_types,
+        dtype_sample_size=dtype_sample_size,
+        previous=previous,
+        writer_delimiter=writer_delimiter,
+        writer_quotechar=writer_quotechar,
+    )
+
+    # Ensure that the options are consistent (see `buildingid.crossref.CrossrefOptions.validate`), and that the change log is only written for the incremental mode.
+    try:
+        options.validate(option_name=crossref_option_name_)
+    except ValueError as exception:
+        raise click.UsageError(str(exception))
 
-    def sort_order_to_ascending_(value: str) -> typing.Optional[bool]:
-        """Return the "ascending" argument for the `pandas.DataFrame.sort_values` method.
-        """
+    if (changes_output is not None) and (previous is None):
+        raise click.UsageError('Option "--changes-output" requires option "--previous".')
 
-        if value == 'ASC':
-            return True
-        elif value == 'DESC':
-            return False
-        else:
-            return None
+    # Construct `Stats` for "--stats" option.
+    stats = make_stats_('crossref', stats_path, stats_interval)
 
     try:
-        # Construct 'pandas.DataFrame' for left input file.
-        #
-        # Ensure that "UBID" field is present and that "index" and "__openlocationcode__" fields are not present.
-        #
-        # Finally, construct 'pandas.Series' for 'CodeArea' by decoding "UBID" field.
-        logger.info('[crossref] Reading left input file: "{0}"'.format(str(left.name).replace('"', '\\"')))
-        left_data_frame: pandas.DataFrame = pandas.read_csv(filepath_or_buffer=left, **kwargs_for_read_csv_left)
-        if left_fieldname_code not in left_data_frame:
-            raise FieldNotFoundError(left_fieldname_code)
-        elif left_fieldname_index_with_suffix in left_data_frame:
-            raise FieldNotUniqueError(left_fieldname_index_with_suffix)
-        elif left_fieldname_openlocationcode_with_suffix in left_data_frame:
-            raise FieldNotUniqueError(left_fieldname_openlocationcode_with_suffix)
-        left_series_codeArea: pandas.Series = left_data_frame[left_fieldname_code].progress_apply(callback_decode_)
-        logger.info('[crossref] Decoded \033[1m{0}/{1} ({2}%)\033[0m rows of left input file'.format(left_series_codeArea.count(), len(left_data_frame), round((left_series_codeArea.count() / len(left_data_frame)) * 100, 2)))
-
-        # Construct 'pandas.DataFrame' for right input file.
-        #
-        # Ensure that "UBID" field is present and that "index" and "__openlocationcode__" fields are not present.
+        # Cross-reference left and right input files (see `buildingid.crossref`).
+        result = crossref_csv(left, right, options, stats=stats, progress=tqdm_progress_, logger=logger)
+
+        # Write error file.
         #
-        # Finally, construct 'pandas.Series' for 'CodeArea' by decoding "UBID" field.
-        logger.info('[crossref] Reading right input file: "{0}"'.format(str(right.name).replace('"', '\\"')))
-        right_data_frame: pandas.DataFrame = pandas.read_csv(filepath_or_buffer=right, **kwargs_for_read_csv_right)
-        if right_fieldname_code not in right_data_frame:
-            raise FieldNotFoundError(right_fieldname_code)
-        elif right_fieldname_index_with_suffix in right_data_frame:
-            raise FieldNotUniqueError(right_fieldname_index_with_suffix)
-        elif right_fieldname_openlocationcode_with_suffix in right_data_frame:
-            raise FieldNotUniqueError(right_fieldname_openlocationcode_with_suffix)
-        right_series_codeArea: pandas.Series = right_data_frame[right_fieldname_code].progress_apply(callback_decode_)
-        logger.info('[crossref] Decoded \033[1m{0}/{1} ({2}%)\033[0m rows of right input file'.format(right_series_codeArea.count(), len(right_data_frame), round((right_series_codeArea.count() / len(right_data_frame)) * 100, 2)))
-
-        # Construct quadtree-based spatial index.
-        if len(left_series_codeArea) >= len(right_series_codeArea):
-            # If left input file has more rows than right input file, then construct
-            # spatial index using left input file and cross-reference with rows of
-            # right input file.
-
-            logger.info('[crossref] Constructing quadtree for left input file')
-            left_spindex: pyqtree.Index = pyqtree.Index(bbox=[
-                left_series_codeArea.progress_apply(lambda codeArea: codeArea.longitudeLo).min(),
-                left_series_codeArea.progress_apply(lambda codeArea: codeArea.latitudeLo).min(),
-                left_series_codeArea.progress_apply(lambda codeArea: codeArea.longitudeHi).max(),
-                left_series_codeArea.progress_apply(lambda codeArea: codeArea.latitudeHi).max(),
-            ])
-            for left_index, left_codeArea in tqdm(left_series_codeArea.iteritems(), total=len(left_series_codeArea)):
-                if left_codeArea is not None:
-                    left_spindex.insert(item=(left_index, left_codeArea), bbox=[left_codeArea.longitudeLo, left_codeArea.latitudeLo, left_codeArea.longitudeHi, left_codeArea.latitudeHi])
-
-            logger.info('[crossref] Cross-referencing rows of right input file against quadtree for left input file')
-            dst_data: typing.List[typing.Tuple[int, int, CodeArea, CodeArea]] = [
-                (left_index, right_index, left_codeArea, right_codeArea)
-                for right_index, right_codeArea
-                in tqdm(right_series_codeArea.iteritems(), total=len(right_series_codeArea))
-                if right_codeArea is not None
-                for (left_index, left_codeArea)
-                in left_spindex.intersect([right_codeArea.longitudeLo, right_codeArea.latitudeLo, right_codeArea.longitudeHi, right_codeArea.latitudeHi])
-                if left_codeArea is not None
-            ]
-        else:
-            # If right input file has more rows than left input file, then construct
-            # spatial index using right input file and cross-reference with rows of
-            # left input file.
-
-            logger.info('[crossref] Constructing quadtree for right input file')
-            right_spindex: pyqtree.Index = pyqtree.Index(bbox=[
-                right_series_codeArea.progress_apply(lambda codeArea: codeArea.longitudeLo).min(),
-                right_series_codeArea.progress_apply(lambda codeArea: codeArea.latitudeLo).min(),
-                right_series_codeArea.progress_apply(lambda codeArea: codeArea.longitudeHi).max(),
-                right_series_codeArea.progress_apply(lambda codeArea: codeArea.latitudeHi).max(),
-            ])
-            for right_index, right_codeArea in tqdm(right_series_codeArea.iteritems(), total=len(right_series_codeArea)):
-                if right_codeArea is not None:
-                    right_spindex.insert(item=(right_index, right_codeArea), bbox=[right_codeArea.longitudeLo, right_codeArea.latitudeLo, right_codeArea.longitudeHi, right_codeArea.latitudeHi])
-
-            logger.info('[crossref] Cross-referencing rows of left input file against quadtree for right input file')
-            dst_data: typing.List[typing.Tuple[int, int, CodeArea, CodeArea]] = [
-                (left_index, right_index, left_codeArea, right_codeArea)
-                for left_index, left_codeArea
-                in tqdm(left_series_codeArea.iteritems(), total=len(left_series_codeArea))
-                if left_codeArea is not None
-                for (right_index, right_codeArea)
-                in right_spindex.intersect([left_codeArea.longitudeLo, left_codeArea.latitudeLo, left_codeArea.longitudeHi, left_codeArea.latitudeHi])
-                if right_codeArea is not None
-            ]
-
-        # Construct 'pandas.DataFrame' for cross-reference results (viz., "intersections").
-        dst_data_frame: pandas.DataFrame = pandas.DataFrame(data=dst_data, columns=[
-            left_fieldname_index_with_suffix,
-            right_fieldname_index_with_suffix,
-            left_fieldname_openlocationcode_with_suffix,
-            right_fieldname_openlocationcode_with_suffix,
-        ])
+        # The code field is named after the "--left-fieldname-code" and "--right-fieldname-code" options (or "code" if they differ).
+        if len(result.errors) > 0:
+            logger.info('[crossref] Writing error file: "{0}"'.format(str(errors_path or '-').replace('"', '\\"')))
+            with open_text_stream_or_stderr_(errors_path, DEFAULT_BUFFER_SIZE) as io_err:
+                csv_err = csv.writer(io_err, delimiter=writer_delimiter, quotechar=writer_quotechar, lineterminator='\n')
+                csv_err.writerow(['side', 'index', left_fieldname_code if (left_fieldname_code == right_fieldname_code) else 'code', 'UBID_Error_Name', 'UBID_Error_Message'])
+                csv_err.writerows([[side, label, code, type(exception).__name__, str(exception)] for (side, label, code, exception, ) in result.errors])
+
+        # Write change log.
+        if changes_output is not None:
+            logger.info('[crossref] Writing change log: "{0}"'.format(str(changes_output.name).replace('"', '\\"')))
+            if result.changes_data_frame is None:
+                changes_output.write('')
+            else:
+                result.changes_data_frame.to_csv(path_or_buf=changes_output, header=True, index=False, quotechar=writer_quotechar, sep=writer_delimiter)
 
         # If there are no cross-reference results, then exit.
-        len_dst_data_frame0: int = len(dst_data_frame)
-        logger.info('[crossref] Found \033[1m{0}\033[0m intersection{1}'.format(len_dst_data_frame0, '' if len_dst_data_frame0 == 1 else 's'))
-        if len_dst_data_frame0 == 0:
+        #
+        # For shards, write an empty output file (see the "merge-shards" command).
+        if result.data_frame is None:
+            if shard is not None:
+                dst.write('')
+
             return
 
-        # Calculate Jaccard similarity coefficient (viz., "intersection over union", "IoU", etc.) for each cross-reference result.
-        logger.info('[crossref] Calculating field: "{0}"'.format(fieldname_jaccard.replace('"', '\\"')))
-        if fieldname_jaccard in dst_data_frame:
-            raise FieldNotUniqueError(fieldname_jaccard)
-        dst_data_frame[fieldname_jaccard] = dst_data_frame.progress_apply(lambda row: row[left_fieldname_openlocationcode_with_suffix].jaccard(row[right_fieldname_openlocationcode_with_suffix]), axis=1)
+        # Write output file.
+        logger.info('[crossref] Writing output file: "{0}"'.format(str(dst.name).replace('"', '\\"')))
+        with stats.stage('write', rows=len(result.data_frame)):
+            result.data_frame.to_csv(path_or_buf=dst, header=True, index=False, quotechar=writer_quotechar, sep=writer_delimiter)
+        stats.incr('rows_out', len(result.data_frame))
+    except BaseException as exception:
+        raise click.ClickException(exception)
+    finally:
+        stats.write()
 
-        # Select cross-reference results within the specified open interval.
-        logger.info('[crossref] Filtering intersections: {1} <= "{0}" <= {2}'.format(fieldname_jaccard.replace('"', '\\"'), jaccard_min, jaccard_max))
-        dst_data_frame: pandas.DataFrame = dst_data_frame[dst_data_frame[fieldname_jaccard].notnull() & (jaccard_min <= dst_data_frame[fieldname_jaccard]) & (dst_data_frame[fieldname_jaccard] <= jaccard_max)]
+    # Done!
+    return
+
+@cli.command('merge-shards', short_help='merge output files of "crossref" command for shards')
+@click.argument('src', type=click.File('r'), nargs=-1, required=True)
+@click.option('--output', 'dst', type=click.File('w'), default='-', show_default=True, help='the path to the output file')
+@click.option('--fieldname-jaccard', type=click.STRING, default='IoU', show_default=True, help='the name of the Jaccard similarity coefficient field for sorting and grouping (e.g., "footprint_IoU")')
+@click.option('--sort-by-jaccard', is_flag=True, default=False, show_default=True, help='sort the rows of the output file by the Jaccard similarity coefficient')
+@click.option('--sort-order', type=click.Choice(['ASC', 'DESC'], case_sensitive=True), default='ASC', show_default=True, help='the sort order for the rows of the output file')
+@click.option('--left-group-by-jaccard', is_flag=True, default=False, show_default=True, help='group the rows of the left input file by their UBID strings')
+@click.option('--left-group-order', type=click.Choice(['ASC', 'DESC'], case_sensitive=True), default='ASC', show_default=True, help='the sort order for the groups of rows of the left input file')
+@click.option('--left-fieldname-index', type=click.STRING, default='index_x', show_default=True, help='the name of the index field of the left input file (with suffix)')
+@click.option('--right-group-by-jaccard', is_flag=True, default=False, show_default=True, help='group the rows of the right input file by their UBID string')
+@click.option('--right-group-order', type=click.Choice(['ASC', 'DESC'], case_sensitive=True), default='ASC', show_default=True, help='the sort order for the groups of rows of the right input file')
+@click.option('--right-fieldname-index', type=click.STRING, default='index_y', show_default=True, help='the name of the index field of the right input file (with suffix)')
+@click.option('--reader-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the input files')
+@click.option('--reader-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the input files')
+@click.option('--writer-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the output file')
+@click.option('--writer-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the output file')
+@click.pass_context
+def run_merge_shards(ctx: None, src: typing.Tuple[typing.TextIO, ...], dst: typing.TextIO, fieldname_jaccard: str, sort_by_jaccard: bool, sort_order: str, left_group_by_jaccard: bool, left_group_order: str, left_fieldname_index: str, right_group_by_jaccard: bool, right_group_order: str, right_fieldname_index: str, reader_delimiter: str, reader_quotechar: str, writer_delimiter: str, writer_quotechar: str) -> None:
+    """The \033[1mmerge-shards\033[0m command merges the output files of the \033[1mcrossref\033[0m command for shards (see the \033[1m--shard\033[0m option).
+
+    The input and output files are represented in comma-separated values (CSV) format.  The input files are read from the specified paths.  The output file is written to either the standard output stream or the path specified by the \033[1m--output\033[0m option.  The input files must have the same header.  The pairs of rows that are owned by each shard are disjoint, so that the rows of the input files are concatenated.
+
+    The \033[1m--sort-by-jaccard\033[0m, \033[1m--left-group-by-jaccard\033[0m and \033[1m--right-group-by-jaccard\033[0m options are the same as for the \033[1mcrossref\033[0m command, and are applied to all of the rows (viz., across shards).  They require the index and Jaccard similarity coefficient fields (see the \033[1m--include-index-fields\033[0m and \033[1m--include-jaccard-field\033[0m options of the \033[1mcrossref\033[0m command).
+
+    The \033[1mmerge-shards\033[0m command exits 0 on success, and >0 if an error occurs.
+    """
+
+    import csv
+
+    try:
+        # Read the headers of the input files (viz., empty input files are the output files of empty shards).
+        readers = [csv.reader(f, delimiter=reader_delimiter, quotechar=reader_quotechar) for f in src]
+        headers = [next(reader, None) for reader in readers]
+
+        header: typing.Optional[typing.List[str]] = None
+
+        for (f, other, ) in zip(src, headers):
+            if other is None:
+                continue
+            elif header is None:
+                header = other
+            elif other != header:
+                raise ValueError('header of input file does not match: "{0}"'.format(str(f.name).replace('"', '\\"')))
+
+        # If all of the input files are empty, then exit.
+        if header is None:
+            dst.write('')
+
+            return
+
+        if not (sort_by_jaccard or left_group_by_jaccard or right_group_by_jaccard):
+            # Concatenate the rows of the input files.
+            writer = csv.writer(dst, delimiter=writer_delimiter, quotechar=writer_quotechar, lineterminator='\n')
+            writer.writerow(header)
+
+            for reader in readers:
+                writer.writerows(reader)
 
-        # If there are no cross-reference results, then exit.
-        len_dst_data_frame1: int = len(dst_data_frame)
-        logger.info('[crossref] Found \033[1m{0}/{1} ({2}%)\033[0m intersection{3}: "{4}"'.format(len_dst_data_frame1, len_dst_data_frame0, round((len_dst_data_frame1 / len_dst_data_frame0) * 100, 2), '' if len_dst_data_frame0 == 1 else 's', fieldname_jaccard.replace('"', '\\"')))
-        if len_dst_data_frame1 == 0:
             return
 
-        # Merge left and right input files with cross-reference results using an inner join.
-        logger.info('[crossref] Merging intersections with left input file')
-        dst_data_frame: pandas.DataFrame = dst_data_frame.merge(left_data_frame.reset_index().rename(index=str, columns={
-            'index': left_fieldname_index_with_suffix,
-        }), how='inner', left_on=left_fieldname_index_with_suffix, right_on=left_fieldname_index_with_suffix, suffixes=(False, False))
-        logger.info('[crossref] Merging intersections with right input file')
-        dst_data_frame: pandas.DataFrame = dst_data_frame.merge(right_data_frame.reset_index().rename(index=str, columns={
-            'index': right_fieldname_index_with_suffix,
-        }), how='inner', left_on=right_fieldname_index_with_suffix, right_on=right_fieldname_index_with_suffix, suffixes=(left_suffix, right_suffix))
-
-        # Sort cross-reference results by Jaccard similarity coefficient.
+        import pandas
+
+        from ..crossref import group_by_, sort_order_to_ascending_
+
+        dst_data_frame: pandas.DataFrame = pandas.DataFrame([row for reader in readers for row in reader], columns=header, dtype=str)
+
+        for fieldname in [fieldname_jaccard] + ([left_fieldname_index] if left_group_by_jaccard else []) + ([right_fieldname_index] if right_group_by_jaccard else []):
+            if fieldname not in dst_data_frame:
+                raise FieldNotFoundError(fieldname)
+            elif fieldname != fieldname_jaccard:
+                dst_data_frame[fieldname] = pandas.to_numeric(dst_data_frame[fieldname])
+
+        # Sort and group as the "crossref" command does (viz., by numeric values).
+        fieldname_order_by: str = '__{0}__'.format(fieldname_jaccard)
+        dst_data_frame[fieldname_order_by] = pandas.to_numeric(dst_data_frame[fieldname_jaccard])
+
         if sort_by_jaccard:
-            logger.info('[crossref] Sorting: "{0}" {1}'.format(fieldname_jaccard.replace('"', '\\"'), sort_order))
-            dst_data_frame.sort_values(fieldname_jaccard, axis=0, ascending=sort_order_to_ascending_(sort_order), inplace=True)
+            dst_data_frame.sort_values(fieldname_order_by, axis=0, ascending=sort_order_to_ascending_(sort_order), inplace=True)
 
-        # Group cross-reference results by left "index" and then, for each group,
-        # select cross-reference result with least ("ASC") or greatest ("DESC") value.
         if left_group_by_jaccard:
-            logger.info('[crossref] Grouping on left: "{0}" {1}'.format(fieldname_jaccard.replace('"', '\\"'), left_group_order))
-            left_group_by_series: pandas.Series = dst_data_frame.groupby([left_fieldname_index_with_suffix])[fieldname_jaccard]
-            if left_group_order == 'ASC':
-                dst_data_frame: pandas.DataFrame = dst_data_frame.loc[left_group_by_series.idxmin()]
-            elif left_group_order == 'DESC':
-                dst_data_frame: pandas.DataFrame = dst_data_frame.loc[left_group_by_series.idxmax()]
-            else:
-                pass
+            dst_data_frame = group_by_(dst_data_frame, left_fieldname_index, fieldname_order_by, left_group_order)
 
-        # Group cross-reference results by right "index" and then, for each group,
-        # select cross-reference result with least ("ASC") or greatest ("DESC") value.
         if right_group_by_jaccard:
-            logger.info('[crossref] Grouping on right: "{0}" {1}'.format(fieldname_jaccard.replace('"', '\\"'), right_group_order))
-            right_group_by_series: pandas.Series = dst_data_frame.groupby([right_fieldname_index_with_suffix])[fieldname_jaccard]
-            if right_group_order == 'ASC':
-                dst_data_frame: pandas.DataFrame = dst_data_frame.loc[right_group_by_series.idxmin()]
-            elif right_group_order == 'DESC':
-                dst_data_frame: pandas.DataFrame = dst_data_frame.loc[right_group_by_series.idxmax()]
-            else:
-                pass
+            dst_data_frame = group_by_(dst_data_frame, right_fieldname_index, fieldname_order_by, right_group_order)
 
-        # Delete left and right "__openlocationcode__" fields.
-        del dst_data_frame[left_fieldname_openlocationcode_with_suffix]
-        del dst_data_frame[right_fieldname_openlocationcode_with_suffix]
+        del dst_data_frame[fieldname_order_by]
 
-        # Delete "IoU" field.
-        if not include_jaccard_field:
-            del dst_data_frame[fieldname_jaccard]
+        dst_data_frame.to_csv(path_or_buf=dst, header=True, index=False, sep=writer_delimiter, quotechar=writer_quotechar)
+    except BaseException as exception:
+        raise click.ClickException(exception)
 
-        # Delete left and right "index" fields.
-        if not include_index_fields:
-            del dst_data_frame[left_fieldname_index_with_suffix]
-            del dst_data_frame[right_fieldname_index_with_suffix]
+    # Done!
+    return
 
-        # Write output file.
-        logger.info('[crossref] Writing output file: "{0}"'.format(str(dst.name).replace('"', '\\"')))
-        dst_data_frame.to_csv(path_or_buf=dst, header=True, index=False, **kwargs_for_to_csv_dst)
+@cli.command('diff', short_help='compare "UBID" fields in rows of two versions of CSV file')
+@click.argument('old', type=click.File('r'))
+@click.argument('new', type=click.File('r'))
+@click.argument('dst', type=click.File('w'))
+@click.option('--fieldname-code', type=click.STRING, default='UBID', show_default=True, help='the name of the UBID field in the old and new input files')
+@click.option('--fieldname-change', type=click.STRING, default='change', show_default=True, help='the name of the category of the change ("added", "removed", "changed" or "moved") in the output file')
+@click.option('--fieldname-jaccard', type=click.STRING, default='IoU', show_default=True, help='the name of the Jaccard similarity coefficient (viz., "intersection over union" or "IoU") in the output file')
+@click.option('--fieldname-distance', type=click.STRING, default='distance', show_default=True, help='the name of the distance (in meters) between the centers of the centroid cells in the output file')
+@click.option('--include-field', type=click.STRING, multiple=True, help='include the named field of the old and new input files in the output file')
+@click.option('--include-index-fields', is_flag=True, default=False, show_default=True, help='include the index fields (viz., the row numbers of the old and new input files) in the output file')
+@click.option('--jaccard-min', type=click.FloatRange(min=0.0, max=1.0), default=DEFAULT_JACCARD_MIN, show_default=True, help='the minimum value of the Jaccard similarity coefficient of the UBIDs of a building whose geometry changed')
+@click.option('--max-distance', type=click.FloatRange(min=0.0), default=DEFAULT_MAX_DISTANCE, show_default=True, help='the maximum distance (in meters) between the centers of the centroid cells of the UBIDs of a building that moved')
+@click.option('--old-suffix', type=click.STRING, default='_old', show_default=True, help='the suffix for field names in the old input file')
+@click.option('--new-suffix', type=click.STRING, default='_new', show_default=True, help='the suffix for field names in the new input file')
+@click.option('--chunk-size', type=click.IntRange(min=1), default=DEFAULT_CHUNK_SIZE, show_default=True, help='the number of rows of the input files that are sorted in memory at a time')
+@click.option('--fan-in', type=click.IntRange(min=2), default=DEFAULT_FAN_IN, show_default=True, help='the number of sorted runs that are merged at a time')
+@click.option('--shard-size', type=click.IntRange(min=1), default=DEFAULT_REMAINDER_SHARD_SIZE, show_default=True, help='the maximum number of remaining rows of the old or new input file that are cross-referenced at a time (viz., per shard)')
+@click.option('--shard-level', type=click.Choice(['2', '4', '6', '8'], case_sensitive=True), default=str(DEFAULT_REMAINDER_SHARD_LEVEL), show_default=True, help='the length of the OLC prefixes of the cells that are assigned to shards')
+@click.option('--temp-dir', type=click.Path(exists=True, file_okay=False, writable=True), default=None, show_default='system temporary directory', help='the path to the directory for sorted runs and shards')
+@click.option('--reader-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the input files')
+@click.option('--reader-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the input files')
+@click.option('--writer-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the output file')
+@click.option('--writer-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the output file')
+@click.option('--stats', 'stats_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default=None, help='the path to the JSON file for run statistics (wall and CPU time per stage, row and error counts, and peak memory); use "-" for the standard error stream')
+@click.option('--stats-interval', type=click.FloatRange(0.0, None), default=None, help='the number of seconds between periodic updates of the JSON file for run statistics (by default, the file is written at the end of the run)')
+@click_profile_options_
+@click.pass_context
+def run_diff(ctx: None, old: typing.TextIO, new: typing.TextIO, dst: typing.TextIO, fieldname_code: str, fieldname_change: str, fieldname_jaccard: str, fieldname_distance: str, include_field: typing.List[str], include_index_fields: bool, jaccard_min: float, max_distance: float, old_suffix: str, new_suffix: str, chunk_size: int, fan_in: int, shard_size: int, shard_level: str, temp_dir: typing.Optional[str], reader_delimiter: str, reader_quotechar: str, writer_delimiter: str, writer_quotechar: str, stats_path: typing.Optional[str], stats_interval: typing.Optional[float]) -> None:
+    """The \033[1mdiff\033[0m command compares the Unique Building Identifiers (UBIDs) in the rows of two versions (old and new) of an input file.
+
+    The old input, new input and output files are represented in comma-separated values (CSV) format.  The old and new input files are read from either the standard input stream (using "-") or the specified path.  The output file is written to either the standard output stream (using "-") or the specified path.
+
+    First, both input files are sorted by UBID (viz., an external merge sort: the rows are sorted in chunks of the \033[1m--chunk-size\033[0m option, which are written to temporary files and merged), and the rows with the same UBID are paired by a merge join (viz., the building is unchanged).  Only the chunks and the rows with the same UBID are kept in memory.
+
+    Then, the remaining rows (viz., the rows without an exact match) are cross-referenced in shards of at most about the \033[1m--shard-size\033[0m option rows (viz., by the OLC cells of the length of the \033[1m--shard-level\033[0m option), one shard at a time.  First, the rows whose UBID bounding boxes intersect with a Jaccard similarity coefficient of at least the \033[1m--jaccard-min\033[0m option are matched greedily (viz., in order of decreasing coefficient, each row at most once): the building "changed".  Then, the other rows are matched greedily with the rows whose UBIDs have centroid cells within the \033[1m--max-distance\033[0m option (in meters; in order of increasing distance): the building "moved" (or "changed", if the UBIDs have the same centroid cell).  A row whose nearest row was matched to a nearer row is matched to its next nearest row.  The other remaining rows of the old and new input files were "removed" and "added", respectively.
+
+    The output file has a row for each added, removed, changed and moved building, with the category, the UBIDs, the Jaccard similarity coefficient and the distance (in meters) between the centers of the centroid cells.  Unchanged buildings are not written.
+
+    The \033[1mdiff\033[0m command exits 0 on success, and >0 if an error occurs.
+    """
+
+    import csv
+    import tempfile
+
+    from .diff import iter_diff
+
+    # Construct `Stats` for "--stats" option.
+    stats = make_stats_('diff', stats_path, stats_interval)
+
+    try:
+        with tempfile.TemporaryDirectory(dir=temp_dir) as dirname:
+            logger.info('[diff] Reading old and new input files: "{0}" and "{1}"'.format(str(old.name).replace('"', '\\"'), str(new.name).replace('"', '\\"')))
+
+            rows = iter_diff(csv.reader(old, delimiter=reader_delimiter, quotechar=reader_quotechar), csv.reader(new, delimiter=reader_delimiter, quotechar=reader_quotechar), dirname, fieldname_code=fieldname_code, fieldname_change=fieldname_change, fieldname_jaccard=fieldname_jaccard, fieldname_distance=fieldname_distance, include_fields=include_field, include_index_fields=include_index_fields, jaccard_min=jaccard_min, max_distance=max_distance, old_suffix=old_suffix, new_suffix=new_suffix, shard_size=shard_size, shard_level=int(shard_level), chunk_size=chunk_size, fan_in=fan_in, stats=stats, logger=logger)
+
+            # Write output file (viz., the header, and then the rows, after the
+            # input files are read).
+            writer = csv.writer(dst, delimiter=writer_delimiter, quotechar=writer_quotechar, lineterminator='\n')
+            writer.writerow(next(rows))
+
+            logger.info('[diff] Writing output file: "{0}"'.format(str(dst.name).replace('"', '\\"')))
+            with stats.stage('write'):
+                for row in rows:
+                    writer.writerow(row)
+
+                    stats.incr('rows_out')
     except BaseException as exception:
         raise click.ClickException(exception)
+    finally:
+        stats.write()
+
+    # Done!
+    return
+
+def click_callback_bbox_(ctx: None, opt: click.core.Option, value: typing.Optional[str]) -> typing.Optional[typing.Tuple[float, float, float, float]]:
+    """Callback for "--bbox" option (the south, west, north and east bounds, separated by commas).
+    """
+
+    if value is None:
+        return None
+
+    try:
+        (south, west, north, east, ) = [float(part) for part in value.split(',')]
+    except ValueError:
+        raise click.BadParameter('Invalid bounding box: {0}'.format(value))
+
+    if not ((-90.0 <= south < north <= 90.0) and (-180.0 <= west < east <= 180.0)):
+        raise click.BadParameter('Invalid bounding box: {0}'.format(value))
+
+    return (south, west, north, east, )
+
+def make_synth_writer_(stack: contextlib.ExitStack, path: str, format: str, perturbed: bool, fieldname_code: typing.Optional[str], code_length: int, buffer_size: int, kwargs_out: dict) -> 'SynthWriter':
+    """Return the `SynthWriter` for the given path and format, whose file is closed by the given stack.
+    """
+
+    from .synth_writers import CSVSynthWriter, ParquetSynthWriter
+
+    if format == 'parquet':
+        if '-' == path:
+            raise click.BadParameter('requires the path to a file for format \'parquet\'', param_hint='--output' if not perturbed else '--perturbed')
+
+        writer = ParquetSynthWriter(path, perturbed=perturbed, fieldname_code=fieldname_code, code_length=code_length)
+    else:
+        io_out = stack.enter_context(open_text_stream(path, 'w', buffer_size=buffer_size))
+
+        writer = CSVSynthWriter(io_out, format, perturbed=perturbed, fieldname_code=fieldname_code, code_length=code_length, kwargs_out=kwargs_out)
+
+    stack.callback(writer.close)
+
+    return writer
+
+@cli.command('synth', short_help='generate synthetic building footprints')
+@click.argument('count', type=click.IntRange(0, None))
+@click.option('--format', 'format', type=click.Choice(['latlng', 'wkb', 'wkt', 'parquet'], case_sensitive=True), default='wkt', show_default=True, help='the format of the output files (CSV with center latitude and longitude, hex-encoded WKB or WKT fields, or Apache Parquet)')
+@click.option('--density', type=click.Choice(['urban', 'suburban', 'rural'], case_sensitive=True), default='urban', show_default=True, help='the density model for the locations of footprints')
+@click.option('--bbox', type=click.STRING, default='38.8,-77.12,38.99,-76.91', show_default=True, callback=click_callback_bbox_, help='the south, west, north and east bounds of the footprints')
+@click.option('--size-distribution', type=click.Choice(['lognormal', 'uniform'], case_sensitive=True), default='lognormal', show_default=True, help='the distribution of the sizes of footprints')
+@click.option('--size-mean', type=click.FloatRange(1.0, None), default=15.0, show_default=True, help='the median length (in meters) of the side of a footprint')
+@click.option('--size-sigma', type=click.FloatRange(0.0, None), default=0.5, show_default=True, help='the spread of the size distribution (the standard deviation of the logarithm for "lognormal", or the relative half-width for "uniform")')
+@click.option('--code-length', type=click.IntRange(0, None), default=11, show_default=True, callback=click_callback_code_length_, help='the number of digits in the OLC segment of the UBID string')
+@click.option('--fieldname-code', type=click.STRING, default='UBID', show_default=True, help='the name of the UBID field in the output files')
+@click.option('--no-code', is_flag=True, default=False, show_default=True, help='do not include the UBID field in the output files')
+@click.option('--output', 'output_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default='-', show_default=True, help='the path to the output file (compressed if the extension is ".gz", ".bz2", ".xz" or ".zst")')
+@click.option('--perturbed', 'perturbed_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default=None, help='the path to the output file for the perturbed copy of the footprints')
+@click.option('--duplicate-rate', type=click.FloatRange(0.0, 1.0), default=0.01, show_default=True, help='the probability that a footprint is duplicated in the perturbed copy')
+@click.option('--shift-rate', type=click.FloatRange(0.0, 1.0), default=0.1, show_default=True, help='the probability that a footprint is shifted in the perturbed copy')
+@click.option('--split-rate', type=click.FloatRange(0.0, 1.0), default=0.01, show_default=True, help='the probability that a footprint is split in half in the perturbed copy')
+@click.option('--shift-distance', type=click.FloatRange(0.0, None), default=5.0, show_default=True, help='the maximum distance (in meters) that a footprint is shifted in the perturbed copy')
+@click.option('--seed', type=click.INT, default=0, show_default=True, help='the seed for the random number generator')
+@click.option('--buffer-size', type=click.IntRange(1, None), default=DEFAULT_BUFFER_SIZE, show_default=True, help='the size (in bytes) of the buffer for writing files')
+@click.option('--batch-size', type=click.IntRange(1, None), default=DEFAULT_BATCH_SIZE, show_default=True, help='the number of footprints that are generated and written at a time')
+@click.option('--writer-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the output files')
+@click.option('--writer-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the output files')
+@click_profile_options_
+@click.pass_context
+def run_synth(ctx: None, count: int, format: str, density: str, bbox: typing.Tuple[float, float, float, float], size_distribution: str, size_mean: float, size_sigma: float, code_length: int, fieldname_code: str, no_code: bool, output_path: str, perturbed_path: typing.Optional[str], duplicate_rate: float, shift_rate: float, split_rate: float, shift_distance: float, seed: int, buffer_size: int, batch_size: int, writer_delimiter: str, writer_quotechar: str) -> None:
+    """The \033[1msynth\033[0m command generates synthetic building footprints (e.g., for load testing).
+
+    The output file is written to the standard output stream or the path specified by the \033[1m--output\033[0m option.  Each footprint is a rotated rectangle, whose center is determined by the density model (the \033[1m--density\033[0m option; "urban" clusters, a "suburban" grid or "rural" sparse) and whose size is drawn from the size distribution (the \033[1m--size-distribution\033[0m option).  By default, each footprint is assigned a UBID.
+
+    If the \033[1m--perturbed\033[0m option is specified, then a perturbed copy of the footprints is also written, in which footprints are shifted, split or duplicated at the specified rates.  The "source_id" field of the perturbed copy is the "id" field of the original footprint, and the "change" field is "none", "shift", "split" or "duplicate".
+
+    The footprints are deterministic for the given \033[1m--seed\033[0m option.
+
+    The \033[1msynth\033[0m command exits 0 on success, and >0 if an error occurs.
+    """
+
+    from ..synth import CHANGES, iter_footprints, iter_perturbed
+
+    if (shift_rate + split_rate) > 1.0:
+        raise click.BadParameter('the sum of the shift and split rates must not exceed 1', param_hint='--shift-rate')
+
+    fieldname_code = None if no_code else fieldname_code
+
+    kwargs_out = {
+        'delimiter': writer_delimiter,
+        'quotechar': writer_quotechar,
+    }
+
+    footprints = iter_footprints(count, seed=seed, density=density, bbox=bbox, size_distribution=size_distribution, size_mean=size_mean, size_sigma=size_sigma)
+
+    if perturbed_path is None:
+        pairs = ((footprint, [], ) for footprint in footprints)
+    else:
+        pairs = iter_perturbed(footprints, seed=seed, duplicate_rate=duplicate_rate, shift_rate=shift_rate, split_rate=split_rate, shift_distance=shift_distance)
+
+    changes = collections.Counter()
+
+    try:
+        with contextlib.ExitStack() as stack:
+            writer_out = make_synth_writer_(stack, output_path, format, False, fieldname_code, code_length, buffer_size, kwargs_out)
+
+            writer_perturbed = None if (perturbed_path is None) else make_synth_writer_(stack, perturbed_path, format, True, fieldname_code, code_length, buffer_size, kwargs_out)
+
+            for batch in iter_batches(pairs, batch_size):
+                with hooks.span('synth.batch', len(batch)):
+                    writer_out.write([footprint for (footprint, _, ) in batch])
+
+                    if writer_perturbed is not None:
+                        perturbed = [footprint for (_, footprints_perturbed, ) in batch for footprint in footprints_perturbed]
+
+                        changes.update([footprint.change for footprint in perturbed])
+
+                        writer_perturbed.write(perturbed)
+    except (CustomException, OSError, ) as exception:
+        raise click.ClickException(exception)
+
+    if perturbed_path is not None:
+        logger.info('[synth] Perturbed copy: {0}'.format(', '.join(['{0}={1}'.format(change, changes[change]) for change in CHANGES])))
+
+    # Done!
+    return
+
+def click_callback_index_levels_(ctx: None, opt: click.core.Option, value: str) -> typing.List[int]:
+    """Callback for "--index-levels" option (the lengths of the OLC prefixes, separated by commas).
+    """
+
+    try:
+        levels = sorted(set([int(part) for part in value.split(',')]))
+    except ValueError:
+        raise click.BadParameter('Invalid OLC prefix lengths: {0}'.format(value))
+
+    if (len(levels) == 0) or any(((level < 2) or (level > 8) or ((level % 2) != 0)) for level in levels):
+        raise click.BadParameter('Invalid OLC prefix lengths: {0}'.format(value))
+
+    return levels
+
+@cli.command('query', short_help='query rows of CSV file by bounding box, OLC prefix or UBID')
+@click.argument('src', type=click.Path(exists=True, dir_okay=False, readable=True))
+@click.option('--bbox', type=click.STRING, default=None, callback=click_callback_bbox_, help='select rows whose UBIDs intersect the south, west, north and east bounds')
+@click.option('--olc-prefix', type=click.STRING, default=None, help='select rows whose UBIDs have centroids in the Open Location Code (OLC) area (e.g., "87C4VV")')
+@click.option('--ubid-intersects', type=click.STRING, default=None, help='select rows whose UBIDs intersect the UBID')
+@click.option('--output', 'dst', type=click.File('wb'), default='-', show_default=True, help='the path to the output file')
+@click.option('--fieldname-code', type=click.STRING, default='UBID', show_default=True, help='the name of the UBID field')
+@click.option('--reader-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the input file')
+@click.option('--reader-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the input file')
+@click.option('--index', 'index_path', type=click.Path(dir_okay=False, writable=True), default=None, help='the path to the sidecar index file (by default, the path to the input file with the ".bidx" extension)')
+@click.option('--index-levels', type=click.STRING, default=','.join([str(level) for level in DEFAULT_LEVELS]), show_default=True, callback=click_callback_index_levels_, help='the lengths of the OLC prefixes in the sidecar index file, separated by commas')
+@click.option('--rebuild-index', is_flag=True, default=False, show_default=True, help='rebuild the sidecar index file, even if it is up to date')
+@click.option('--max-cells', type=click.IntRange(min=1), default=DEFAULT_MAX_CELLS, show_default=True, help='the maximum number of OLC cells that are looked up for a bounding box')
+@click.option('--stats', 'stats_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default=None, help='the path to the JSON file for run statistics (wall and CPU time per stage, row and error counts, and peak memory); use "-" for the standard error stream')
+@click.option('--stats-interval', type=click.FloatRange(0.0, None), default=None, help='the number of seconds between periodic updates of the JSON file for run statistics (by default, the file is written at the end of the run)')
+@click_profile_options_
+@click.pass_context
+def run_query(ctx: None, src: str, bbox: typing.Optional[typing.Tuple[float, float, float, float]], olc_prefix: typing.Optional[str], ubid_intersects: typing.Optional[str], dst: typing.BinaryIO, fieldname_code: str, reader_delimiter: str, reader_quotechar: str, index_path: typing.Optional[str], index_levels: typing.List[int], rebuild_index: bool, max_cells: int, stats_path: typing.Optional[str], stats_interval: typing.Optional[float]) -> None:
+    """The \033[1mquery\033[0m command writes the rows of the input file whose Unique Building Identifiers (UBIDs) are in a region.
+
+    The input and output files are represented in comma-separated values (CSV) format.  The input file is read from the specified path.  The output file is written to either the standard output stream or the path specified by the \033[1m--output\033[0m option.  The header and the selected rows are copied from the input file, byte for byte.
+
+    The region is specified by one of the \033[1m--bbox\033[0m (rows whose UBID bounding boxes intersect the bounding box), \033[1m--olc-prefix\033[0m (rows whose UBIDs have centroids in the OLC area) and \033[1m--ubid-intersects\033[0m (rows whose UBID bounding boxes intersect the bounding box of the UBID) options.
+
+    The rows are found using a sidecar index file, which maps the OLC prefixes of the UBIDs (at the lengths specified by the \033[1m--index-levels\033[0m option) to byte ranges of the input file.  The index is built if it does not exist, or if the input file has changed.  Only the byte ranges for the region are read (using a memory map).  Sort the input file by UBID, so that each OLC prefix is a single byte range.  If no region is specified, then the index is built (if needed) and no rows are written.
+
+    The \033[1mquery\033[0m command exits 0 on success, and >0 if an error occurs.
+    """
+
+    # Ensure that at most one region is specified.
+    regions = [name for (name, value, ) in [('--bbox', bbox, ), ('--olc-prefix', olc_prefix, ), ('--ubid-intersects', ubid_intersects, )] if value is not None]
+    if len(regions) > 1:
+        raise click.UsageError('Options {0} are mutually exclusive.'.format(', '.join(['"{0}"'.format(name) for name in regions])))
+
+    # Validate "--olc-prefix" option.
+    if olc_prefix is not None:
+        olc_prefix_digits = olc_digits(olc_prefix)
+        if (len(olc_prefix_digits) == 0) or any((char not in openlocationcode.CODE_ALPHABET_) for char in olc_prefix_digits):
+            raise click.BadParameter('Invalid Open Location Code prefix: {0}'.format(olc_prefix), param_hint='--olc-prefix')
+        elif len(olc_prefix_digits) < min(index_levels):
+            raise click.BadParameter('Open Location Code prefix must have at least {0} digits: {1}'.format(min(index_levels), olc_prefix), param_hint='--olc-prefix')
+
+    # Validate "--ubid-intersects" option.
+    if ubid_intersects is not None:
+        try:
+            ubid_intersects_codeArea = decode(ubid_intersects)
+        except (AssertionError, ValueError, ):
+            raise click.BadParameter('Invalid UBID: {0}'.format(ubid_intersects), param_hint='--ubid-intersects')
+
+        bbox = (ubid_intersects_codeArea.latitudeLo, ubid_intersects_codeArea.longitudeLo, ubid_intersects_codeArea.latitudeHi, ubid_intersects_codeArea.longitudeHi, )
+
+    if index_path is None:
+        index_path = '{0}{1}'.format(src, INDEX_SUFFIX)
+
+    # Construct `Stats` for "--stats" option.
+    stats = make_stats_('query', stats_path, stats_interval)
+
+    try:
+        # Open (or build) the sidecar index file.
+        index = None if rebuild_index else PrefixIndex.open(index_path, src, fieldname_code, index_levels, reader_delimiter, reader_quotechar)
+        if index is None:
+            logger.info('[query] Building index: "{0}"'.format(str(index_path).replace('"', '\\"')))
+            with stats.stage('index'):
+                index = PrefixIndex.build(index_path, src, fieldname_code, index_levels, reader_delimiter, reader_quotechar, on_error=stats.error)
+            logger.info('[query] Indexed \033[1m{0}/{1}\033[0m rows of input file'.format(index.meta['rows_indexed'], index.meta['rows']))
+            if not index.meta.get('sorted', True):
+                logger.warning('[query] Input file is not sorted by UBID: OLC prefixes have more than one byte range')
+        else:
+            logger.info('[query] Using index: "{0}"'.format(str(index_path).replace('"', '\\"')))
+
+        try:
+            if len(regions) == 0:
+                return
+
+            # Find the byte ranges for the region.
+            with stats.stage('ranges'):
+                if olc_prefix is not None:
+                    (level, ranges, ) = index.ranges_for_olc_prefix(olc_prefix_digits)
+                else:
+                    (level, ranges, ) = index.ranges_for_bbox(bbox, max_cells=max_cells)
+            stats.incr('ranges', len(ranges))
+            stats.incr('bytes_read', sum([(end - start) for (start, end, ) in ranges]))
+            logger.info('[query] Reading \033[1m{0}\033[0m byte range{1} (OLC prefix length {2})'.format(len(ranges), '' if len(ranges) == 1 else 's', level))
+
+            size = os.path.getsize(src)
+            if size == 0:
+                return
+
+            with open(src, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                # Write the header.
+                dst.write(buffer[0:index.meta['header_end']])
+
+                header = parse_record_(buffer[0:index.meta['header_end']], reader_delimiter, reader_quotechar)
+                index_code = header.index(fieldname_code)
+
+                quotechar = reader_quotechar.encode('utf-8')
+
+                count_in = 0
+                count_out = 0
+
+                # Read the byte ranges, and write the rows in the region.
+                with stats.stage('query'):
+                    for (start, end, ) in ranges:
+                        for (record_start, record_end, ) in iter_records(buffer, start, end, quotechar=quotechar):
+                            count_in += 1
+
+                            record = buffer[record_start:record_end]
+
+                            row = parse_record_(record, reader_delimiter, reader_quotechar)
+
+                            if index_code >= len(row):
+                                continue
+
+                            code = row[index_code]
+
+                            if olc_prefix is not None:
+                                selected = olc_digits(code).startswith(olc_prefix_digits)
+                            else:
+                                try:
+                                    selected = intersects_(decode(code), bbox)
+                                except (AssertionError, ValueError, ):
+                                    selected = False
+
+                            if selected:
+                                dst.write(record)
+
+                                count_out += 1
+
+                stats.incr('rows_in', count_in)
+                stats.incr('rows_out', count_out)
+                logger.info('[query] Found \033[1m{0}/{1}\033[0m rows in region'.format(count_out, count_in))
+        finally:
+            index.close()
+    except BaseException as exception:
+        raise click.ClickException(exception)
+    finally:
+        stats.write()
+
+    # Done!
+    return
+
+def click_callback_code_lengths_(ctx: None, opt: click.core.Option, value: str) -> typing.List[int]:
+    """Callback for "--code-lengths" option (the numbers of digits in the OLC segments of the cells, separated by commas).
+    """
+
+    try:
+        code_lengths = sorted(set([int(part) for part in value.split(',')]))
+    except ValueError:
+        raise click.BadParameter('Invalid Open Location Code lengths: {0}'.format(value))
+
+    if (len(code_lengths) == 0) or any(((not isValidCodeLength(code_length)) or (code_length > openlocationcode.MAX_DIGIT_COUNT_)) for code_length in code_lengths):
+        raise click.BadParameter('Invalid Open Location Code lengths: {0}'.format(value))
+
+    return code_lengths
+
+@cli.command('rollup', short_help='aggregate "UBID" fields in rows of CSV file by OLC cell')
+@click.argument('src', type=click.File('r'))
+@click.option('--output', 'dst', type=click.File('w'), default='-', show_default=True, help='the path to the output file')
+@click.option('--code-lengths', type=click.STRING, default='8', show_default=True, callback=click_callback_code_lengths_, help='the numbers of digits in the OLC segments of the cells, separated by commas (e.g., "4,6,8" for a tile pyramid)')
+@click.option('--fieldname-code', type=click.STRING, default='UBID', show_default=True, help='the name of the UBID field')
+@click.option('--sum-field', type=click.STRING, multiple=True, help='sum the named numeric field of the input file for each cell')
+@click.option('--max-groups', type=click.IntRange(min=1), default=DEFAULT_MAX_GROUPS, show_default=True, help='the maximum number of cells that are aggregated in memory (the aggregates are written to temporary files, and then merged)')
+@click.option('--fan-in', type=click.IntRange(min=2), default=DEFAULT_FAN_IN, show_default=True, help='the number of temporary files that are merged at a time')
+@click.option('--temp-dir', type=click.Path(exists=True, file_okay=False, writable=True), default=None, show_default='system temporary directory', help='the path to the directory for temporary files')
+@click.option('--reader-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the input file')
+@click.option('--reader-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the input file')
+@click.option('--writer-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the output file')
+@click.option('--writer-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the output file')
+@click.option('--stats', 'stats_path', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default=None, help='the path to the JSON file for run statistics (wall and CPU time per stage, row and error counts, and peak memory); use "-" for the standard error stream')
+@click.option('--stats-interval', type=click.FloatRange(0.0, None), default=None, help='the number of seconds between periodic updates of the JSON file for run statistics (by default, the file is written at the end of the run)')
+@click_profile_options_
+@click.pass_context
+def run_rollup(ctx: None, src: typing.TextIO, dst: typing.TextIO, code_lengths: typing.List[int], fieldname_code: str, sum_field: typing.List[str], max_groups: int, fan_in: int, temp_dir: typing.Optional[str], reader_delimiter: str, reader_quotechar: str, writer_delimiter: str, writer_quotechar: str, stats_path: typing.Optional[str], stats_interval: typing.Optional[float]) -> None:
+    """The \033[1mrollup\033[0m command aggregates the Unique Building Identifiers (UBIDs) in the rows of the input file by Open Location Code (OLC) cell.
+
+    The input and output files are represented in comma-separated values (CSV) format.  The input file is read from either the standard input stream (using "-") or the specified path.  The output file is written to either the standard output stream or the path specified by the \033[1m--output\033[0m option.
+
+    The input file is read, row at a time.  The OLC of the centroid cell of each UBID is truncated to the numbers of digits of the \033[1m--code-lengths\033[0m option (e.g., "4,6,8" for a tile pyramid), and, for each cell, the number of UBIDs, the sum of the areas of their bounding boxes (in square degrees; see \033[1mbuildingid.code.CodeArea.area\033[0m) and the sums of the \033[1m--sum-field\033[0m options are calculated.  The UBIDs are validated, but their bounding boxes are not decoded.  UBIDs with fewer digits than a code length are not aggregated for that code length.
+
+    At most \033[1m--max-groups\033[0m cells are aggregated in memory.  If there are more, then the aggregates are written to temporary files, which are merged at the end.
+
+    The output file has a row for each code length and cell (in order), with the code length, the OLC of the cell, the number of UBIDs, the sum of their areas and the sums of the fields.
+
+    The \033[1mrollup\033[0m command exits 0 on success, and >0 if an error occurs.
+    """
+
+    import csv
+    import tempfile
+
+    from .rollup import HashAggregate, olc_for_digits, parse_code
+
+    # Construct `Stats` for "--stats" option.
+    stats = make_stats_('rollup', stats_path, stats_interval)
+
+    try:
+        reader = csv.reader(src, delimiter=reader_delimiter, quotechar=reader_quotechar)
+
+        # Ensure that "UBID" and summed fields are present.
+        header = next(reader, None)
+        if header is None:
+            raise FieldNotFoundError(fieldname_code)
+        for fieldname in [fieldname_code] + list(sum_field):
+            if fieldname not in header:
+                raise FieldNotFoundError(fieldname)
+
+        position_code = header.index(fieldname_code)
+        positions_sum = [header.index(fieldname) for fieldname in sum_field]
+
+        with tempfile.TemporaryDirectory(dir=temp_dir) as dirname:
+            aggregate = HashAggregate(2 + len(sum_field), dirname, max_groups=max_groups, fan_in=fan_in)
+
+            # Aggregate rows of input file (viz., the number of UBIDs, the sum of their areas, and the sums of the fields).
+            logger.info('[rollup] Aggregating input file: "{0}"'.format(str(src.name).replace('"', '\\"')))
+            with stats.stage('aggregate'):
+                for row in reader:
+                    stats.incr('rows_in')
+
+                    try:
+                        (digits, area, ) = parse_code(row[position_code] if (position_code < len(row)) else '')
+                    except ValueError as exception:
+                        stats.error(exception)
+
+                        continue
+
+                    values = [1.0, area]
+
+                    for position in positions_sum:
+                        value = row[position] if (position < len(row)) else ''
+
+                        try:
+                            values.append(float(value) if (len(value) > 0) else 0.0)
+                        except ValueError as exception:
+                            stats.error(exception)
+
+                            values.append(0.0)
+
+                    for code_length in code_lengths:
+                        if len(digits) < code_length:
+                            stats.incr('rows_too_short')
+
+                            continue
+
+                        aggregate.add(('{0:02d}'.format(code_length), digits[:code_length], ), values)
+
+            stats.incr('runs', len(aggregate.paths))
+            if len(aggregate.paths) > 0:
+                logger.info('[rollup] Merging \033[1m{0}\033[0m temporary file{1}'.format(len(aggregate.paths), '' if len(aggregate.paths) == 1 else 's'))
+
+            # Write output file.
+            logger.info('[rollup] Writing output file: "{0}"'.format(str(dst.name).replace('"', '\\"')))
+            with stats.stage('write'):
+                writer = csv.writer(dst, delimiter=writer_delimiter, quotechar=writer_quotechar, lineterminator='\n')
+                writer.writerow(['code_length', 'olc', 'count', 'area'] + ['{0}_sum'.format(fieldname) for fieldname in sum_field])
+
+                for ((code_length, digits, ), sums, ) in aggregate:
+                    writer.writerow([int(code_length), olc_for_digits(digits), int(sums[0]), sums[1]] + sums[2:])
+
+                    stats.incr('rows_out')
+    except BaseException as exception:
+        raise click.ClickException(exception)
+    finally:
+        stats.write()
+
+    # Done!
+    return
+
+@cli.command('serve', short_help='run HTTP/JSON server to encode, decode, validate and match UBIDs')
+@click.option('--host', type=click.STRING, default='127.0.0.1', show_default=True, help='the host name or IP address to listen on')
+@click.option('--port', type=click.IntRange(0, 65535), default=8080, show_default=True, help='the TCP port to listen on')
+@click.option('--unix-socket', type=click.Path(dir_okay=False, writable=True), default=None, help='the path to the Unix domain socket to listen on (instead of the host and port)')
+@click.option('--reference', 'reference_path', type=click.Path(exists=True, dir_okay=False, allow_dash=True), default=None, help='the path to the CSV file of the reference set for the "match" endpoint')
+@click.option('--reference-fieldname-code', type=click.STRING, default='UBID', show_default=True, help='the name of the UBID field in the reference file')
+@click.option('--reference-reader-delimiter', type=click.STRING, default=',', show_default=True, help='the delimiter to use for the reference file')
+@click.option('--reference-reader-quotechar', type=click.STRING, default='"', show_default=True, help='the character used to denote the start and end of a quoted field in the reference file')
+@click.option('--code-length', type=click.IntRange(0, None), default=11, show_default=True, callback=click_callback_code_length_, help='the default number of digits in the OLC segment of the UBID string for the "encode" endpoint')
+@click.option('--workers', type=click.IntRange(1, None), default=None, show_default='number of CPUs', help='the number of workers in the worker pool')
+@click.option('--executor', type=click.Choice(['process', 'thread'], case_sensitive=True), default='process', show_default=True, help='the type of the worker pool')
+@click.option('--max-batch-size', type=click.IntRange(1, None), default=1024, show_default=True, help='the maximum number of items in a micro-batch')
+@click.option('--max-batch-delay', type=click.FloatRange(0.0, None), default=0.002, show_default=True, help='the maximum number of seconds that a request waits for a micro-batch to fill')
+@click_profile_options_
+@click.pass_context
+def run_serve(ctx: None, host: str, port: int, unix_socket: typing.Optional[str], reference_path: typing.Optional[str], reference_fieldname_code: str, reference_reader_delimiter: str, reference_reader_quotechar: str, code_length: int, workers: typing.Optional[int], executor: str, max_batch_size: int, max_batch_delay: float) -> None:
+    """The \033[1mserve\033[0m command runs a long-running HTTP/JSON server for Unique Building Identifiers (UBIDs).
+
+    The server listens on the \033[1m--host\033[0m and \033[1m--port\033[0m options, or on the Unix domain socket specified by the \033[1m--unix-socket\033[0m option.  The "/encode", "/decode", "/validate" and "/match" endpoints accept POST requests with a JSON object, whose "items" member is an array, and respond with a JSON object, whose "results" member is an array of the same length.  For "/encode", each item is an object with a "geometry" (GeoJSON), "wkb" (hex), "wkt" or "latitude" and "longitude" member.  For the other endpoints, each item is a UBID string.  The "/match" endpoint matches UBIDs against the reference set (the \033[1m--reference\033[0m option).  The "/stats" endpoint (GET) reports latency percentiles and micro-batch sizes.
+
+    The items of concurrent requests are coalesced into micro-batches of up to \033[1m--max-batch-size\033[0m items, which are processed by a pool of \033[1m--workers\033[0m workers.
+
+    The \033[1mserve\033[0m command runs until it is interrupted.
+    """
+
+    import asyncio
+    import concurrent.futures
+    import csv
+
+    from .server import Server, init_worker
+
+    # Load reference set (if any).
+    reference_codes = None
+
+    if reference_path is not None:
+        with open_text_stream(reference_path, 'r') as io_reference:
+            csv_reference = csv.reader(io_reference, delimiter=reference_reader_delimiter, quotechar=reference_reader_quotechar)
+
+            try:
+                index_code = fieldname_index(next(csv_reference, []), reference_fieldname_code)
+            except FieldNotFoundError as exception:
+                raise click.ClickException(exception)
+
+            reference_codes = [row[index_code] if (len(row) > index_code) else '' for row in csv_reference if row]
+
+        logger.info('[serve] Loaded reference set: {0} rows'.format(len(reference_codes)))
+
+    # Construct worker pool.
+    if executor == 'process':
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(code_length, reference_codes, ))
+    else:
+        init_worker(code_length, reference_codes)
+
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+    async def serve_() -> None:
+        server = Server(pool, max_batch_size=max_batch_size, max_batch_delay=max_batch_delay)
+
+        asyncio_server = await server.start(host=host, port=port, unix_socket=unix_socket)
+
+        logger.info('[serve] Listening on {0}'.format(unix_socket if (unix_socket is not None) else ', '.join(['{0}:{1}'.format(*socket.getsockname()[:2]) for socket in asyncio_server.sockets])))
+
+        try:
+            await asyncio_server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve_())
+    except KeyboardInterrupt:
+        pass
+    except OSError as exception:
+        raise click.ClickException(exception)
+    finally:
+        pool.shutdown(cancel_futures=True)
 
     # Done!
     return
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/command_line/checkpoint.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import json
+import os
+import tempfile
+import time
+import typing
+
+from .exceptions import CustomException
+
+DEFAULT_CHECKPOINT_INTERVAL = 60.0
+
+class CheckpointMismatchError(CustomException):
+    def __init__(self, path: str, path_in: str) -> None:
+        msg = 'checkpoint \'{0}\' is not for input file \'{1}\' (or the input file has changed)'.format(path.replace('\'','\\\''), path_in.replace('\'','\\\''))
+
+        super(CheckpointMismatchError, self).__init__(msg)
+
+        self.path = path
+        self.path_in = path_in
+
+class OffsetLineReader:
+    """Iterator over the decoded lines of a binary stream that tracks the byte offset of the next line.
+
+    Instances are passed to `csv.reader`, which consumes lines only as it
+    needs them, so that, after a row is read, `offset` is the byte offset of
+    the start of the next row.
+    """
+
+    def __init__(self, stream: typing.BinaryIO, encoding: str = 'utf-8') -> None:
+        super(OffsetLineReader, self).__init__()
+
+        self.stream = stream
+        self.encoding = encoding
+
+        self.offset = 0
+
+    def __iter__(self) -> 'OffsetLineReader':
+        return self
+
+    def __next__(self) -> str:
+        line = self.stream.readline()
+
+        if not line:
+            raise StopIteration
+
+        self.offset += len(line)
+
+        return line.decode(self.encoding)
+
+    def seek(self, offset: int) -> None:
+        self.stream.seek(offset)
+
+        self.offset = offset
+
+class Checkpoint:
+    """Record of the progress of a `DictPipe` run, saved to (and loaded from) a JSON file.
+
+    The record comprises the byte offset of the next row of the input file,
+    the number of rows that have been read, and the byte offsets of the ends of
+    the output and error files.  The record is saved after a batch has been
+    written and flushed, at most once every `interval` seconds.  The file is
+    replaced atomically.
+
+    If the path to the input file is given, then its absolute path, size and
+    modification time are also recorded, so that a checkpoint is not resumed
+    with a different (or regenerated) input file.
+    """
+
+    def __init__(self, path: str, path_in: typing.Optional[str] = None, interval: float = DEFAULT_CHECKPOINT_INTERVAL) -> None:
+        super(Checkpoint, self).__init__()
+
+        self.path = path
+        self.interval = interval
+
+        self.meta_in = None if (path_in is None) else self.source_meta_(path_in)
+
+        self.offset_in = 0
+        self.offset_out = 0
+        self.offset_err = 0
+
+        self.count_in = 0
+
+        self.saved_at = time.monotonic()
+
+    @staticmethod
+    def source_meta_(path_in: str) -> typing.Dict[str, typing.Any]:
+        stat = os.stat(path_in)
+
+        return {
+            'path': os.path.abspath(path_in),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+        }
+
+    @classmethod
+    def load(cls, path: str, path_in: typing.Optional[str] = None, interval: float = DEFAULT_CHECKPOINT_INTERVAL) -> 'Checkpoint':
+        """Return the checkpoint that is saved to the given path, or a new checkpoint if the file does not exist.
+
+        Raises `CheckpointMismatchError` if the checkpoint was saved for a
+        different input file (see `source_meta_`).
+        """
+
+        checkpoint = cls(path, path_in=path_in, interval=interval)
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            if data.get('input', None) != checkpoint.meta_in:
+                raise CheckpointMismatchError(path, path_in or '-')
+
+            checkpoint.offset_in = int(data['offset_in'])
+            checkpoint.offset_out = int(data['offset_out'])
+            checkpoint.offset_err = int(data['offset_err'])
+
+            checkpoint.count_in = int(data['count_in'])
+
+        return checkpoint
+
+    @property
+    def resuming(self) -> bool:
+        return self.offset_in > 0
+
+    def truncate(self, path_out: str, path_err: str) -> None:
+        """Truncate the output and error files to the recorded byte offsets (viz., discard rows written after the checkpoint was saved).
+        """
+
+        for (path, offset, ) in [(path_out, self.offset_out, ), (path_err, self.offset_err, )]:
+            if os.path.exists(path):
+                os.truncate(path, offset)
+            elif offset > 0:
+                raise FileNotFoundError(path)
+
+    def update(self, io_in: OffsetLineReader, io_out: typing.TextIO, io_err: typing.TextIO, count_in: int, force: bool = False) -> bool:
+        """Update the record after a batch of `count_in` rows has been written, and save it if `interval` seconds have elapsed (or `force` is set).
+
+        Returns `True` if the record was saved.
+        """
+
+        self.count_in += count_in
+
+        if not (force or ((time.monotonic() - self.saved_at) >= self.interval)):
+            return False
+
+        for io in (io_out, io_err, ):
+            io.flush()
+
+            try:
+                os.fsync(io.fileno())
+            except (AttributeError, OSError, ValueError, ):
+                # Not a file.
+                pass
+
+        self.offset_in = io_in.offset
+        self.offset_out = io_out.tell()
+        self.offset_err = io_err.tell()
+
+        self.save()
+
+        return True
+
+    def save(self) -> None:
+        data = {
+            'offset_in': self.offset_in,
+            'offset_out': self.offset_out,
+            'offset_err': self.offset_err,
+            'count_in': self.count_in,
+            'input': self.meta_in,
+        }
+
+        (fd, tmp_path, ) = tempfile.mkstemp(prefix='.{0}.'.format(os.path.basename(self.path)), dir=(os.path.dirname(os.path.abspath(self.path))))
+
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+
+                f.flush()
+
+                os.fsync(f.fileno())
+
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+
+            raise
+
+        self.saved_at = time.monotonic()
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
@@ -7,6 +7,7 @@
 #
 # See LICENSE.txt and WARRANTY.txt for details.
 
+import struct
 import typing
 
 import shapely.geometry
@@ -15,7 +16,90 @@ import shapely.wkb
 import shapely.wkt
 
 from .dict_datum import DictDatum
-from .dict_pipe import DictDecoder
+from .dict_pipe import DictDecoder, fieldname_index
+
+class GeoJSONDictDecoder(DictDecoder[DictDatum]):
+    def __init__(self, fieldname_geometry: str = 'geometry') -> None:
+        super(GeoJSONDictDecoder, self).__init__()
+
+        self.fieldname_geometry = fieldname_geometry
+
+    def decode(self, row: typing.Dict[str, typing.Any]) -> DictDatum:
+        geometry = row[self.fieldname_geometry]
+
+        if geometry is None:
+            raise ValueError('geometry is null')
+
+        geom = shapely.geometry.shape(geometry)
+
+        return DictDatum(geom)
+
+    @property
+    def fieldnames(self) -> typing.List[str]:
+        return [
+            self.fieldname_geometry,
+        ]
+
+GEOPACKAGE_MAGIC_ = b'GP'
+
+GEOPACKAGE_ENVELOPE_SIZES_ = [0, 32, 48, 48, 64]
+
+def strip_geopackage_header(blob: bytes) -> bytes:
+    """Return the well-known binary (WKB) geometry for the given GeoPackage binary geometry.
+
+    If the given value does not start with the GeoPackage magic number, then it
+    is assumed to be WKB and is returned unchanged.
+    """
+
+    if blob[0:2] != GEOPACKAGE_MAGIC_:
+        return blob
+
+    (flags, ) = struct.unpack_from('B', blob, 3)
+
+    envelope_indicator = (flags >> 1) & 0x07
+
+    if envelope_indicator >= len(GEOPACKAGE_ENVELOPE_SIZES_):
+        raise ValueError('invalid GeoPackage envelope indicator: {0}'.format(envelope_indicator))
+
+    return blob[(8 + GEOPACKAGE_ENVELOPE_SIZES_[envelope_indicator]):]
+
+class GeoPackageDictDecoder(DictDecoder[DictDatum]):
+    """Decoder for binary geometry columns of SQLite databases.
+
+    Values are GeoPackage binary geometries, WKB blobs or hex-encoded WKB strings.
+    """
+
+    def __init__(self, fieldname_geometry: str) -> None:
+        super(GeoPackageDictDecoder, self).__init__()
+
+        self.fieldname_geometry = fieldname_geometry
+
+    def bind(self, fieldnames_in: typing.List[str]) -> None:
+        super(GeoPackageDictDecoder, self).bind(fieldnames_in)
+
+        self.index_geometry = fieldname_index(fieldnames_in, self.fieldname_geometry)
+
+    def decode(self, row: typing.Dict[str, typing.Any]) -> DictDatum:
+        return self.decode_value_(row[self.fieldname_geometry])
+
+    def decode_row(self, row: typing.Sequence[typing.Any]) -> DictDatum:
+        return self.decode_value_(row[self.index_geometry])
+
+    def decode_value_(self, value: typing.Any) -> DictDatum:
+        if value is None:
+            raise ValueError('geometry is null')
+        elif isinstance(value, str):
+            geom = shapely.wkb.loads(value, hex=True)
+        else:
+            geom = shapely.wkb.loads(strip_geopackage_header(bytes(value)))
+
+        return DictDatum(geom)
+
+    @property
+    def fieldnames(self) -> typing.List[str]:
+        return [
+            self.fieldname_geometry,
+        ]
 
 class LatLngDictDecoder(DictDecoder[DictDatum]):
     def __init__(self, fieldname_center_latitude: str, fieldname_center_longitude: str, fieldname_north_latitude: str = None, fieldname_south_latitude: str = None, fieldname_west_longitude: str = None, fieldname_east_longitude: str = None) -> None:
@@ -29,19 +113,39 @@ class LatLngDictDecoder(DictDecoder[DictDatum]):
         self.fieldname_east_longitude = self.fieldname_center_longitude if (fieldname_east_longitude is None) else fieldname_east_longitude
         self.fieldname_west_longitude = self.fieldname_center_longitude if (fieldname_west_longitude is None) else fieldname_west_longitude
 
+    def bind(self, fieldnames_in: typing.List[str]) -> None:
+        super(LatLngDictDecoder, self).bind(fieldnames_in)
+
+        self.index_center_latitude = fieldname_index(fieldnames_in, self.fieldname_center_latitude)
+        self.index_center_longitude = fieldname_index(fieldnames_in, self.fieldname_center_longitude)
+
+        self.index_north_latitude = fieldname_index(fieldnames_in, self.fieldname_north_latitude)
+        self.index_south_latitude = fieldname_index(fieldnames_in, self.fieldname_south_latitude)
+        self.index_east_longitude = fieldname_index(fieldnames_in, self.fieldname_east_longitude)
+        self.index_west_longitude = fieldname_index(fieldnames_in, self.fieldname_west_longitude)
+
     def decode(self, row: typing.Dict[str, str]) -> DictDatum:
-        center_latitude = float(row[self.fieldname_center_latitude])
-        center_longitude = float(row[self.fieldname_center_longitude])
+        return self.decode_values_(row[self.fieldname_center_latitude], row[self.fieldname_center_longitude], row[self.fieldname_north_latitude], row[self.fieldname_south_latitude], row[self.fieldname_east_longitude], row[self.fieldname_west_longitude])
+
+    def decode_row(self, row: typing.Sequence[str]) -> DictDatum:
+        return self.decode_values_(row[self.index_center_latitude], row[self.index_center_longitude], row[self.index_north_latitude], row[self.index_south_latitude], row[self.index_east_longitude], row[self.index_west_longitude])
+
+    def key_row(self, row: typing.Sequence[str]) -> typing.Tuple[str, ...]:
+        return (row[self.index_center_latitude], row[self.index_center_longitude], row[self.index_north_latitude], row[self.index_south_latitude], row[self.index_east_longitude], row[self.index_west_longitude], )
+
+    def decode_values_(self, center_latitude_str: str, center_longitude_str: str, north_latitude_str: str, south_latitude_str: str, east_longitude_str: str, west_longitude_str: str) -> DictDatum:
+        center_latitude = float(center_latitude_str)
+        center_longitude = float(center_longitude_str)
 
         centroid = shapely.geometry.point.Point(center_longitude, center_latitude)
 
         if (self.fieldname_center_latitude == self.fieldname_north_latitude == self.fieldname_south_latitude) and (self.fieldname_center_longitude == self.fieldname_east_longitude == self.fieldname_west_longitude):
             return DictDatum(centroid)
         else:
-            north_latitude = float(row[self.fieldname_north_latitude])
-            south_latitude = float(row[self.fieldname_south_latitude])
-            east_longitude = float(row[self.fieldname_east_longitude])
-            west_longitude = float(row[self.fieldname_west_longitude])
+            north_latitude = float(north_latitude_str)
+            south_latitude = float(south_latitude_str)
+            east_longitude = float(east_longitude_str)
+            west_longitude = float(west_longitude_str)
 
             bounds = (west_longitude, south_latitude, east_longitude, north_latitude)
 
@@ -66,8 +170,22 @@ class WKBDictDecoder(DictDecoder[DictDatum]):
 
         self.fieldname_wkbstr = fieldname_wkbstr
 
+    def bind(self, fieldnames_in: typing.List[str]) -> None:
+        super(WKBDictDecoder, self).bind(fieldnames_in)
+
+        self.index_wkbstr = fieldname_index(fieldnames_in, self.fieldname_wkbstr)
+
     def decode(self, row: typing.Dict[str, str]) -> DictDatum:
-        wkbstr = str(row[self.fieldname_wkbstr])
+        return self.decode_value_(row[self.fieldname_wkbstr])
+
+    def decode_row(self, row: typing.Sequence[str]) -> DictDatum:
+        return self.decode_value_(row[self.index_wkbstr])
+
+    def key_row(self, row: typing.Sequence[str]) -> str:
+        return row[self.index_wkbstr]
+
+    def decode_value_(self, value: str) -> DictDatum:
+        wkbstr = str(value)
 
         geom = shapely.wkb.loads(wkbstr, hex=True)
 
@@ -85,8 +203,22 @@ class WKTDictDecoder(DictDecoder[DictDatum]):
 
         self.fieldname_wktstr = fieldname_wktstr
 
+    def bind(self, fieldnames_in: typing.List[str]) -> None:
+        super(WKTDictDecoder, self).bind(fieldnames_in)
+
+        self.index_wktstr = fieldname_index(fieldnames_in, self.fieldname_wktstr)
+
     def decode(self, row: typing.Dict[str, str]) -> DictDatum:
-        wktstr = str(row[self.fieldname_wktstr])
+        return self.decode_value_(row[self.fieldname_wktstr])
+
+    def decode_row(self, row: typing.Sequence[str]) -> DictDatum:
+        return self.decode_value_(row[self.index_wktstr])
+
+    def key_row(self, row: typing.Sequence[str]) -> str:
+        return row[self.index_wktstr]
+
+    def decode_value_(self, value: str) -> DictDatum:
+        wktstr = str(value)
 
         geom = shapely.wkt.loads(wktstr)
 
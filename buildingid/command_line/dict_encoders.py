@@ -29,6 +29,11 @@ class BaseGeometryDictEncoder(DictEncoder[DictDatum]):
 
         return row
 
+    def encode_row(self, datum: DictDatum) -> typing.List[typing.Any]:
+        return [
+            datum.encode(codeLength=self.code_length),
+        ]
+
     @property
     def fieldnames(self) -> typing.List[str]:
         return [
@@ -49,6 +54,12 @@ class ErrorDictEncoder(DictEncoder[BaseException]):
 
         return row
 
+    def encode_row(self, exception: BaseException) -> typing.List[typing.Any]:
+        return [
+            type(exception).__name__,
+            str(exception),
+        ]
+
     @property
     def fieldnames(self) -> typing.List[str]:
         return [
@@ -8,21 +8,90 @@
 # See LICENSE.txt and WARRANTY.txt for details.
 
 import abc
+import collections
 import csv
+import itertools
 import typing
 
+from .checkpoint import Checkpoint
 from .exceptions import FieldNotFoundError, FieldNotUniqueError
 
+from .. import hooks
+from ..stats import NullStats, Stats
+
 T = typing.TypeVar('T')
 
+DEFAULT_BATCH_SIZE = 1024
+
+# The default maximum number of entries of the cache of encoded rows
+# (viz., no cache).
+DEFAULT_CACHE_SIZE = 0
+
+NULL_STATS = NullStats()
+
+def iter_batches(iterable: typing.Iterable[T], batch_size: int) -> typing.Iterator[typing.List[T]]:
+    """Return an iterator over lists of (at most) `batch_size` consecutive items of the given iterable.
+    """
+
+    iterator = iter(iterable)
+
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+
+        if len(batch) == 0:
+            return
+
+        yield batch
+
+def fieldname_index(fieldnames: typing.List[str], fieldname: str) -> int:
+    """Return the position of the given field name in the given header.
+
+    If the field name occurs more than once, then the position of the last
+    occurrence is returned (viz., the same field that `csv.DictReader` would
+    select).
+    """
+
+    for index in range(len(fieldnames) - 1, -1, -1):
+        if fieldnames[index] == fieldname:
+            return index
+
+    raise FieldNotFoundError(fieldname)
+
 class DictDecoder(abc.ABC, typing.Generic[T]):
     def __init__(self) -> None:
         super(DictDecoder, self).__init__()
 
+        self.fieldnames_in = None
+
+    def bind(self, fieldnames_in: typing.List[str]) -> None:
+        """Resolve the positions of `fieldnames` in the header of the input file.
+
+        Subclasses that override `decode_row` should override this method to
+        resolve their column indices once per input file.
+        """
+
+        self.fieldnames_in = fieldnames_in
+
     @abc.abstractmethod
     def decode(self, row: typing.Dict[str, str]) -> T:
         raise MethodNotImplemented()  # pragma: no cover
 
+    def decode_row(self, row: typing.Sequence[str]) -> T:
+        """Decode the given positional row, whose fields are ordered by the header passed to `bind`.
+
+        The default implementation adapts the row to a dict and calls `decode`.
+        """
+
+        return self.decode(dict(zip(self.fieldnames_in, row)))
+
+    def key_row(self, row: typing.Sequence[str]) -> typing.Optional[typing.Hashable]:
+        """Return the key of the given positional row for the cache of encoded rows (viz., the raw values of the fields that are decoded), or `None` if the row is not cached.
+
+        The default implementation returns `None`.
+        """
+
+        return None
+
     @property
     @abc.abstractmethod
     def fieldnames(self) -> typing.List[str]:
@@ -36,24 +105,97 @@ class DictEncoder(abc.ABC, typing.Generic[T]):
     def encode(self, inst: T) -> typing.Dict[str, typing.Any]:
         raise MethodNotImplemented()  # pragma: no cover
 
+    def encode_row(self, inst: T) -> typing.List[typing.Any]:
+        """Encode the given instance as a list of values, ordered by `fieldnames`.
+
+        The default implementation adapts the dict returned by `encode`.
+        """
+
+        row = self.encode(inst)
+
+        return [row.get(fieldname) for fieldname in self.fieldnames]
+
     @property
     @abc.abstractmethod
     def fieldnames(self) -> typing.List[str]:
         raise MethodNotImplemented()  # pragma: no cover
 
+class LRUCache(object):
+    """A cache with at most `max_size` entries, which evicts the least recently used entry.
+
+    The numbers of hits and misses of `get` are counted.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        super(LRUCache, self).__init__()
+
+        if max_size < 1:
+            raise ValueError('invalid cache size: {0}'.format(max_size))
+
+        self.max_size = max_size
+
+        self.entries: typing.OrderedDict[typing.Hashable, typing.Any] = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: typing.Hashable) -> typing.Optional[typing.Any]:
+        """Return the entry for the given key (and mark it as the most recently used), or `None`.
+        """
+
+        entry = self.entries.get(key, None)
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+            self.entries.move_to_end(key)
+
+        return entry
+
+    def put(self, key: typing.Hashable, entry: typing.Any) -> None:
+        """Add the given entry for the given key (and evict the least recently used entry, if the cache is full).
+        """
+
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
 class DictPipe:
-    def __init__(self, decoder_in: DictDecoder[T], encoder_out: DictEncoder[T], encoder_err: DictEncoder[BaseException]) -> None:
+    def __init__(self, decoder_in: DictDecoder[T], encoder_out: DictEncoder[T], encoder_err: DictEncoder[BaseException], cache_size: int = DEFAULT_CACHE_SIZE) -> None:
         super(DictPipe, self).__init__()
 
         self.decoder_in = decoder_in
         self.encoder_out = encoder_out
         self.encoder_err = encoder_err
 
-    def run(self, io_in: typing.TextIO, io_out: typing.TextIO, io_err: typing.TextIO, args_in: list = [], kwargs_in: dict = {}, args_out: list = [], kwargs_out: dict = {}) -> None:
-        csv_in = csv.DictReader(io_in, *args_in, **kwargs_in)
+        # Cache of encoded rows (viz., the output values or the exception for
+        # the key of each row; see `DictDecoder.key_row`).
+        self.cache = LRUCache(cache_size) if (cache_size > 0) else None
 
-        fieldnames_in = csv_in.fieldnames
-        fieldnames_in = [] if (fieldnames_in is None) else list(fieldnames_in)
+    def run(self, io_in: typing.TextIO, io_out: typing.TextIO, io_err: typing.TextIO, args_in: list = [], kwargs_in: dict = {}, args_out: list = [], kwargs_out: dict = {}, batch_size: int = DEFAULT_BATCH_SIZE, checkpoint: typing.Optional[Checkpoint] = None, stats: Stats = NULL_STATS) -> None:
+        """Read the input file, and write the output and error files, in batches.
+
+        If `checkpoint` is given, then `io_in` must be an `OffsetLineReader`.
+        The checkpoint is updated after each batch.  If the checkpoint records a
+        previous run, then reading resumes from the recorded byte offset and the
+        headers of the output and error files are not written again.
+
+        If `stats` is given, then the time for each stage ("read", "decode",
+        "encode" and "write") and the numbers of rows and errors are recorded
+        (and, if there is a cache of encoded rows, the numbers of hits and
+        misses).
+        """
+
+        csv_in = csv.reader(io_in, *args_in, **kwargs_in)
+
+        fieldnames_in = next(csv_in, [])
 
         for fieldname in self.decoder_in.fieldnames:
             if not fieldname in fieldnames_in:
@@ -75,34 +217,155 @@ class DictPipe:
 
             fieldnames_err.append(fieldname)
 
-        csv_out = csv.DictWriter(io_out, fieldnames_out, *args_out, **kwargs_out)
-        csv_err = csv.DictWriter(io_err, fieldnames_err, *args_out, **kwargs_out)
+        self.decoder_in.bind(fieldnames_in)
+
+        csv_out = csv.writer(io_out, *args_out, **kwargs_out)
+        csv_err = csv.writer(io_err, *args_out, **kwargs_out)
 
         csv_out_writeheader_called = False
         csv_err_writeheader_called = False
 
-        for in_row in csv_in:
-            try:
-                inst = self.decoder_in.decode(in_row)
+        if (checkpoint is not None) and checkpoint.resuming:
+            io_in.seek(checkpoint.offset_in)
+
+            csv_out_writeheader_called = checkpoint.offset_out > 0
+            csv_err_writeheader_called = checkpoint.offset_err > 0
+
+        batches = iter_batches(csv_in, batch_size)
+
+        while True:
+            with stats.stage('read'):
+                in_rows = next(batches, None)
+
+            if in_rows is None:
+                break
+
+            with hooks.span('dict_pipe.batch', len(in_rows)):
+                (out_rows, err_rows, ) = self.run_batch(in_rows, len(fieldnames_in), stats=stats)
+
+            with stats.stage('write', rows=len(out_rows) + len(err_rows)):
+                if len(err_rows) > 0:
+                    if not csv_err_writeheader_called:
+                        csv_err_writeheader_called = True
 
-                out_row = in_row.copy()
-                out_row.update(self.encoder_out.encode(inst))
-            except BaseException as exception:
-                err_row = in_row.copy()
-                err_row.update(self.encoder_err.encode(exception))
+                        csv_err.writerow(fieldnames_err)
 
-                if not csv_err_writeheader_called:
-                    csv_err_writeheader_called = True
+                    csv_err.writerows(err_rows)
 
-                    csv_err.writeheader()
+                if len(out_rows) > 0:
+                    if not csv_out_writeheader_called:
+                        csv_out_writeheader_called = True
 
-                csv_err.writerow(err_row)
-            else:
-                if not csv_out_writeheader_called:
-                    csv_out_writeheader_called = True
+                        csv_out.writerow(fieldnames_out)
 
-                    csv_out.writeheader()
+                    csv_out.writerows(out_rows)
 
-                csv_out.writerow(out_row)
+            stats.incr('rows_in', len(in_rows))
+            stats.incr('rows_out', len(out_rows))
+            stats.incr('rows_err', len(err_rows))
+
+            if checkpoint is not None:
+                checkpoint.update(io_in, io_out, io_err, len(in_rows))
+
+            stats.maybe_write()
+
+        if checkpoint is not None:
+            checkpoint.update(io_in, io_out, io_err, 0, force=True)
 
         return
+
+    def run_batch(self, in_rows: typing.List[typing.List[str]], len_fieldnames_in: int, stats: Stats = NULL_STATS) -> typing.Tuple[typing.List[typing.List[typing.Any]], typing.List[typing.List[typing.Any]]]:
+        """Decode and encode the given batch of positional rows.
+
+        Returns the rows for the output and error files.  The input rows are
+        extended in place.
+
+        If there is a cache of encoded rows, then the rows whose keys are
+        cached are neither decoded nor encoded: the cached output values (or
+        exception) are used.  The entry for a key is added when the row is
+        decoded, and set when it is encoded, so that rows with the same key
+        in the same batch are also hits.
+        """
+
+        decoded = []
+
+        (hits, misses, ) = (0, 0, ) if (self.cache is None) else (self.cache.hits, self.cache.misses, )
+
+        with stats.stage('decode', rows=len(in_rows)), hooks.span('dict_pipe.decode', len(in_rows)):
+            for in_row in in_rows:
+                # Skip blank rows (c.f., `csv.DictReader`).
+                if not in_row:
+                    continue
+
+                try:
+                    # Pad short rows with empty fields (c.f., `csv.DictWriter`).
+                    if len(in_row) < len_fieldnames_in:
+                        in_row.extend([''] * (len_fieldnames_in - len(in_row)))
+                    elif len(in_row) > len_fieldnames_in:
+                        del in_row[len_fieldnames_in:]
+
+                        raise ValueError('row has more fields than header')
+                except BaseException as exception:
+                    decoded.append((in_row, None, exception, None, False, ))
+
+                    continue
+
+                entry = None
+
+                if self.cache is not None:
+                    key = self.decoder_in.key_row(in_row)
+
+                    if key is not None:
+                        entry = self.cache.get(key)
+
+                        if entry is not None:
+                            decoded.append((in_row, None, None, entry, True, ))
+
+                            continue
+
+                        # The output values and exception (viz., set when the row is encoded).
+                        entry = [None, None]
+
+                        self.cache.put(key, entry)
+
+                try:
+                    decoded.append((in_row, self.decoder_in.decode_row(in_row), None, entry, False, ))
+                except BaseException as exception:
+                    decoded.append((in_row, None, exception, entry, False, ))
+
+        out_rows = []
+        err_rows = []
+
+        with stats.stage('encode', rows=len(decoded)), hooks.span('code.encode', len(decoded)):
+            for (in_row, inst, exception, entry, hit, ) in decoded:
+                out_values = None
+
+                if hit:
+                    (out_values, exception, ) = entry
+                elif exception is None:
+                    try:
+                        out_values = self.encoder_out.encode_row(inst)
+                    except BaseException as encode_exception:
+                        exception = encode_exception
+
+                if (entry is not None) and (not hit):
+                    entry[:] = [out_values, exception]
+
+                if exception is None:
+                    in_row.extend(out_values)
+
+                    out_rows.append(in_row)
+
+                    continue
+
+                stats.error(exception)
+
+                in_row.extend(self.encoder_err.encode_row(exception))
+
+                err_rows.append(in_row)
+
+        if self.cache is not None:
+            stats.incr('cache_hits', self.cache.hits - hits)
+            stats.incr('cache_misses', self.cache.misses - misses)
+
+        return (out_rows, err_rows, )
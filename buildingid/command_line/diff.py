@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/command_line/diff.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import collections
+import contextlib
+import csv
+import logging
+import math
+import os
+import typing
+
+from .exceptions import FieldNotFoundError
+from .external_sort import DEFAULT_CHUNK_SIZE, DEFAULT_FAN_IN, Row, iter_sorted, merge_join
+from ..stats import NullStats, Stats
+
+if typing.TYPE_CHECKING:
+    import numpy
+    import pandas
+
+# The categories of the changes (in the order of the rows of the output file).
+CHANGES = ['added', 'removed', 'changed', 'moved']
+
+# The default minimum Jaccard similarity coefficient of the UBIDs of a
+# building whose geometry changed, and the default maximum distance (in
+# meters) between the centers of the centroid cells of the UBIDs of a
+# building that moved.
+DEFAULT_JACCARD_MIN = 0.5
+DEFAULT_MAX_DISTANCE = 25.0
+
+# The default maximum number of remaining rows of the old or new input file
+# per shard (viz., that are cross-referenced at a time).
+DEFAULT_REMAINDER_SHARD_SIZE = 1000000
+
+# The default length of the OLC prefixes of the cells that are assigned to
+# the shards of the remaining rows (viz., cells of 0.05 degrees, so that
+# dense regions are spread across shards; see `buildingid.crossref.shard_of`).
+DEFAULT_REMAINDER_SHARD_LEVEL = 6
+
+# The number of nearest neighbors of each row of the old input file per pass
+# of the "moved" stage (see `classify_frames`).
+NEAREST_K_ = 4
+
+# The number of rows of the remainder files that are read at a time.
+REMAINDER_CHUNK_SIZE_ = 100000
+
+# The fields of the pairs of rows of a building that changed or moved (see
+# `classify_frames`).
+CLASSIFY_COLUMNS_ = ['change', 'old', 'new', 'jaccard', 'distance']
+
+# The names of the fields of the output of `buildingid.crossref.crossref_frames`.
+FIELDNAME_INDEX_ = 'index'
+FIELDNAME_JACCARD_ = 'jaccard'
+FIELDNAME_DISTANCE_ = 'distance'
+
+OLD_SUFFIX_ = '_old'
+NEW_SUFFIX_ = '_new'
+
+logger = logging.getLogger(__name__)
+
+def read_header(reader: typing.Iterator[Row], fieldnames: typing.Iterable[str]) -> Row:
+    """Return the header of the given input file (viz., its first row), and ensure that the named fields are present.
+    """
+
+    header = next(reader, None)
+
+    for fieldname in fieldnames:
+        if (header is None) or (fieldname not in header):
+            raise FieldNotFoundError(fieldname)
+
+    return header
+
+def iter_keyed_rows_(reader: typing.Iterator[Row], position: int, remainder: typing.Any, name: str, counts: typing.Counter[str]) -> typing.Iterator[Row]:
+    """Return an iterator over the rows of the given input file with UBIDs, prefixed by the normalized UBID (viz., the key) and the row number.
+
+    The rows without UBIDs are written to the remainder file.
+    """
+
+    for (index, row, ) in enumerate(reader):
+        counts['rows_{0}'.format(name)] += 1
+
+        key = row[position].strip().upper() if (position < len(row)) else ''
+
+        if len(key) == 0:
+            remainder.writerow([str(index)] + row)
+
+            counts['remainder_{0}'.format(name)] += 1
+        else:
+            yield [key, str(index)] + row
+
+def join_rows_(readers: typing.Dict[str, typing.Iterator[Row]], headers: typing.Dict[str, Row], paths: typing.Dict[str, str], fieldname_code: str, dirname: str, chunk_size: int = DEFAULT_CHUNK_SIZE, fan_in: int = DEFAULT_FAN_IN) -> typing.Counter[str]:
+    """Sort the rows of the old and new input files by UBID, pair the rows with the same UBID (viz., an exact-match merge join), and write the other rows to the remainder files (viz., CSV files of the row numbers and rows).
+
+    Return the numbers of rows ("rows_old" and "rows_new"), pairs
+    ("unchanged") and other rows ("remainder_old" and "remainder_new").
+    """
+
+    counts: typing.Counter[str] = collections.Counter()
+
+    with contextlib.ExitStack() as stack:
+        remainders: typing.Dict[str, typing.Any] = {}
+        rows: typing.Dict[str, typing.Iterator[Row]] = {}
+
+        for name in ['old', 'new']:
+            os.mkdir(os.path.join(dirname, name))
+
+            remainders[name] = csv.writer(stack.enter_context(open(paths[name], 'w', newline='')))
+            remainders[name].writerow([''] + headers[name])
+
+            rows[name] = iter_sorted(iter_keyed_rows_(readers[name], headers[name].index(fieldname_code), remainders[name], name, counts), key=lambda row: row[0], dirname=os.path.join(dirname, name), chunk_size=chunk_size, fan_in=fan_in)
+
+        for (old_row, new_row, ) in merge_join(rows['old'], rows['new'], lambda row: row[0], lambda row: row[0]):
+            if old_row is None:
+                remainders['new'].writerow(new_row[1:])
+
+                counts['remainder_new'] += 1
+            elif new_row is None:
+                remainders['old'].writerow(old_row[1:])
+
+                counts['remainder_old'] += 1
+            else:
+                counts['unchanged'] += 1
+
+    return counts
+
+def iter_remainder_(path: str) -> typing.Iterator['pandas.DataFrame']:
+    """Return an iterator over the chunks of the given remainder file, as `pandas.DataFrame` of strings indexed by row number.
+    """
+
+    import numpy
+    import pandas
+
+    for data_frame in pandas.read_csv(filepath_or_buffer=path, dtype=str, keep_default_na=False, na_filter=False, index_col=0, chunksize=REMAINDER_CHUNK_SIZE_):
+        data_frame.index = data_frame.index.astype(numpy.int64)
+
+        yield data_frame
+
+def read_remainder_(path: str) -> 'pandas.DataFrame':
+    """Return the rows of the given remainder file, as a `pandas.DataFrame` of strings indexed by row number.
+    """
+
+    import numpy
+    import pandas
+
+    data_frame = pandas.read_csv(filepath_or_buffer=path, dtype=str, keep_default_na=False, na_filter=False, index_col=0)
+    data_frame.index = data_frame.index.astype(numpy.int64)
+
+    return data_frame
+
+def partition_remainders_(paths: typing.Dict[str, str], dirname: str, fieldname_code: str, count: int, level: int, max_distance: float) -> typing.List[typing.Dict[str, str]]:
+    """Write the rows of the remainder files to the remainder files of the given number of shards, and return their paths.
+
+    Each row of the old remainder file is written to the shard of the center
+    of the centroid cell of its UBID (or to the first shard, if the UBID
+    cannot be decoded).  Each row of the new remainder file is written to the
+    shards whose cells are touched by its UBID bounding box, expanded by the
+    maximum distance and the greatest height and width of the UBID bounding
+    boxes of the old remainder file (viz., the shards of the rows of the old
+    remainder file that it intersects or is near), or to no shard, if the
+    UBID cannot be decoded.
+    """
+
+    import numpy
+
+    from ..crossref import LATITUDE_CENTER_, LATITUDE_HI_, LATITUDE_LO_, LONGITUDE_CENTER_, LONGITUDE_HI_, LONGITUDE_LO_, decode_bounds, shard_of, shards_of_bounds
+
+    shard_paths = [dict([(name, os.path.join(dirname, '{0}-{1}.csv'.format(name, index)), ) for name in ['old', 'new']]) for index in range(count)]
+
+    # The greatest height and width of the UBID bounding boxes of the old remainder file.
+    margin = [0.0, 0.0]
+
+    for name in ['old', 'new']:
+        with contextlib.ExitStack() as stack:
+            files = [stack.enter_context(open(shard_path[name], 'w', newline='')) for shard_path in shard_paths]
+
+            with open(paths[name], 'r', newline='') as f:
+                header = next(csv.reader(f))
+
+            for f in files:
+                csv.writer(f).writerow(header)
+
+            for data_frame in iter_remainder_(paths[name]):
+                bounds = decode_bounds(data_frame[fieldname_code].tolist())
+
+                valid = ~numpy.isnan(bounds[:, LATITUDE_LO_])
+
+                if name == 'old':
+                    shards = numpy.zeros(len(bounds), dtype=numpy.int64)
+                    shards[valid] = shard_of(bounds[valid, LATITUDE_CENTER_], bounds[valid, LONGITUDE_CENTER_], count, level=level)
+
+                    positions = numpy.arange(len(bounds))
+
+                    if valid.any():
+                        margin[0] = max(margin[0], float(numpy.max(bounds[valid, LATITUDE_HI_] - bounds[valid, LATITUDE_LO_])))
+                        margin[1] = max(margin[1], float(numpy.max(bounds[valid, LONGITUDE_HI_] - bounds[valid, LONGITUDE_LO_])))
+                else:
+                    (positions, shards, ) = shards_of_bounds(bounds, count, level=level, halo=max_distance, margin=(margin[0], margin[1], ))
+
+                for index in numpy.unique(shards).tolist():
+                    data_frame.iloc[positions[shards == index]].to_csv(path_or_buf=files[index], header=False, index=True)
+
+    return shard_paths
+
+def match_greedy_(old_positions: 'numpy.ndarray', new_positions: 'numpy.ndarray', scores: 'numpy.ndarray', ascending: bool, old_matched: 'numpy.ndarray', new_matched: 'numpy.ndarray') -> 'numpy.ndarray':
+    """Return the mask of the given pairs of positions of rows that are matched greedily (viz., in order of the scores, each row at most once), and mark the matched rows.
+    """
+
+    import numpy
+
+    accepted = numpy.zeros(len(scores), dtype=bool)
+
+    order = numpy.argsort(scores if ascending else -scores, kind='stable')
+
+    for (index, old_position, new_position, ) in zip(order.tolist(), old_positions[order].tolist(), new_positions[order].tolist()):
+        if not (old_matched[old_position] or new_matched[new_position]):
+            old_matched[old_position] = new_matched[new_position] = True
+
+            accepted[index] = True
+
+    return accepted
+
+def classify_frames(old_data_frame: 'pandas.DataFrame', new_data_frame: 'pandas.DataFrame', fieldname_code: str = 'UBID', jaccard_min: float = DEFAULT_JACCARD_MIN, max_distance: float = DEFAULT_MAX_DISTANCE, stats: typing.Optional[Stats] = None) -> 'pandas.DataFrame':
+    """Return the pairs of rows of the given old and new `pandas.DataFrame` for the buildings that changed or moved, with the "change", "old" and "new" (the labels of the rows), "jaccard" and "distance" fields.
+
+    First, the rows whose UBID bounding boxes intersect with a Jaccard
+    similarity coefficient of at least `jaccard_min` are matched greedily
+    (viz., in order of decreasing coefficient, each row at most once): the
+    building "changed".  Then, the other rows are matched greedily with the
+    rows whose UBIDs have centroid cells within `max_distance` (in meters;
+    in order of increasing distance), in passes until no such rows remain:
+    the building "moved" (or "changed", if the centroid cells are the same).
+    A row whose nearest row was matched to a nearer row is matched to its
+    next nearest row.  The other rows are not matched.
+    """
+
+    import numpy
+    import pandas
+
+    from ..crossref import crossref_frames
+
+    if stats is None:
+        stats = NullStats()
+
+    # Cross-reference the positions of the rows.
+    old_codes = old_data_frame[[fieldname_code]].reset_index(drop=True)
+    new_codes = new_data_frame[[fieldname_code]].reset_index(drop=True)
+
+    old_matched = numpy.zeros(len(old_codes), dtype=bool)
+    new_matched = numpy.zeros(len(new_codes), dtype=bool)
+
+    kwargs_for_crossref_frames = {
+        'left_fieldname_code': fieldname_code,
+        'right_fieldname_code': fieldname_code,
+        'fieldname_jaccard': FIELDNAME_JACCARD_,
+        'fieldname_distance': FIELDNAME_DISTANCE_,
+        'include_jaccard_field': True,
+        'include_index_fields': True,
+        'left_fieldname_index': FIELDNAME_INDEX_,
+        'right_fieldname_index': FIELDNAME_INDEX_,
+        'left_suffix': OLD_SUFFIX_,
+        'right_suffix': NEW_SUFFIX_,
+    }
+
+    (old_fieldname_index_with_suffix, new_fieldname_index_with_suffix, ) = ('{0}{1}'.format(FIELDNAME_INDEX_, OLD_SUFFIX_), '{0}{1}'.format(FIELDNAME_INDEX_, NEW_SUFFIX_), )
+
+    data_frames: typing.List[pandas.DataFrame] = []
+
+    def append_(change: typing.Union[str, numpy.ndarray], data_frame: pandas.DataFrame, accepted: numpy.ndarray, distance: typing.Optional[numpy.ndarray]) -> None:
+        data_frames.append(pandas.DataFrame({
+            'change': change[accepted] if isinstance(change, numpy.ndarray) else change,
+            'old': old_data_frame.index.values[data_frame[old_fieldname_index_with_suffix].values[accepted]],
+            'new': new_data_frame.index.values[data_frame[new_fieldname_index_with_suffix].values[accepted]],
+            'jaccard': data_frame[FIELDNAME_JACCARD_].values[accepted].astype(numpy.float64),
+            'distance': numpy.nan if (distance is None) else distance[accepted],
+        }, columns=CLASSIFY_COLUMNS_))
+
+    # Match the rows with intersecting UBID bounding boxes.
+    with stats.stage('changed', rows=len(old_codes) + len(new_codes)):
+        data_frame = crossref_frames(old_codes, new_codes, jaccard_min=jaccard_min, **kwargs_for_crossref_frames) if ((len(old_codes) > 0) and (len(new_codes) > 0)) else None
+
+        if data_frame is not None:
+            accepted = match_greedy_(data_frame[old_fieldname_index_with_suffix].values, data_frame[new_fieldname_index_with_suffix].values, data_frame[FIELDNAME_JACCARD_].values.astype(numpy.float64), False, old_matched, new_matched)
+
+            append_('changed', data_frame, accepted, None)
+
+    # Match the other rows with the nearest UBIDs.  The rows of the old
+    # `pandas.DataFrame` whose nearest neighbors were all matched (viz., that
+    # may have other neighbors within the maximum distance) are queried again.
+    with stats.stage('moved', rows=int((~old_matched).sum()) + int((~new_matched).sum())):
+        queried = ~old_matched
+
+        while queried.any() and (not new_matched.all()):
+            data_frame = crossref_frames(old_codes[queried], new_codes[~new_matched], mode='nearest', k=NEAREST_K_, max_distance=max_distance, distance_metric='centroid', **kwargs_for_crossref_frames)
+
+            if data_frame is None:
+                break
+
+            old_positions = data_frame[old_fieldname_index_with_suffix].values
+            distance = data_frame[FIELDNAME_DISTANCE_].values.astype(numpy.float64)
+
+            accepted = match_greedy_(old_positions, data_frame[new_fieldname_index_with_suffix].values, distance, True, old_matched, new_matched)
+
+            # The UBIDs with the same centroid cell (viz., distance zero) are changed, not moved.
+            append_(numpy.where(distance == 0.0, 'changed', 'moved'), data_frame, accepted, distance)
+
+            queried = numpy.zeros(len(old_codes), dtype=bool)
+            queried[old_positions] = numpy.bincount(old_positions, minlength=len(old_codes))[old_positions] >= NEAREST_K_
+            queried &= ~old_matched
+
+    if len(data_frames) == 0:
+        return pandas.DataFrame(columns=CLASSIFY_COLUMNS_)
+
+    return pandas.concat(data_frames, ignore_index=True)
+
+def output_header_(fieldnames: typing.List[typing.Tuple[str, str, typing.Optional[str]]]) -> Row:
+    return [fieldname for (fieldname, _, _, ) in fieldnames]
+
+def output_frame_(fieldnames: typing.List[typing.Tuple[str, str, typing.Optional[str]]], change: str, old_data_frame: typing.Optional['pandas.DataFrame'], new_data_frame: typing.Optional['pandas.DataFrame'], pairs: typing.Optional['pandas.DataFrame'] = None) -> 'pandas.DataFrame':
+    """Return the rows of the output file for the given category and rows of the old and new `pandas.DataFrame` (either of which may be `None`; see `classify_frames` for the pairs).
+
+    The fields of the output file are given as triples of the name, the
+    source ("change", "old", "new", "jaccard" or "distance") and the field
+    of the source (or `None` for the row number).
+    """
+
+    import pandas
+
+    if pairs is not None:
+        (old_data_frame, new_data_frame, ) = (old_data_frame.loc[pairs['old'].values], new_data_frame.loc[pairs['new'].values], )
+
+    count = len(new_data_frame) if (old_data_frame is None) else len(old_data_frame)
+
+    def values_(source: str, fieldname: typing.Optional[str]) -> typing.Sequence[typing.Any]:
+        data_frame = {'old': old_data_frame, 'new': new_data_frame}.get(source, None)
+
+        if source == 'change':
+            return [change] * count
+        elif source in ('jaccard', 'distance', ):
+            return [''] * count if (pairs is None) else pairs[source].values
+        elif data_frame is None:
+            return [''] * count
+        elif fieldname is None:
+            return data_frame.index.values
+        else:
+            return data_frame[fieldname].values
+
+    return pandas.DataFrame(data=collections.OrderedDict([(fieldname, values_(source, source_fieldname), ) for (fieldname, source, source_fieldname, ) in fieldnames]))
+
+def iter_diff(old_reader: typing.Iterator[Row], new_reader: typing.Iterator[Row], dirname: str, fieldname_code: str = 'UBID', fieldname_change: str = 'change', fieldname_jaccard: str = 'IoU', fieldname_distance: str = 'distance', include_fields: typing.Sequence[str] = [], include_index_fields: bool = False, jaccard_min: float = DEFAULT_JACCARD_MIN, max_distance: float = DEFAULT_MAX_DISTANCE, old_suffix: str = '_old', new_suffix: str = '_new', shard_size: int = DEFAULT_REMAINDER_SHARD_SIZE, shard_level: int = DEFAULT_REMAINDER_SHARD_LEVEL, chunk_size: int = DEFAULT_CHUNK_SIZE, fan_in: int = DEFAULT_FAN_IN, stats: typing.Optional[Stats] = None, logger: logging.Logger = logger) -> typing.Iterator[Row]:
+    """Return an iterator over the rows of the differences between the rows of the given old and new input files (viz., CSV readers), starting with the header.
+
+    First, the rows of the input files are sorted by UBID (see
+    `buildingid.command_line.external_sort.iter_sorted`), and the rows with
+    the same UBID are paired (viz., the building is unchanged).  Then, the
+    other rows (viz., the remainder) are cross-referenced in shards of at
+    most about `shard_size` rows (see `partition_remainders_`), one at a
+    time, and the buildings that changed or moved are matched (see
+    `classify_frames`).  The rows of the new input file that are matched in a
+    shard are not matched in other shards.  The other rows of the old and new
+    input files were "removed" and "added", respectively.
+
+    The rows are written to temporary files in the given directory, so that
+    only one chunk of rows or one shard is kept in memory (and a flag for
+    each row of the new input file).  The rows are ordered by category (see
+    `CHANGES`).  Unchanged buildings are not returned.
+    """
+
+    import numpy
+
+    if stats is None:
+        stats = NullStats()
+
+    # The fields of the output file.
+    fieldnames: typing.List[typing.Tuple[str, str, typing.Optional[str]]] = [(fieldname_change, 'change', None, )]
+
+    if include_index_fields:
+        fieldnames.extend([
+            ('index{0}'.format(old_suffix), 'old', None, ),
+            ('index{0}'.format(new_suffix), 'new', None, ),
+        ])
+
+    fieldnames.extend([
+        ('{0}{1}'.format(fieldname_code, old_suffix), 'old', fieldname_code, ),
+        ('{0}{1}'.format(fieldname_code, new_suffix), 'new', fieldname_code, ),
+        (fieldname_jaccard, 'jaccard', None, ),
+        (fieldname_distance, 'distance', None, ),
+    ])
+
+    for fieldname in include_fields:
+        if fieldname != fieldname_code:
+            fieldnames.extend([
+                ('{0}{1}'.format(fieldname, old_suffix), 'old', fieldname, ),
+                ('{0}{1}'.format(fieldname, new_suffix), 'new', fieldname, ),
+            ])
+
+    headers = {
+        'old': read_header(old_reader, [fieldname_code] + list(include_fields)),
+        'new': read_header(new_reader, [fieldname_code] + list(include_fields)),
+    }
+
+    paths = dict([(name, os.path.join(dirname, '{0}.csv'.format(name)), ) for name in ['old', 'new']])
+
+    # Pair the rows with the same UBID.
+    logger.info('[diff] Sorting and joining old and new input files')
+    with stats.stage('join'):
+        counts = join_rows_({'old': old_reader, 'new': new_reader}, headers, paths, fieldname_code, dirname, chunk_size=chunk_size, fan_in=fan_in)
+    for name in ['rows_old', 'rows_new', 'unchanged']:
+        stats.incr('rows_unchanged' if (name == 'unchanged') else name, counts[name])
+    logger.info('[diff] Found \033[1m{0}\033[0m unchanged rows, and \033[1m{1}\033[0m and \033[1m{2}\033[0m remaining rows of old and new input files'.format(counts['unchanged'], counts['remainder_old'], counts['remainder_new']))
+
+    # Partition the remaining rows into shards.
+    count = max(1, int(math.ceil(max(counts['remainder_old'], counts['remainder_new']) / shard_size)))
+
+    if count == 1:
+        shard_paths = [paths]
+    else:
+        logger.info('[diff] Partitioning remaining rows into \033[1m{0}\033[0m shards'.format(count))
+        with stats.stage('partition', rows=counts['remainder_old'] + counts['remainder_new']):
+            shard_paths = partition_remainders_(paths, dirname, fieldname_code, count, shard_level, max_distance)
+
+    # Cross-reference the remaining rows of each shard, and write the rows of
+    # the output file for each category.
+    change_paths = dict([(change, os.path.join(dirname, '{0}.csv'.format(change)), ) for change in CHANGES])
+
+    new_matched = numpy.zeros(counts['rows_new'], dtype=bool)
+
+    with contextlib.ExitStack() as stack:
+        files = dict([(change, stack.enter_context(open(change_paths[change], 'w', newline='')), ) for change in CHANGES])
+
+        for (index, shard_path, ) in enumerate(shard_paths):
+            if count > 1:
+                logger.info('[diff] Cross-referencing remaining rows of shard {0}/{1}'.format(index + 1, count))
+
+            old_data_frame = read_remainder_(shard_path['old']).sort_index()
+            new_data_frame = read_remainder_(shard_path['new'])
+            new_data_frame = new_data_frame[~new_matched[new_data_frame.index.values]]
+
+            pairs = classify_frames(old_data_frame, new_data_frame, fieldname_code=fieldname_code, jaccard_min=jaccard_min, max_distance=max_distance, stats=stats).sort_values('old', kind='stable')
+
+            new_matched[pairs['new'].values.astype(numpy.int64)] = True
+
+            removed = old_data_frame[~old_data_frame.index.isin(pairs['old'].values)]
+
+            output_frame_(fieldnames, 'removed', removed, None).to_csv(path_or_buf=files['removed'], header=False, index=False)
+            stats.incr('rows_removed', len(removed))
+
+            for change in ['changed', 'moved']:
+                change_pairs = pairs[pairs['change'] == change]
+
+                output_frame_(fieldnames, change, old_data_frame, new_data_frame, pairs=change_pairs).to_csv(path_or_buf=files[change], header=False, index=False)
+                stats.incr('rows_{0}'.format(change), len(change_pairs))
+
+        # The other rows of the new input file were added (viz., ordered by
+        # row number, which is the first field of the unsorted rows).
+        with open(os.path.join(dirname, 'added-unsorted.csv'), 'w', newline='') as f:
+            for new_data_frame in iter_remainder_(paths['new']):
+                added = new_data_frame[~new_matched[new_data_frame.index.values]]
+
+                output_frame_(fieldnames, 'added', None, added).set_index(added.index).to_csv(path_or_buf=f, header=False, index=True)
+                stats.incr('rows_added', len(added))
+
+        with open(os.path.join(dirname, 'added-unsorted.csv'), 'r', newline='') as f:
+            writer = csv.writer(files['added'], lineterminator='\n')
+
+            for row in iter_sorted(csv.reader(f), key=lambda row: int(row[0]), dirname=os.path.join(dirname, 'new'), chunk_size=chunk_size, fan_in=fan_in):
+                writer.writerow(row[1:])
+
+    yield output_header_(fieldnames)
+
+    for change in CHANGES:
+        with open(change_paths[change], 'r', newline='') as f:
+            yield from csv.reader(f)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/command_line/external_sort.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import csv
+import heapq
+import itertools
+import os
+import tempfile
+import typing
+
+from .. import hooks
+
+# The default number of rows that are sorted in memory at a time.
+DEFAULT_CHUNK_SIZE = 500000
+
+# The default maximum number of runs that are merged at a time (viz., the
+# number of open files).
+DEFAULT_FAN_IN = 64
+
+Row = typing.List[str]
+
+Key = typing.Callable[[Row], typing.Any]
+
+def write_run_(rows: typing.Iterable[Row], dirname: str) -> str:
+    """Write the given rows to a new run (viz., a temporary CSV file in the given directory), and return its path.
+    """
+
+    (fd, path, ) = tempfile.mkstemp(suffix='.csv', prefix='run-', dir=dirname)
+
+    with open(fd, 'w', newline='') as f:
+        csv.writer(f).writerows(rows)
+
+    return path
+
+def read_run_(path: str) -> typing.Iterator[Row]:
+    """Return an iterator over the rows of the given run, and then delete it.
+    """
+
+    with open(path, 'r', newline='') as f:
+        yield from csv.reader(f)
+
+    os.remove(path)
+
+def iter_sorted(rows: typing.Iterable[Row], key: Key, dirname: str, chunk_size: int = DEFAULT_CHUNK_SIZE, fan_in: int = DEFAULT_FAN_IN) -> typing.Iterator[Row]:
+    """Return an iterator over the given rows, sorted by the given key (viz., an external merge sort).
+
+    The rows are sorted in chunks of at most `chunk_size` rows, which are
+    written to runs (viz., temporary CSV files in the given directory), and
+    the runs are merged (at most `fan_in` at a time), so that at most one
+    chunk is kept in memory.  If there is only one chunk, then it is not
+    written.  The sort is stable.
+    """
+
+    if chunk_size < 1:
+        raise ValueError('invalid chunk size: {0}'.format(chunk_size))
+    elif fan_in < 2:
+        raise ValueError('invalid fan-in: {0}'.format(fan_in))
+
+    iterator = iter(rows)
+
+    paths: typing.List[str] = []
+
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+
+        with hooks.span('external_sort.sort', len(chunk)):
+            chunk.sort(key=key)
+
+        if len(chunk) < chunk_size:
+            if len(paths) == 0:
+                yield from chunk
+
+                return
+            elif len(chunk) > 0:
+                paths.append(write_run_(chunk, dirname))
+
+            break
+
+        paths.append(write_run_(chunk, dirname))
+
+    del chunk
+
+    yield from merge_runs_(paths, key, dirname, fan_in=fan_in)
+
+def merge_runs_(paths: typing.List[str], key: Key, dirname: str, fan_in: int = DEFAULT_FAN_IN) -> typing.Iterator[Row]:
+    """Return an iterator over the rows of the given runs (each sorted by the given key), merged and then deleted.
+
+    The runs are merged in passes (at most `fan_in` at a time), until at most
+    `fan_in` remain.  The runs of each merge are consecutive, so that the
+    merge is stable.
+    """
+
+    while len(paths) > fan_in:
+        merged_paths: typing.List[str] = []
+
+        for index in range(0, len(paths), fan_in):
+            with hooks.span('external_sort.merge'):
+                merged_paths.append(write_run_(heapq.merge(*[read_run_(path) for path in paths[index:(index + fan_in)]], key=key), dirname))
+
+        paths = merged_paths
+
+    yield from heapq.merge(*[read_run_(path) for path in paths], key=key)
+
+def merge_join(left: typing.Iterable[Row], right: typing.Iterable[Row], left_key: Key, right_key: Key) -> typing.Iterator[typing.Tuple[typing.Optional[Row], typing.Optional[Row]]]:
+    """Return an iterator over the pairs of rows of the given left and right iterables with equal keys (viz., an exact-match merge join).
+
+    The left and right iterables must be sorted by their keys.  The rows
+    with equal keys are paired in order, and the other rows are paired with
+    `None`.  Only the rows with the same key are kept in memory.
+    """
+
+    left_groups = itertools.groupby(left, key=left_key)
+    right_groups = itertools.groupby(right, key=right_key)
+
+    left_group = next(left_groups, None)
+    right_group = next(right_groups, None)
+
+    while (left_group is not None) or (right_group is not None):
+        if (right_group is None) or ((left_group is not None) and (left_group[0] < right_group[0])):
+            for row in left_group[1]:
+                yield (row, None, )
+
+            left_group = next(left_groups, None)
+        elif (left_group is None) or (right_group[0] < left_group[0]):
+            for row in right_group[1]:
+                yield (None, row, )
+
+            right_group = next(right_groups, None)
+        else:
+            yield from itertools.zip_longest(left_group[1], right_group[1])
+
+            left_group = next(left_groups, None)
+            right_group = next(right_groups, None)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/command_line/geojson_seq_pipe.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import json
+import typing
+
+from .dict_pipe import DEFAULT_BATCH_SIZE, NULL_STATS, DictPipe, iter_batches
+from .exceptions import FieldNotUniqueError
+
+from .. import hooks
+from ..stats import Stats
+
+RECORD_SEPARATOR_ = '\x1e'
+
+class GeoJSONSeqPipe(DictPipe):
+    """Pipe for newline-delimited GeoJSON (GeoJSONSeq; c.f., RFC 8142) files.
+
+    Each line of the input file is a GeoJSON Feature object, which is decoded
+    using `decoder_in.decode`.  The fields of the encoded output (or error) are
+    added to the "properties" member of the Feature object, which is written as
+    one line of the output (or error) file.
+    """
+
+    def run(self, io_in: typing.TextIO, io_out: typing.TextIO, io_err: typing.TextIO, batch_size: int = DEFAULT_BATCH_SIZE, stats: Stats = NULL_STATS) -> None:
+        batches = iter_batches(io_in, batch_size)
+
+        while True:
+            with stats.stage('read'):
+                in_lines = next(batches, None)
+
+            if in_lines is None:
+                break
+
+            with hooks.span('geojson_seq_pipe.batch', len(in_lines)):
+                (out_lines, err_lines, ) = self.run_batch(in_lines, stats=stats)
+
+            with stats.stage('write', rows=len(out_lines) + len(err_lines)):
+                if len(err_lines) > 0:
+                    io_err.write(''.join(err_lines))
+
+                if len(out_lines) > 0:
+                    io_out.write(''.join(out_lines))
+
+            stats.incr('rows_in', len(in_lines))
+            stats.incr('rows_out', len(out_lines))
+            stats.incr('rows_err', len(err_lines))
+
+            stats.maybe_write()
+
+        return
+
+    def run_batch(self, in_lines: typing.List[str], stats: Stats = NULL_STATS) -> typing.Tuple[typing.List[str], typing.List[str]]:
+        """Decode and encode the given batch of lines.
+
+        Returns the lines for the output and error files.
+        """
+
+        decoded = []
+
+        with stats.stage('decode', rows=len(in_lines)), hooks.span('geojson_seq_pipe.decode', len(in_lines)):
+            for in_line in in_lines:
+                in_line = in_line.strip().lstrip(RECORD_SEPARATOR_)
+
+                # Skip blank lines.
+                if not in_line:
+                    continue
+
+                feature = None
+
+                try:
+                    feature = json.loads(in_line)
+
+                    decoded.append((feature, self.decoder_in.decode(feature), None, ))
+                except BaseException as exception:
+                    decoded.append((feature, None, exception, ))
+
+        out_lines = []
+        err_lines = []
+
+        with stats.stage('encode', rows=len(decoded)), hooks.span('code.encode', len(decoded)):
+            for (feature, inst, exception, ) in decoded:
+                if exception is None:
+                    try:
+                        properties = add_properties_(feature, self.encoder_out.encode(inst))
+                    except BaseException as encode_exception:
+                        exception = encode_exception
+                    else:
+                        feature['properties'] = properties
+
+                        out_lines.append(dumps_(feature))
+
+                        continue
+
+                stats.error(exception)
+
+                if not isinstance(feature, dict):
+                    feature = {
+                        'type': 'Feature',
+                        'geometry': None,
+                        'properties': None,
+                    }
+
+                properties = dict(feature.get('properties') or {})
+                properties.update(self.encoder_err.encode(exception))
+
+                feature['properties'] = properties
+
+                err_lines.append(dumps_(feature))
+
+        return (out_lines, err_lines, )
+
+def add_properties_(feature: typing.Dict[str, typing.Any], values: typing.Dict[str, typing.Any]) -> typing.Dict[str, typing.Any]:
+    properties = feature.get('properties') or {}
+
+    for fieldname in values:
+        if fieldname in properties:
+            raise FieldNotUniqueError(fieldname)
+
+    properties = dict(properties)
+    properties.update(values)
+
+    return properties
+
+def dumps_(feature: typing.Dict[str, typing.Any]) -> str:
+    return json.dumps(feature, ensure_ascii=False, separators=(',', ':', )) + '\n'
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/command_line/open_text_stream.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import bz2
+import contextlib
+import gzip
+import io
+import lzma
+import os
+import typing
+
+import click
+
+from .exceptions import CustomException
+
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+COMPRESSION_MAGIC_NUMBERS_ = [
+    ('gzip', b'\x1f\x8b'),
+    ('bz2', b'BZh'),
+    ('xz', b'\xfd7zXZ\x00'),
+    ('zstd', b'\x28\xb5\x2f\xfd'),
+]
+
+COMPRESSION_EXTENSIONS_ = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+    '.zst': 'zstd',
+}
+
+class CompressionNotSupportedError(CustomException):
+    def __init__(self, compression: str) -> None:
+        msg = 'compression \'{0}\' is not supported (install the "zstandard" package)'.format(compression.replace('\'','\\\''))
+
+        super(CompressionNotSupportedError, self).__init__(msg)
+
+        self.compression = compression
+
+class UncloseableStream_(io.RawIOBase):
+    """Raw stream that delegates to, but never closes, a standard stream.
+    """
+
+    def __init__(self, stream: typing.BinaryIO) -> None:
+        super(UncloseableStream_, self).__init__()
+
+        self.stream = stream
+
+    def readable(self) -> bool:
+        return self.stream.readable()
+
+    def writable(self) -> bool:
+        return self.stream.writable()
+
+    def readinto(self, b: bytearray) -> int:
+        data = self.stream.read(len(b))
+
+        b[:len(data)] = data
+
+        return len(data)
+
+    def write(self, b: bytes) -> int:
+        return self.stream.write(b)
+
+    def close(self) -> None:
+        if not self.closed and self.stream.writable():
+            self.stream.flush()
+
+        super(UncloseableStream_, self).close()
+
+def detect_compression(stream: io.BufferedReader) -> typing.Optional[str]:
+    """Return the compression format of the given stream, detected using its magic number, or `None`.
+    """
+
+    head = stream.peek(8)
+
+    for compression, magic_number in COMPRESSION_MAGIC_NUMBERS_:
+        if head.startswith(magic_number):
+            return compression
+
+    return None
+
+def compression_for_path(path: str) -> typing.Optional[str]:
+    """Return the compression format for the given path, inferred from its extension, or `None`.
+    """
+
+    return COMPRESSION_EXTENSIONS_.get(os.path.splitext(path)[1].lower(), None)
+
+def open_compressed_(stream: typing.BinaryIO, mode: str, compression: str) -> typing.BinaryIO:
+    if 'gzip' == compression:
+        return gzip.GzipFile(fileobj=stream, mode=mode)
+    elif 'bz2' == compression:
+        return bz2.BZ2File(stream, mode=mode)
+    elif 'xz' == compression:
+        return lzma.LZMAFile(stream, mode=mode)
+    elif 'zstd' == compression:
+        try:
+            import zstandard
+        except ImportError:
+            raise CompressionNotSupportedError(compression)
+
+        if 'r' == mode:
+            return zstandard.ZstdDecompressor().stream_reader(stream, closefd=False)
+        else:
+            return zstandard.ZstdCompressor().stream_writer(stream, closefd=False)
+    else:
+        raise CompressionNotSupportedError(compression)
+
+@contextlib.contextmanager
+def open_text_stream(path: str, mode: str = 'r', buffer_size: int = DEFAULT_BUFFER_SIZE, encoding: str = 'utf-8') -> typing.Iterator[typing.TextIO]:
+    """Open the given path (or "-" for the standard input or output stream) as a text stream for CSV.
+
+    When reading, the compression format (gzip, bz2, xz or zstd) is detected
+    using the magic number of the stream.  When writing, the compression
+    format is inferred from the extension of the path.
+
+    The returned text stream is opened with `newline=''` (c.f., `csv.reader`)
+    and is buffered with the given number of bytes.
+    """
+
+    if mode not in ('r', 'w', 'a', ):
+        raise ValueError('invalid mode: {0}'.format(mode))
+
+    with contextlib.ExitStack() as stack:
+        if path == '-':
+            std_stream = click.get_binary_stream('stdin' if ('r' == mode) else 'stdout')
+
+            if 'r' == mode:
+                stream = io.BufferedReader(UncloseableStream_(std_stream), buffer_size=buffer_size)
+            else:
+                stream = io.BufferedWriter(UncloseableStream_(std_stream), buffer_size=buffer_size)
+
+            compression = None
+        else:
+            stream = open(path, mode + 'b', buffering=buffer_size)
+
+            compression = compression_for_path(path)
+
+        stack.enter_context(stream)
+
+        if 'r' == mode:
+            compression = detect_compression(stream)
+
+        if compression is not None:
+            compressed_stream = stack.enter_context(open_compressed_(stream, 'r' if ('r' == mode) else 'w', compression))
+
+            if 'r' == mode:
+                stream = io.BufferedReader(compressed_stream, buffer_size=buffer_size)
+            else:
+                stream = io.BufferedWriter(compressed_stream, buffer_size=buffer_size)
+
+            stack.enter_context(stream)
+
+        text_stream = io.TextIOWrapper(stream, encoding=encoding, newline='')
+
+        try:
+            yield text_stream
+        finally:
+            if not text_stream.closed:
+                text_stream.flush()
+
+                text_stream.detach()
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/command_line/prefix_index.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import csv
+import json
+import math
+import mmap
+import os
+import sqlite3
+import tempfile
+import typing
+
+from openlocationcode import openlocationcode
+
+from .. import hooks
+from ..code import Code, CodeArea, cellSize_, decode
+
+# The lengths of the OLC prefixes that are indexed (viz., cells of 20, 1,
+# 0.05 and 0.0025 degrees).
+DEFAULT_LEVELS = [2, 4, 6, 8]
+
+# The maximum number of OLC cells that are looked up for a bounding box.
+DEFAULT_MAX_CELLS = 4096
+
+INDEX_SUFFIX = '.bidx'
+
+# The version of the format of the index file.
+VERSION_ = 1
+
+# The margin (in degrees) of the expanded bounding box (viz., for rounding
+# errors at the boundaries of OLC cells).
+EPSILON_ = 1e-9
+
+# The number of rows that are inserted into the index file at a time.
+INSERT_BATCH_SIZE_ = 10000
+
+# The number of OLC prefixes that are looked up at a time.
+SELECT_BATCH_SIZE_ = 500
+
+BBox = typing.Tuple[float, float, float, float]
+
+def olc_digits(code: Code) -> str:
+    """Return the significant digits of the OLC of the given UBID (viz., without the separator and padding characters).
+    """
+
+    olc = code.split('-', 1)[0].upper()
+
+    return olc.replace(openlocationcode.SEPARATOR_, '').rstrip(openlocationcode.PADDING_CHARACTER_)
+
+def iter_cells(bbox: BBox, level: int) -> typing.Iterator[str]:
+    """Yield the OLC prefixes with the given number of digits of the cells that cover the given bounding box.
+    """
+
+    (south, west, north, east, ) = bbox
+
+    (height, width, ) = cellSize_(level)
+
+    latitude_range = range(int(math.floor((max(south, -90.0) + 90.0) / height)), int(math.floor((min(north, 90.0 - 1e-9) + 90.0) / height)) + 1)
+    longitude_range = range(int(math.floor((max(west, -180.0) + 180.0) / width)), int(math.floor((min(east, 180.0 - 1e-9) + 180.0) / width)) + 1)
+
+    for i in latitude_range:
+        for j in longitude_range:
+            yield olc_digits(openlocationcode.encode(((i + 0.5) * height) - 90.0, ((j + 0.5) * width) - 180.0, codeLength=level))
+
+def count_cells_(bbox: BBox, level: int) -> int:
+    (south, west, north, east, ) = bbox
+
+    (height, width, ) = cellSize_(level)
+
+    return (int(math.floor((north - south) / height)) + 2) * (int(math.floor((east - west) / width)) + 2)
+
+def iter_records(buffer: typing.Union[bytes, mmap.mmap], start: int, end: int, quotechar: bytes = b'"') -> typing.Iterator[typing.Tuple[int, int]]:
+    """Yield the start and end byte offsets of the CSV records in the given byte range.
+
+    A record ends at the first newline after which the number of quote
+    characters in the record is even (viz., quoted fields may contain
+    newlines).
+    """
+
+    record_start = start
+    quotes = 0
+
+    position = start
+
+    while position < end:
+        newline = buffer.find(b'\n', position, end)
+
+        line_end = end if (newline < 0) else (newline + 1)
+
+        quotes += buffer[position:line_end].count(quotechar)
+
+        position = line_end
+
+        if (quotes % 2) == 0:
+            yield (record_start, line_end, )
+
+            record_start = line_end
+            quotes = 0
+
+    if record_start < end:
+        yield (record_start, end, )
+
+def parse_record_(data: bytes, delimiter: str, quotechar: str) -> typing.List[str]:
+    for row in csv.reader([data.decode('utf-8')], delimiter=delimiter, quotechar=quotechar):
+        return row
+
+    return []
+
+def intersects_(codeArea: CodeArea, bbox: BBox) -> bool:
+    (south, west, north, east, ) = bbox
+
+    return (codeArea.latitudeLo <= north) and (south <= codeArea.latitudeHi) and (codeArea.longitudeLo <= east) and (west <= codeArea.longitudeHi)
+
+class PrefixIndex(object):
+    """Sidecar index of a CSV file, which maps the OLC prefixes of the UBIDs of its rows (at a few levels) to byte ranges.
+
+    For each level, a range is a run of consecutive rows with the same OLC
+    prefix.  If the file is sorted by UBID, then each prefix is a single
+    range.  The index is a SQLite database, which also records the size and
+    modification time of the file (to detect stale indexes), the byte range
+    of the header, and the greatest distances from the center of the centroid
+    cell of a UBID to the edges of its bounding box (to find UBIDs whose
+    centroids are outside of a bounding box, but whose extents are not).
+    """
+
+    def __init__(self, path: str, connection: sqlite3.Connection, meta: typing.Dict[str, typing.Any]) -> None:
+        super(PrefixIndex, self).__init__()
+
+        self.path = path
+        self.connection = connection
+        self.meta = meta
+
+    @property
+    def levels(self) -> typing.List[int]:
+        return self.meta['levels']
+
+    def close(self) -> None:
+        self.connection.close()
+
+    @staticmethod
+    def source_meta_(src_path: str, fieldname_code: str, levels: typing.List[int], delimiter: str, quotechar: str) -> typing.Dict[str, typing.Any]:
+        stat = os.stat(src_path)
+
+        return {
+            'version': VERSION_,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'fieldname_code': fieldname_code,
+            'levels': sorted(levels),
+            'delimiter': delimiter,
+            'quotechar': quotechar,
+        }
+
+    @classmethod
+    def open(cls, path: str, src_path: str, fieldname_code: str, levels: typing.List[int], delimiter: str, quotechar: str) -> typing.Optional['PrefixIndex']:
+        """Return the index that is saved to the given path, or `None` if the file does not exist or if the index is stale.
+        """
+
+        if not os.path.exists(path):
+            return None
+
+        connection = sqlite3.connect(path)
+
+        try:
+            meta = dict([(key, json.loads(value), ) for (key, value, ) in connection.execute('SELECT key, value FROM meta')])
+        except sqlite3.DatabaseError:
+            connection.close()
+
+            return None
+
+        expected = cls.source_meta_(src_path, fieldname_code, levels, delimiter, quotechar)
+
+        if any((meta.get(key, None) != value) for (key, value, ) in expected.items()):
+            connection.close()
+
+            return None
+
+        return cls(path, connection, meta)
+
+    @classmethod
+    def build(cls, path: str, src_path: str, fieldname_code: str, levels: typing.List[int], delimiter: str, quotechar: str, on_error: typing.Optional[typing.Callable[[BaseException], None]] = None) -> 'PrefixIndex':
+        """Build the index of the given CSV file, and save it to the given path (atomically).
+        """
+
+        levels = sorted(levels)
+
+        meta = cls.source_meta_(src_path, fieldname_code, levels, delimiter, quotechar)
+
+        (fd, tmp_path, ) = tempfile.mkstemp(prefix='.{0}.'.format(os.path.basename(path)), dir=os.path.dirname(os.path.abspath(path)))
+        os.close(fd)
+
+        try:
+            connection = sqlite3.connect(tmp_path)
+
+            try:
+                connection.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+                connection.execute('CREATE TABLE ranges (level INTEGER, prefix TEXT, start INTEGER, end INTEGER)')
+
+                meta.update(cls.scan_(connection, src_path, fieldname_code, levels, delimiter, quotechar, on_error=on_error))
+
+                connection.execute('CREATE INDEX ranges_level_prefix ON ranges (level, prefix)')
+                connection.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', [(key, json.dumps(value), ) for (key, value, ) in meta.items()])
+                connection.commit()
+            finally:
+                connection.close()
+
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+
+            raise
+
+        return cls(path, sqlite3.connect(path), meta)
+
+    @staticmethod
+    def scan_(connection: sqlite3.Connection, src_path: str, fieldname_code: str, levels: typing.List[int], delimiter: str, quotechar: str, on_error: typing.Optional[typing.Callable[[BaseException], None]] = None) -> typing.Dict[str, typing.Any]:
+        """Insert the ranges of the given CSV file into the index, and return the metadata of the scan.
+        """
+
+        meta: typing.Dict[str, typing.Any] = {
+            'header_end': 0,
+            'rows': 0,
+            'rows_indexed': 0,
+            'extent_north': 0.0,
+            'extent_south': 0.0,
+            'extent_east': 0.0,
+            'extent_west': 0.0,
+        }
+
+        # For each level, the current run (viz., prefix, start and end offsets).
+        runs: typing.List[typing.Optional[typing.List[typing.Any]]] = [None] * len(levels)
+
+        batch: typing.List[typing.Tuple[int, str, int, int]] = []
+
+        def flush_(force: bool = False) -> None:
+            if force or (len(batch) >= INSERT_BATCH_SIZE_):
+                connection.executemany('INSERT INTO ranges (level, prefix, start, end) VALUES (?, ?, ?, ?)', batch)
+
+                del batch[:]
+
+        size = os.path.getsize(src_path)
+
+        if size == 0:
+            return meta
+
+        with open(src_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer, hooks.span('query.index', 0):
+            records = iter_records(buffer, 0, size, quotechar=quotechar.encode('utf-8'))
+
+            # Read the header.
+            for (start, end, ) in records:
+                header = parse_record_(buffer[start:end], delimiter, quotechar)
+
+                meta['header_end'] = end
+
+                break
+            else:
+                return meta
+
+            try:
+                index_code = header.index(fieldname_code)
+            except ValueError:
+                raise ValueError('field \'{0}\' is not defined'.format(fieldname_code))
+
+            for (start, end, ) in records:
+                meta['rows'] += 1
+
+                row = parse_record_(buffer[start:end], delimiter, quotechar)
+
+                if index_code >= len(row):
+                    continue
+
+                code = row[index_code]
+
+                try:
+                    codeArea = decode(code)
+                except (AssertionError, ValueError, ) as exception:
+                    if on_error is not None:
+                        on_error(exception)
+
+                    continue
+
+                meta['rows_indexed'] += 1
+
+                latitudeCenter = codeArea.centroid.latitudeCenter
+                longitudeCenter = codeArea.centroid.longitudeCenter
+
+                meta['extent_north'] = max(meta['extent_north'], codeArea.latitudeHi - latitudeCenter)
+                meta['extent_south'] = max(meta['extent_south'], latitudeCenter - codeArea.latitudeLo)
+                meta['extent_east'] = max(meta['extent_east'], codeArea.longitudeHi - longitudeCenter)
+                meta['extent_west'] = max(meta['extent_west'], longitudeCenter - codeArea.longitudeLo)
+
+                digits = olc_digits(code)
+
+                for (index, level, ) in enumerate(levels):
+                    prefix = digits[0:level]
+
+                    run = runs[index]
+
+                    if (run is not None) and (run[0] == prefix):
+                        run[2] = end
+                    else:
+                        if run is not None:
+                            batch.append((level, run[0], run[1], run[2], ))
+
+                        runs[index] = [prefix, start, end]
+
+                flush_()
+
+        for (index, level, ) in enumerate(levels):
+            run = runs[index]
+
+            if run is not None:
+                batch.append((level, run[0], run[1], run[2], ))
+
+        flush_(force=True)
+
+        # The file is sorted if each prefix at the finest level is a single range.
+        (count_ranges, count_prefixes, ) = connection.execute('SELECT COUNT(*), COUNT(DISTINCT prefix) FROM ranges WHERE level = ?', [levels[-1]]).fetchone()
+
+        meta['sorted'] = count_ranges == count_prefixes
+
+        return meta
+
+    def ranges_(self, level: int, prefixes: typing.Iterable[str]) -> typing.List[typing.Tuple[int, int]]:
+        """Return the coalesced byte ranges for the given OLC prefixes at the given level.
+        """
+
+        prefixes = sorted(set(prefixes))
+
+        ranges = []
+
+        for offset in range(0, len(prefixes), SELECT_BATCH_SIZE_):
+            chunk = prefixes[offset:(offset + SELECT_BATCH_SIZE_)]
+
+            ranges.extend(self.connection.execute('SELECT start, end FROM ranges WHERE level = ? AND prefix IN ({0})'.format(', '.join(['?'] * len(chunk))), [level] + chunk).fetchall())
+
+        ranges.sort()
+
+        coalesced: typing.List[typing.List[int]] = []
+
+        for (start, end, ) in ranges:
+            if (len(coalesced) > 0) and (start <= coalesced[-1][1]):
+                coalesced[-1][1] = max(coalesced[-1][1], end)
+            else:
+                coalesced.append([start, end])
+
+        return [(start, end, ) for (start, end, ) in coalesced]
+
+    def ranges_for_bbox(self, bbox: BBox, max_cells: int = DEFAULT_MAX_CELLS) -> typing.Tuple[int, typing.List[typing.Tuple[int, int]]]:
+        """Return the level and the byte ranges of the rows whose UBID bounding boxes may intersect the given bounding box.
+
+        The bounding box is expanded by the greatest extents of the UBIDs,
+        and the finest level for which at most `max_cells` OLC cells cover the
+        expanded bounding box is selected.
+        """
+
+        (south, west, north, east, ) = bbox
+
+        expanded = (south - self.meta['extent_north'] - EPSILON_, west - self.meta['extent_east'] - EPSILON_, north + self.meta['extent_south'] + EPSILON_, east + self.meta['extent_west'] + EPSILON_, )
+
+        level = self.levels[0]
+
+        for candidate in self.levels:
+            if count_cells_(expanded, candidate) <= max_cells:
+                level = candidate
+
+        prefixes = set()
+
+        for prefix in iter_cells(expanded, level):
+            prefixes.add(prefix)
+
+            # UBIDs with fewer digits than the level are indexed by their (shorter) prefixes.
+            for other in self.levels:
+                if other < level:
+                    prefixes.add(prefix[0:other])
+
+        return (level, self.ranges_(level, prefixes), )
+
+    def ranges_for_olc_prefix(self, digits: str) -> typing.Tuple[int, typing.List[typing.Tuple[int, int]]]:
+        """Return the level and the byte ranges of the rows whose OLC digits may start with the given digits.
+        """
+
+        levels = [level for level in self.levels if level <= len(digits)]
+
+        if len(levels) == 0:
+            raise ValueError('OLC prefix must have at least {0} digits'.format(self.levels[0]))
+
+        level = levels[-1]
+
+        return (level, self.ranges_(level, [digits[0:level]]), )
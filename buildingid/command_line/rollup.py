@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/command_line/rollup.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import itertools
+import typing
+
+from openlocationcode import openlocationcode
+
+from .external_sort import DEFAULT_FAN_IN, merge_runs_, write_run_
+from .prefix_index import olc_digits
+from ..code import RE_GROUP_EAST_, RE_GROUP_NORTH_, RE_GROUP_OPENLOCATIONCODE_, RE_GROUP_SOUTH_, RE_GROUP_WEST_, Code, cellSize_, isValid_
+
+# The default maximum number of groups that are kept in memory.
+DEFAULT_MAX_GROUPS = 1000000
+
+Key = typing.Tuple[str, ...]
+
+def parse_code(code: Code) -> typing.Tuple[str, float]:
+    """Return the significant digits of the OLC of the given UBID, and the area of its bounding box (viz., `CodeArea.area`, in square degrees).
+
+    The UBID is validated, but not decoded: the area is the product of the
+    extents and the size of the OLC cell.
+    """
+
+    match = isValid_(code)
+
+    if match is None:
+        raise ValueError('buildingid.code.decode - Invalid code')
+
+    digits = olc_digits(match.group(RE_GROUP_OPENLOCATIONCODE_))
+
+    (height, width, ) = cellSize_(len(digits))
+
+    return (digits, (height * (1 + int(match.group(RE_GROUP_NORTH_)) + int(match.group(RE_GROUP_SOUTH_)))) * (width * (1 + int(match.group(RE_GROUP_EAST_)) + int(match.group(RE_GROUP_WEST_)))), )
+
+def olc_for_digits(digits: str) -> str:
+    """Return the OLC for the given significant digits (viz., with the separator and padding characters).
+    """
+
+    if len(digits) < openlocationcode.SEPARATOR_POSITION_:
+        return digits + (openlocationcode.PADDING_CHARACTER_ * (openlocationcode.SEPARATOR_POSITION_ - len(digits))) + openlocationcode.SEPARATOR_
+    else:
+        return digits[:openlocationcode.SEPARATOR_POSITION_] + openlocationcode.SEPARATOR_ + digits[openlocationcode.SEPARATOR_POSITION_:]
+
+class HashAggregate(object):
+    """A hash aggregate of the sums of arrays of values by key, which spills to disk when the number of groups exceeds a budget.
+
+    If there are more than `max_groups` groups in memory, then they are
+    written to a run (viz., a temporary CSV file in the given directory,
+    sorted by key), and the sums for the runs are merged when the groups are
+    iterated (see `buildingid.command_line.external_sort`).
+    """
+
+    def __init__(self, size: int, dirname: str, max_groups: int = DEFAULT_MAX_GROUPS, fan_in: int = DEFAULT_FAN_IN) -> None:
+        super(HashAggregate, self).__init__()
+
+        if max_groups < 1:
+            raise ValueError('invalid maximum number of groups: {0}'.format(max_groups))
+
+        self.size = size
+        self.dirname = dirname
+        self.max_groups = max_groups
+        self.fan_in = fan_in
+
+        self.groups: typing.Dict[Key, typing.List[float]] = {}
+        self.paths: typing.List[str] = []
+
+    def add(self, key: Key, values: typing.Sequence[float]) -> None:
+        """Add the given values to the sums for the given key.
+        """
+
+        sums = self.groups.get(key)
+
+        if sums is None:
+            if len(self.groups) >= self.max_groups:
+                self.spill_()
+
+            self.groups[key] = list(values)
+        else:
+            for (index, value, ) in enumerate(values):
+                sums[index] += value
+
+    def spill_(self) -> None:
+        self.paths.append(write_run_([list(key) + [repr(value) for value in sums] for (key, sums, ) in sorted(self.groups.items())], self.dirname))
+
+        self.groups.clear()
+
+    def __iter__(self) -> typing.Iterator[typing.Tuple[Key, typing.List[float]]]:
+        """Return an iterator over the keys and sums of the groups, ordered by key.
+        """
+
+        if len(self.paths) == 0:
+            yield from sorted(self.groups.items())
+
+            return
+
+        if len(self.groups) > 0:
+            self.spill_()
+
+        (paths, self.paths, ) = (self.paths, [], )
+
+        rows = merge_runs_(paths, lambda row: row[:-self.size], self.dirname, fan_in=self.fan_in)
+
+        for (key, group, ) in itertools.groupby(rows, key=lambda row: tuple(row[:-self.size])):
+            sums = [0.0] * self.size
+
+            for row in group:
+                for (index, value, ) in enumerate(row[-self.size:]):
+                    sums[index] += float(value)
+
+            yield (key, sums, )
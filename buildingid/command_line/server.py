@@ -0,0 +1,524 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/command_line/server.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import asyncio
+import collections
+import concurrent.futures
+import http
+import json
+import math
+import time
+import typing
+
+from ..code import Code, decode, isValid
+
+DEFAULT_MAX_BATCH_SIZE = 1024
+
+DEFAULT_MAX_BATCH_DELAY = 0.002
+
+DEFAULT_MAX_BODY_SIZE = 64 << 20
+
+DEFAULT_LATENCY_WINDOW = 10000
+
+# State of the current worker (viz., a thread or process of the worker pool),
+# initialized by `init_worker`.
+WORKER_STATE_: typing.Dict[str, typing.Any] = {}
+
+class RequestError(Exception):
+    """Exception for a malformed request (viz., HTTP status 400).
+    """
+
+    pass
+
+def init_worker(code_length: int, reference_codes: typing.Optional[typing.List[Code]] = None) -> None:
+    """Initialize the state of the current worker: the decoders and encoders for "encode", and the spatial index for "match".
+    """
+
+    from .dict_decoders import GeoJSONDictDecoder, LatLngDictDecoder, WKBDictDecoder, WKTDictDecoder
+    from .dict_encoders import BaseGeometryDictEncoder
+
+    WORKER_STATE_['code_length'] = code_length
+
+    WORKER_STATE_['decoders'] = [
+        ('geometry', GeoJSONDictDecoder('geometry'), ),
+        ('wkb', WKBDictDecoder('wkb'), ),
+        ('wkt', WKTDictDecoder('wkt'), ),
+        ('north', LatLngDictDecoder('latitude', 'longitude', fieldname_north_latitude='north', fieldname_south_latitude='south', fieldname_west_longitude='west', fieldname_east_longitude='east'), ),
+        ('latitude', LatLngDictDecoder('latitude', 'longitude'), ),
+    ]
+
+    WORKER_STATE_['encoders'] = {}
+    WORKER_STATE_['make_encoder'] = lambda code_length: BaseGeometryDictEncoder('ubid', code_length)
+
+    if reference_codes is None:
+        WORKER_STATE_['reference'] = None
+    else:
+        from ..crossref import CrossReferencer
+
+        WORKER_STATE_['reference'] = CrossReferencer.from_codes(reference_codes)
+
+def error_(exception: BaseException) -> typing.Dict[str, typing.Any]:
+    return {
+        'error': {
+            'name': type(exception).__name__,
+            'message': str(exception),
+        },
+    }
+
+def encode_batch(items: typing.List[typing.Tuple[typing.Dict[str, typing.Any], typing.Optional[int]]]) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Assign UBIDs to the given batch of (geometry, code length) pairs.
+
+    Each geometry is an object with a "geometry" (GeoJSON), "wkb" (hex), "wkt"
+    or "latitude" and "longitude" (and, optionally, "north", "south", "east"
+    and "west") member.
+    """
+
+    results = []
+
+    for (item, code_length, ) in items:
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('geometry must be an object')
+
+            for (fieldname, decoder, ) in WORKER_STATE_['decoders']:
+                if fieldname in item:
+                    break
+            else:
+                raise ValueError('geometry must have a "geometry", "wkb", "wkt" or "latitude" and "longitude" member')
+
+            if code_length is None:
+                code_length = WORKER_STATE_['code_length']
+
+            encoder = WORKER_STATE_['encoders'].get(code_length, None)
+
+            if encoder is None:
+                encoder = WORKER_STATE_['encoders'][code_length] = WORKER_STATE_['make_encoder'](code_length)
+
+            (code, ) = encoder.encode_row(decoder.decode(item))
+        except BaseException as exception:
+            results.append(error_(exception))
+        else:
+            results.append({
+                'ubid': code,
+            })
+
+    return results
+
+def decode_batch(codes: typing.List[Code]) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Decode the given batch of UBIDs.
+    """
+
+    results = []
+
+    for code in codes:
+        try:
+            codeArea = decode(code)
+        except BaseException as exception:
+            results.append(error_(exception))
+        else:
+            results.append({
+                'north': codeArea.latitudeHi,
+                'south': codeArea.latitudeLo,
+                'east': codeArea.longitudeHi,
+                'west': codeArea.longitudeLo,
+                'latitude': codeArea.centroid.latitudeCenter,
+                'longitude': codeArea.centroid.longitudeCenter,
+            })
+
+    return results
+
+def validate_batch(codes: typing.List[Code]) -> typing.List[bool]:
+    """Validate the given batch of UBIDs.
+    """
+
+    return [isinstance(code, str) and isValid(code) for code in codes]
+
+def match_batch(items: typing.List[typing.Tuple[Code, float]]) -> typing.List[typing.Any]:
+    """Match the given batch of (UBID, minimum Jaccard similarity coefficient) pairs against the reference set.
+
+    The batch is matched with a single query of the reference set.
+    """
+
+    from ..crossref import BOUNDS_COLUMNS_, bounds_for_code_area
+
+    reference = WORKER_STATE_['reference']
+
+    results: typing.List[typing.Any] = [None] * len(items)
+
+    bounds: typing.List[typing.Tuple[float, ...]] = [(math.nan, ) * BOUNDS_COLUMNS_] * len(items)
+
+    for (index, (code, jaccard_min, ), ) in enumerate(items):
+        try:
+            if reference is None:
+                raise ValueError('reference set is not loaded')
+
+            codeArea = decode(code)
+        except BaseException as exception:
+            results[index] = error_(exception)
+        else:
+            bounds[index] = bounds_for_code_area(codeArea)
+
+            results[index] = {
+                'matches': [],
+            }
+
+    if reference is None:
+        return results
+
+    matches = reference.query_bounds(bounds)
+
+    for (index, reference_index, jaccard, ) in zip(matches.query_index.tolist(), matches.reference_index.tolist(), matches.jaccard.tolist()):
+        if (jaccard > 0) and (jaccard >= items[index][1]):
+            results[index]['matches'].append({
+                'index': reference_index,
+                'ubid': reference.codes[reference_index],
+                'jaccard': jaccard,
+            })
+
+    for result in results:
+        if 'matches' in result:
+            result['matches'].sort(key=lambda match: (-match['jaccard'], match['index'], ))
+
+    return results
+
+class LatencyRecorder(object):
+    """Latencies (in seconds) of the most recent requests, for percentiles.
+    """
+
+    def __init__(self, window: int = DEFAULT_LATENCY_WINDOW) -> None:
+        super(LatencyRecorder, self).__init__()
+
+        self.latencies = collections.deque(maxlen=window)
+
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, latency: float) -> None:
+        self.latencies.append(latency)
+
+        self.count += 1
+        self.total += latency
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile_(p: float) -> typing.Optional[float]:
+            if len(latencies) == 0:
+                return None
+
+            return latencies[min(len(latencies) - 1, max(0, int(math.ceil(p * len(latencies))) - 1))]
+
+        return {
+            'count': self.count,
+            'mean': (self.total / self.count) if (self.count > 0) else None,
+            'p50': percentile_(0.50),
+            'p90': percentile_(0.90),
+            'p99': percentile_(0.99),
+            'p999': percentile_(0.999),
+            'max': latencies[-1] if (len(latencies) > 0) else None,
+        }
+
+class MicroBatcher(object):
+    """Coalesces the items of concurrent requests into batches, which are processed by `fn` in the given executor.
+
+    A batch is dispatched when it has `max_batch_size` items, or when
+    `max_batch_delay` seconds have elapsed since its first request was queued.
+    """
+
+    def __init__(self, fn: typing.Callable[[list], list], executor: concurrent.futures.Executor, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_batch_delay: float = DEFAULT_MAX_BATCH_DELAY) -> None:
+        super(MicroBatcher, self).__init__()
+
+        self.fn = fn
+        self.executor = executor
+
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+
+        self.queue = None
+        self.task = None
+
+        self.batches = 0
+        self.items = 0
+
+    def start(self) -> None:
+        self.queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(self.run_())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+            self.task = None
+
+    async def submit(self, items: list) -> list:
+        """Return the results for the given items (viz., a request).
+        """
+
+        if len(items) == 0:
+            return []
+
+        future = asyncio.get_event_loop().create_future()
+
+        await self.queue.put((items, future, ))
+
+        return await future
+
+    async def run_(self) -> None:
+        loop = asyncio.get_event_loop()
+
+        while True:
+            pending = [await self.queue.get()]
+
+            count = len(pending[0][0])
+
+            deadline = loop.time() + self.max_batch_delay
+
+            while count < self.max_batch_size:
+                try:
+                    entry = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+
+                    if timeout <= 0:
+                        break
+
+                    try:
+                        entry = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+
+                pending.append(entry)
+
+                count += len(entry[0])
+
+            asyncio.ensure_future(self.dispatch_(pending))
+
+    async def dispatch_(self, pending: typing.List[typing.Tuple[list, asyncio.Future]]) -> None:
+        batch = [item for (items, _, ) in pending for item in items]
+
+        self.batches += 1
+        self.items += len(batch)
+
+        try:
+            results = await asyncio.get_event_loop().run_in_executor(self.executor, self.fn, batch)
+        except BaseException as exception:
+            for (_, future, ) in pending:
+                if not future.done():
+                    future.set_exception(exception)
+
+            return
+
+        offset = 0
+
+        for (items, future, ) in pending:
+            if not future.done():
+                future.set_result(results[offset:offset + len(items)])
+
+            offset += len(items)
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': (self.items / self.batches) if (self.batches > 0) else None,
+        }
+
+class Server(object):
+    """HTTP/JSON server for the "encode", "decode", "validate" and "match" endpoints.
+
+    Each endpoint accepts a POST request with a JSON object, whose "items"
+    member is an array, and responds with a JSON object, whose "results"
+    member is an array of the same length.  The items of concurrent requests
+    are coalesced into micro-batches (see `MicroBatcher`), which are processed
+    in the given executor (viz., a worker pool, whose workers are initialized
+    by `init_worker`).  The "stats" endpoint (GET) reports the latency
+    percentiles and batch sizes for each endpoint.
+    """
+
+    def __init__(self, executor: concurrent.futures.Executor, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_batch_delay: float = DEFAULT_MAX_BATCH_DELAY, max_body_size: int = DEFAULT_MAX_BODY_SIZE) -> None:
+        super(Server, self).__init__()
+
+        self.executor = executor
+
+        self.max_body_size = max_body_size
+
+        self.batchers = collections.OrderedDict([
+            ('/encode', MicroBatcher(encode_batch, executor, max_batch_size=max_batch_size, max_batch_delay=max_batch_delay), ),
+            ('/decode', MicroBatcher(decode_batch, executor, max_batch_size=max_batch_size, max_batch_delay=max_batch_delay), ),
+            ('/validate', MicroBatcher(validate_batch, executor, max_batch_size=max_batch_size, max_batch_delay=max_batch_delay), ),
+            ('/match', MicroBatcher(match_batch, executor, max_batch_size=max_batch_size, max_batch_delay=max_batch_delay), ),
+        ])
+
+        self.latencies = collections.OrderedDict([(path, LatencyRecorder(), ) for path in self.batchers.keys()])
+
+        self.started_at = time.monotonic()
+
+        self.server = None
+
+    async def start(self, host: typing.Optional[str] = None, port: typing.Optional[int] = None, unix_socket: typing.Optional[str] = None) -> asyncio.AbstractServer:
+        for batcher in self.batchers.values():
+            batcher.start()
+
+        if unix_socket is None:
+            self.server = await asyncio.start_server(self.handle_connection_, host=host, port=port)
+        else:
+            self.server = await asyncio.start_unix_server(self.handle_connection_, path=unix_socket)
+
+        return self.server
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+
+            await self.server.wait_closed()
+
+        for batcher in self.batchers.values():
+            await batcher.stop()
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            'uptime': time.monotonic() - self.started_at,
+            'endpoints': collections.OrderedDict([
+                (path.lstrip('/'), {
+                    'latency': self.latencies[path].to_dict(),
+                    'batches': self.batchers[path].to_dict(),
+                })
+                for path in self.batchers.keys()
+            ]),
+        }
+
+    async def handle_request(self, method: str, path: str, body: bytes) -> typing.Tuple[int, typing.Any]:
+        """Return the HTTP status and the JSON value of the response for the given request.
+        """
+
+        if path in ('/health', '/stats', ):
+            if method != 'GET':
+                return (http.HTTPStatus.METHOD_NOT_ALLOWED, {'error': {'name': 'MethodNotAllowed', 'message': method}}, )
+
+            return (http.HTTPStatus.OK, {'status': 'ok'} if (path == '/health') else self.to_dict(), )
+
+        batcher = self.batchers.get(path, None)
+
+        if batcher is None:
+            return (http.HTTPStatus.NOT_FOUND, {'error': {'name': 'NotFound', 'message': path}}, )
+        elif method != 'POST':
+            return (http.HTTPStatus.METHOD_NOT_ALLOWED, {'error': {'name': 'MethodNotAllowed', 'message': method}}, )
+
+        started_at = time.perf_counter()
+
+        try:
+            items = self.parse_items_(path, body)
+        except (RequestError, ValueError, ) as exception:
+            return (http.HTTPStatus.BAD_REQUEST, error_(exception), )
+
+        try:
+            results = await batcher.submit(items)
+        except Exception as exception:
+            # The batch failed (e.g., the worker pool is broken, or the items cannot be pickled).
+            return (http.HTTPStatus.INTERNAL_SERVER_ERROR, error_(exception), )
+
+        self.latencies[path].record(time.perf_counter() - started_at)
+
+        return (http.HTTPStatus.OK, {'results': results}, )
+
+    def parse_items_(self, path: str, body: bytes) -> list:
+        request = json.loads(body.decode('utf-8'))
+
+        if not isinstance(request, dict) or not isinstance(request.get('items', None), list):
+            raise RequestError('request must be an object with an "items" array')
+
+        items = request['items']
+
+        if path == '/encode':
+            code_length = request.get('code_length', None)
+
+            if not ((code_length is None) or isinstance(code_length, int)):
+                raise RequestError('"code_length" must be an integer')
+
+            return [(item, code_length, ) for item in items]
+        elif path == '/match':
+            jaccard_min = request.get('jaccard_min', 0.0)
+
+            if not isinstance(jaccard_min, (int, float, )):
+                raise RequestError('"jaccard_min" must be a number')
+
+            return [(item, float(jaccard_min), ) for item in items]
+        else:
+            return items
+
+    async def handle_connection_(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+
+                if not request_line.strip():
+                    break
+
+                try:
+                    (method, target, version, ) = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.write_response_(writer, http.HTTPStatus.BAD_REQUEST, error_(RequestError('malformed request line')), False)
+
+                    break
+
+                headers = {}
+
+                while True:
+                    line = await reader.readline()
+
+                    if line in (b'\r\n', b'\n', b'', ):
+                        break
+
+                    (name, _, value, ) = line.decode('latin-1').partition(':')
+
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = (version == 'HTTP/1.1') and (headers.get('connection', '').lower() != 'close')
+
+                try:
+                    content_length = int(headers.get('content-length', '0') or '0')
+                except ValueError:
+                    content_length = -1
+
+                if content_length < 0:
+                    await self.write_response_(writer, http.HTTPStatus.BAD_REQUEST, error_(RequestError('invalid "Content-Length" header')), False)
+
+                    break
+                elif content_length > self.max_body_size:
+                    await self.write_response_(writer, http.HTTPStatus.REQUEST_ENTITY_TOO_LARGE, error_(RequestError('request body is too large')), False)
+
+                    break
+
+                body = (await reader.readexactly(content_length)) if (content_length > 0) else b''
+
+                (status, value, ) = await self.handle_request(method, target.split('?', 1)[0], body)
+
+                await self.write_response_(writer, status, value, keep_alive)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ):
+            pass
+        finally:
+            writer.close()
+
+    async def write_response_(self, writer: asyncio.StreamWriter, status: int, value: typing.Any, keep_alive: bool) -> None:
+        body = json.dumps(value).encode('utf-8')
+
+        status = http.HTTPStatus(status)
+
+        writer.write('HTTP/1.1 {0} {1}\r\nContent-Type: application/json\r\nContent-Length: {2}\r\nConnection: {3}\r\n\r\n'.format(status.value, status.phrase, len(body), 'keep-alive' if keep_alive else 'close').encode('latin-1'))
+        writer.write(body)
+
+        await writer.drain()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/command_line/sqlite_pipe.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import csv
+import sqlite3
+import typing
+
+from .dict_pipe import DEFAULT_BATCH_SIZE, DictDecoder, DictEncoder, T
+from .exceptions import CustomException, FieldNotFoundError, FieldNotUniqueError
+
+from .. import hooks
+
+DEFAULT_TRANSACTION_SIZE = 100000
+
+class TableNotFoundError(CustomException):
+    def __init__(self, tablename: str) -> None:
+        msg = 'table \'{0}\' is not defined'.format(tablename.replace('\'','\\\''))
+
+        super(TableNotFoundError, self).__init__(msg)
+
+        self.tablename = tablename
+
+def quote_identifier(identifier: str) -> str:
+    """Return the given SQL identifier, quoted for SQLite.
+    """
+
+    return '"{0}"'.format(identifier.replace('"', '""'))
+
+def find_geometry_column(connection: sqlite3.Connection, tablename: str) -> typing.Optional[str]:
+    """Return the name of the geometry column of the given GeoPackage feature table, or `None`.
+    """
+
+    try:
+        row = connection.execute('SELECT column_name FROM gpkg_geometry_columns WHERE table_name = ?', (tablename, )).fetchone()
+    except sqlite3.OperationalError:
+        # Not a GeoPackage.
+        return None
+
+    return None if (row is None) else row[0]
+
+class SQLitePipe:
+    """Pipe that assigns UBIDs to the rows of a table of an SQLite database (or GeoPackage), in place.
+
+    The table is read in pages of consecutive "rowid" values.  For each page,
+    the geometry column is decoded using `decoder_in.decode_row`, and the
+    values of `encoder_out.encode_row` are written back to the table using
+    `executemany` (viz., to the columns named by `encoder_out.fieldnames`).
+    Transactions are committed every `transaction_size` rows.
+
+    Rows that cannot be decoded or encoded are left unchanged and are written
+    (with their "rowid") to the error file in CSV format.
+    """
+
+    def __init__(self, decoder_in: DictDecoder[T], encoder_out: DictEncoder[T], encoder_err: DictEncoder[BaseException]) -> None:
+        super(SQLitePipe, self).__init__()
+
+        self.decoder_in = decoder_in
+        self.encoder_out = encoder_out
+        self.encoder_err = encoder_err
+
+    def run(self, connection: sqlite3.Connection, tablename: str, io_err: typing.TextIO, args_out: list = [], kwargs_out: dict = {}, batch_size: int = DEFAULT_BATCH_SIZE, transaction_size: int = DEFAULT_TRANSACTION_SIZE, overwrite: bool = False, create_index: bool = True) -> typing.Tuple[int, int]:
+        """Assign UBIDs to the rows of the given table.
+
+        Returns the number of updated rows and the number of rows with errors.
+        """
+
+        column_names = [row[1] for row in connection.execute('PRAGMA table_info({0})'.format(quote_identifier(tablename)))]
+
+        if len(column_names) == 0:
+            raise TableNotFoundError(tablename)
+
+        for fieldname in self.decoder_in.fieldnames:
+            if not fieldname in column_names:
+                raise FieldNotFoundError(fieldname)
+
+        fieldnames_out = self.encoder_out.fieldnames
+
+        for fieldname in fieldnames_out:
+            if (fieldname in column_names) and not overwrite:
+                raise FieldNotUniqueError(fieldname)
+
+        fieldnames_in = ['rowid'] + self.decoder_in.fieldnames
+
+        self.decoder_in.bind(fieldnames_in)
+
+        fieldnames_err = ['rowid'] + self.encoder_err.fieldnames
+
+        csv_err = csv.writer(io_err, *args_out, **kwargs_out)
+
+        csv_err_writeheader_called = False
+
+        sql_select = 'SELECT {0} FROM {1} WHERE rowid > ? ORDER BY rowid LIMIT ?'.format(', '.join(map(quote_identifier, fieldnames_in)), quote_identifier(tablename))
+        sql_update = 'UPDATE {0} SET {1} WHERE rowid = ?'.format(quote_identifier(tablename), ', '.join(['{0} = ?'.format(quote_identifier(fieldname)) for fieldname in fieldnames_out]))
+
+        isolation_level = connection.isolation_level
+
+        # Manage transactions explicitly.
+        connection.isolation_level = None
+
+        count_out = 0
+        count_err = 0
+
+        try:
+            connection.execute('BEGIN')
+
+            for fieldname in fieldnames_out:
+                if not fieldname in column_names:
+                    connection.execute('ALTER TABLE {0} ADD COLUMN {1} TEXT'.format(quote_identifier(tablename), quote_identifier(fieldname)))
+
+            count_uncommitted = 0
+
+            last_rowid = None
+
+            while True:
+                in_rows = connection.execute(sql_select, (-(1 << 63) if (last_rowid is None) else last_rowid, batch_size, )).fetchall()
+
+                if len(in_rows) == 0:
+                    break
+
+                last_rowid = in_rows[-1][0]
+
+                with hooks.span('sqlite_pipe.batch', len(in_rows)):
+                    (out_params, err_rows, ) = self.run_batch(in_rows)
+
+                if len(out_params) > 0:
+                    connection.executemany(sql_update, out_params)
+
+                if len(err_rows) > 0:
+                    if not csv_err_writeheader_called:
+                        csv_err_writeheader_called = True
+
+                        csv_err.writerow(fieldnames_err)
+
+                    csv_err.writerows(err_rows)
+
+                count_out += len(out_params)
+                count_err += len(err_rows)
+
+                count_uncommitted += len(in_rows)
+
+                if count_uncommitted >= transaction_size:
+                    connection.execute('COMMIT')
+                    connection.execute('BEGIN')
+
+                    count_uncommitted = 0
+
+            if create_index:
+                for fieldname in fieldnames_out:
+                    connection.execute('CREATE INDEX IF NOT EXISTS {0} ON {1} ({2})'.format(quote_identifier('{0}_{1}_idx'.format(tablename, fieldname)), quote_identifier(tablename), quote_identifier(fieldname)))
+
+            connection.execute('COMMIT')
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+
+            raise
+        finally:
+            connection.isolation_level = isolation_level
+
+        return (count_out, count_err, )
+
+    def run_batch(self, in_rows: typing.List[typing.Sequence[typing.Any]]) -> typing.Tuple[typing.List[typing.List[typing.Any]], typing.List[typing.List[typing.Any]]]:
+        """Decode and encode the given batch of rows, whose first field is "rowid".
+
+        Returns the parameters for the "UPDATE" statement and the rows for the error file.
+        """
+
+        out_params = []
+        err_rows = []
+
+        for in_row in in_rows:
+            try:
+                inst = self.decoder_in.decode_row(in_row)
+
+                out_values = self.encoder_out.encode_row(inst)
+            except BaseException as exception:
+                err_rows.append([in_row[0]] + self.encoder_err.encode_row(exception))
+            else:
+                out_values.append(in_row[0])
+
+                out_params.append(out_values)
+
+        return (out_params, err_rows, )
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/command_line/synth_writers.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import abc
+import binascii
+import csv
+import typing
+
+import shapely.wkb
+
+from .exceptions import CustomException
+
+from ..synth import SynthFootprint
+
+GEOMETRY_FIELDNAMES_ = {
+    'latlng': ['Latitude', 'Longitude'],
+    'wkb': ['WKB'],
+    'wkt': ['WKT'],
+    'parquet': ['WKB'],
+}
+
+class ParquetNotSupportedError(CustomException):
+    def __init__(self) -> None:
+        msg = 'format \'parquet\' is not supported (install the "pyarrow" package)'
+
+        super(ParquetNotSupportedError, self).__init__(msg)
+
+class SynthWriter(abc.ABC):
+    """Writer for synthetic building footprints.
+
+    The fields are "id", then "source_id" and "change" (for the perturbed
+    copy), then the geometry fields for the format, then the UBID field (unless
+    `fieldname_code` is `None`).
+    """
+
+    def __init__(self, format: str, perturbed: bool = False, fieldname_code: typing.Optional[str] = 'UBID', code_length: int = 11) -> None:
+        super(SynthWriter, self).__init__()
+
+        self.format = format
+        self.perturbed = perturbed
+        self.fieldname_code = fieldname_code
+        self.code_length = code_length
+
+    @property
+    def fieldnames(self) -> typing.List[str]:
+        return ['id'] + (['source_id', 'change'] if self.perturbed else []) + GEOMETRY_FIELDNAMES_[self.format] + ([] if (self.fieldname_code is None) else [self.fieldname_code])
+
+    def values(self, footprint: SynthFootprint) -> typing.List[typing.Any]:
+        values = [footprint.id]
+
+        if self.perturbed:
+            values.extend([footprint.source_id, footprint.change])
+
+        if self.format == 'latlng':
+            centroid = footprint.geometry.centroid
+
+            values.extend([repr(centroid.y), repr(centroid.x)])
+        elif self.format == 'wkb':
+            values.append(binascii.hexlify(shapely.wkb.dumps(footprint.geometry)).decode('ascii'))
+        elif self.format == 'wkt':
+            values.append(footprint.geometry.wkt)
+        elif self.format == 'parquet':
+            values.append(shapely.wkb.dumps(footprint.geometry))
+
+        if self.fieldname_code is not None:
+            values.append(footprint.encode(self.code_length))
+
+        return values
+
+    @abc.abstractmethod
+    def write(self, footprints: typing.List[SynthFootprint]) -> None:
+        raise NotImplementedError()  # pragma: no cover
+
+    def close(self) -> None:
+        pass
+
+class CSVSynthWriter(SynthWriter):
+    def __init__(self, io_out: typing.TextIO, format: str, perturbed: bool = False, fieldname_code: typing.Optional[str] = 'UBID', code_length: int = 11, args_out: list = [], kwargs_out: dict = {}) -> None:
+        super(CSVSynthWriter, self).__init__(format, perturbed=perturbed, fieldname_code=fieldname_code, code_length=code_length)
+
+        self.csv_out = csv.writer(io_out, *args_out, **kwargs_out)
+
+        self.csv_out.writerow(self.fieldnames)
+
+    def write(self, footprints: typing.List[SynthFootprint]) -> None:
+        self.csv_out.writerows([self.values(footprint) for footprint in footprints])
+
+class ParquetSynthWriter(SynthWriter):
+    """Writer for Apache Parquet files (requires the "pyarrow" package).
+
+    Each call to `write` appends a row group.  The geometry is written as WKB.
+    """
+
+    def __init__(self, path: str, perturbed: bool = False, fieldname_code: typing.Optional[str] = 'UBID', code_length: int = 11) -> None:
+        super(ParquetSynthWriter, self).__init__('parquet', perturbed=perturbed, fieldname_code=fieldname_code, code_length=code_length)
+
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ParquetNotSupportedError()
+
+        self.pyarrow = pyarrow
+
+        types = {
+            'id': pyarrow.int64(),
+            'source_id': pyarrow.int64(),
+            'change': pyarrow.string(),
+            'WKB': pyarrow.binary(),
+        }
+
+        self.schema = pyarrow.schema([(fieldname, types.get(fieldname, pyarrow.string()), ) for fieldname in self.fieldnames])
+
+        self.parquet_writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, footprints: typing.List[SynthFootprint]) -> None:
+        columns = list(zip(*[self.values(footprint) for footprint in footprints]))
+
+        if len(columns) == 0:
+            return
+
+        self.parquet_writer.write_table(self.pyarrow.Table.from_arrays([self.pyarrow.array(column, type=field.type) for (column, field, ) in zip(columns, self.schema)], schema=self.schema))
+
+    def close(self) -> None:
+        self.parquet_writer.close()
@@ -0,0 +1,1890 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/crossref.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import logging
+import math
+import typing
+
+import numpy
+import pyqtree
+
+from . import hooks
+from .code import Code, CodeArea, cellSize_, decode
+from .dtypes import DEFAULT_SAMPLE_SIZE, format_bytes, memory_usage, sample_dtypes
+from .stats import NullStats, Stats
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    import pandas
+
+# The columns of the bounds arrays (viz., the south, west, north and east
+# bounds of each UBID, and the latitude and longitude of the center of its
+# centroid cell).
+LATITUDE_LO_ = 0
+LONGITUDE_LO_ = 1
+LATITUDE_HI_ = 2
+LONGITUDE_HI_ = 3
+LATITUDE_CENTER_ = 4
+LONGITUDE_CENTER_ = 5
+
+BOUNDS_COLUMNS_ = 6
+
+MODES = ['intersects', 'nearest']
+
+# The predicates of the bounding boxes of the queries and references (viz.,
+# the query intersects, contains or is within the reference).
+PREDICATES = ['intersects', 'contains', 'within']
+
+# The converse of each predicate (viz., for swapped queries and references).
+CONVERSE_PREDICATES_ = {
+    'intersects': 'intersects',
+    'contains': 'within',
+    'within': 'contains',
+}
+
+DISTANCE_METRICS = ['bbox', 'centroid']
+
+DEFAULT_K = 1
+
+# The default maximum distance (in meters) for nearest-neighbor queries.
+DEFAULT_MAX_DISTANCE = 100.0
+
+# The number of meters per degree of latitude.
+METERS_PER_DEGREE_ = 111320.0
+
+# The ratio of the maximum distance to the minimum initial radius of the
+# expanding ring (viz., at most 11 rings per query).
+MAX_RINGS_SCALE_ = 1024.0
+
+# The minimum cosine of latitude (viz., to avoid division by zero at the poles).
+MIN_COS_LATITUDE_ = 1e-6
+
+# The height or width (in meters) above which UBID bounding boxes are not
+# inserted into the quadtree, but are kept in a flat list (viz., campuses, or
+# UBIDs of mis-geocoded footprints).
+DEFAULT_OVERSIZED_EXTENT = 1000.0
+
+# The maximum number of elements of the arrays for the vectorized test of the
+# oversized UBID bounding boxes.
+OVERSIZED_CHUNK_SIZE_ = 1000000
+
+# The policies for rows with more than the maximum number of candidates: keep
+# the candidates with the greatest Jaccard similarity coefficients, or drop
+# all of the candidates of the row (and report an error).
+CANDIDATES_POLICIES = ['top', 'error']
+
+# The length of the OLC prefixes of the cells that are assigned to shards
+# (viz., cells of 1 degree).
+DEFAULT_SHARD_LEVEL = 4
+
+# The multiplier of the Fibonacci hash of the cells (viz., 2**64 divided by
+# the golden ratio).
+SHARD_HASH_MULTIPLIER_ = numpy.uint64(0x9E3779B97F4A7C15)
+
+# The default number of rows of a CSV file that are read at a time for shards
+# (see `read_csv_shard`).
+DEFAULT_SHARD_CHUNK_SIZE = 100000
+
+# A function that wraps the given iterable with the given total length (e.g., `tqdm.tqdm`).
+Progress = typing.Callable[[typing.Iterable[typing.Any], int], typing.Iterable[typing.Any]]
+
+logger = logging.getLogger(__name__)
+
+class TooManyCandidatesError(ValueError):
+    """Raised (viz., reported) for a row with more than the maximum number of candidates.
+    """
+
+    def __init__(self, count: int, max_candidates: int) -> None:
+        super(TooManyCandidatesError, self).__init__('row has {0} candidates (more than {1})'.format(count, max_candidates))
+
+        self.count = count
+        self.max_candidates = max_candidates
+
+class Matches(typing.NamedTuple):
+    """The results of a query of a `CrossReferencer`.
+
+    The i-th match is the pair of the `query_index`-th query and the
+    `reference_index`-th reference (viz., positions, not labels), whose UBID
+    bounding boxes intersect with the Jaccard similarity coefficient
+    `jaccard` (or `None`, if it was not calculated).  For nearest-neighbor
+    queries, `distance` is the distance (in meters) between the UBIDs.
+    """
+
+    query_index: numpy.ndarray
+    reference_index: numpy.ndarray
+    jaccard: typing.Optional[numpy.ndarray]
+    distance: typing.Optional[numpy.ndarray] = None
+
+    def take(self, indices: numpy.ndarray) -> 'Matches':
+        """Return the matches at the given indices (or boolean mask).
+        """
+
+        return Matches(*[(None if (value is None) else value[indices]) for value in self])
+
+def empty_matches_(distance: bool = False) -> Matches:
+    return Matches(numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.float64), numpy.empty(0, dtype=numpy.float64) if distance else None)
+
+def no_progress_(iterable: typing.Iterable[typing.Any], total: int) -> typing.Iterable[typing.Any]:
+    return iterable
+
+def decode_bounds(codes: typing.Iterable[typing.Optional[Code]], on_error: typing.Optional[typing.Callable[[BaseException], None]] = None, progress: typing.Optional[Progress] = None, total: typing.Optional[int] = None) -> numpy.ndarray:
+    """Return the bounds of the given UBIDs as an array with columns for the south, west, north and east bounds, and the latitude and longitude of the center of the centroid cell.
+
+    The row for a missing UBID (viz., `None` or NaN), or for a UBID that
+    cannot be decoded, is NaN.  Decoding errors are passed to `on_error`.
+    """
+
+    if progress is None:
+        progress = no_progress_
+
+    if total is None:
+        codes = list(codes)
+
+        total = len(codes)
+
+    bounds = numpy.full((total, BOUNDS_COLUMNS_, ), numpy.nan, dtype=numpy.float64)
+
+    with hooks.span('code.decode', total):
+        for (index, code, ) in enumerate(progress(codes, total)):
+            if (code is None) or (not isinstance(code, str)):
+                continue
+
+            try:
+                codeArea = decode(code)
+            except (AssertionError, ValueError, ) as exception:
+                if on_error is not None:
+                    on_error(exception)
+
+                continue
+
+            bounds[index] = bounds_for_code_area(codeArea)
+
+    return bounds
+
+def bounds_for_code_area(codeArea: CodeArea) -> typing.Tuple[float, float, float, float, float, float]:
+    """Return the row of the bounds array for the given 'CodeArea' (see `decode_bounds`).
+    """
+
+    return (codeArea.latitudeLo, codeArea.longitudeLo, codeArea.latitudeHi, codeArea.longitudeHi, codeArea.centroid.latitudeCenter, codeArea.centroid.longitudeCenter, )
+
+def jaccard(bounds: numpy.ndarray, other: numpy.ndarray) -> numpy.ndarray:
+    """Return the Jaccard similarity coefficients (viz., "intersection over union" or "IoU") of the given pairs of bounds.
+
+    The coefficient is NaN if the bounds do not intersect (see `CodeArea.jaccard`).
+    """
+
+    latitudeLo = numpy.maximum(bounds[:, LATITUDE_LO_], other[:, LATITUDE_LO_])
+    latitudeHi = numpy.minimum(bounds[:, LATITUDE_HI_], other[:, LATITUDE_HI_])
+    longitudeLo = numpy.maximum(bounds[:, LONGITUDE_LO_], other[:, LONGITUDE_LO_])
+    longitudeHi = numpy.minimum(bounds[:, LONGITUDE_HI_], other[:, LONGITUDE_HI_])
+
+    area = (latitudeHi - latitudeLo) * (longitudeHi - longitudeLo)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        result = area / (area_(bounds) + area_(other) - area)
+
+    result[(latitudeLo > latitudeHi) | (longitudeLo > longitudeHi)] = numpy.nan
+
+    return result
+
+def predicate_mask(bounds: numpy.ndarray, other: numpy.ndarray, predicate: str = 'intersects') -> numpy.ndarray:
+    """Return the mask of the given pairs of bounds (row by row) for which the predicate is true (viz., the first bounds intersect, contain or are within the second).
+
+    The bounds are closed (e.g., bounds contain themselves).
+    """
+
+    if predicate == 'intersects':
+        return (bounds[:, LATITUDE_LO_] <= other[:, LATITUDE_HI_]) & (other[:, LATITUDE_LO_] <= bounds[:, LATITUDE_HI_]) & (bounds[:, LONGITUDE_LO_] <= other[:, LONGITUDE_HI_]) & (other[:, LONGITUDE_LO_] <= bounds[:, LONGITUDE_HI_])
+    elif predicate == 'contains':
+        return (bounds[:, LATITUDE_LO_] <= other[:, LATITUDE_LO_]) & (other[:, LATITUDE_HI_] <= bounds[:, LATITUDE_HI_]) & (bounds[:, LONGITUDE_LO_] <= other[:, LONGITUDE_LO_]) & (other[:, LONGITUDE_HI_] <= bounds[:, LONGITUDE_HI_])
+    elif predicate == 'within':
+        return predicate_mask(other, bounds, predicate='contains')
+    else:
+        raise ValueError('invalid predicate: "{0}"'.format(predicate))
+
+def area_(bounds: numpy.ndarray) -> numpy.ndarray:
+    return (bounds[:, LATITUDE_HI_] - bounds[:, LATITUDE_LO_]) * (bounds[:, LONGITUDE_HI_] - bounds[:, LONGITUDE_LO_])
+
+def distance(bounds: numpy.ndarray, latitudeLo: float, longitudeLo: float, latitudeHi: float, longitudeHi: float, meters_per_degree_longitude: float) -> numpy.ndarray:
+    """Return the distances (in meters) between the given bounds and the given bounding box (or point, if the bounds are equal).
+
+    The distance is zero if they intersect.  The distance is the
+    equirectangular approximation, with the given number of meters per degree
+    of longitude (viz., at the latitude of the bounding box), which is
+    accurate for short distances.
+    """
+
+    latitude_gap = numpy.maximum(0.0, numpy.maximum(bounds[:, LATITUDE_LO_] - latitudeHi, latitudeLo - bounds[:, LATITUDE_HI_]))
+    longitude_gap = numpy.maximum(0.0, numpy.maximum(bounds[:, LONGITUDE_LO_] - longitudeHi, longitudeLo - bounds[:, LONGITUDE_HI_]))
+
+    return numpy.hypot(latitude_gap * METERS_PER_DEGREE_, longitude_gap * meters_per_degree_longitude)
+
+def meters_per_degree_longitude_(latitude: float) -> float:
+    return METERS_PER_DEGREE_ * max(math.cos(math.radians(latitude)), MIN_COS_LATITUDE_)
+
+def extent_(bounds: numpy.ndarray) -> numpy.ndarray:
+    """Return the greater of the height and width (in meters) of each of the given array of bounds.
+    """
+
+    height = (bounds[:, LATITUDE_HI_] - bounds[:, LATITUDE_LO_]) * METERS_PER_DEGREE_
+    width = (bounds[:, LONGITUDE_HI_] - bounds[:, LONGITUDE_LO_]) * METERS_PER_DEGREE_ * numpy.maximum(numpy.cos(numpy.radians(bounds[:, LATITUDE_CENTER_])), MIN_COS_LATITUDE_)
+
+    return numpy.maximum(height, width)
+
+def centers_(bounds: numpy.ndarray) -> numpy.ndarray:
+    """Return the given bounds, with the bounding boxes replaced by the centers of the centroid cells.
+    """
+
+    result = bounds.copy()
+    result[:, LATITUDE_LO_] = result[:, LATITUDE_HI_] = bounds[:, LATITUDE_CENTER_]
+    result[:, LONGITUDE_LO_] = result[:, LONGITUDE_HI_] = bounds[:, LONGITUDE_CENTER_]
+
+    return result
+
+def parse_geometries(values: typing.Iterable[typing.Any], format: str = 'wkt') -> numpy.ndarray:
+    """Return the given footprints as an array of `shapely` geometries.
+
+    Each value is either a WKT string (`format` is "wkt"), a hex-encoded or
+    binary WKB string (`format` is "wkb") or a `shapely` geometry.  The
+    element for a missing value (viz., `None` or NaN), or for a value that
+    cannot be parsed, is `None`.  Invalid geometries are made valid.
+    """
+
+    import shapely
+
+    values = numpy.array([(value if isinstance(value, (str, bytes, shapely.Geometry, )) else None) for value in values], dtype=object)
+
+    is_string = numpy.array([isinstance(value, (str, bytes, )) for value in values], dtype=bool)
+
+    if format == 'wkt':
+        values[is_string] = shapely.from_wkt(values[is_string], on_invalid='ignore')
+    elif format == 'wkb':
+        values[is_string] = shapely.from_wkb(values[is_string], on_invalid='ignore')
+    else:
+        raise ValueError('invalid geometry format: "{0}"'.format(format))
+
+    is_invalid = ~shapely.is_valid(values) & ~shapely.is_missing(values)
+
+    if is_invalid.any():
+        values[is_invalid] = shapely.make_valid(values[is_invalid])
+
+    return values
+
+def footprint_jaccard(geometries: numpy.ndarray, other: numpy.ndarray) -> numpy.ndarray:
+    """Return the Jaccard similarity coefficients (viz., "intersection over union" or "IoU") of the given pairs of footprints.
+
+    The coefficient is NaN if either footprint is missing, or if the union is empty.
+    """
+
+    import shapely
+
+    area = shapely.area(shapely.intersection(geometries, other))
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        result = area / (shapely.area(geometries) + shapely.area(other) - area)
+
+    result[~numpy.isfinite(result)] = numpy.nan
+
+    # The area of the intersection of identical footprints can exceed the
+    # area of either footprint by a rounding error.
+    numpy.minimum(result, 1.0, out=result, where=~numpy.isnan(result))
+
+    return result
+
+class CrossReferencer(object):
+    """Quadtree-based spatial index of the UBIDs of a reference set.
+
+    The index is built once, and then queried with the UBIDs of any number of
+    query sets.  UBIDs of the reference set that cannot be decoded are not
+    indexed.
+
+    UBIDs whose heights or widths are greater than `oversized_extent` meters
+    (e.g., campuses) are not inserted into the quadtree, where they would be
+    near the root and intersect most queries, but are kept in a flat list,
+    which is tested with vectorized comparisons.
+    """
+
+    def __init__(self, bounds: numpy.ndarray, codes: typing.Optional[typing.Sequence[typing.Optional[Code]]] = None, progress: typing.Optional[Progress] = None, oversized_extent: typing.Optional[float] = DEFAULT_OVERSIZED_EXTENT) -> None:
+        super(CrossReferencer, self).__init__()
+
+        if progress is None:
+            progress = no_progress_
+
+        self.bounds = numpy.asarray(bounds, dtype=numpy.float64)
+        self.codes = codes
+
+        self.valid = ~numpy.isnan(self.bounds).any(axis=1)
+
+        oversized = numpy.zeros(len(self.bounds), dtype=bool)
+
+        if oversized_extent is not None:
+            oversized[self.valid] = extent_(self.bounds[self.valid]) > oversized_extent
+
+        self.oversized = numpy.flatnonzero(oversized)
+
+        indexed = self.valid & ~oversized
+
+        if not indexed.any():
+            self.spindex = None
+
+            return
+
+        with hooks.span('crossref.build', len(self.bounds)):
+            valid_bounds = self.bounds[indexed]
+
+            self.spindex = pyqtree.Index(bbox=[
+                valid_bounds[:, LONGITUDE_LO_].min(),
+                valid_bounds[:, LATITUDE_LO_].min(),
+                valid_bounds[:, LONGITUDE_HI_].max(),
+                valid_bounds[:, LATITUDE_HI_].max(),
+            ])
+
+            for index in progress(numpy.flatnonzero(indexed).tolist(), int(indexed.sum())):
+                (latitudeLo, longitudeLo, latitudeHi, longitudeHi, _, _, ) = self.bounds[index].tolist()
+
+                self.spindex.insert(item=index, bbox=[longitudeLo, latitudeLo, longitudeHi, latitudeHi])
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    @classmethod
+    def from_codes(cls, codes: typing.Sequence[typing.Optional[Code]], on_error: typing.Optional[typing.Callable[[BaseException], None]] = None, progress: typing.Optional[Progress] = None) -> 'CrossReferencer':
+        """Return a new `CrossReferencer` for the given sequence of UBIDs.
+        """
+
+        codes = list(codes)
+
+        return cls(decode_bounds(codes, on_error=on_error, progress=progress), codes=codes, progress=progress)
+
+    @classmethod
+    def from_frame(cls, data_frame: 'pandas.DataFrame', fieldname_code: str = 'UBID', on_error: typing.Optional[typing.Callable[[BaseException], None]] = None, progress: typing.Optional[Progress] = None) -> 'CrossReferencer':
+        """Return a new `CrossReferencer` for the UBIDs in the named field of the given `pandas.DataFrame`.
+        """
+
+        return cls.from_codes(data_frame[fieldname_code].tolist(), on_error=on_error, progress=progress)
+
+    @classmethod
+    def from_arrays(cls, latitudeLo: typing.Sequence[float], longitudeLo: typing.Sequence[float], latitudeHi: typing.Sequence[float], longitudeHi: typing.Sequence[float], latitudeCenter: typing.Optional[typing.Sequence[float]] = None, longitudeCenter: typing.Optional[typing.Sequence[float]] = None, progress: typing.Optional[Progress] = None) -> 'CrossReferencer':
+        """Return a new `CrossReferencer` for the given arrays of south, west, north and east bounds (e.g., of decoded UBIDs).
+
+        The centers of the centroid cells default to the centers of the bounding boxes.
+        """
+
+        latitudeLo = numpy.asarray(latitudeLo, dtype=numpy.float64)
+        longitudeLo = numpy.asarray(longitudeLo, dtype=numpy.float64)
+        latitudeHi = numpy.asarray(latitudeHi, dtype=numpy.float64)
+        longitudeHi = numpy.asarray(longitudeHi, dtype=numpy.float64)
+
+        if latitudeCenter is None:
+            latitudeCenter = (latitudeLo + latitudeHi) / 2
+
+        if longitudeCenter is None:
+            longitudeCenter = (longitudeLo + longitudeHi) / 2
+
+        return cls(numpy.column_stack([latitudeLo, longitudeLo, latitudeHi, longitudeHi, latitudeCenter, longitudeCenter]).astype(numpy.float64), progress=progress)
+
+    def query(self, codes: typing.Sequence[typing.Optional[Code]], jaccard_min: typing.Optional[float] = None, jaccard_max: typing.Optional[float] = None, on_error: typing.Optional[typing.Callable[[BaseException], None]] = None, progress: typing.Optional[Progress] = None, predicate: str = 'intersects') -> Matches:
+        """Return the matches of the given sequence of UBIDs against the reference set (see `query_bounds`).
+
+        If specified, only the matches whose Jaccard similarity coefficients
+        are within the closed interval [`jaccard_min`, `jaccard_max`] are
+        returned.
+        """
+
+        return self.query_bounds(decode_bounds(codes, on_error=on_error, progress=progress), jaccard_min=jaccard_min, jaccard_max=jaccard_max, progress=progress, predicate=predicate)
+
+    def query_frame(self, data_frame: 'pandas.DataFrame', fieldname_code: str = 'UBID', jaccard_min: typing.Optional[float] = None, jaccard_max: typing.Optional[float] = None, on_error: typing.Optional[typing.Callable[[BaseException], None]] = None, progress: typing.Optional[Progress] = None, predicate: str = 'intersects') -> Matches:
+        """Return the matches of the UBIDs in the named field of the given `pandas.DataFrame` against the reference set.
+
+        The `query_index` of each match is a position in the `pandas.DataFrame` (see `pandas.DataFrame.iloc`).
+        """
+
+        return self.query(data_frame[fieldname_code].tolist(), jaccard_min=jaccard_min, jaccard_max=jaccard_max, on_error=on_error, progress=progress, predicate=predicate)
+
+    def query_bounds(self, bounds: numpy.ndarray, jaccard_min: typing.Optional[float] = None, jaccard_max: typing.Optional[float] = None, progress: typing.Optional[Progress] = None, predicate: str = 'intersects', include_jaccard: bool = True) -> Matches:
+        """Return the matches of the given array of south, west, north and east bounds against the reference set.
+
+        If `predicate` is "contains" or "within", then only the references
+        whose bounding boxes are contained by or contain (respectively) the
+        bounding box of the query are matched.  The predicate is evaluated on
+        the arrays of bounds of the candidates from the quadtree.  If
+        `include_jaccard` is false, then the Jaccard similarity coefficients
+        are not calculated.
+
+        The matches are ordered by query and then by their order in the quadtree.
+        """
+
+        if predicate not in PREDICATES:
+            raise ValueError('invalid predicate: "{0}"'.format(predicate))
+        elif (not include_jaccard) and ((jaccard_min is not None) or (jaccard_max is not None)):
+            raise ValueError('Jaccard similarity coefficients must be calculated to be filtered')
+
+        if progress is None:
+            progress = no_progress_
+
+        bounds = numpy.asarray(bounds, dtype=numpy.float64)
+
+        if ((self.spindex is None) and (len(self.oversized) == 0)) or (len(bounds) == 0):
+            return empty_matches_()._replace(jaccard=(numpy.empty(0, dtype=numpy.float64) if include_jaccard else None))
+
+        query_index: typing.List[int] = []
+        reference_index: typing.List[int] = []
+
+        with hooks.span('crossref.probe', len(bounds)):
+            if self.spindex is not None:
+                for (index, (latitudeLo, longitudeLo, latitudeHi, longitudeHi, _, _, ), ) in enumerate(progress(bounds.tolist(), len(bounds))):
+                    if latitudeLo != latitudeLo:
+                        # NaN (viz., the UBID was not decoded).
+                        continue
+
+                    indices = self.spindex.intersect([longitudeLo, latitudeLo, longitudeHi, latitudeHi])
+
+                    query_index.extend([index] * len(indices))
+                    reference_index.extend(indices)
+
+            matches = Matches(numpy.array(query_index, dtype=numpy.int64), numpy.array(reference_index, dtype=numpy.int64), None)
+
+            if len(self.oversized) > 0:
+                (oversized_query_index, oversized_reference_index, ) = self.intersect_oversized_(bounds)
+
+                matches = Matches(numpy.concatenate([matches.query_index, oversized_query_index]), numpy.concatenate([matches.reference_index, oversized_reference_index]), None)
+
+                # Order by query (and then the quadtree, and then the flat list).
+                matches = matches.take(numpy.argsort(matches.query_index, kind='stable'))
+
+            if predicate != 'intersects':
+                matches = matches.take(predicate_mask(bounds[matches.query_index], self.bounds[matches.reference_index], predicate=predicate))
+
+            if include_jaccard:
+                matches = matches._replace(jaccard=jaccard(bounds[matches.query_index], self.bounds[matches.reference_index]))
+
+        return filter_matches(matches, jaccard_min=jaccard_min, jaccard_max=jaccard_max)
+
+    def query_nearest(self, codes: typing.Sequence[typing.Optional[Code]], k: int = DEFAULT_K, max_distance: float = DEFAULT_MAX_DISTANCE, metric: str = 'bbox', on_error: typing.Optional[typing.Callable[[BaseException], None]] = None, progress: typing.Optional[Progress] = None) -> Matches:
+        """Return the `k` nearest references within `max_distance` meters of each of the given sequence of UBIDs (see `query_nearest_bounds`).
+        """
+
+        return self.query_nearest_bounds(decode_bounds(codes, on_error=on_error, progress=progress), k=k, max_distance=max_distance, metric=metric, progress=progress)
+
+    def query_nearest_bounds(self, bounds: numpy.ndarray, k: int = DEFAULT_K, max_distance: float = DEFAULT_MAX_DISTANCE, metric: str = 'bbox', progress: typing.Optional[Progress] = None) -> Matches:
+        """Return the `k` nearest references within `max_distance` meters of each of the given array of bounds.
+
+        The distance is measured between the UBID bounding boxes (`metric` is
+        "bbox"; zero if they intersect), or between the centers of the
+        centroid cells (`metric` is "centroid").  The Jaccard similarity
+        coefficient of non-intersecting UBID bounding boxes is zero.
+
+        The search is an expanding ring: the quadtree is queried with the
+        bounding box of the query, expanded by a radius that starts at the
+        typical spacing of the references and doubles until `k` references
+        are found within the radius (or the radius reaches `max_distance`).
+
+        The matches are ordered by query, and then by distance (ties are
+        broken by the position of the reference).
+        """
+
+        if metric not in DISTANCE_METRICS:
+            raise ValueError('invalid distance metric: "{0}"'.format(metric))
+        elif k < 1:
+            raise ValueError('invalid number of nearest neighbors: {0}'.format(k))
+
+        if progress is None:
+            progress = no_progress_
+
+        bounds = numpy.asarray(bounds, dtype=numpy.float64)
+
+        if ((self.spindex is None) and (len(self.oversized) == 0)) or (len(bounds) == 0):
+            return empty_matches_(distance=True)
+
+        reference_bounds = centers_(self.bounds) if (metric == 'centroid') else self.bounds
+        query_bounds = centers_(bounds) if (metric == 'centroid') else bounds
+
+        initial_radius = min(max(self.spacing_(k), max_distance / MAX_RINGS_SCALE_), max_distance)
+
+        query_index: typing.List[int] = []
+        reference_index: typing.List[int] = []
+        distances: typing.List[float] = []
+
+        with hooks.span('crossref.nearest', len(bounds)):
+            for (index, (latitudeLo, longitudeLo, latitudeHi, longitudeHi, latitudeCenter, _, ), ) in enumerate(progress(query_bounds.tolist(), len(query_bounds))):
+                if latitudeLo != latitudeLo:
+                    # NaN (viz., the UBID was not decoded).
+                    continue
+
+                meters_per_degree_longitude = meters_per_degree_longitude_(latitudeCenter)
+
+                radius = initial_radius
+
+                while True:
+                    latitude_delta = radius / METERS_PER_DEGREE_
+                    longitude_delta = radius / meters_per_degree_longitude
+
+                    # Every reference within the radius intersects the expanded bounding box.
+                    candidates = self.intersect_(latitudeLo - latitude_delta, longitudeLo - longitude_delta, latitudeHi + latitude_delta, longitudeHi + longitude_delta)
+
+                    candidate_distances = distance(reference_bounds[candidates], latitudeLo, longitudeLo, latitudeHi, longitudeHi, meters_per_degree_longitude)
+
+                    within = candidate_distances <= radius
+
+                    if (int(within.sum()) >= k) or (radius >= max_distance):
+                        candidates = candidates[within]
+                        candidate_distances = candidate_distances[within]
+
+                        order = numpy.lexsort((candidates, candidate_distances, ))[:k]
+
+                        query_index.extend([index] * len(order))
+                        reference_index.extend(candidates[order].tolist())
+                        distances.extend(candidate_distances[order].tolist())
+
+                        break
+
+                    radius = min(radius * 2, max_distance)
+
+            matches = Matches(numpy.array(query_index, dtype=numpy.int64), numpy.array(reference_index, dtype=numpy.int64), None, numpy.array(distances, dtype=numpy.float64))
+
+            matches = matches._replace(jaccard=numpy.nan_to_num(jaccard(bounds[matches.query_index], self.bounds[matches.reference_index]), nan=0.0))
+
+        return matches
+
+    def intersect_(self, latitudeLo: float, longitudeLo: float, latitudeHi: float, longitudeHi: float) -> numpy.ndarray:
+        """Return the positions of the references whose bounding boxes intersect the given bounding box (viz., in the quadtree or in the flat list of oversized bounding boxes).
+        """
+
+        candidates = numpy.array([] if (self.spindex is None) else self.spindex.intersect([longitudeLo, latitudeLo, longitudeHi, latitudeHi]), dtype=numpy.int64)
+
+        if len(self.oversized) > 0:
+            oversized_bounds = self.bounds[self.oversized]
+
+            within = (oversized_bounds[:, LATITUDE_LO_] <= latitudeHi) & (latitudeLo <= oversized_bounds[:, LATITUDE_HI_]) & (oversized_bounds[:, LONGITUDE_LO_] <= longitudeHi) & (longitudeLo <= oversized_bounds[:, LONGITUDE_HI_])
+
+            candidates = numpy.concatenate([candidates, self.oversized[within]])
+
+        return candidates
+
+    def intersect_oversized_(self, bounds: numpy.ndarray) -> typing.Tuple[numpy.ndarray, numpy.ndarray]:
+        """Return the positions of the queries and references of the intersections of the given array of bounds with the oversized bounding boxes (in chunks of queries).
+        """
+
+        oversized_bounds = self.bounds[self.oversized]
+
+        chunk_size = max(1, OVERSIZED_CHUNK_SIZE_ // len(oversized_bounds))
+
+        query_index: typing.List[numpy.ndarray] = [numpy.empty(0, dtype=numpy.int64)]
+        reference_index: typing.List[numpy.ndarray] = [numpy.empty(0, dtype=numpy.int64)]
+
+        for start in range(0, len(bounds), chunk_size):
+            chunk = bounds[start:(start + chunk_size)]
+
+            # NaN bounds (viz., the UBID was not decoded) do not intersect.
+            within = (chunk[:, numpy.newaxis, LATITUDE_LO_] <= oversized_bounds[numpy.newaxis, :, LATITUDE_HI_]) & (oversized_bounds[numpy.newaxis, :, LATITUDE_LO_] <= chunk[:, numpy.newaxis, LATITUDE_HI_]) & (chunk[:, numpy.newaxis, LONGITUDE_LO_] <= oversized_bounds[numpy.newaxis, :, LONGITUDE_HI_]) & (oversized_bounds[numpy.newaxis, :, LONGITUDE_LO_] <= chunk[:, numpy.newaxis, LONGITUDE_HI_])
+
+            (i, j, ) = numpy.nonzero(within)
+
+            query_index.append(i.astype(numpy.int64) + start)
+            reference_index.append(self.oversized[j])
+
+        return (numpy.concatenate(query_index), numpy.concatenate(reference_index), )
+
+    def spacing_(self, k: int) -> float:
+        """Return the typical distance (in meters) to the `k` nearest references (viz., assuming a uniform density), or zero.
+        """
+
+        valid_bounds = self.bounds[self.valid]
+
+        latitude = float(numpy.mean(valid_bounds[:, LATITUDE_CENTER_]))
+
+        height = float(valid_bounds[:, LATITUDE_HI_].max() - valid_bounds[:, LATITUDE_LO_].min()) * METERS_PER_DEGREE_
+        width = float(valid_bounds[:, LONGITUDE_HI_].max() - valid_bounds[:, LONGITUDE_LO_].min()) * meters_per_degree_longitude_(latitude)
+
+        return math.sqrt((height * width * k) / len(valid_bounds))
+
+    def iter_query(self, batches: typing.Iterable[typing.Sequence[typing.Optional[Code]]], jaccard_min: typing.Optional[float] = None, jaccard_max: typing.Optional[float] = None, on_error: typing.Optional[typing.Callable[[BaseException], None]] = None) -> typing.Iterator[Matches]:
+        """Yield the matches of each of the given batches of UBIDs against the reference set.
+
+        The `query_index` of each match is a position in the concatenation of
+        the batches (viz., the stream), not in the batch.
+        """
+
+        offset = 0
+
+        for batch in batches:
+            batch = list(batch)
+
+            matches = self.query(batch, jaccard_min=jaccard_min, jaccard_max=jaccard_max, on_error=on_error)
+
+            yield matches._replace(query_index=matches.query_index + offset)
+
+            offset += len(batch)
+
+    def iter_query_frames(self, data_frames: typing.Iterable['pandas.DataFrame'], fieldname_code: str = 'UBID', jaccard_min: typing.Optional[float] = None, jaccard_max: typing.Optional[float] = None, on_error: typing.Optional[typing.Callable[[BaseException], None]] = None) -> typing.Iterator[Matches]:
+        """Yield the matches of the UBIDs in the named field of each of the given `pandas.DataFrame` objects (e.g., the chunks of `pandas.read_csv`) against the reference set.
+        """
+
+        return self.iter_query((data_frame[fieldname_code].tolist() for data_frame in data_frames), jaccard_min=jaccard_min, jaccard_max=jaccard_max, on_error=on_error)
+
+def filter_matches(matches: Matches, jaccard_min: typing.Optional[float] = None, jaccard_max: typing.Optional[float] = None) -> Matches:
+    """Return the given matches whose Jaccard similarity coefficients are within the closed interval [`jaccard_min`, `jaccard_max`].
+
+    If neither bound is specified, then the matches are returned unchanged
+    (including those whose coefficients are NaN).
+    """
+
+    if (jaccard_min is None) and (jaccard_max is None):
+        return matches
+
+    mask = ~numpy.isnan(matches.jaccard)
+
+    if jaccard_min is not None:
+        mask &= (jaccard_min <= matches.jaccard)
+
+    if jaccard_max is not None:
+        mask &= (matches.jaccard <= jaccard_max)
+
+    return matches.take(mask)
+
+def cap_candidates(matches: Matches, positions: numpy.ndarray, max_candidates: int, policy: str = 'top') -> typing.Tuple[Matches, numpy.ndarray, numpy.ndarray]:
+    """Return the given matches with at most `max_candidates` matches for each of the given positions (viz., the `query_index` or `reference_index` of the matches), and the positions (and numbers of matches) that had more.
+
+    If `policy` is "top", then the matches with the greatest Jaccard
+    similarity coefficients are kept (ties are broken by the order of the
+    matches).  If `policy` is "error", then none of the matches of the
+    positions that had more are kept.  The order of the matches is kept.
+    """
+
+    if policy not in CANDIDATES_POLICIES:
+        raise ValueError('invalid candidates policy: "{0}"'.format(policy))
+    elif max_candidates < 1:
+        raise ValueError('invalid maximum number of candidates: {0}'.format(max_candidates))
+
+    if len(positions) == 0:
+        return (matches, numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64), )
+
+    counts = numpy.bincount(positions)
+
+    exceeded = numpy.flatnonzero(counts > max_candidates)
+
+    if len(exceeded) == 0:
+        return (matches, exceeded, counts[exceeded], )
+
+    if policy == 'error':
+        keep = counts[positions] <= max_candidates
+    else:
+        # Rank the matches of each position by descending Jaccard similarity coefficient (NaN last).
+        order = numpy.lexsort((numpy.arange(len(positions)), -numpy.nan_to_num(matches.jaccard, nan=-numpy.inf), positions, ))
+
+        starts = numpy.concatenate([[0], numpy.cumsum(counts)[:-1]])
+
+        keep = numpy.empty(len(positions), dtype=bool)
+        keep[order] = (numpy.arange(len(positions)) - starts[positions[order]]) < max_candidates
+
+    return (matches.take(keep), exceeded, counts[exceeded], )
+
+def refine_matches(matches: Matches, query_geometries: numpy.ndarray, reference_geometries: numpy.ndarray) -> numpy.ndarray:
+    """Return the Jaccard similarity coefficients of the footprints of the given matches (see `footprint_jaccard`).
+
+    The footprints are given as arrays that are indexed by the positions of
+    the queries and references (see `parse_geometries`).  Only the footprints
+    of the given matches are intersected (viz., refine the matches that
+    survive the bounding box filter).
+    """
+
+    with hooks.span('crossref.refine', len(matches.query_index)):
+        return footprint_jaccard(query_geometries[matches.query_index], reference_geometries[matches.reference_index])
+
+def sort_order_to_ascending_(value: str) -> typing.Optional[bool]:
+    """Return the "ascending" argument for the `pandas.DataFrame.sort_values` method.
+    """
+
+    if value == 'ASC':
+        return True
+    elif value == 'DESC':
+        return False
+    else:
+        return None
+
+def crossref_frames(left_data_frame: 'pandas.DataFrame', right_data_frame: 'pandas.DataFrame', left_fieldname_code: str = 'UBID', right_fieldname_code: str = 'UBID', fieldname_jaccard: str = 'IoU', include_jaccard_field: bool = True, include_index_fields: bool = True, jaccard_min: float = 0.0, jaccard_max: float = 1.0, sort_order: typing.Optional[str] = None, left_group_order: typing.Optional[str] = None, right_group_order: typing.Optional[str] = None, left_fieldname_index: str = 'index', right_fieldname_index: str = 'index', left_suffix: str = '_x', right_suffix: str = '_y', left_geometries: typing.Optional[typing.Sequence[typing.Any]] = None, right_geometries: typing.Optional[typing.Sequence[typing.Any]] = None, left_geometry_format: str = 'wkt', right_geometry_format: str = 'wkt', fieldname_refined_jaccard: str = 'footprint_IoU', refined_jaccard_min: float = 0.0, refined_jaccard_max: float = 1.0, mode: str = 'intersects', k: int = DEFAULT_K, max_distance: float = DEFAULT_MAX_DISTANCE, distance_metric: str = 'bbox', fieldname_distance: str = 'distance', left_partitions: typing.Optional[typing.Sequence[typing.Any]] = None, right_partitions: typing.Optional[typing.Sequence[typing.Any]] = None, partition_workers: int = 1, shard: typing.Optional[typing.Tuple[int, int]] = None, shard_level: int = DEFAULT_SHARD_LEVEL, oversized_extent: typing.Optional[float] = DEFAULT_OVERSIZED_EXTENT, max_candidates: typing.Optional[int] = None, candidates_policy: str = 'top', on_candidates_error: typing.Optional[typing.Callable[[str, typing.Any, BaseException], None]] = None, predicate: str = 'intersects', left_changed: typing.Optional[typing.Sequence[bool]] = None, right_changed: typing.Optional[typing.Sequence[bool]] = None, stats: typing.Optional[Stats] = None, progress: typing.Optional[Progress] = None, logger: logging.Logger = logger) -> typing.Optional['pandas.DataFrame']:
+    """Cross-reference the UBIDs in the rows of the given left and right `pandas.DataFrame` objects.
+
+    The larger of the two is used to construct a `CrossReferencer`, which is
+    queried with the UBIDs of the smaller of the two.  The result has a row
+    for each pair of rows whose UBID bounding boxes intersect, with the
+    Jaccard similarity coefficient within the closed interval [`jaccard_min`,
+    `jaccard_max`], and the fields of both rows (with the given suffixes for
+    duplicate field names).
+
+    If `mode` is "nearest", then the right `pandas.DataFrame` is used to
+    construct the `CrossReferencer`, and the result has a row for each of
+    the `k` nearest right rows within `max_distance` meters of each left row
+    (see `CrossReferencer.query_nearest_bounds`), with the distance (the
+    `fieldname_distance` field).
+
+    If specified, the result is sorted by the Jaccard similarity coefficient
+    (`sort_order`), and then grouped by the rows of the left and right
+    `pandas.DataFrame` objects, selecting the least ("ASC") or greatest
+    ("DESC") coefficient for each group (`left_group_order` and
+    `right_group_order`).
+
+    If the footprints of the left and right rows are given (viz., the
+    WKT or WKB strings, or `shapely` geometries, of `left_geometries` and
+    `right_geometries`), then the pairs that survive the bounding box filter
+    are refined: the Jaccard similarity coefficient of their footprints is
+    calculated (the `fieldname_refined_jaccard` field), and the pairs are
+    filtered again by the closed interval [`refined_jaccard_min`,
+    `refined_jaccard_max`].  The refined coefficient is then used for
+    sorting and grouping.
+
+    If the partition keys of the left and right rows are given (e.g., the
+    county FIPS codes of `left_partitions` and `right_partitions`), then
+    only rows with equal keys are cross-referenced: a `CrossReferencer` is
+    constructed for each partition (see `match_bounds`), and the partitions
+    are processed independently (by a pool of `partition_workers` processes,
+    if more than one).  Rows whose keys are missing are not
+    cross-referenced.
+
+    If `shard` is specified (viz., the 0-based index and the number of
+    shards), then only the pairs that are owned by the shard are returned
+    (see `owned_mask`).  The results for all shards are the result without
+    sharding (viz., the same pairs, without duplicates), if the rows of each
+    shard are selected by `shard_mask`.  The candidates of a row may be
+    owned by more than one shard, so that `max_candidates` is not supported
+    for shards.
+
+    If `predicate` is "contains" or "within", then only the pairs whose left
+    UBID bounding box contains or is within (respectively) the right UBID
+    bounding box are returned (see `CrossReferencer.query_bounds`).
+
+    If the masks of the changed left and right rows are given (viz.,
+    `left_changed` and `right_changed`), then only the pairs with a changed
+    left or right row are cross-referenced (see `delta_partitions_` and
+    `update_crossref_frames`).
+
+    The rows of each side are factorized into units (viz., the rows with the
+    same UBID, partition key and changed flag; see `units_`), and the UBIDs
+    are decoded, indexed, queried and compared once for each unit.  The
+    pairs of units are then fanned out to the pairs of their rows (see
+    `fan_out_`).  Decoding errors are reported once for each unit.  For
+    nearest-neighbor queries, only the left rows are factorized (viz., the
+    `k` nearest right rows are found for each left unit).
+
+    If `max_candidates` is specified, then each left and right row has at
+    most `max_candidates` pairs (before filtering; see `cap_candidates`).
+    If `candidates_policy` is "error", then the pairs of the rows that have
+    more are dropped, and `on_candidates_error` is called with the side
+    ("left" or "right"), the label of the row and a `TooManyCandidatesError`.
+
+    Returns `None` if there are no intersections.
+    """
+
+    import pandas
+
+    if stats is None:
+        stats = NullStats()
+
+    if mode not in MODES:
+        raise ValueError('invalid mode: "{0}"'.format(mode))
+    elif (left_geometries is None) != (right_geometries is None):
+        raise ValueError('footprints must be given for both left and right data frames')
+    elif (left_partitions is None) != (right_partitions is None):
+        raise ValueError('partition keys must be given for both left and right data frames')
+    elif partition_workers < 1:
+        raise ValueError('invalid number of partition workers: {0}'.format(partition_workers))
+    elif (shard is not None) and not (0 <= shard[0] < shard[1]):
+        raise ValueError('invalid shard: {0}/{1}'.format(shard[0], shard[1]))
+    elif (shard is not None) and (max_candidates is not None):
+        raise ValueError('maximum numbers of candidates are not supported for shards')
+    elif candidates_policy not in CANDIDATES_POLICIES:
+        raise ValueError('invalid candidates policy: "{0}"'.format(candidates_policy))
+    elif predicate not in PREDICATES:
+        raise ValueError('invalid predicate: "{0}"'.format(predicate))
+    elif (mode == 'nearest') and (predicate != 'intersects'):
+        raise ValueError('predicate must be "intersects" for nearest-neighbor queries')
+    elif (left_changed is None) != (right_changed is None):
+        raise ValueError('changed rows must be given for both left and right data frames')
+    elif (left_changed is not None) and ((mode == 'nearest') or (max_candidates is not None)):
+        raise ValueError('changed rows are not supported for nearest-neighbor queries or maximum numbers of candidates')
+
+    refine: bool = left_geometries is not None
+
+    # The Jaccard similarity coefficients of the UBID bounding boxes are only
+    # calculated for "contains" and "within" predicates if they are used
+    # (viz., included, filtered, sorted, grouped or capped).
+    include_jaccard: bool = (predicate == 'intersects') or include_jaccard_field or (jaccard_min > 0.0) or (jaccard_max < 1.0) or ((not refine) and ((sort_order is not None) or (left_group_order is not None) or (right_group_order is not None))) or ((max_candidates is not None) and (candidates_policy == 'top'))
+
+    # Names for "index" fields for left and right data frames.
+    left_fieldname_index_with_suffix: str = '{0}{1}'.format(left_fieldname_index, left_suffix)
+    right_fieldname_index_with_suffix: str = '{0}{1}'.format(right_fieldname_index, right_suffix)
+
+    # Factorize rows of left and right data frames into units (viz., the
+    # rows with the same UBID, partition key and changed flag).
+    with stats.stage('factorize', rows=len(left_data_frame) + len(right_data_frame)):
+        (left_units, left_firsts, ) = units_(left_data_frame[left_fieldname_code], *([] if (left_partitions is None) else [left_partitions]), *([] if (left_changed is None) else [left_changed]))
+
+        if mode == 'nearest':
+            (right_units, right_firsts, ) = (numpy.arange(len(right_data_frame)), numpy.arange(len(right_data_frame)), )
+        else:
+            (right_units, right_firsts, ) = units_(right_data_frame[right_fieldname_code], *([] if (right_partitions is None) else [right_partitions]), *([] if (right_changed is None) else [right_changed]))
+    stats.incr('units_left', len(left_firsts))
+    stats.incr('units_right', len(right_firsts))
+    logger.info('[crossref] Found \033[1m{0}\033[0m and \033[1m{1}\033[0m distinct UBIDs in rows of left and right input files'.format(len(left_firsts), len(right_firsts)))
+
+    # Decode "UBID" fields of left and right data frames (for each unit).
+    with stats.stage('decode_left', rows=len(left_firsts)):
+        left_bounds: numpy.ndarray = decode_bounds(left_data_frame[left_fieldname_code].values[left_firsts].tolist(), on_error=stats.error, progress=progress)
+    left_count: int = int((~numpy.isnan(left_bounds[left_units, LATITUDE_LO_])).sum())
+    stats.incr('rows_left', len(left_data_frame))
+    stats.incr('rows_left_decoded', left_count)
+    logger.info('[crossref] Decoded \033[1m{0}/{1} ({2}%)\033[0m rows of left input file'.format(left_count, len(left_data_frame), round((left_count / len(left_data_frame)) * 100, 2) if (len(left_data_frame) > 0) else 0.0))
+
+    with stats.stage('decode_right', rows=len(right_firsts)):
+        right_bounds: numpy.ndarray = decode_bounds(right_data_frame[right_fieldname_code].values[right_firsts].tolist(), on_error=stats.error, progress=progress)
+    right_count: int = int((~numpy.isnan(right_bounds[right_units, LATITUDE_LO_])).sum())
+    stats.incr('rows_right', len(right_data_frame))
+    stats.incr('rows_right_decoded', right_count)
+    logger.info('[crossref] Decoded \033[1m{0}/{1} ({2}%)\033[0m rows of right input file'.format(right_count, len(right_data_frame), round((right_count / len(right_data_frame)) * 100, 2) if (len(right_data_frame) > 0) else 0.0))
+
+    # Construct quadtree-based spatial index for the larger of the two data
+    # frames, and cross-reference with the rows of the smaller of the two.
+    #
+    # For nearest-neighbor queries, construct quadtree-based spatial index
+    # for the right data frame, and search with the rows of the left.
+    #
+    # For partitioned data frames, do so for each partition.
+    #
+    # For changed rows, do so for the changed rows of each partition.
+    #
+    # The partition key and changed flag of each unit are those of its rows.
+    if (left_partitions is not None) or (left_changed is not None):
+        if left_partitions is not None:
+            partitions: typing.List[typing.Tuple[numpy.ndarray, numpy.ndarray]] = partition_positions(numpy.asarray(left_partitions, dtype=object)[left_firsts], numpy.asarray(right_partitions, dtype=object)[right_firsts])
+        else:
+            partitions: typing.List[typing.Tuple[numpy.ndarray, numpy.ndarray]] = [(numpy.arange(len(left_bounds)), numpy.arange(len(right_bounds)), )]
+
+        if left_changed is not None:
+            partitions = delta_partitions_(partitions, numpy.asarray(left_changed, dtype=bool)[left_firsts], numpy.asarray(right_changed, dtype=bool)[right_firsts])
+            stats.incr('rows_left_changed', int(numpy.asarray(left_changed, dtype=bool).sum()))
+            stats.incr('rows_right_changed', int(numpy.asarray(right_changed, dtype=bool).sum()))
+
+        stats.incr('partitions', len(partitions))
+
+        logger.info('[crossref] Cross-referencing rows of left and right input files in \033[1m{0}\033[0m partition{1}'.format(len(partitions), '' if len(partitions) == 1 else 's'))
+        with stats.stage('partitions', rows=len(partitions)):
+            matches = match_partitions_(left_bounds, right_bounds, partitions, partition_workers, progress=progress, mode=mode, k=k, max_distance=max_distance, distance_metric=distance_metric, oversized_extent=oversized_extent, predicate=predicate, include_jaccard=include_jaccard)
+
+        (left_positions, right_positions, ) = (matches.query_index, matches.reference_index, )
+    elif mode == 'nearest':
+        logger.info('[crossref] Constructing quadtree for right input file')
+        with stats.stage('build', rows=len(right_bounds)):
+            crossreferencer = CrossReferencer(right_bounds, progress=progress, oversized_extent=oversized_extent)
+
+        logger.info('[crossref] Searching quadtree for right input file for {0} nearest row{1} within {2} meters of rows of left input file'.format(k, '' if k == 1 else 's', max_distance))
+        with stats.stage('nearest', rows=len(left_bounds)):
+            matches = crossreferencer.query_nearest_bounds(left_bounds, k=k, max_distance=max_distance, metric=distance_metric, progress=progress)
+
+        (left_positions, right_positions, ) = (matches.query_index, matches.reference_index, )
+    elif len(left_bounds) >= len(right_bounds):
+        logger.info('[crossref] Constructing quadtree for left input file')
+        with stats.stage('build', rows=len(left_bounds)):
+            crossreferencer = CrossReferencer(left_bounds, progress=progress, oversized_extent=oversized_extent)
+
+        logger.info('[crossref] Cross-referencing rows of right input file against quadtree for left input file')
+        with stats.stage('probe', rows=len(right_bounds)):
+            matches = crossreferencer.query_bounds(right_bounds, progress=progress, predicate=CONVERSE_PREDICATES_[predicate], include_jaccard=include_jaccard)
+
+        (left_positions, right_positions, ) = (matches.reference_index, matches.query_index, )
+    else:
+        logger.info('[crossref] Constructing quadtree for right input file')
+        with stats.stage('build', rows=len(right_bounds)):
+            crossreferencer = CrossReferencer(right_bounds, progress=progress, oversized_extent=oversized_extent)
+
+        logger.info('[crossref] Cross-referencing rows of left input file against quadtree for right input file')
+        with stats.stage('probe', rows=len(left_bounds)):
+            matches = crossreferencer.query_bounds(left_bounds, progress=progress, predicate=predicate, include_jaccard=include_jaccard)
+
+        (left_positions, right_positions, ) = (matches.query_index, matches.reference_index, )
+
+    # Select cross-reference results that are owned by the shard.
+    if shard is not None:
+        with stats.stage('own', rows=len(left_positions)):
+            owned: numpy.ndarray = owned_mask(left_bounds[left_positions], right_bounds[right_positions], shard, mode=mode, level=shard_level)
+        stats.incr('unowned_pairs', int((~owned).sum()))
+        logger.info('[crossref] Shard {0}/{1} owns \033[1m{2}/{3}\033[0m intersection{4}'.format(shard[0] + 1, shard[1], int(owned.sum()), len(owned), '' if len(owned) == 1 else 's'))
+
+        matches = matches.take(owned)
+        (left_positions, right_positions, ) = (left_positions[owned], right_positions[owned], )
+
+    # Fan out the pairs of units to the pairs of their rows.
+    if (len(left_firsts) < len(left_data_frame)) or (len(right_firsts) < len(right_data_frame)):
+        stats.incr('unit_pairs', len(left_positions))
+        with stats.stage('fan_out', rows=len(left_positions)):
+            (left_positions, right_positions, pair_index, ) = fan_out_(left_units, right_units, left_positions, right_positions)
+
+            matches = matches.take(pair_index)
+
+    # Select at most the maximum number of candidates for each row of the
+    # left and right data frames.
+    if max_candidates is not None:
+        with stats.stage('cap', rows=len(left_positions)):
+            pairs = Matches(left_positions, right_positions, matches.jaccard, matches.distance)
+
+            for (side, data_frame, ) in [('left', left_data_frame, ), ('right', right_data_frame, )]:
+                (pairs, exceeded, counts, ) = cap_candidates(pairs, pairs.query_index if (side == 'left') else pairs.reference_index, max_candidates, policy=candidates_policy)
+
+                stats.incr('rows_{0}_capped'.format(side), len(exceeded))
+                if len(exceeded) > 0:
+                    logger.warning('[crossref] Found \033[1m{0}\033[0m row{1} of {2} input file with more than {3} candidate{4}'.format(len(exceeded), '' if len(exceeded) == 1 else 's', side, max_candidates, '' if max_candidates == 1 else 's'))
+
+                if candidates_policy == 'error':
+                    for (label, count, ) in zip(data_frame.index.values[exceeded].tolist(), counts.tolist()):
+                        exception = TooManyCandidatesError(count, max_candidates)
+
+                        stats.error(exception)
+
+                        if on_candidates_error is not None:
+                            on_candidates_error(side, label, exception)
+
+            matches = pairs
+            (left_positions, right_positions, ) = (pairs.query_index, pairs.reference_index, )
+
+    # Construct 'pandas.DataFrame' for cross-reference results (viz., "intersections").
+    if fieldname_jaccard in (left_fieldname_index_with_suffix, right_fieldname_index_with_suffix, ):
+        raise ValueError('field name is not unique: "{0}"'.format(fieldname_jaccard))
+    elif refine and (fieldname_refined_jaccard in (left_fieldname_index_with_suffix, right_fieldname_index_with_suffix, fieldname_jaccard, )):
+        raise ValueError('field name is not unique: "{0}"'.format(fieldname_refined_jaccard))
+    elif (mode == 'nearest') and (fieldname_distance in (left_fieldname_index_with_suffix, right_fieldname_index_with_suffix, fieldname_jaccard, fieldname_refined_jaccard, )):
+        raise ValueError('field name is not unique: "{0}"'.format(fieldname_distance))
+    dst_data_frame: pandas.DataFrame = pandas.DataFrame(data=collections.OrderedDict([
+        (left_fieldname_index_with_suffix, left_data_frame.index.values[left_positions], ),
+        (right_fieldname_index_with_suffix, right_data_frame.index.values[right_positions], ),
+        (fieldname_jaccard, numpy.full(len(left_positions), numpy.nan) if (matches.jaccard is None) else matches.jaccard, ),
+    ] + ([
+        (fieldname_distance, matches.distance, ),
+    ] if (mode == 'nearest') else [])))
+
+    # If there are no cross-reference results, then exit.
+    len_dst_data_frame0: int = len(dst_data_frame)
+    stats.incr('candidate_pairs', len_dst_data_frame0)
+    logger.info('[crossref] Found \033[1m{0}\033[0m intersection{1}'.format(len_dst_data_frame0, '' if len_dst_data_frame0 == 1 else 's'))
+    if len_dst_data_frame0 == 0:
+        return None
+
+    # Select cross-reference results within the specified closed interval.
+    if include_jaccard:
+        logger.info('[crossref] Filtering intersections: {1} <= "{0}" <= {2}'.format(fieldname_jaccard.replace('"', '\\"'), jaccard_min, jaccard_max))
+        with stats.stage('filter', rows=len_dst_data_frame0):
+            dst_data_frame: pandas.DataFrame = dst_data_frame[dst_data_frame[fieldname_jaccard].notnull() & (jaccard_min <= dst_data_frame[fieldname_jaccard]) & (dst_data_frame[fieldname_jaccard] <= jaccard_max)]
+
+    # If there are no cross-reference results, then exit.
+    len_dst_data_frame1: int = len(dst_data_frame)
+    stats.incr('filtered_pairs', len_dst_data_frame1)
+    logger.info('[crossref] Found \033[1m{0}/{1} ({2}%)\033[0m intersection{3}: "{4}"'.format(len_dst_data_frame1, len_dst_data_frame0, round((len_dst_data_frame1 / len_dst_data_frame0) * 100, 2), '' if len_dst_data_frame0 == 1 else 's', fieldname_jaccard.replace('"', '\\"')))
+    if len_dst_data_frame1 == 0:
+        return None
+
+    # Calculate Jaccard similarity coefficient of footprints for each
+    # cross-reference result, and then select cross-reference results within
+    # the specified closed interval.
+    #
+    # Only the footprints of the selected cross-reference results are parsed.
+    if refine:
+        logger.info('[crossref] Refining intersections: {1} <= "{0}" <= {2}'.format(fieldname_refined_jaccard.replace('"', '\\"'), refined_jaccard_min, refined_jaccard_max))
+        with stats.stage('refine', rows=len_dst_data_frame1):
+            pairs: Matches = Matches(left_positions[dst_data_frame.index.values], right_positions[dst_data_frame.index.values], dst_data_frame[fieldname_jaccard].values)
+            dst_data_frame[fieldname_refined_jaccard] = refine_matches(pairs, parse_geometries_at_(left_geometries, pairs.query_index, left_geometry_format), parse_geometries_at_(right_geometries, pairs.reference_index, right_geometry_format))
+            dst_data_frame: pandas.DataFrame = dst_data_frame[dst_data_frame[fieldname_refined_jaccard].notnull() & (refined_jaccard_min <= dst_data_frame[fieldname_refined_jaccard]) & (dst_data_frame[fieldname_refined_jaccard] <= refined_jaccard_max)]
+
+        # If there are no cross-reference results, then exit.
+        len_dst_data_frame2: int = len(dst_data_frame)
+        stats.incr('refined_pairs', len_dst_data_frame2)
+        logger.info('[crossref] Found \033[1m{0}/{1} ({2}%)\033[0m intersection{3}: "{4}"'.format(len_dst_data_frame2, len_dst_data_frame1, round((len_dst_data_frame2 / len_dst_data_frame1) * 100, 2), '' if len_dst_data_frame1 == 1 else 's', fieldname_refined_jaccard.replace('"', '\\"')))
+        if len_dst_data_frame2 == 0:
+            return None
+
+    # Sort and group by the refined Jaccard similarity coefficient, if any.
+    fieldname_order_by: str = fieldname_refined_jaccard if refine else fieldname_jaccard
+
+    # Merge left and right data frames with cross-reference results using an inner join.
+    with stats.stage('merge', rows=len_dst_data_frame1):
+        logger.info('[crossref] Merging intersections with left input file')
+        dst_data_frame: pandas.DataFrame = dst_data_frame.merge(left_data_frame.reset_index().rename(index=str, columns={
+            'index': left_fieldname_index_with_suffix,
+        }), how='inner', left_on=left_fieldname_index_with_suffix, right_on=left_fieldname_index_with_suffix, suffixes=(False, False))
+        logger.info('[crossref] Merging intersections with right input file')
+        dst_data_frame: pandas.DataFrame = dst_data_frame.merge(right_data_frame.reset_index().rename(index=str, columns={
+            'index': right_fieldname_index_with_suffix,
+        }), how='inner', left_on=right_fieldname_index_with_suffix, right_on=right_fieldname_index_with_suffix, suffixes=(left_suffix, right_suffix))
+
+    # Sort cross-reference results by Jaccard similarity coefficient.
+    if sort_order is not None:
+        logger.info('[crossref] Sorting: "{0}" {1}'.format(fieldname_order_by.replace('"', '\\"'), sort_order))
+        with stats.stage('sort', rows=len(dst_data_frame)):
+            dst_data_frame.sort_values(fieldname_order_by, axis=0, ascending=sort_order_to_ascending_(sort_order), inplace=True)
+
+    # Group cross-reference results by left "index" and then, for each group,
+    # select cross-reference result with least ("ASC") or greatest ("DESC") value.
+    if left_group_order is not None:
+        logger.info('[crossref] Grouping on left: "{0}" {1}'.format(fieldname_order_by.replace('"', '\\"'), left_group_order))
+        with stats.stage('group_left', rows=len(dst_data_frame)):
+            dst_data_frame: pandas.DataFrame = group_by_(dst_data_frame, left_fieldname_index_with_suffix, fieldname_order_by, left_group_order)
+
+    # Group cross-reference results by right "index" and then, for each group,
+    # select cross-reference result with least ("ASC") or greatest ("DESC") value.
+    if right_group_order is not None:
+        logger.info('[crossref] Grouping on right: "{0}" {1}'.format(fieldname_order_by.replace('"', '\\"'), right_group_order))
+        with stats.stage('group_right', rows=len(dst_data_frame)):
+            dst_data_frame: pandas.DataFrame = group_by_(dst_data_frame, right_fieldname_index_with_suffix, fieldname_order_by, right_group_order)
+
+    # Delete "IoU" field.
+    if not include_jaccard_field:
+        del dst_data_frame[fieldname_jaccard]
+
+    # Delete left and right "index" fields.
+    if not include_index_fields:
+        del dst_data_frame[left_fieldname_index_with_suffix]
+        del dst_data_frame[right_fieldname_index_with_suffix]
+
+    return dst_data_frame
+
+def match_bounds(left_bounds: numpy.ndarray, right_bounds: numpy.ndarray, mode: str = 'intersects', k: int = DEFAULT_K, max_distance: float = DEFAULT_MAX_DISTANCE, distance_metric: str = 'bbox', oversized_extent: typing.Optional[float] = DEFAULT_OVERSIZED_EXTENT, predicate: str = 'intersects', include_jaccard: bool = True) -> Matches:
+    """Return the matches of the given arrays of left and right bounds (viz., the `query_index` and `reference_index` of each match are the positions of the left and right bounds, respectively).
+
+    As with `crossref_frames`, the `CrossReferencer` is constructed for the
+    larger of the two (or for the right, for nearest-neighbor queries).  The
+    predicate is of the left and right bounds (e.g., "contains" matches the
+    left bounds that contain the right bounds).
+    """
+
+    if mode == 'nearest':
+        return CrossReferencer(right_bounds, oversized_extent=oversized_extent).query_nearest_bounds(left_bounds, k=k, max_distance=max_distance, metric=distance_metric)
+    elif len(left_bounds) >= len(right_bounds):
+        matches = CrossReferencer(left_bounds, oversized_extent=oversized_extent).query_bounds(right_bounds, predicate=CONVERSE_PREDICATES_[predicate], include_jaccard=include_jaccard)
+
+        return matches._replace(query_index=matches.reference_index, reference_index=matches.query_index)
+    else:
+        return CrossReferencer(right_bounds, oversized_extent=oversized_extent).query_bounds(left_bounds, predicate=predicate, include_jaccard=include_jaccard)
+
+def delta_partitions_(partitions: typing.List[typing.Tuple[numpy.ndarray, numpy.ndarray]], left_changed: numpy.ndarray, right_changed: numpy.ndarray) -> typing.List[typing.Tuple[numpy.ndarray, numpy.ndarray]]:
+    """Return the given partitions of the positions of the left and right rows, split so that each pair with a changed left or right row is in exactly one (viz., the changed left rows with all of the right rows, and the unchanged left rows with the changed right rows).
+    """
+
+    result: typing.List[typing.Tuple[numpy.ndarray, numpy.ndarray]] = []
+
+    for (left_positions, right_positions, ) in partitions:
+        mask = left_changed[left_positions]
+
+        for (left_positions_, right_positions_, ) in [(left_positions[mask], right_positions, ), (left_positions[~mask], right_positions[right_changed[right_positions]], )]:
+            if (len(left_positions_) > 0) and (len(right_positions_) > 0):
+                result.append((left_positions_, right_positions_, ))
+
+    return result
+
+def read_csv_text(filepath_or_buffer: typing.Union[str, typing.TextIO], **kwargs: typing.Any) -> typing.Optional['pandas.DataFrame']:
+    """Return the given CSV file as a `pandas.DataFrame` of strings (viz., without type inference or missing values), or `None` if it is empty.
+
+    The keyword arguments are passed to `pandas.read_csv` (e.g., `sep` and `quotechar`).
+    """
+
+    import pandas
+
+    try:
+        return pandas.read_csv(filepath_or_buffer=filepath_or_buffer, dtype=str, keep_default_na=False, na_filter=False, **kwargs)
+    except pandas.errors.EmptyDataError:
+        return None
+
+def to_csv_text(data_frame: 'pandas.DataFrame', sep: str = ',', quotechar: str = '"') -> 'pandas.DataFrame':
+    """Return the given `pandas.DataFrame` with the strings that are written to a CSV file (see `read_csv_text`).
+
+    The labels of the rows are kept.
+    """
+
+    import io
+
+    buffer = io.StringIO()
+    data_frame.to_csv(path_or_buf=buffer, header=True, index=False, sep=sep, quotechar=quotechar)
+    buffer.seek(0)
+
+    text_data_frame = read_csv_text(buffer, sep=sep, quotechar=quotechar)
+    text_data_frame.index = data_frame.index
+
+    return text_data_frame
+
+def read_changed_ids(files: typing.Iterable[typing.Union[str, typing.TextIO]], fieldname_id: str, sep: str = ',', quotechar: str = '"') -> typing.Set[str]:
+    """Return the ids of the rows of the given CSV files of added, removed and modified rows (viz., the strings of the `fieldname_id` field).
+
+    Empty files are skipped.
+    """
+
+    changed_ids: typing.Set[str] = set()
+
+    for f in files:
+        data_frame = read_csv_text(f, sep=sep, quotechar=quotechar)
+
+        if data_frame is None:
+            continue
+        elif fieldname_id not in data_frame:
+            raise ValueError('field not found in changes: "{0}"'.format(fieldname_id))
+
+        changed_ids.update(data_frame[fieldname_id].tolist())
+
+    return changed_ids
+
+def update_frames(previous_data_frame: typing.Optional['pandas.DataFrame'], delta_data_frame: typing.Optional['pandas.DataFrame'], left_ids: 'pandas.Series', right_ids: 'pandas.Series', left_changed_ids: typing.Set[str], right_changed_ids: typing.Set[str], left_fieldname_id: str, right_fieldname_id: str, left_fieldname_index: typing.Optional[str] = None, right_fieldname_index: typing.Optional[str] = None, fieldname_change: str = 'change', stats: typing.Optional[Stats] = None) -> typing.Tuple[typing.Optional['pandas.DataFrame'], typing.Optional['pandas.DataFrame']]:
+    """Return the updated result of a cross-reference, and the change log of the pairs that are gained and lost.
+
+    The previous result and the delta (viz., the result for the pairs with a
+    changed left or right row; see `crossref_frames`) are `pandas.DataFrame`
+    objects with the same fields, whose values are the strings of the CSV
+    files.  The rows are identified by stable ids (the `left_fieldname_id`
+    and `right_fieldname_id` fields), whose strings for the current left
+    and right rows are given (viz., the values of `left_ids` and
+    `right_ids`, indexed by the labels of the rows).  The changed ids are
+    the ids of the added, removed and modified rows.
+
+    The updated result is the rows of the previous result without a changed
+    id, and the rows of the delta, ordered by the positions of the left and
+    right rows.  If specified, the "index" fields are set to the labels of
+    the current rows (viz., the rows may have moved).  The change log has the
+    rows of the pairs that are only in the previous result ("lost") or only
+    in the updated result ("gained"), with the `fieldname_change` field.
+
+    Returns `None` for either if it has no rows.
+    """
+
+    import pandas
+
+    if stats is None:
+        stats = NullStats()
+
+    if (previous_data_frame is None) and (delta_data_frame is None):
+        return (None, None, )
+    elif previous_data_frame is None:
+        previous_data_frame = delta_data_frame.iloc[0:0]
+    elif delta_data_frame is None:
+        delta_data_frame = previous_data_frame.iloc[0:0]
+    elif list(previous_data_frame.columns) != list(delta_data_frame.columns):
+        raise ValueError('fields of previous result do not match: {0}'.format(', '.join(['"{0}"'.format(fieldname) for fieldname in previous_data_frame.columns])))
+
+    for fieldname in [left_fieldname_id, right_fieldname_id]:
+        if fieldname not in previous_data_frame:
+            raise ValueError('field not found in previous result: "{0}"'.format(fieldname))
+
+    for ids in [left_ids, right_ids]:
+        if not ids.is_unique:
+            raise ValueError('ids are not unique: {0}'.format(', '.join(['"{0}"'.format(value) for value in ids[ids.duplicated()].unique().tolist()[:10]])))
+
+    # Select the rows of the previous result without a changed id.
+    mask = ~(previous_data_frame[left_fieldname_id].isin(left_changed_ids) | previous_data_frame[right_fieldname_id].isin(right_changed_ids))
+    kept_data_frame = previous_data_frame[mask]
+    lost_data_frame = previous_data_frame[~mask]
+
+    # The positions of the current left and right rows, by id.
+    left_positions = pandas.Series(numpy.arange(len(left_ids)), index=left_ids.values)
+    right_positions = pandas.Series(numpy.arange(len(right_ids)), index=right_ids.values)
+
+    for (fieldname, positions, ) in [(left_fieldname_id, left_positions, ), (right_fieldname_id, right_positions, )]:
+        missing = ~kept_data_frame[fieldname].isin(positions.index)
+
+        if missing.any():
+            raise ValueError('ids of previous result not found (and not changed): {0}'.format(', '.join(['"{0}"'.format(value) for value in kept_data_frame.loc[missing, fieldname].unique().tolist()[:10]])))
+
+    dst_data_frame = pandas.concat([kept_data_frame, delta_data_frame], ignore_index=True)
+
+    # Order by left, and then by right, position.
+    dst_data_frame = dst_data_frame.iloc[numpy.lexsort((right_positions[dst_data_frame[right_fieldname_id]].values, left_positions[dst_data_frame[left_fieldname_id]].values, ))].reset_index(drop=True)
+
+    # Set the "index" fields to the labels of the current rows.
+    for (fieldname_index, fieldname_id, ids, positions, ) in [(left_fieldname_index, left_fieldname_id, left_ids, left_positions, ), (right_fieldname_index, right_fieldname_id, right_ids, right_positions, )]:
+        if (fieldname_index is not None) and (fieldname_index in dst_data_frame):
+            dst_data_frame[fieldname_index] = [str(label) for label in ids.index[positions[dst_data_frame[fieldname_id]].values]]
+
+    # Pairs that are only in the previous result or only in the updated result.
+    lost_keys = pandas.MultiIndex.from_frame(lost_data_frame[[left_fieldname_id, right_fieldname_id]])
+    delta_keys = pandas.MultiIndex.from_frame(delta_data_frame[[left_fieldname_id, right_fieldname_id]])
+
+    changes_data_frame = pandas.concat([
+        lost_data_frame[~lost_keys.isin(delta_keys)].assign(**{fieldname_change: 'lost'}),
+        delta_data_frame[~delta_keys.isin(lost_keys)].assign(**{fieldname_change: 'gained'}),
+    ], ignore_index=True)
+    changes_data_frame = changes_data_frame[[fieldname_change] + list(previous_data_frame.columns)]
+
+    stats.incr('rows_kept', len(kept_data_frame))
+    stats.incr('pairs_lost', int((changes_data_frame[fieldname_change] == 'lost').sum()))
+    stats.incr('pairs_gained', int((changes_data_frame[fieldname_change] == 'gained').sum()))
+
+    return (dst_data_frame if (len(dst_data_frame) > 0) else None, changes_data_frame if (len(changes_data_frame) > 0) else None, )
+
+def update_crossref_frames(previous_data_frame: typing.Optional['pandas.DataFrame'], left_data_frame: 'pandas.DataFrame', right_data_frame: 'pandas.DataFrame', left_changed_ids: typing.Set[str], right_changed_ids: typing.Set[str], left_fieldname_id: str, right_fieldname_id: str, include_index_fields: bool = True, left_fieldname_index: str = 'index', right_fieldname_index: str = 'index', left_suffix: str = '_x', right_suffix: str = '_y', sep: str = ',', quotechar: str = '"', fieldname_change: str = 'change', stats: typing.Optional[Stats] = None, logger: logging.Logger = logger, **kwargs: typing.Any) -> typing.Tuple[typing.Optional['pandas.DataFrame'], typing.Optional['pandas.DataFrame']]:
+    """Return the updated result of a cross-reference of the given `pandas.DataFrame` objects, and the change log of the pairs that are gained and lost (see `update_frames`).
+
+    The previous result is a `pandas.DataFrame` of the strings of its CSV
+    file (see `read_csv_text`), or `None` if it is empty.  The rows of the
+    left and right data frames are identified by their `left_fieldname_id`
+    and `right_fieldname_id` fields (as strings; see `to_csv_text`), which
+    must be included in the result.  Only the pairs with a changed id are
+    cross-referenced (see `crossref_frames`, which is called with the other
+    keyword arguments), and the strings of the delta are those that are
+    written with `sep` and `quotechar`.
+
+    Returns `None` for either if it has no rows.
+    """
+
+    if stats is None:
+        stats = NullStats()
+
+    for (fieldname_id, data_frame, ) in [(left_fieldname_id, left_data_frame, ), (right_fieldname_id, right_data_frame, )]:
+        if fieldname_id not in data_frame:
+            raise ValueError('field not found: "{0}"'.format(fieldname_id))
+
+    # The ids of the rows of the left and right data frames, as they are written.
+    left_ids = to_csv_text(left_data_frame[[left_fieldname_id]], sep=sep, quotechar=quotechar)[left_fieldname_id]
+    right_ids = to_csv_text(right_data_frame[[right_fieldname_id]], sep=sep, quotechar=quotechar)[right_fieldname_id]
+
+    (left_changed, right_changed, ) = (left_ids.isin(left_changed_ids).values, right_ids.isin(right_changed_ids).values, )
+    logger.info('[crossref] Selected \033[1m{0}\033[0m changed rows of left input file and \033[1m{1}\033[0m changed rows of right input file'.format(int(left_changed.sum()), int(right_changed.sum())))
+
+    delta_data_frame = crossref_frames(left_data_frame, right_data_frame, include_index_fields=include_index_fields, left_fieldname_index=left_fieldname_index, right_fieldname_index=right_fieldname_index, left_suffix=left_suffix, right_suffix=right_suffix, left_changed=left_changed, right_changed=right_changed, stats=stats, logger=logger, **kwargs)
+
+    # The names of the id fields in the result (viz., with suffixes for duplicate field names).
+    left_fieldname_id_in_dst = '{0}{1}'.format(left_fieldname_id, left_suffix) if (left_fieldname_id in right_data_frame) else left_fieldname_id
+    right_fieldname_id_in_dst = '{0}{1}'.format(right_fieldname_id, right_suffix) if (right_fieldname_id in left_data_frame) else right_fieldname_id
+
+    with stats.stage('update'):
+        (dst_data_frame, changes_data_frame, ) = update_frames(
+            previous_data_frame,
+            None if (delta_data_frame is None) else to_csv_text(delta_data_frame, sep=sep, quotechar=quotechar),
+            left_ids,
+            right_ids,
+            left_changed_ids,
+            right_changed_ids,
+            left_fieldname_id_in_dst,
+            right_fieldname_id_in_dst,
+            left_fieldname_index='{0}{1}'.format(left_fieldname_index, left_suffix) if include_index_fields else None,
+            right_fieldname_index='{0}{1}'.format(right_fieldname_index, right_suffix) if include_index_fields else None,
+            fieldname_change=fieldname_change,
+            stats=stats,
+        )
+    logger.info('[crossref] Found \033[1m{0}\033[0m changed pair{1}'.format(0 if (changes_data_frame is None) else len(changes_data_frame), '' if ((changes_data_frame is not None) and (len(changes_data_frame) == 1)) else 's'))
+
+    return (dst_data_frame, changes_data_frame, )
+
+def option_name_(name: str) -> str:
+    return '"{0}"'.format(name)
+
+def name_of_(filepath_or_buffer: typing.Union[str, typing.TextIO]) -> str:
+    return str(getattr(filepath_or_buffer, 'name', filepath_or_buffer)).replace('"', '\\"')
+
+class InputOptions(typing.NamedTuple):
+    """The options for the left or right input file of `crossref_csv`.
+
+    The UBIDs are read from the `fieldname_code` field, and the
+    `include_fields` are included in the result (with `suffix` for duplicate
+    field names; see `crossref_frames`).  The footprint (`fieldname_geometry`,
+    in `geometry_format`) and partition key (`partition_field`) fields are
+    read if they are specified, and are cross-referenced by
+    `crossref_frames`.  The CSV file is read with `delimiter` and
+    `quotechar`, and the types of its fields are overridden by `dtype` (e.g.,
+    `{'county': 'category'}`).  If `group_order` is specified, then the
+    result is grouped by the rows of the input file.
+
+    For the incremental mode (see `CrossrefOptions`), the rows are
+    identified by the `fieldname_id` field, and the ids of the changed rows
+    are read from the `changes` files (see `read_changed_ids`).
+    """
+
+    fieldname_code: str = 'UBID'
+    fieldname_index: str = 'index'
+    fieldname_openlocationcode: str = '__openlocationcode__'
+    fieldname_geometry: typing.Optional[str] = None
+    geometry_format: str = 'wkt'
+    partition_field: typing.Optional[str] = None
+    suffix: str = ''
+    include_fields: typing.Sequence[str] = ()
+    group_order: typing.Optional[str] = None
+    dtype: typing.Optional[typing.Mapping[str, typing.Any]] = None
+    delimiter: str = ','
+    quotechar: str = '"'
+    fieldname_id: typing.Optional[str] = None
+    changes: typing.Sequence[typing.Union[str, typing.TextIO]] = ()
+
+    def fieldnames(self) -> typing.List[str]:
+        """Return the names of the fields that are read (viz., the UBID, included, footprint and partition key fields).
+        """
+
+        fieldnames = [self.fieldname_code] + list(self.include_fields)
+
+        for fieldname in [self.fieldname_geometry, self.partition_field]:
+            if (fieldname is not None) and (fieldname not in fieldnames):
+                fieldnames.append(fieldname)
+
+        return fieldnames
+
+class CrossrefOptions(typing.NamedTuple):
+    """The options of `crossref_csv` (viz., of the "crossref" command).
+
+    The options of the left and right input files are `left` and `right`
+    (see `InputOptions`), and the other options are passed to
+    `crossref_frames` (`sort_order` is `None` for unsorted results).  If
+    `infer_dtypes` is true, then the types of the text fields of the input
+    files are inferred from `dtype_sample_size` rows (see
+    `buildingid.dtypes.sample_dtypes`).
+
+    If `shard` is specified, then only the rows of the shard are read (see
+    `read_csv_shard`).  If `previous` is specified (viz., the previous
+    result, written with `writer_delimiter` and `writer_quotechar`), then it
+    is updated incrementally (see `update_crossref_frames`).
+    """
+
+    left: InputOptions = InputOptions(suffix='_x')
+    right: InputOptions = InputOptions(suffix='_y')
+    mode: str = 'intersects'
+    predicate: str = 'intersects'
+    k: int = DEFAULT_K
+    max_distance: float = DEFAULT_MAX_DISTANCE
+    distance_metric: str = 'bbox'
+    fieldname_distance: str = 'distance'
+    fieldname_jaccard: str = 'IoU'
+    include_jaccard_field: bool = True
+    include_index_fields: bool = True
+    jaccard_min: float = 0.0
+    jaccard_max: float = 1.0
+    fieldname_refined_jaccard: str = 'footprint_IoU'
+    refined_jaccard_min: float = 0.0
+    refined_jaccard_max: float = 1.0
+    sort_order: typing.Optional[str] = None
+    oversized_extent: typing.Optional[float] = DEFAULT_OVERSIZED_EXTENT
+    max_candidates: typing.Optional[int] = None
+    candidates_policy: str = 'top'
+    shard: typing.Optional[typing.Tuple[int, int]] = None
+    shard_level: int = DEFAULT_SHARD_LEVEL
+    partition_workers: int = 1
+    infer_dtypes: bool = True
+    dtype_sample_size: int = DEFAULT_SAMPLE_SIZE
+    previous: typing.Optional[typing.Union[str, typing.TextIO]] = None
+    writer_delimiter: str = ','
+    writer_quotechar: str = '"'
+
+    def validate(self, option_name: typing.Callable[[str], str] = option_name_) -> None:
+        """Raise `ValueError` if the options are inconsistent.
+
+        The options are named in the messages by `option_name`, which is
+        called with the name of the field (e.g., "shard" or
+        "left.fieldname_geometry"), so that the messages can name the
+        options of the "crossref" command.
+        """
+
+        (left, right, ) = (self.left, self.right, )
+
+        grouped: bool = (self.sort_order is not None) or (left.group_order is not None) or (right.group_order is not None)
+
+        # Ensure that footprint and partition key fields are specified for both or neither of the left and right input files.
+        for fieldname in ['fieldname_geometry', 'partition_field']:
+            if (getattr(left, fieldname) is None) != (getattr(right, fieldname) is None):
+                raise ValueError('Options {0} and {1} must be specified together.'.format(option_name('left.{0}'.format(fieldname)), option_name('right.{0}'.format(fieldname))))
+
+        # Ensure that the predicate is only specified for intersections.
+        if (self.mode == 'nearest') and (self.predicate != 'intersects'):
+            raise ValueError('Option {0} must be "intersects" if option {1} is "nearest".'.format(option_name('predicate'), option_name('mode')))
+
+        # Ensure that the results of shards are sorted and grouped by the "merge-shards" command, and that the candidates of each row are not capped by each shard.
+        if (self.shard is not None) and grouped:
+            raise ValueError('Option {0} cannot be used with options {1}, {2} and {3} (use them with the "merge-shards" command).'.format(option_name('shard'), option_name('sort_order'), option_name('left.group_order'), option_name('right.group_order')))
+        elif (self.shard is not None) and (self.max_candidates is not None):
+            raise ValueError('Option {0} cannot be used with option {1} (the candidates of a row may be owned by more than one shard).'.format(option_name('shard'), option_name('max_candidates')))
+
+        # Ensure that the incremental mode has stable ids, which are included in the result, and that the pairs of unchanged rows are unchanged.
+        if self.previous is not None:
+            if (left.fieldname_id is None) or (right.fieldname_id is None):
+                raise ValueError('Options {0} and {1} must be specified with option {2}.'.format(option_name('left.fieldname_id'), option_name('right.fieldname_id'), option_name('previous')))
+            elif (left.fieldname_id not in left.include_fields) or (right.fieldname_id not in right.include_fields):
+                raise ValueError('Options {0} and {1} must be included in the output file (see options {2} and {3}).'.format(option_name('left.fieldname_id'), option_name('right.fieldname_id'), option_name('left.include_fields'), option_name('right.include_fields')))
+            elif (self.mode == 'nearest') or (self.max_candidates is not None) or (self.shard is not None) or grouped:
+                raise ValueError('Option {0} cannot be used with options {1}, {2}, {3}, {4}, {5} and {6} (use them with the "merge-shards" command).'.format(option_name('previous'), option_name('mode'), option_name('max_candidates'), option_name('shard'), option_name('sort_order'), option_name('left.group_order'), option_name('right.group_order')))
+        elif (len(left.changes) > 0) or (len(right.changes) > 0):
+            raise ValueError('Options {0} and {1} require option {2}.'.format(option_name('left.changes'), option_name('right.changes'), option_name('previous')))
+
+        # Ensure that the overridden types are of fields that are read.
+        for (side, options, ) in [('left', left, ), ('right', right, )]:
+            for fieldname in (options.dtype or {}).keys():
+                if fieldname not in options.fieldnames():
+                    raise ValueError('Option {0} names a field that is not read: "{1}"'.format(option_name('{0}.dtype'.format(side)), fieldname))
+
+        # Ensure that the names of the fields of the result are unique (viz., the "index" and "__openlocationcode__" fields with suffixes).
+        fieldnames = ['{0}{1}'.format(options.fieldname_index, options.suffix) for options in [left, right]]
+
+        if self.fieldname_jaccard in fieldnames + ['{0}{1}'.format(options.fieldname_openlocationcode, options.suffix) for options in [left, right]]:
+            raise ValueError('field name is not unique: "{0}"'.format(self.fieldname_jaccard))
+        elif (left.fieldname_geometry is not None) and (self.fieldname_refined_jaccard in fieldnames + [self.fieldname_jaccard]):
+            raise ValueError('field name is not unique: "{0}"'.format(self.fieldname_refined_jaccard))
+        elif (self.mode == 'nearest') and (self.fieldname_distance in fieldnames + [self.fieldname_jaccard, self.fieldname_refined_jaccard]):
+            raise ValueError('field name is not unique: "{0}"'.format(self.fieldname_distance))
+
+    def kwargs_for_crossref_frames_(self) -> typing.Dict[str, typing.Any]:
+        return {
+            'left_fieldname_code': self.left.fieldname_code,
+            'right_fieldname_code': self.right.fieldname_code,
+            'fieldname_jaccard': self.fieldname_jaccard,
+            'include_jaccard_field': self.include_jaccard_field,
+            'include_index_fields': self.include_index_fields,
+            'jaccard_min': self.jaccard_min,
+            'jaccard_max': self.jaccard_max,
+            'sort_order': self.sort_order,
+            'left_group_order': self.left.group_order,
+            'right_group_order': self.right.group_order,
+            'left_fieldname_index': self.left.fieldname_index,
+            'right_fieldname_index': self.right.fieldname_index,
+            'left_suffix': self.left.suffix,
+            'right_suffix': self.right.suffix,
+            'left_geometry_format': self.left.geometry_format,
+            'right_geometry_format': self.right.geometry_format,
+            'fieldname_refined_jaccard': self.fieldname_refined_jaccard,
+            'refined_jaccard_min': self.refined_jaccard_min,
+            'refined_jaccard_max': self.refined_jaccard_max,
+            'mode': self.mode,
+            'k': self.k,
+            'max_distance': self.max_distance,
+            'distance_metric': self.distance_metric,
+            'fieldname_distance': self.fieldname_distance,
+            'partition_workers': self.partition_workers,
+            'shard': self.shard,
+            'shard_level': self.shard_level,
+            'oversized_extent': self.oversized_extent,
+            'max_candidates': self.max_candidates,
+            'candidates_policy': self.candidates_policy,
+            'predicate': self.predicate,
+        }
+
+class CrossrefResult(typing.NamedTuple):
+    """The result of `crossref_csv`.
+
+    The `data_frame` is the result of the cross-reference (or `None` if it
+    has no rows), and the `changes_data_frame` is the change log of the
+    incremental mode (or `None`; see `update_crossref_frames`).  The
+    `errors` are the rows with more than the maximum number of candidates
+    (viz., the side, the label, the UBID and the `TooManyCandidatesError` of
+    each row; see `crossref_frames`).
+    """
+
+    data_frame: typing.Optional['pandas.DataFrame']
+    changes_data_frame: typing.Optional['pandas.DataFrame']
+    errors: typing.List[typing.Tuple[str, typing.Any, typing.Any, BaseException]]
+
+def crossref_csv(left: typing.TextIO, right: typing.TextIO, options: CrossrefOptions = CrossrefOptions(), stats: typing.Optional[Stats] = None, progress: typing.Optional[Progress] = None, logger: logging.Logger = logger) -> CrossrefResult:
+    """Cross-reference the UBIDs in the rows of the given left and right CSV files (see `crossref_frames`).
+
+    The options are validated (see `CrossrefOptions.validate`), and the
+    fields of the input files are read (see `read_input_`).  For the
+    incremental mode, only the pairs of the changed rows are
+    cross-referenced, and the previous result is updated (see
+    `update_crossref_frames`).  The memory use of the input files and of
+    the result is logged and recorded (viz., the "bytes_left", "bytes_right"
+    and "bytes_out" counters).
+    """
+
+    if stats is None:
+        stats = NullStats()
+
+    options.validate()
+
+    (left_data_frame, left_bounds, ) = read_input_(left, 'left', options.left, options, stats=stats, logger=logger)
+
+    # For nearest-neighbor queries of a shard, select the rows of the right
+    # input file within the maximum distance of the selected rows of the left
+    # input file (viz., the halo), whose bounding boxes are within their
+    # greatest height and width of the cells of the shard.
+    if (options.shard is not None) and (options.mode == 'nearest') and (len(left_bounds) > 0):
+        (halo, margin, ) = (options.max_distance, (float(numpy.max(left_bounds[:, LATITUDE_HI_] - left_bounds[:, LATITUDE_LO_])), float(numpy.max(left_bounds[:, LONGITUDE_HI_] - left_bounds[:, LONGITUDE_LO_])), ), )
+    else:
+        (halo, margin, ) = (0.0, (0.0, 0.0, ), )
+
+    (right_data_frame, _, ) = read_input_(right, 'right', options.right, options, halo=halo, margin=margin, stats=stats, logger=logger)
+
+    # Rows with more than the maximum number of candidates (viz., the side, the label and the exception).
+    candidates_errors: typing.List[typing.Tuple[str, typing.Any, BaseException]] = []
+
+    kwargs_for_crossref_frames = options.kwargs_for_crossref_frames_()
+    kwargs_for_crossref_frames.update({
+        # Extract footprint and partition key fields of left and right input files.
+        'left_partitions': pop_field_(left_data_frame, options.left.partition_field, list(options.left.include_fields) + [options.left.fieldname_geometry], options.left.fieldname_code),
+        'right_partitions': pop_field_(right_data_frame, options.right.partition_field, list(options.right.include_fields) + [options.right.fieldname_geometry], options.right.fieldname_code),
+        'left_geometries': pop_field_(left_data_frame, options.left.fieldname_geometry, options.left.include_fields, options.left.fieldname_code),
+        'right_geometries': pop_field_(right_data_frame, options.right.fieldname_geometry, options.right.include_fields, options.right.fieldname_code),
+        'on_candidates_error': lambda side, label, exception: candidates_errors.append((side, label, exception, )),
+        'stats': stats,
+        'progress': progress,
+        'logger': logger,
+    })
+
+    # For the incremental mode, cross-reference the pairs of the changed rows, and update the previous result.
+    if options.previous is None:
+        (data_frame, changes_data_frame, ) = (crossref_frames(left_data_frame, right_data_frame, **kwargs_for_crossref_frames), None, )
+    else:
+        left_changed_ids = read_changed_ids(options.left.changes, options.left.fieldname_id, sep=options.left.delimiter, quotechar=options.left.quotechar)
+        right_changed_ids = read_changed_ids(options.right.changes, options.right.fieldname_id, sep=options.right.delimiter, quotechar=options.right.quotechar)
+
+        logger.info('[crossref] Updating previous output file: "{0}"'.format(name_of_(options.previous)))
+        (data_frame, changes_data_frame, ) = update_crossref_frames(read_csv_text(options.previous, sep=options.writer_delimiter, quotechar=options.writer_quotechar), left_data_frame, right_data_frame, left_changed_ids, right_changed_ids, options.left.fieldname_id, options.right.fieldname_id, sep=options.writer_delimiter, quotechar=options.writer_quotechar, **kwargs_for_crossref_frames)
+
+    if data_frame is not None:
+        report_memory_('out', data_frame, stats, logger)
+
+    errors = [(side, label, (left_data_frame if (side == 'left') else right_data_frame).at[label, (options.left if (side == 'left') else options.right).fieldname_code], exception, ) for (side, label, exception, ) in candidates_errors]
+
+    return CrossrefResult(data_frame, changes_data_frame, errors)
+
+def read_input_(filepath_or_buffer: typing.TextIO, side: str, options: InputOptions, crossref_options: CrossrefOptions, halo: float = 0.0, margin: typing.Tuple[float, float] = (0.0, 0.0, ), stats: Stats = NullStats(), logger: logging.Logger = logger) -> typing.Tuple['pandas.DataFrame', typing.Optional[numpy.ndarray]]:
+    """Return the `pandas.DataFrame` for the given input file (viz., of the "left" or "right" side), and, for shards, the bounds of its rows (see `read_csv_shard`).
+
+    Raises `ValueError` if the UBID field is not found, or if the names of
+    the "index" and "__openlocationcode__" fields (with the suffix) are
+    already taken.
+    """
+
+    import pandas
+
+    # Configuration for `pandas.read_csv`.
+    kwargs_for_read_csv: typing.Dict[str, typing.Any] = {
+        'dtype': dict([(fieldname, str, ) for fieldname in [options.fieldname_code, options.fieldname_geometry, options.partition_field] if fieldname is not None]),
+        'quotechar': options.quotechar,
+        'sep': options.delimiter,
+        'usecols': options.fieldnames(),
+    }
+
+    logger.info('[crossref] Reading {0} input file: "{1}"'.format(side, name_of_(filepath_or_buffer)))
+
+    with stats.stage('infer_{0}'.format(side)):
+        if crossref_options.infer_dtypes:
+            dtypes = sample_dtypes(filepath_or_buffer, [options.fieldname_code, options.fieldname_geometry], sample_size=crossref_options.dtype_sample_size, **kwargs_for_read_csv)
+
+            if dtypes is None:
+                logger.warning('[crossref] Not inferring types of fields of input file (not seekable): "{0}"'.format(name_of_(filepath_or_buffer)))
+            else:
+                kwargs_for_read_csv['dtype'].update(dtypes)
+
+        kwargs_for_read_csv['dtype'].update(options.dtype or {})
+
+    with stats.stage('read_{0}'.format(side)):
+        if crossref_options.shard is None:
+            (data_frame, bounds, ) = (pandas.read_csv(filepath_or_buffer=filepath_or_buffer, **kwargs_for_read_csv), None, )
+        else:
+            (data_frame, bounds, ) = read_csv_shard(filepath_or_buffer, crossref_options.shard, fieldname_code=options.fieldname_code, level=crossref_options.shard_level, halo=halo, margin=margin, **kwargs_for_read_csv)
+            logger.info('[crossref] Selected \033[1m{0}\033[0m rows of {1} input file for shard {2}/{3}'.format(len(data_frame), side, crossref_options.shard[0] + 1, crossref_options.shard[1]))
+
+    # Ensure that "UBID" field is present and that "index" and "__openlocationcode__" fields are not present.
+    if options.fieldname_code not in data_frame:
+        raise ValueError('field not found: "{0}"'.format(options.fieldname_code))
+
+    for fieldname in [options.fieldname_index, options.fieldname_openlocationcode]:
+        if '{0}{1}'.format(fieldname, options.suffix) in data_frame:
+            raise ValueError('field name is not unique: "{0}{1}"'.format(fieldname, options.suffix))
+
+    report_memory_(side, data_frame, stats, logger)
+
+    return (data_frame, bounds, )
+
+def report_memory_(side: str, data_frame: 'pandas.DataFrame', stats: Stats, logger: logging.Logger) -> None:
+    """Log and record the memory use of the given `pandas.DataFrame` (viz., of the "left" or "right" input file, or of the "out" result).
+    """
+
+    count = memory_usage(data_frame)
+
+    stats.incr('bytes_{0}'.format(side), count)
+    logger.info('[crossref] Memory use of {0}: \033[1m{1}\033[0m'.format({'left': 'left input file', 'right': 'right input file', 'out': 'output file'}[side], format_bytes(count)))
+
+def pop_field_(data_frame: 'pandas.DataFrame', fieldname: typing.Optional[str], include_fields: typing.Sequence[typing.Optional[str]], fieldname_code: str) -> typing.Optional[numpy.ndarray]:
+    """Return the values of the named field of the given `pandas.DataFrame` (e.g., the footprint field), and delete it if it is not included in the result.
+    """
+
+    if fieldname is None:
+        return None
+    elif fieldname not in data_frame:
+        raise ValueError('field not found: "{0}"'.format(fieldname))
+
+    values = data_frame[fieldname].values
+
+    if (fieldname not in include_fields) and (fieldname != fieldname_code):
+        del data_frame[fieldname]
+
+    return values
+
+def units_(*keys: typing.Sequence[typing.Any]) -> typing.Tuple[numpy.ndarray, numpy.ndarray]:
+    """Return the unit of each row (viz., the code of its distinct combination of the values of the given keys, in order of first appearance), and the position of the first row of each unit.
+
+    Missing values (e.g., `None` and NaN) are equal.
+    """
+
+    import pandas
+
+    units: typing.Optional[numpy.ndarray] = None
+
+    for key in keys:
+        (codes, uniques, ) = pandas.factorize(pandas.Series(key, dtype=object), use_na_sentinel=False)
+
+        if units is None:
+            units = codes
+        else:
+            (units, _, ) = pandas.factorize((units * len(uniques)) + codes)
+
+    (_, firsts, ) = numpy.unique(units, return_index=True)
+
+    return (units.astype(numpy.int64), firsts, )
+
+def fan_out_(left_units: numpy.ndarray, right_units: numpy.ndarray, left_positions: numpy.ndarray, right_positions: numpy.ndarray) -> typing.Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """Return the positions of the left and right rows of the pairs of the given positions of left and right units (viz., every pair of their rows), and the index of the pair of units for each pair of rows.
+
+    The pairs of rows are ordered by the pair of units, and then by the left
+    and right rows.
+    """
+
+    (left_order, left_starts, left_counts, ) = unit_rows_(left_units)
+    (right_order, right_starts, right_counts, ) = unit_rows_(right_units)
+
+    counts = left_counts[left_positions] * right_counts[right_positions]
+
+    pair_index = numpy.repeat(numpy.arange(len(counts)), counts)
+
+    # The offset of each pair of rows in the pairs of rows of its pair of units.
+    offsets = numpy.arange(len(pair_index)) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+
+    right_counts_ = right_counts[right_positions][pair_index]
+
+    return (left_order[left_starts[left_positions][pair_index] + (offsets // right_counts_)], right_order[right_starts[right_positions][pair_index] + (offsets % right_counts_)], pair_index, )
+
+def unit_rows_(units: numpy.ndarray) -> typing.Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """Return the positions of the rows ordered by unit, and the start and number of the rows of each unit.
+    """
+
+    order = numpy.argsort(units, kind='stable')
+
+    counts = numpy.bincount(units, minlength=0 if (len(units) == 0) else (int(units.max()) + 1))
+
+    return (order, numpy.cumsum(counts) - counts, counts, )
+
+def partition_positions(left_partitions: typing.Sequence[typing.Any], right_partitions: typing.Sequence[typing.Any]) -> typing.List[typing.Tuple[numpy.ndarray, numpy.ndarray]]:
+    """Return the positions of the left and right rows for each partition key that is given for both (in order of first appearance).
+
+    Missing keys (e.g., `None` and NaN) are not partitions.
+    """
+
+    import pandas
+
+    left_partitions = pandas.Series(left_partitions, dtype=object)
+    right_partitions = pandas.Series(right_partitions, dtype=object)
+
+    (codes, _, ) = pandas.factorize(pandas.concat([left_partitions, right_partitions], ignore_index=True))
+
+    left_groups = group_positions_(codes[:len(left_partitions)])
+    right_groups = group_positions_(codes[len(left_partitions):])
+
+    return [(left_groups[key], right_groups[key], ) for key in sorted(left_groups.keys() & right_groups.keys())]
+
+def group_positions_(codes: numpy.ndarray) -> typing.Dict[int, numpy.ndarray]:
+    """Return the positions of each non-negative code.
+    """
+
+    order = numpy.argsort(codes, kind='stable')
+
+    (keys, starts, ) = numpy.unique(codes[order], return_index=True)
+
+    return dict([(key, positions, ) for (key, positions, ) in zip(keys.tolist(), numpy.split(order, starts[1:])) if key >= 0])
+
+def match_partitions_(left_bounds: numpy.ndarray, right_bounds: numpy.ndarray, partitions: typing.List[typing.Tuple[numpy.ndarray, numpy.ndarray]], workers: int, progress: typing.Optional[Progress] = None, **kwargs: typing.Any) -> Matches:
+    """Return the matches of the given partitions of the given arrays of left and right bounds (see `match_bounds`, for the keyword arguments), ordered by left position.
+    """
+
+    if progress is None:
+        progress = no_progress_
+
+    fn = functools.partial(match_bounds, **kwargs)
+
+    args = (
+        [left_bounds[left_positions] for (left_positions, _, ) in partitions],
+        [right_bounds[right_positions] for (_, right_positions, ) in partitions],
+    )
+
+    results: typing.List[Matches] = []
+
+    with contextlib.ExitStack() as stack:
+        if (workers > 1) and (len(partitions) > 1):
+            executor = stack.enter_context(concurrent.futures.ProcessPoolExecutor(max_workers=workers))
+
+            iterator = executor.map(fn, *args, chunksize=max(1, len(partitions) // (workers * 4)))
+        else:
+            iterator = map(fn, *args)
+
+        # Convert the positions in each partition to positions in the left and right bounds.
+        for (matches, (left_positions, right_positions, ), ) in zip(progress(iterator, len(partitions)), partitions):
+            results.append(matches._replace(query_index=left_positions[matches.query_index], reference_index=right_positions[matches.reference_index]))
+
+    if len(results) == 0:
+        return empty_matches_(distance=(kwargs.get('mode') == 'nearest'))
+
+    matches = Matches(*[(None if (values[0] is None) else numpy.concatenate(values)) for values in zip(*results)])
+
+    return matches.take(numpy.argsort(matches.query_index, kind='stable'))
+
+def shard_cells_(latitude: numpy.ndarray, longitude: numpy.ndarray, level: int) -> typing.Tuple[numpy.ndarray, numpy.ndarray, int, int]:
+    """Return the row and column indices of the OLC cells with the given number of digits that contain the given points, and the numbers of rows and columns.
+    """
+
+    (height, width, ) = cellSize_(level)
+
+    (rows, columns, ) = (int(round(180.0 / height)), int(round(360.0 / width)), )
+
+    i = numpy.clip(numpy.floor((numpy.asarray(latitude, dtype=numpy.float64) + 90.0) / height), 0, rows - 1).astype(numpy.int64)
+    j = numpy.clip(numpy.floor((numpy.asarray(longitude, dtype=numpy.float64) + 180.0) / width), 0, columns - 1).astype(numpy.int64)
+
+    return (i, j, rows, columns, )
+
+def shard_of_cells_(i: numpy.ndarray, j: numpy.ndarray, columns: int, count: int) -> numpy.ndarray:
+    keys = ((i * columns) + j).astype(numpy.uint64)
+
+    with numpy.errstate(over='ignore'):
+        return ((keys * SHARD_HASH_MULTIPLIER_) >> numpy.uint64(32)) % numpy.uint64(count)
+
+def shard_of(latitude: numpy.ndarray, longitude: numpy.ndarray, count: int, level: int = DEFAULT_SHARD_LEVEL) -> numpy.ndarray:
+    """Return the 0-based indices of the shards that own the given points.
+
+    Space is divided into the OLC cells with `level` digits, and each cell
+    is assigned to one of `count` shards by a hash of its position (viz.,
+    deterministically, and so that dense regions are spread across shards).
+    """
+
+    (i, j, _, columns, ) = shard_cells_(latitude, longitude, level)
+
+    return shard_of_cells_(i, j, columns, count).astype(numpy.int64)
+
+def shards_of_bounds(bounds: numpy.ndarray, count: int, level: int = DEFAULT_SHARD_LEVEL, halo: float = 0.0, margin: typing.Tuple[float, float] = (0.0, 0.0, )) -> typing.Tuple[numpy.ndarray, numpy.ndarray]:
+    """Return the pairs of positions in the given array of bounds and 0-based indices of the shards whose cells they touch (see `shard_of`), as two arrays ordered by position.
+
+    The bounds are expanded by the halo (in meters) and by the margin (the
+    latitude and longitude, in degrees).  Missing bounds (NaN) are not in
+    any shard.
+    """
+
+    bounds = numpy.asarray(bounds, dtype=numpy.float64)
+
+    valid = numpy.flatnonzero(~numpy.isnan(bounds[:, LATITUDE_LO_]))
+
+    if len(valid) == 0:
+        return (numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64), )
+
+    valid_bounds = bounds[valid]
+
+    latitude_delta = (halo / METERS_PER_DEGREE_) + margin[0]
+
+    # The longitude delta is for the latitude that is farthest from the equator (viz., the most degrees per meter).
+    latitude_max = numpy.minimum(numpy.maximum(numpy.abs(valid_bounds[:, LATITUDE_LO_] - latitude_delta), numpy.abs(valid_bounds[:, LATITUDE_HI_] + latitude_delta)), 90.0)
+    longitude_delta = (halo / (METERS_PER_DEGREE_ * numpy.maximum(numpy.cos(numpy.radians(latitude_max)), MIN_COS_LATITUDE_))) + margin[1]
+
+    (i_lo, j_lo, _, columns, ) = shard_cells_(valid_bounds[:, LATITUDE_LO_] - latitude_delta, valid_bounds[:, LONGITUDE_LO_] - longitude_delta, level)
+    (i_hi, j_hi, _, _, ) = shard_cells_(valid_bounds[:, LATITUDE_HI_] + latitude_delta, valid_bounds[:, LONGITUDE_HI_] + longitude_delta, level)
+
+    keys: typing.List[numpy.ndarray] = []
+
+    # Most bounds are in one cell (or a few).
+    for di in range(int((i_hi - i_lo).max()) + 1):
+        for dj in range(int((j_hi - j_lo).max()) + 1):
+            within = ((i_lo + di) <= i_hi) & ((j_lo + dj) <= j_hi)
+
+            keys.append((valid[within] * count) + shard_of_cells_(i_lo[within] + di, j_lo[within] + dj, columns, count).astype(numpy.int64))
+
+    # The cells of bounds in many cells are often in the same shard.
+    unique_keys = numpy.unique(numpy.concatenate(keys))
+
+    return (unique_keys // count, unique_keys % count, )
+
+def shard_mask(bounds: numpy.ndarray, shard: typing.Tuple[int, int], level: int = DEFAULT_SHARD_LEVEL, halo: float = 0.0, margin: typing.Tuple[float, float] = (0.0, 0.0, )) -> numpy.ndarray:
+    """Return the mask of the given array of bounds that touch the cells of the given shard (viz., the 0-based index and the number of shards; see `shards_of_bounds`).
+    """
+
+    (index, count, ) = shard
+
+    result = numpy.zeros(len(bounds), dtype=bool)
+
+    (positions, shards, ) = shards_of_bounds(bounds, count, level=level, halo=halo, margin=margin)
+
+    result[positions[shards == index]] = True
+
+    return result
+
+def read_csv_shard(filepath_or_buffer: typing.Union[str, typing.TextIO], shard: typing.Tuple[int, int], fieldname_code: str = 'UBID', level: int = DEFAULT_SHARD_LEVEL, halo: float = 0.0, margin: typing.Tuple[float, float] = (0.0, 0.0, ), chunk_size: int = DEFAULT_SHARD_CHUNK_SIZE, **kwargs: typing.Any) -> typing.Tuple['pandas.DataFrame', numpy.ndarray]:
+    """Return the rows of the given CSV file that are selected by the given shard (see `shard_mask`), and their bounds.
+
+    The CSV file is read in chunks of `chunk_size` rows, so that only the
+    selected rows are kept in memory.  The keyword arguments are passed to
+    `pandas.read_csv` (e.g., `usecols` and `dtype`).
+    """
+
+    import pandas
+
+    data_frames: typing.List['pandas.DataFrame'] = []
+    bounds: typing.List[numpy.ndarray] = []
+
+    for data_frame in pandas.read_csv(filepath_or_buffer=filepath_or_buffer, chunksize=chunk_size, **kwargs):
+        if fieldname_code not in data_frame:
+            raise ValueError('field not found: "{0}"'.format(fieldname_code))
+
+        # Errors are counted when the selected rows are cross-referenced.
+        chunk_bounds = decode_bounds(data_frame[fieldname_code].tolist())
+        mask = shard_mask(chunk_bounds, shard, level=level, halo=halo, margin=margin)
+
+        data_frames.append(data_frame[mask])
+        bounds.append(chunk_bounds[mask])
+
+    if len(data_frames) == 0:
+        return (pandas.DataFrame(columns=kwargs.get('usecols', None)), numpy.empty((0, BOUNDS_COLUMNS_), dtype=numpy.float64), )
+
+    # The categories of the chunks differ, so that categorical fields are concatenated as objects.
+    categorical_fieldnames = [fieldname for fieldname in data_frames[0].columns if isinstance(data_frames[0][fieldname].dtype, pandas.CategoricalDtype)]
+
+    data_frame = pandas.concat(data_frames)
+
+    return (data_frame.astype(dict([(fieldname, 'category', ) for fieldname in categorical_fieldnames])), numpy.concatenate(bounds), )
+
+def owned_mask(left_bounds: numpy.ndarray, right_bounds: numpy.ndarray, shard: typing.Tuple[int, int], mode: str = 'intersects', level: int = DEFAULT_SHARD_LEVEL) -> numpy.ndarray:
+    """Return the mask of the given pairs of left and right bounds that are owned by the given shard (see `shard_of`).
+
+    A pair is owned by the shard that owns its reference point: the
+    south-west corner of the intersection of the bounding boxes (or, for
+    nearest-neighbor queries, the center of the centroid cell of the left
+    UBID).  The reference point is in both bounding boxes, so that the shard
+    that owns the pair selects both rows (see `shard_mask`).
+    """
+
+    if mode == 'nearest':
+        (latitude, longitude, ) = (left_bounds[:, LATITUDE_CENTER_], left_bounds[:, LONGITUDE_CENTER_], )
+    else:
+        (latitude, longitude, ) = (numpy.maximum(left_bounds[:, LATITUDE_LO_], right_bounds[:, LATITUDE_LO_]), numpy.maximum(left_bounds[:, LONGITUDE_LO_], right_bounds[:, LONGITUDE_LO_]), )
+
+    return shard_of(latitude, longitude, shard[1], level=level) == shard[0]
+
+def parse_geometries_at_(geometries: typing.Sequence[typing.Any], positions: numpy.ndarray, format: str) -> numpy.ndarray:
+    """Return an array of `shapely` geometries, in which only the elements at the given positions are parsed (see `parse_geometries`).
+    """
+
+    geometries = numpy.asarray(geometries, dtype=object)
+
+    unique_positions = numpy.unique(positions)
+
+    result = numpy.full(len(geometries), None, dtype=object)
+    result[unique_positions] = parse_geometries(geometries[unique_positions], format=format)
+
+    return result
+
+def group_by_(data_frame: 'pandas.DataFrame', fieldname_index: str, fieldname_jaccard: str, order: str) -> 'pandas.DataFrame':
+    group_by_series = data_frame.groupby([fieldname_index])[fieldname_jaccard]
+
+    if order == 'ASC':
+        return data_frame.loc[group_by_series.idxmin()]
+    elif order == 'DESC':
+        return data_frame.loc[group_by_series.idxmax()]
+    else:
+        return data_frame
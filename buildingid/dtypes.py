@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/dtypes.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import typing
+
+if typing.TYPE_CHECKING:
+    import pandas
+
+# The default number of rows of an input file that are read to infer the
+# types of its fields.
+DEFAULT_SAMPLE_SIZE = 10000
+
+# The default maximum ratio of the number of distinct values to the number of
+# non-missing values of a text field in the sample, for which the field is
+# categorical.
+DEFAULT_MAX_CATEGORY_RATIO = 0.5
+
+Dtype = typing.Any
+
+def string_dtype() -> Dtype:
+    """Return the type for text fields: the Arrow-backed string type (if the "pyarrow" package is installed), or `str`.
+    """
+
+    try:
+        import pyarrow
+    except ImportError:
+        return str
+
+    return 'string[pyarrow]'
+
+def parse_dtype(value: str) -> Dtype:
+    """Return the `pandas` type for the given name (e.g., "category", "string[pyarrow]", "Int64" or "float32").
+
+    The names "str" and "string" are the type for text fields (see `string_dtype`).
+    """
+
+    import pandas
+
+    if value in ('str', 'string', ):
+        return string_dtype()
+
+    try:
+        return pandas.api.types.pandas_dtype(value)
+    except TypeError:
+        raise ValueError('invalid type: "{0}"'.format(value))
+
+def infer_dtypes(sample: 'pandas.DataFrame', string_fields: typing.Sequence[str] = [], max_category_ratio: float = DEFAULT_MAX_CATEGORY_RATIO) -> typing.Dict[str, Dtype]:
+    """Return the types of the text fields of the given sample of an input file.
+
+    The named string fields (e.g., UBIDs and footprints) are text.  Other
+    text fields are categorical if the ratio of the number of distinct values
+    to the number of non-missing values is at most `max_category_ratio`, and
+    text otherwise.  The types of other fields (e.g., numbers) are not
+    returned (viz., they are inferred when the input file is read), so that
+    the values are the same.
+    """
+
+    import pandas
+
+    dtypes: typing.Dict[str, Dtype] = {}
+
+    for fieldname in sample.columns:
+        values = sample[fieldname]
+
+        if fieldname in string_fields:
+            dtypes[fieldname] = string_dtype()
+        elif pandas.api.types.is_object_dtype(values.dtype) or pandas.api.types.is_string_dtype(values.dtype):
+            values = values.dropna()
+
+            if (len(values) > 0) and (values.nunique() <= (len(values) * max_category_ratio)):
+                dtypes[fieldname] = 'category'
+            else:
+                dtypes[fieldname] = string_dtype()
+
+    return dtypes
+
+def sample_dtypes(filepath_or_buffer: typing.TextIO, string_fields: typing.Sequence[typing.Optional[str]] = [], sample_size: int = DEFAULT_SAMPLE_SIZE, max_category_ratio: float = DEFAULT_MAX_CATEGORY_RATIO, **kwargs: typing.Any) -> typing.Optional[typing.Dict[str, Dtype]]:
+    """Return the types of the text fields of the given CSV file, inferred from a sample of its rows (see `infer_dtypes`), or `None` if the CSV file is not seekable.
+
+    The sample is read from the current position, which is then restored.
+    The keyword arguments are passed to `pandas.read_csv`.
+    """
+
+    import pandas
+
+    try:
+        offset = filepath_or_buffer.tell() if filepath_or_buffer.seekable() else None
+    except (OSError, ValueError, ):
+        offset = None
+
+    if offset is None:
+        return None
+
+    sample = pandas.read_csv(filepath_or_buffer=filepath_or_buffer, nrows=sample_size, **kwargs)
+
+    filepath_or_buffer.seek(offset)
+
+    return infer_dtypes(sample, [fieldname for fieldname in string_fields if fieldname is not None], max_category_ratio=max_category_ratio)
+
+def memory_usage(data_frame: 'pandas.DataFrame') -> int:
+    """Return the number of bytes used by the given `pandas.DataFrame` (including the values of text fields).
+    """
+
+    return int(data_frame.memory_usage(index=True, deep=True).sum())
+
+def format_bytes(count: int) -> str:
+    """Return the given number of bytes in human-readable form (e.g., "1.5 MiB").
+    """
+
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if count < 1024:
+            return '{0:.1f} {1}'.format(count, unit) if (unit != 'B') else '{0} {1}'.format(count, unit)
+
+        count /= 1024
+
+    return '{0:.1f} TiB'.format(count)
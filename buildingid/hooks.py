@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/hooks.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import collections
+import contextlib
+import io
+import json
+import math
+import sys
+import time
+import tracemalloc
+import typing
+
+class Hook(object):
+    """Base class for profiling hooks.
+
+    Hooks are called at the boundaries of batches (viz., "spans") on hot
+    paths, e.g., "code.encode" for a batch of rows in `DictPipe`, or
+    "crossref.probe" for the probe phase of `crossref`.
+    """
+
+    def begin(self, name: str, size: int) -> None:
+        pass
+
+    def end(self, name: str, size: int) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+HOOKS_: typing.List[Hook] = []
+
+class Span_(object):
+    __slots__ = ('name', 'size', )
+
+    def __init__(self, name: str, size: int) -> None:
+        self.name = name
+        self.size = size
+
+    def __enter__(self) -> 'Span_':
+        for hook in HOOKS_:
+            hook.begin(self.name, self.size)
+
+        return self
+
+    def __exit__(self, *args) -> None:
+        for hook in reversed(HOOKS_):
+            hook.end(self.name, self.size)
+
+class NullSpan_(object):
+    __slots__ = ()
+
+    def __enter__(self) -> 'NullSpan_':
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+NULL_SPAN_ = NullSpan_()
+
+def span(name: str, size: int = 0) -> typing.ContextManager:
+    """Return a context manager that calls the registered hooks at the beginning and end of a batch of `size` items.
+
+    If no hooks are registered, then a shared no-op context manager is returned.
+    """
+
+    if not HOOKS_:
+        return NULL_SPAN_
+
+    return Span_(name, size)
+
+def register(hook: Hook) -> None:
+    HOOKS_.append(hook)
+
+def unregister(hook: Hook) -> None:
+    HOOKS_.remove(hook)
+
+@contextlib.contextmanager
+def installed(hooks: typing.Sequence[Hook]) -> typing.Iterator[typing.Sequence[Hook]]:
+    """Context manager that registers the given hooks, and then unregisters and closes them.
+    """
+
+    for hook in hooks:
+        register(hook)
+
+    try:
+        yield hooks
+    finally:
+        for hook in hooks:
+            unregister(hook)
+
+            hook.close()
+
+def write_report_(path: typing.Optional[str], text: str) -> None:
+    if path is None:
+        sys.stderr.write(text)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+class CProfileHook(Hook):
+    """Profile every `every`-th span of each name using `cProfile`.
+
+    On close, the statistics are dumped to `path` (in `pstats` format) or, if
+    `path` is `None`, the top `limit` functions are printed to the standard
+    error stream.
+    """
+
+    def __init__(self, every: int = 10, path: typing.Optional[str] = None, limit: int = 30) -> None:
+        super(CProfileHook, self).__init__()
+
+        self.every = every
+        self.path = path
+        self.limit = limit
+
+        self.counts = collections.Counter()
+
+        import cProfile
+
+        self.profile = cProfile.Profile()
+        self.active = None
+
+    def begin(self, name: str, size: int) -> None:
+        count = self.counts[name]
+
+        self.counts[name] += 1
+
+        if (self.active is None) and ((count % self.every) == 0):
+            self.active = name
+
+            self.profile.enable()
+
+    def end(self, name: str, size: int) -> None:
+        if self.active == name:
+            self.profile.disable()
+
+            self.active = None
+
+    def close(self) -> None:
+        if self.active is not None:
+            self.profile.disable()
+
+            self.active = None
+
+        if self.path is None:
+            import pstats
+
+            stream = io.StringIO()
+
+            try:
+                pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(self.limit)
+            except TypeError:
+                # Nothing was profiled.
+                return
+
+            write_report_(None, stream.getvalue())
+        else:
+            self.profile.dump_stats(self.path)
+
+class TimingHook(Hook):
+    """Histogram of the durations of spans (and of the durations per item) for each name.
+
+    Durations are collected in logarithmic (base 2) buckets of microseconds.
+    On close, the histograms are written as JSON to `path` or the standard
+    error stream.
+    """
+
+    def __init__(self, path: typing.Optional[str] = None) -> None:
+        super(TimingHook, self).__init__()
+
+        self.path = path
+
+        self.started = {}
+
+        self.histograms = collections.OrderedDict()
+
+    def begin(self, name: str, size: int) -> None:
+        self.started[name] = time.perf_counter()
+
+    def end(self, name: str, size: int) -> None:
+        started = self.started.pop(name, None)
+
+        if started is None:
+            return
+
+        duration_us = (time.perf_counter() - started) * 1e6
+
+        histogram = self.histograms.get(name, None)
+
+        if histogram is None:
+            histogram = self.histograms[name] = {
+                'count': 0,
+                'items': 0,
+                'total_us': 0.0,
+                'max_us': 0.0,
+                'buckets_us': collections.Counter(),
+            }
+
+        histogram['count'] += 1
+        histogram['items'] += size
+        histogram['total_us'] += duration_us
+        histogram['max_us'] = max(histogram['max_us'], duration_us)
+        histogram['buckets_us'][bucket_(duration_us)] += 1
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return collections.OrderedDict([
+            (name, {
+                'count': histogram['count'],
+                'items': histogram['items'],
+                'total_us': histogram['total_us'],
+                'max_us': histogram['max_us'],
+                'mean_us': histogram['total_us'] / histogram['count'],
+                'mean_us_per_item': (histogram['total_us'] / histogram['items']) if (histogram['items'] > 0) else None,
+                'buckets_us': collections.OrderedDict([('<{0}'.format(bucket), count) for (bucket, count) in sorted(histogram['buckets_us'].items())]),
+            })
+            for (name, histogram) in self.histograms.items()
+        ])
+
+    def close(self) -> None:
+        write_report_(self.path, json.dumps(self.to_dict(), indent=2) + '\n')
+
+def bucket_(duration_us: float) -> int:
+    """Return the upper bound of the logarithmic (base 2) bucket for the given duration.
+    """
+
+    if duration_us < 1.0:
+        return 1
+
+    return 1 << (int(math.floor(math.log2(duration_us))) + 1)
+
+class TracemallocHook(Hook):
+    """Snapshot memory allocations at the end of every `every`-th span of each name using `tracemalloc`.
+
+    Tracing starts when the hook is constructed.  On close, the current and
+    peak traced memory and the top `limit` allocation sites of each snapshot
+    are written to `path` or the standard error stream.
+    """
+
+    def __init__(self, every: int = 10, path: typing.Optional[str] = None, limit: int = 10) -> None:
+        super(TracemallocHook, self).__init__()
+
+        self.every = every
+        self.path = path
+        self.limit = limit
+
+        self.counts = collections.Counter()
+
+        self.lines = []
+
+        self.started = not tracemalloc.is_tracing()
+
+        if self.started:
+            tracemalloc.start()
+
+    def end(self, name: str, size: int) -> None:
+        count = self.counts[name]
+
+        self.counts[name] += 1
+
+        if (count % self.every) != 0:
+            return
+
+        (current, peak, ) = tracemalloc.get_traced_memory()
+
+        self.lines.append('[{0} #{1}] current={2} peak={3}\n'.format(name, count, current, peak))
+
+        for stat in tracemalloc.take_snapshot().statistics('lineno')[:self.limit]:
+            self.lines.append('  {0}\n'.format(stat))
+
+    def close(self) -> None:
+        if self.started:
+            tracemalloc.stop()
+
+        write_report_(self.path, ''.join(self.lines))
+
+# Ordered from outermost to innermost, so that the cost of a hook is not
+# measured by the hooks that are registered after it.
+HOOK_FACTORIES_ = collections.OrderedDict([
+    ('tracemalloc', lambda every, prefix: TracemallocHook(every=every, path=None if (prefix is None) else '{0}.tracemalloc.txt'.format(prefix))),
+    ('timing', lambda every, prefix: TimingHook(path=None if (prefix is None) else '{0}.timing.json'.format(prefix))),
+    ('cprofile', lambda every, prefix: CProfileHook(every=every, path=None if (prefix is None) else '{0}.cprofile'.format(prefix))),
+])
+
+HOOK_NAMES = list(HOOK_FACTORIES_.keys())
+
+def make_hooks(names: typing.Sequence[str], every: int = 10, prefix: typing.Optional[str] = None) -> typing.List[Hook]:
+    """Return the built-in hooks for the given names (see `HOOK_NAMES`).
+
+    Reports are written to files whose paths start with `prefix`, or to the
+    standard error stream if `prefix` is `None`.
+    """
+
+    return [factory(every, prefix) for (name, factory) in HOOK_FACTORIES_.items() if name in names]
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/stats.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import collections
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import typing
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # Not available on Windows.
+    resource = None
+
+def peak_rss_bytes() -> typing.Optional[int]:
+    """Return the peak resident set size (RSS) of the current process in bytes, or `None` if it is not available.
+    """
+
+    if resource is None:  # pragma: no cover
+        return None
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Kilobytes on Linux, but bytes on macOS.
+    if sys.platform == 'darwin':  # pragma: no cover
+        return maxrss
+    else:
+        return maxrss * 1024
+
+class StageStats(object):
+    def __init__(self) -> None:
+        super(StageStats, self).__init__()
+
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+
+        self.calls = 0
+        self.rows = 0
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            'wall_time': self.wall_time,
+            'cpu_time': self.cpu_time,
+            'calls': self.calls,
+            'rows': self.rows,
+            'rows_per_second': (self.rows / self.wall_time) if ((self.rows > 0) and (self.wall_time > 0)) else None,
+        }
+
+class Stats(object):
+    """Wall and CPU time per stage, row counters, error counts by exception type and peak RSS of a run.
+
+    The report is written as JSON to `path` by `write`, and by `maybe_write`
+    at most once every `interval` seconds.
+    """
+
+    def __init__(self, name: str, path: typing.Optional[str] = None, interval: typing.Optional[float] = None) -> None:
+        super(Stats, self).__init__()
+
+        self.name = name
+
+        self.path = path
+        self.interval = interval
+
+        self.stages = collections.OrderedDict()
+        self.counters = collections.OrderedDict()
+        self.errors = collections.OrderedDict()
+
+        self.started_wall_time = time.perf_counter()
+        self.started_cpu_time = time.process_time()
+
+        self.written_at = time.monotonic()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, rows: int = 0) -> typing.Iterator[StageStats]:
+        """Context manager that adds the elapsed wall and CPU time to the named stage.
+        """
+
+        stage = self.stages.get(name, None)
+
+        if stage is None:
+            stage = self.stages[name] = StageStats()
+
+        wall_time = time.perf_counter()
+        cpu_time = time.process_time()
+
+        try:
+            yield stage
+        finally:
+            stage.wall_time += time.perf_counter() - wall_time
+            stage.cpu_time += time.process_time() - cpu_time
+
+            stage.calls += 1
+            stage.rows += rows
+
+    def incr(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def error(self, exception: BaseException) -> None:
+        name = type(exception).__name__
+
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            'name': self.name,
+            'wall_time': time.perf_counter() - self.started_wall_time,
+            'cpu_time': time.process_time() - self.started_cpu_time,
+            'peak_rss_bytes': peak_rss_bytes(),
+            'stages': collections.OrderedDict([(name, stage.to_dict()) for (name, stage) in self.stages.items()]),
+            'counters': dict(self.counters),
+            'errors': dict(self.errors),
+        }
+
+    def maybe_write(self) -> bool:
+        """Write the report if `interval` seconds have elapsed since it was last written.
+
+        Returns `True` if the report was written.
+        """
+
+        if (self.path is None) or (self.interval is None) or ((time.monotonic() - self.written_at) < self.interval):
+            return False
+
+        self.write()
+
+        return True
+
+    def write(self) -> None:
+        """Write the report to `path` (atomically), or do nothing if `path` is `None`.
+        """
+
+        if self.path is None:
+            return
+
+        if self.path == '-':
+            sys.stderr.write(json.dumps(self.to_dict()) + '\n')
+        else:
+            (fd, tmp_path, ) = tempfile.mkstemp(prefix='.{0}.'.format(os.path.basename(self.path)), dir=os.path.dirname(os.path.abspath(self.path)))
+
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.to_dict(), f, indent=2)
+
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+
+                raise
+
+        self.written_at = time.monotonic()
+
+class NullStats(Stats):
+    """Stats that records nothing (viz., the default for `DictPipe` and `crossref`).
+    """
+
+    def __init__(self) -> None:
+        super(NullStats, self).__init__('null')
+
+    @contextlib.contextmanager
+    def stage(self, name: str, rows: int = 0) -> typing.Iterator[None]:
+        yield None
+
+    def incr(self, name: str, value: int = 1) -> None:
+        pass
+
+    def error(self, exception: BaseException) -> None:
+        pass
+
+    def maybe_write(self) -> bool:
+        return False
+
+    def write(self) -> None:
+        pass
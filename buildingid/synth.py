@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: buildingid/synth.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import math
+import random
+import typing
+
+import shapely.affinity
+import shapely.geometry
+
+from .code import Code, encode
+
+DEFAULT_SEED = 0
+
+# South, west, north and east bounds (viz., Washington, DC).
+DEFAULT_BBOX = (38.80, -77.12, 38.99, -76.91, )
+
+DENSITY_MODELS = ['urban', 'suburban', 'rural']
+
+SIZE_DISTRIBUTIONS = ['lognormal', 'uniform']
+
+CHANGES = ['none', 'duplicate', 'shift', 'split']
+
+# The number of meters per degree of latitude.
+METERS_PER_DEGREE_ = 111320.0
+
+# The number of urban clusters, and the standard deviation of the distance of
+# a footprint from the center of its cluster (as a fraction of the extent).
+URBAN_CLUSTERS_ = 16
+URBAN_CLUSTER_SIGMA_ = 0.03
+
+BBox = typing.Tuple[float, float, float, float]
+
+class SynthFootprint(typing.NamedTuple):
+    """A synthetic building footprint.
+
+    For footprints of the perturbed copy, `source_id` is the identifier of the
+    original footprint, and `change` is one of `CHANGES`.
+    """
+
+    id: int
+    geometry: shapely.geometry.Polygon
+    source_id: typing.Optional[int] = None
+    change: typing.Optional[str] = None
+
+    def encode(self, codeLength: int) -> Code:
+        (longitudeLo, latitudeLo, longitudeHi, latitudeHi, ) = self.geometry.bounds
+
+        centroid = self.geometry.centroid
+
+        return encode(latitudeLo, longitudeLo, latitudeHi, longitudeHi, centroid.y, centroid.x, codeLength=codeLength)
+
+def meters_to_degrees_(latitude: float, dy: float, dx: float) -> typing.Tuple[float, float]:
+    """Return the given north-south and east-west distances (in meters) as differences of latitude and longitude (in degrees).
+    """
+
+    return (dy / METERS_PER_DEGREE_, dx / (METERS_PER_DEGREE_ * math.cos(math.radians(latitude))), )
+
+def iter_centers_(rng: random.Random, count: int, density: str, bbox: BBox) -> typing.Iterator[typing.Tuple[float, float]]:
+    """Return an iterator over the (latitude, longitude) centers of `count` footprints for the given density model.
+
+    * "urban" - Gaussian clusters around a fixed number of city centers.
+    * "suburban" - a jittered grid of lots that fills the bounding box.
+    * "rural" - uniformly distributed over the bounding box.
+    """
+
+    (south, west, north, east, ) = bbox
+
+    if density == 'urban':
+        clusters = [(rng.uniform(south, north), rng.uniform(west, east), ) for _ in range(URBAN_CLUSTERS_)]
+
+        sigma_latitude = (north - south) * URBAN_CLUSTER_SIGMA_
+        sigma_longitude = (east - west) * URBAN_CLUSTER_SIGMA_
+
+        for _ in range(count):
+            (latitude, longitude, ) = rng.choice(clusters)
+
+            yield (min(max(rng.gauss(latitude, sigma_latitude), south), north), min(max(rng.gauss(longitude, sigma_longitude), west), east), )
+    elif density == 'suburban':
+        columns = max(1, int(math.ceil(math.sqrt(count))))
+        rows = max(1, int(math.ceil(count / columns)))
+
+        step_latitude = (north - south) / rows
+        step_longitude = (east - west) / columns
+
+        for index in range(count):
+            (row, column, ) = divmod(index, columns)
+
+            yield (south + (row + 0.5 + rng.uniform(-0.1, 0.1)) * step_latitude, west + (column + 0.5 + rng.uniform(-0.1, 0.1)) * step_longitude, )
+    elif density == 'rural':
+        for _ in range(count):
+            yield (rng.uniform(south, north), rng.uniform(west, east), )
+    else:
+        raise ValueError(density)
+
+def make_footprint_(rng: random.Random, latitude: float, longitude: float, size_distribution: str, size_mean: float, size_sigma: float) -> shapely.geometry.Polygon:
+    """Return a rotated rectangular footprint with the given center, whose side (in meters) is drawn from the given size distribution.
+    """
+
+    if size_distribution == 'lognormal':
+        side = rng.lognormvariate(math.log(size_mean), size_sigma)
+    elif size_distribution == 'uniform':
+        side = rng.uniform(max(1.0, size_mean - size_sigma * size_mean), size_mean + size_sigma * size_mean)
+    else:
+        raise ValueError(size_distribution)
+
+    aspect = rng.uniform(0.5, 2.0)
+
+    (dy, dx, ) = meters_to_degrees_(latitude, side * math.sqrt(aspect) / 2, side / math.sqrt(aspect) / 2)
+
+    polygon = shapely.geometry.box(longitude - dx, latitude - dy, longitude + dx, latitude + dy)
+
+    return shapely.affinity.rotate(polygon, rng.uniform(0.0, 90.0), origin='centroid')
+
+def iter_footprints(count: int, seed: int = DEFAULT_SEED, density: str = 'urban', bbox: BBox = DEFAULT_BBOX, size_distribution: str = 'lognormal', size_mean: float = 15.0, size_sigma: float = 0.5) -> typing.Iterator[SynthFootprint]:
+    """Return an iterator over `count` synthetic building footprints.
+
+    The footprints are deterministic for the given seed.
+    """
+
+    rng = random.Random(seed)
+
+    for (index, (latitude, longitude, ), ) in enumerate(iter_centers_(rng, count, density, bbox)):
+        yield SynthFootprint(index, make_footprint_(rng, latitude, longitude, size_distribution, size_mean, size_sigma))
+
+def perturb(footprint: SynthFootprint, rng: random.Random, next_id: int, duplicate_rate: float = 0.0, shift_rate: float = 0.0, split_rate: float = 0.0, shift_distance: float = 5.0) -> typing.List[SynthFootprint]:
+    """Return the footprints of the perturbed copy of the given footprint, numbered from `next_id`.
+
+    With probability `split_rate`, the footprint is split in half (viz., two
+    footprints).  Otherwise, with probability `shift_rate`, the footprint is
+    moved by up to `shift_distance` meters in a random direction.  Otherwise,
+    the footprint is unchanged.  In addition, with probability
+    `duplicate_rate`, an exact duplicate is added.
+    """
+
+    r = rng.random()
+
+    if r < split_rate:
+        (longitudeLo, latitudeLo, longitudeHi, latitudeHi, ) = footprint.geometry.bounds
+
+        if (latitudeHi - latitudeLo) > (longitudeHi - longitudeLo):
+            latitudeMid = (latitudeLo + latitudeHi) / 2
+
+            halves = [shapely.geometry.box(longitudeLo, latitudeLo, longitudeHi, latitudeMid), shapely.geometry.box(longitudeLo, latitudeMid, longitudeHi, latitudeHi)]
+        else:
+            longitudeMid = (longitudeLo + longitudeHi) / 2
+
+            halves = [shapely.geometry.box(longitudeLo, latitudeLo, longitudeMid, latitudeHi), shapely.geometry.box(longitudeMid, latitudeLo, longitudeHi, latitudeHi)]
+
+        footprints = [SynthFootprint(next_id + index, footprint.geometry.intersection(half), footprint.id, 'split') for (index, half, ) in enumerate(halves)]
+    elif r < (split_rate + shift_rate):
+        distance = rng.uniform(0.0, shift_distance)
+        angle = rng.uniform(0.0, 2 * math.pi)
+
+        (dy, dx, ) = meters_to_degrees_(footprint.geometry.centroid.y, distance * math.sin(angle), distance * math.cos(angle))
+
+        footprints = [SynthFootprint(next_id, shapely.affinity.translate(footprint.geometry, xoff=dx, yoff=dy), footprint.id, 'shift')]
+    else:
+        footprints = [SynthFootprint(next_id, footprint.geometry, footprint.id, 'none')]
+
+    if rng.random() < duplicate_rate:
+        footprints.append(SynthFootprint(next_id + len(footprints), footprint.geometry, footprint.id, 'duplicate'))
+
+    return footprints
+
+def iter_perturbed(footprints: typing.Iterable[SynthFootprint], seed: int = DEFAULT_SEED, duplicate_rate: float = 0.0, shift_rate: float = 0.0, split_rate: float = 0.0, shift_distance: float = 5.0) -> typing.Iterator[typing.Tuple[SynthFootprint, typing.List[SynthFootprint]]]:
+    """Return an iterator over pairs of the given footprints and the footprints of their perturbed copies (see `perturb`).
+
+    The perturbations are deterministic for the given seed, and independent of
+    the random numbers that are used to generate the footprints.
+    """
+
+    rng = random.Random('perturb:{0}'.format(seed))
+
+    next_id = 0
+
+    for footprint in footprints:
+        perturbed = perturb(footprint, rng, next_id, duplicate_rate=duplicate_rate, shift_rate=shift_rate, split_rate=split_rate, shift_distance=shift_distance)
+
+        next_id += len(perturbed)
+
+        yield (footprint, perturbed, )
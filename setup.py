@@ -52,7 +52,7 @@ setup(
 
     # keywords=[],
 
-    packages=find_packages(exclude=['tests*']),
+    packages=find_packages(exclude=['benchmarks*', 'tests*']),
 
     install_requires=[
         'click',
@@ -60,7 +60,7 @@ setup(
         'openlocationcode',
         'pandas',
         'pyqtree',
-        'shapely',
+        'shapely>=2.0',
         'tqdm',
     ],
 
@@ -78,6 +78,12 @@ setup(
             'coverage',
             'nose',
         ],
+        'parquet': [
+            'pyarrow',
+        ],
+        'zstd': [
+            'zstandard',
+        ],
     },
 
     entry_points={
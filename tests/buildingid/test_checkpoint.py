@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_checkpoint.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import io
+import os
+import tempfile
+import unittest
+
+from openlocationcode import openlocationcode
+
+from ..context import buildingid
+from buildingid.command_line.checkpoint import Checkpoint, CheckpointMismatchError, OffsetLineReader
+from buildingid.command_line.dict_decoders import LatLngDictDecoder
+from buildingid.command_line.dict_encoders import BaseGeometryDictEncoder, ErrorDictEncoder
+from buildingid.command_line.dict_pipe import DictPipe
+
+class InterruptedOffsetLineReader(OffsetLineReader):
+    def __init__(self, stream, count):
+        super(InterruptedOffsetLineReader, self).__init__(stream)
+
+        self.count = count
+
+    def __next__(self):
+        self.count -= 1
+
+        if self.count < 0:
+            raise RuntimeError('interrupted')
+
+        return super(InterruptedOffsetLineReader, self).__next__()
+
+class TestCheckpoint(unittest.TestCase):
+    def test_buildingid_checkpoint_OffsetLineReader(self):
+        lines = OffsetLineReader(io.BytesIO('a,b\r\n"c\r\nd",é\r\n'.encode('utf-8')))
+
+        self.assertEqual(next(lines), 'a,b\r\n')
+        self.assertEqual(lines.offset, 5)
+        self.assertEqual(next(lines), '"c\r\n')
+        self.assertEqual(next(lines), 'd",é\r\n')
+        self.assertEqual(lines.offset, 16)
+
+        lines.seek(5)
+
+        self.assertEqual(list(lines), ['"c\r\n', 'd",é\r\n'])
+
+    def test_buildingid_checkpoint_DictPipe_resume(self):
+        dict_pipe = DictPipe(LatLngDictDecoder('Latitude', 'Longitude'), BaseGeometryDictEncoder('UBID', openlocationcode.PAIR_CODE_LENGTH_), ErrorDictEncoder('UBID'))
+
+        value_in = 'Latitude,Longitude\r\n' + ''.join(['{0},{1}\r\n'.format(i, -i) if (i % 3) else 'x,x\r\n' for i in range(20)])
+
+        io_out = io.StringIO('')
+        io_err = io.StringIO('')
+
+        dict_pipe.run(io.StringIO(value_in), io_out, io_err, batch_size=4)
+
+        with tempfile.TemporaryDirectory() as dirname:
+            path_in = os.path.join(dirname, 'in.csv')
+            path_out = os.path.join(dirname, 'out.csv')
+            path_err = os.path.join(dirname, 'err.csv')
+            path_checkpoint = os.path.join(dirname, 'checkpoint.json')
+
+            with open(path_in, 'w', newline='') as f:
+                f.write(value_in)
+
+            # Interrupt the first run in the middle of the third batch.
+            checkpoint = Checkpoint.load(path_checkpoint, path_in=path_in, interval=0.0)
+
+            self.assertFalse(checkpoint.resuming)
+
+            with open(path_in, 'rb') as f_in, open(path_out, 'w', newline='') as f_out, open(path_err, 'w', newline='') as f_err:
+                with self.assertRaisesRegex(RuntimeError, 'interrupted'):
+                    dict_pipe.run(InterruptedOffsetLineReader(f_in, 11), f_out, f_err, batch_size=4, checkpoint=checkpoint)
+
+                # Rows that were written after the checkpoint are discarded.
+                f_out.write('x\r\n')
+
+            checkpoint = Checkpoint.load(path_checkpoint, path_in=path_in, interval=0.0)
+
+            self.assertTrue(checkpoint.resuming)
+            self.assertEqual(checkpoint.count_in, 8)
+
+            checkpoint.truncate(path_out, path_err)
+
+            with open(path_in, 'rb') as f_in, open(path_out, 'a', newline='') as f_out, open(path_err, 'a', newline='') as f_err:
+                dict_pipe.run(OffsetLineReader(f_in), f_out, f_err, batch_size=4, checkpoint=checkpoint)
+
+            self.assertEqual(checkpoint.count_in, 20)
+
+            with open(path_out, 'r', newline='') as f_out, open(path_err, 'r', newline='') as f_err:
+                self.assertEqual(f_out.read(), io_out.getvalue())
+                self.assertEqual(f_err.read(), io_err.getvalue())
+
+    def test_buildingid_checkpoint_CheckpointMismatchError(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            path_in = os.path.join(dirname, 'in.csv')
+            path_checkpoint = os.path.join(dirname, 'checkpoint.json')
+
+            for path in [path_in, path_in + '.copy']:
+                with open(path, 'w', newline='') as f:
+                    f.write('Latitude,Longitude\r\n0,0\r\n')
+
+            checkpoint = Checkpoint.load(path_checkpoint, path_in=path_in)
+            checkpoint.offset_in = 20
+            checkpoint.save()
+
+            self.assertTrue(Checkpoint.load(path_checkpoint, path_in=path_in).resuming)
+
+            # A different input file.
+            with self.assertRaises(CheckpointMismatchError):
+                Checkpoint.load(path_checkpoint, path_in=path_in + '.copy')
+
+            # A regenerated input file.
+            with open(path_in, 'a', newline='') as f:
+                f.write('1,1\r\n')
+
+            with self.assertRaises(CheckpointMismatchError):
+                Checkpoint.load(path_checkpoint, path_in=path_in)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,7 +13,7 @@ from openlocationcode import openlocationcode
 import shapely.wkt
 
 from ..context import buildingid
-from buildingid.code import RE_PATTERN_, decode, encode, isValid
+from buildingid.code import RE_PATTERN_, cellSize_, decode, encode, isValid
 
 class TestCode(unittest.TestCase):
     def test_buildingid_code_decode(self):
@@ -105,5 +105,14 @@ class TestCode(unittest.TestCase):
         self.assertEqual(None, RE_PATTERN_.match('22222222+2202-0-0-0-0'))
         self.assertNotEqual(None, RE_PATTERN_.match('22222222+2220-0-0-0-0'))
 
+    def test_buildingid_code_cellSize_(self):
+        for codeLength in [2, 4, 6, 8, 10, 11, 12, 13]:
+            codeArea = openlocationcode.decode(openlocationcode.encode(46.3, -119.3, codeLength=codeLength))
+
+            (height, width, ) = cellSize_(codeLength)
+
+            self.assertAlmostEqual(height, codeArea.latitudeHi - codeArea.latitudeLo, places=12)
+            self.assertAlmostEqual(width, codeArea.longitudeHi - codeArea.longitudeLo, places=12)
+
 if __name__ == '__main__':
     unittest.main()
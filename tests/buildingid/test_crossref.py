@@ -0,0 +1,702 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_crossref.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import io
+import math
+import os
+import random
+import tempfile
+import unittest
+
+import numpy
+import pandas
+import shapely
+
+from click.testing import CliRunner
+
+from ..context import buildingid
+from buildingid.code import decode
+from buildingid.command_line import cli, crossref_option_name_
+from buildingid.crossref import CrossReferencer, CrossrefOptions, Matches, TooManyCandidatesError, cap_candidates, crossref_csv, crossref_frames, decode_bounds, distance, fan_out_, footprint_jaccard, jaccard, meters_per_degree_longitude_, parse_geometries, partition_positions, predicate_mask, read_changed_ids, read_csv_shard, read_csv_text, shard_mask, shard_of, to_csv_text, units_, update_crossref_frames, update_frames
+from buildingid.stats import Stats
+
+CODES_ = [
+    '849VQJH6+95J-51-58-42-50',
+    '849VQJH6+95J-1-1-1-1',
+    '849VQJH6+95J-0-0-0-0',
+    '8FVC9G8F+6X-0-0-0-0',
+]
+
+class TestCrossReferencer(unittest.TestCase):
+    def test_buildingid_crossref_decode_bounds(self):
+        errors = []
+
+        bounds = decode_bounds(CODES_[0:1] + [None, 'bad', math.nan], on_error=errors.append)
+
+        codeArea = decode(CODES_[0])
+
+        self.assertEqual(bounds[0].tolist(), [codeArea.latitudeLo, codeArea.longitudeLo, codeArea.latitudeHi, codeArea.longitudeHi, codeArea.centroid.latitudeCenter, codeArea.centroid.longitudeCenter])
+        self.assertTrue(all(math.isnan(value) for value in bounds[1:].flatten().tolist()))
+        self.assertEqual(len(errors), 1)
+
+    def test_buildingid_crossref_jaccard(self):
+        bounds = decode_bounds(CODES_)
+
+        pairs = [(i, j, ) for i in range(len(CODES_)) for j in range(len(CODES_))]
+
+        result = jaccard(bounds[[i for (i, _, ) in pairs]], bounds[[j for (_, j, ) in pairs]]).tolist()
+
+        for ((i, j, ), value, ) in zip(pairs, result):
+            expected = decode(CODES_[i]).jaccard(decode(CODES_[j]))
+
+            if expected is None:
+                self.assertTrue(math.isnan(value))
+            else:
+                self.assertEqual(value, expected)
+
+    def test_buildingid_crossref_query(self):
+        crossreferencer = CrossReferencer.from_codes(CODES_ + ['bad'])
+
+        self.assertEqual(len(crossreferencer), 5)
+
+        matches = crossreferencer.query([CODES_[1], 'bad', CODES_[3]])
+
+        self.assertEqual(sorted(zip(matches.query_index.tolist(), matches.reference_index.tolist())), [(0, 0, ), (0, 1, ), (0, 2, ), (2, 3, )])
+
+        matches = crossreferencer.query([CODES_[1]], jaccard_min=0.5)
+
+        self.assertEqual(matches.reference_index.tolist(), [1])
+        self.assertEqual(matches.jaccard.tolist(), [1.0])
+
+    def test_buildingid_crossref_from_arrays_and_frames(self):
+        bounds = decode_bounds(CODES_)
+
+        crossreferencer = CrossReferencer.from_arrays(bounds[:, 0], bounds[:, 1], bounds[:, 2], bounds[:, 3])
+
+        data_frame = pandas.DataFrame({'UBID': CODES_}, index=[10, 20, 30, 40])
+
+        expected = CrossReferencer.from_frame(data_frame).query_frame(data_frame)
+        matches = crossreferencer.query_frame(data_frame)
+
+        self.assertEqual(matches.query_index.tolist(), expected.query_index.tolist())
+        self.assertEqual(matches.reference_index.tolist(), expected.reference_index.tolist())
+
+        # Streaming: the query index is a position in the stream.
+        streamed = list(crossreferencer.iter_query_frames([data_frame.iloc[0:2], data_frame.iloc[2:4]]))
+
+        self.assertEqual(len(streamed), 2)
+        self.assertEqual(sorted(sum([list(zip(batch.query_index.tolist(), batch.reference_index.tolist())) for batch in streamed], [])), sorted(zip(matches.query_index.tolist(), matches.reference_index.tolist())))
+
+    def test_buildingid_crossref_empty(self):
+        crossreferencer = CrossReferencer.from_codes(['bad'])
+
+        self.assertEqual(len(crossreferencer.query(CODES_).query_index), 0)
+        self.assertEqual(len(CrossReferencer.from_codes(CODES_).query([]).query_index), 0)
+
+    def test_buildingid_crossref_frames(self):
+        left = pandas.DataFrame({'UBID': [CODES_[0], CODES_[3], 'bad'], 'name': ['a', 'b', 'c']})
+        right = pandas.DataFrame({'UBID': [CODES_[1], CODES_[2]], 'name': ['d', 'e']})
+
+        stats = Stats('crossref')
+
+        data_frame = crossref_frames(left, right, left_group_order='DESC', stats=stats)
+
+        self.assertEqual(data_frame['name_x'].tolist(), ['a'])
+        self.assertEqual(data_frame['name_y'].tolist(), ['d'])
+        self.assertEqual(data_frame['index_x'].tolist(), [0])
+        self.assertEqual(stats.counters['candidate_pairs'], 2)
+        self.assertEqual(stats.errors, {'ValueError': 1})
+
+        self.assertIsNone(crossref_frames(left, right, jaccard_min=1.0))
+
+    def test_buildingid_crossref_parse_geometries(self):
+        square = shapely.box(0, 0, 1, 1)
+
+        geometries = parse_geometries([square.wkt, None, math.nan, 'nope', square, 'POLYGON ((0 0, 1 1, 1 0, 0 1, 0 0))'], format='wkt')
+
+        self.assertTrue(geometries[0].equals(square))
+        self.assertEqual(geometries[1:4].tolist(), [None, None, None])
+        self.assertTrue(geometries[4].equals(square))
+        # Invalid geometries (e.g., "bowtie" polygons) are made valid.
+        self.assertTrue(geometries[5].is_valid)
+        self.assertAlmostEqual(geometries[5].area, 0.5)
+
+        geometries = parse_geometries([square.wkb_hex, square.wkb], format='wkb')
+
+        self.assertTrue(geometries[0].equals(square))
+        self.assertTrue(geometries[1].equals(square))
+
+        with self.assertRaises(ValueError):
+            parse_geometries([square.wkt], format='nope')
+
+    def test_buildingid_crossref_footprint_jaccard(self):
+        geometries = numpy.array([shapely.box(0, 0, 2, 2), shapely.box(0, 0, 2, 2), shapely.box(0, 0, 1, 1), None], dtype=object)
+        other = numpy.array([shapely.box(0, 0, 2, 2), shapely.box(1, 0, 3, 2), shapely.box(2, 2, 3, 3), shapely.box(0, 0, 1, 1)], dtype=object)
+
+        result = footprint_jaccard(geometries, other).tolist()
+
+        self.assertEqual(result[0:3], [1.0, 1 / 3, 0.0])
+        self.assertTrue(math.isnan(result[3]))
+
+        # Identical footprints (with rounding errors in the area of the intersection).
+        geometry = shapely.from_wkt('POLYGON ((-77.00299396833907 38.90021636287447, -77.00306868827991 38.900378019245125, -77.00320201972102 38.900316391501356, -77.0031272997802 38.9001547351307, -77.00299396833907 38.90021636287447))')
+
+        self.assertEqual(footprint_jaccard(numpy.array([geometry], dtype=object), numpy.array([geometry], dtype=object)).tolist(), [1.0])
+
+    def test_buildingid_crossref_frames_refine(self):
+        # An L-shaped footprint, and a footprint in its "notch": the UBID
+        # bounding boxes are similar, but the footprints do not intersect.
+        l_shape = shapely.Polygon([(0, 0), (0.001, 0), (0.001, 0.0005), (0.0005, 0.0005), (0.0005, 0.001), (0, 0.001)])
+        notch = shapely.box(0.0006, 0.0006, 0.001, 0.001)
+        same = shapely.box(0, 0, 0.001, 0.001)
+
+        def encode_(geometry):
+            (longitudeLo, latitudeLo, longitudeHi, latitudeHi, ) = geometry.bounds
+
+            return buildingid.code.encode(latitudeLo, longitudeLo, latitudeHi, longitudeHi, geometry.centroid.y, geometry.centroid.x, codeLength=11)
+
+        left = pandas.DataFrame({'UBID': [encode_(same)], 'WKT': [same.wkt]})
+        right = pandas.DataFrame({'UBID': [encode_(l_shape), encode_(notch)], 'WKT': [l_shape.wkt, notch.wkt]})
+
+        data_frame = crossref_frames(left, right, jaccard_min=0.1)
+
+        self.assertEqual(data_frame['index_y'].tolist(), [0, 1])
+
+        stats = Stats('crossref')
+
+        data_frame = crossref_frames(left, right, jaccard_min=0.1, left_geometries=left['WKT'], right_geometries=right['WKT'], refined_jaccard_min=0.5, stats=stats)
+
+        self.assertEqual(data_frame['index_y'].tolist(), [0])
+        self.assertAlmostEqual(data_frame['footprint_IoU'].tolist()[0], 0.75)
+        self.assertEqual(stats.counters['refined_pairs'], 1)
+
+        with self.assertRaises(ValueError):
+            crossref_frames(left, right, left_geometries=left['WKT'])
+
+    def test_buildingid_crossref_query_nearest(self):
+        rng = random.Random(0)
+
+        def bounds_(count):
+            rows = []
+
+            for _ in range(count):
+                (latitude, longitude, ) = (38.9 + rng.uniform(0, 0.01), -77.0 + rng.uniform(0, 0.01), )
+                (height, width, ) = (rng.uniform(0, 0.0002), rng.uniform(0, 0.0002), )
+
+                rows.append((latitude, longitude, latitude + height, longitude + width, latitude + (height / 2), longitude + (width / 2), ))
+
+            return numpy.array(rows, dtype=numpy.float64)
+
+        reference_bounds = bounds_(500)
+        query_bounds = bounds_(50)
+
+        crossreferencer = CrossReferencer(reference_bounds)
+
+        for metric in ['bbox', 'centroid']:
+            for (k, max_distance, ) in [(1, 100.0, ), (3, 50.0, ), (5, 1000.0, )]:
+                matches = crossreferencer.query_nearest_bounds(query_bounds, k=k, max_distance=max_distance, metric=metric)
+
+                # Brute force.
+                for (index, row, ) in enumerate(query_bounds.tolist()):
+                    if metric == 'centroid':
+                        (others, row, ) = (reference_bounds[:, [4, 5, 4, 5]], [row[4], row[5], row[4], row[5]], )
+                    else:
+                        others = reference_bounds
+
+                    distances = distance(others, row[0], row[1], row[2], row[3], meters_per_degree_longitude_(query_bounds[index, 4]))
+
+                    expected = [position for position in numpy.lexsort((numpy.arange(len(distances)), distances, )).tolist() if distances[position] <= max_distance][0:k]
+
+                    self.assertEqual(matches.reference_index[matches.query_index == index].tolist(), expected)
+                    self.assertEqual(matches.distance[matches.query_index == index].tolist(), distances[expected].tolist())
+
+        self.assertTrue(((matches.jaccard >= 0) & (matches.jaccard <= 1)).all())
+
+        self.assertEqual(len(crossreferencer.query_nearest_bounds(query_bounds, max_distance=0.0).query_index), len([row for row in query_bounds.tolist() if (distance(reference_bounds, row[0], row[1], row[2], row[3], 1.0) == 0).any()]))
+
+        with self.assertRaises(ValueError):
+            crossreferencer.query_nearest_bounds(query_bounds, metric='nope')
+
+    def test_buildingid_crossref_frames_nearest(self):
+        left = pandas.DataFrame({'UBID': [CODES_[0], CODES_[3]]})
+        right = pandas.DataFrame({'UBID': [CODES_[3], CODES_[1]]})
+
+        data_frame = crossref_frames(left, right, mode='nearest', k=2, max_distance=1000.0)
+
+        self.assertEqual(data_frame['index_x'].tolist(), [0, 1])
+        self.assertEqual(data_frame['index_y'].tolist(), [1, 0])
+        self.assertEqual(data_frame['distance'].tolist(), [0.0, 0.0])
+
+    def test_buildingid_crossref_partition_positions(self):
+        partitions = partition_positions(['a', 'b', None, 'a', 'c'], ['b', 'a', math.nan, 'd', 'b'])
+
+        self.assertEqual([(left_positions.tolist(), right_positions.tolist(), ) for (left_positions, right_positions, ) in partitions], [([0, 3], [1], ), ([1], [0, 4], )])
+
+    def test_buildingid_crossref_frames_partitions(self):
+        left = pandas.DataFrame({'UBID': [CODES_[0], CODES_[1], CODES_[3], CODES_[2]]})
+        right = pandas.DataFrame({'UBID': [CODES_[1], CODES_[2], CODES_[3]]})
+
+        expected = crossref_frames(left, right)
+
+        stats = Stats('crossref')
+
+        for partition_workers in [1, 2]:
+            data_frame = crossref_frames(left, right, left_partitions=['a', 'a', 'b', None], right_partitions=['a', 'b', 'b'], partition_workers=partition_workers, stats=stats)
+
+            self.assertEqual(list(zip(data_frame['index_x'].tolist(), data_frame['index_y'].tolist())), [(0, 0, ), (1, 0, ), (2, 2, )])
+            # Pairs across partitions (and rows without partition keys) are not cross-referenced.
+            self.assertTrue(set(zip(data_frame['index_x'].tolist(), data_frame['index_y'].tolist())) < set(zip(expected['index_x'].tolist(), expected['index_y'].tolist())))
+
+        self.assertEqual(stats.counters['partitions'], 4)
+
+        data_frame = crossref_frames(left, right, mode='nearest', max_distance=1000.0, left_partitions=['a', 'b', 'b', 'b'], right_partitions=['b', 'a', 'a'])
+
+        self.assertEqual(list(zip(data_frame['index_x'].tolist(), data_frame['index_y'].tolist())), [(0, 1, ), (1, 0, ), (3, 0, )])
+
+        with self.assertRaises(ValueError):
+            crossref_frames(left, right, left_partitions=['a'] * 4)
+
+    def test_buildingid_crossref_units(self):
+        (units, firsts, ) = units_(['a', 'b', 'a', None, math.nan, 'b'], [0, 0, 0, 1, 1, 1])
+
+        self.assertEqual(units.tolist(), [0, 1, 0, 2, 2, 3])
+        self.assertEqual(firsts.tolist(), [0, 1, 3, 5])
+
+        (left_positions, right_positions, pair_index, ) = fan_out_(numpy.array([0, 1, 0, 1]), numpy.array([0, 0, 1]), numpy.array([1, 0]), numpy.array([0, 1]))
+
+        self.assertEqual(list(zip(left_positions.tolist(), right_positions.tolist(), pair_index.tolist())), [(1, 0, 0, ), (1, 1, 0, ), (3, 0, 0, ), (3, 1, 0, ), (0, 2, 1, ), (2, 2, 1, )])
+
+    def test_buildingid_crossref_frames_units(self):
+        rng = random.Random(0)
+
+        codes = [CODES_[0], CODES_[1], CODES_[2], CODES_[3], None, 'invalid']
+
+        left = pandas.DataFrame({'UBID': [rng.choice(codes) for _ in range(40)]})
+        right = pandas.DataFrame({'UBID': [rng.choice(codes) for _ in range(30)]})
+
+        left_bounds = decode_bounds(left['UBID'].tolist())
+        right_bounds = decode_bounds(right['UBID'].tolist())
+
+        # Every pair of rows whose UBID bounding boxes intersect.
+        expected = set()
+        for (i, j, ) in zip(*numpy.nonzero((left_bounds[:, numpy.newaxis, 0] <= right_bounds[numpy.newaxis, :, 2]) & (right_bounds[numpy.newaxis, :, 0] <= left_bounds[:, numpy.newaxis, 2]) & (left_bounds[:, numpy.newaxis, 1] <= right_bounds[numpy.newaxis, :, 3]) & (right_bounds[numpy.newaxis, :, 1] <= left_bounds[:, numpy.newaxis, 3]))):
+            expected.add((int(i), int(j), ))
+
+        stats = Stats('crossref')
+
+        data_frame = crossref_frames(left, right, stats=stats)
+
+        self.assertEqual(len(data_frame), len(expected))
+        self.assertEqual(set(zip(data_frame['index_x'].tolist(), data_frame['index_y'].tolist())), expected)
+        self.assertEqual(data_frame['IoU'].tolist(), jaccard(left_bounds[data_frame['index_x'].values], right_bounds[data_frame['index_y'].values]).tolist())
+
+        # The UBIDs are decoded once for each unit.
+        self.assertEqual(stats.counters['units_left'], 6)
+        self.assertEqual(stats.stages['decode_left'].rows, 6)
+        self.assertEqual(stats.counters['rows_left'], 40)
+        # The invalid UBID is reported once for each side.
+        self.assertEqual(sum(stats.errors.values()), 2)
+
+        # The units of partitioned rows have the same partition keys.
+        left_partitions = [rng.choice(['a', 'b']) for _ in range(len(left))]
+        right_partitions = [rng.choice(['a', 'b']) for _ in range(len(right))]
+
+        data_frame = crossref_frames(left, right, left_partitions=left_partitions, right_partitions=right_partitions)
+
+        self.assertEqual(set(zip(data_frame['index_x'].tolist(), data_frame['index_y'].tolist())), set([(i, j, ) for (i, j, ) in expected if left_partitions[i] == right_partitions[j]]))
+
+        # For nearest-neighbor queries, each left row has at most `k` pairs.
+        data_frame = crossref_frames(left, right, mode='nearest', k=2, max_distance=1000000.0)
+
+        self.assertEqual(int(data_frame.groupby('index_x').size().max()), 2)
+
+    def test_buildingid_crossref_frames_shards(self):
+        rng = random.Random(0)
+
+        def frame_(count):
+            codes = []
+
+            for _ in range(count):
+                (latitude, longitude, ) = (38.9 + rng.uniform(0, 0.2), -77.1 + rng.uniform(0, 0.2), )
+                (height, width, ) = (rng.uniform(0, 0.002), rng.uniform(0, 0.002), )
+
+                codes.append(buildingid.code.encode(latitude, longitude, latitude + height, longitude + width, latitude + (height / 2), longitude + (width / 2), codeLength=11))
+
+            return pandas.DataFrame({'UBID': codes})
+
+        (left, right, ) = (frame_(400), frame_(300), )
+
+        (left_bounds, right_bounds, ) = (decode_bounds(left['UBID'].tolist()), decode_bounds(right['UBID'].tolist()), )
+
+        # The cells of the shards are 0.05 degrees (viz., the rows are in about 25 cells).
+        shards = shard_of(numpy.array([38.91, 38.94]), numpy.array([-77.09, -77.06]), 4, level=6).tolist()
+
+        self.assertEqual(shards[0], shards[1])
+        self.assertTrue(0 <= shards[0] < 4)
+
+        for kwargs in [{}, {'mode': 'nearest', 'k': 2, 'max_distance': 500.0}]:
+            expected = crossref_frames(left, right, **kwargs)
+
+            data_frames = []
+
+            for index in range(4):
+                left_mask = shard_mask(left_bounds, (index, 4, ), level=6)
+
+                if kwargs:
+                    right_mask = shard_mask(right_bounds, (index, 4, ), level=6, halo=500.0, margin=(0.002, 0.002, ))
+                else:
+                    right_mask = shard_mask(right_bounds, (index, 4, ), level=6)
+
+                # Shards read only some of the rows.
+                self.assertLess(int(left_mask.sum()), len(left))
+
+                data_frame = crossref_frames(left[left_mask], right[right_mask], shard=(index, 4, ), shard_level=6, **kwargs)
+
+                if data_frame is not None:
+                    data_frames.append(data_frame)
+
+            data_frame = pandas.concat(data_frames)
+
+            self.assertEqual(sorted(map(tuple, data_frame.values.tolist())), sorted(map(tuple, expected.values.tolist())))
+
+        with self.assertRaises(ValueError):
+            crossref_frames(left, right, shard=(4, 4, ))
+
+    def test_buildingid_crossref_frames_shards_max_candidates(self):
+        # One large left UBID over 36 small right UBIDs, in many cells of the shards.
+        left = pandas.DataFrame({'UBID': [buildingid.code.encode(38.9, -77.1, 38.92, -77.08, 38.91, -77.09, codeLength=11)]})
+        right = pandas.DataFrame({'UBID': [buildingid.code.encode(38.9 + (i * 0.003), -77.1 + (j * 0.003), 38.9005 + (i * 0.003), -77.0995 + (j * 0.003), 38.90025 + (i * 0.003), -77.09975 + (j * 0.003), codeLength=11) for i in range(6) for j in range(6)]})
+
+        (left_bounds, right_bounds, ) = (decode_bounds(left['UBID'].tolist()), decode_bounds(right['UBID'].tolist()), )
+
+        expected = crossref_frames(left, right)
+
+        self.assertEqual(len(expected), 36)
+        self.assertEqual(len(crossref_frames(left, right, max_candidates=2)), 2)
+
+        data_frames = [crossref_frames(left[shard_mask(left_bounds, (index, 4, ), level=8)], right[shard_mask(right_bounds, (index, 4, ), level=8)], shard=(index, 4, ), shard_level=8) for index in range(4)]
+
+        # The candidates of the left row are owned by more than one shard.
+        self.assertGreater(sum(1 for data_frame in data_frames if data_frame is not None), 1)
+
+        data_frame = pandas.concat([data_frame for data_frame in data_frames if data_frame is not None])
+
+        self.assertEqual(sorted(map(tuple, data_frame.values.tolist())), sorted(map(tuple, expected.values.tolist())))
+
+        # So that the candidates cannot be capped by each shard.
+        with self.assertRaises(ValueError):
+            crossref_frames(left, right, shard=(0, 4, ), shard_level=8, max_candidates=2)
+
+        with tempfile.TemporaryDirectory() as dirname:
+            for (name, data_frame, ) in [('left', left, ), ('right', right, )]:
+                data_frame.to_csv(os.path.join(dirname, '{0}.csv'.format(name)), index=False)
+
+            for policy in ['top', 'error']:
+                result = CliRunner().invoke(cli, ['crossref', os.path.join(dirname, 'left.csv'), os.path.join(dirname, 'right.csv'), '-', '--shard', '1/4', '--shard-level', '8', '--max-candidates-per-row', '2', '--candidates-policy', policy])
+                self.assertEqual(result.exit_code, 2)
+                self.assertIn('--max-candidates-per-row', result.output)
+
+    def test_buildingid_crossref_read_csv_shard(self):
+        rng = random.Random(0)
+
+        codes = []
+
+        for _ in range(250):
+            (latitude, longitude, ) = (38.9 + rng.uniform(0, 0.2), -77.1 + rng.uniform(0, 0.2), )
+
+            codes.append(buildingid.code.encode(latitude, longitude, latitude + 0.001, longitude + 0.001, latitude + 0.0005, longitude + 0.0005, codeLength=11))
+
+        data_frame = pandas.DataFrame({'UBID': codes, 'use': [rng.choice(['Office', 'Retail']) for _ in codes]})
+        bounds = decode_bounds(codes)
+
+        buffer = io.StringIO(data_frame.to_csv(index=False))
+
+        for (halo, margin, ) in [(0.0, (0.0, 0.0, ), ), (500.0, (0.002, 0.002, ), )]:
+            for index in range(4):
+                buffer.seek(0)
+
+                # The rows are read in chunks whose categorical fields are combined.
+                (shard_data_frame, shard_bounds, ) = read_csv_shard(buffer, (index, 4, ), level=6, halo=halo, margin=margin, chunk_size=100, dtype={'use': 'category'})
+
+                mask = shard_mask(bounds, (index, 4, ), level=6, halo=halo, margin=margin)
+
+                self.assertEqual(shard_data_frame['UBID'].tolist(), data_frame['UBID'][mask].tolist())
+                self.assertEqual(shard_data_frame['use'].tolist(), data_frame['use'][mask].tolist())
+                self.assertEqual(str(shard_data_frame['use'].dtype), 'category')
+                self.assertTrue(numpy.array_equal(shard_bounds, bounds[mask]))
+
+        with self.assertRaises(ValueError):
+            read_csv_shard(io.StringIO(data_frame.to_csv(index=False)), (0, 4, ), fieldname_code='bogus')
+
+    def test_buildingid_crossref_oversized(self):
+        rng = random.Random(0)
+
+        rows = []
+
+        for index in range(300):
+            (latitude, longitude, ) = (38.9 + rng.uniform(0, 0.05), -77.0 + rng.uniform(0, 0.05), )
+
+            # Every tenth UBID is a "campus" (about 1 to 5 kilometers).
+            (height, width, ) = (rng.uniform(0.01, 0.05), rng.uniform(0.01, 0.05), ) if ((index % 10) == 0) else (rng.uniform(0, 0.0002), rng.uniform(0, 0.0002), )
+
+            rows.append((latitude, longitude, latitude + height, longitude + width, latitude + (height / 2), longitude + (width / 2), ))
+
+        bounds = numpy.array(rows, dtype=numpy.float64)
+
+        expected = CrossReferencer(bounds, oversized_extent=None)
+
+        self.assertEqual(len(expected.oversized), 0)
+
+        for oversized_extent in [1000.0, 0.0]:
+            crossreferencer = CrossReferencer(bounds, oversized_extent=oversized_extent)
+
+            self.assertEqual(len(crossreferencer.oversized), 30 if (oversized_extent > 0) else 300)
+
+            for (matches, expected_matches, ) in [(crossreferencer.query_bounds(bounds[::-1]), expected.query_bounds(bounds[::-1]), ), (crossreferencer.query_nearest_bounds(bounds, k=3), expected.query_nearest_bounds(bounds, k=3), )]:
+                # Matches are ordered by query.
+                self.assertTrue((numpy.diff(matches.query_index) >= 0).all())
+
+                self.assertEqual(sorted(zip(matches.query_index.tolist(), matches.reference_index.tolist(), matches.jaccard.tolist())), sorted(zip(expected_matches.query_index.tolist(), expected_matches.reference_index.tolist(), expected_matches.jaccard.tolist())))
+
+    def test_buildingid_crossref_cap_candidates(self):
+        matches = Matches(numpy.array([0, 0, 0, 1, 2, 2]), numpy.array([0, 1, 2, 0, 1, 2]), numpy.array([0.1, math.nan, 0.5, 0.2, 0.3, 0.3]))
+
+        (capped, exceeded, counts, ) = cap_candidates(matches, matches.query_index, 1)
+
+        self.assertEqual(list(zip(capped.query_index.tolist(), capped.reference_index.tolist())), [(0, 2, ), (1, 0, ), (2, 1, )])
+        self.assertEqual(exceeded.tolist(), [0, 2])
+        self.assertEqual(counts.tolist(), [3, 2])
+
+        (capped, exceeded, counts, ) = cap_candidates(matches, matches.reference_index, 1, policy='error')
+
+        self.assertEqual(list(zip(capped.query_index.tolist(), capped.reference_index.tolist())), [])
+        self.assertEqual(exceeded.tolist(), [0, 1, 2])
+
+        errors = []
+
+        left = pandas.DataFrame({'UBID': CODES_[0:3]}, index=[10, 20, 30])
+        right = pandas.DataFrame({'UBID': CODES_[0:3]})
+
+        data_frame = crossref_frames(left, right, max_candidates=2, candidates_policy='error', on_candidates_error=lambda *args: errors.append(args))
+
+        self.assertIsNone(data_frame)
+        self.assertEqual([(side, label, ) for (side, label, _, ) in errors], [('left', 10, ), ('left', 20, ), ('left', 30, )])
+        self.assertIsInstance(errors[0][2], TooManyCandidatesError)
+
+        data_frame = crossref_frames(left, right, max_candidates=1)
+
+        self.assertEqual(list(zip(data_frame['index_x'].tolist(), data_frame['index_y'].tolist())), [(10, 0, ), (20, 1, ), (30, 2, )])
+
+        with tempfile.TemporaryDirectory() as dirname:
+            left.rename(columns={'UBID': 'code_left'}).to_csv(os.path.join(dirname, 'left.csv'), index=False)
+
+            # The code field of the error file is named after the code fields of the input files (or "code" if they differ).
+            for (fieldname_code, expected_fieldname_code, ) in [('code_left', 'code_left', ), ('code_right', 'code', )]:
+                right.rename(columns={'UBID': fieldname_code}).to_csv(os.path.join(dirname, 'right.csv'), index=False)
+
+                result = CliRunner().invoke(cli, ['crossref', os.path.join(dirname, 'left.csv'), os.path.join(dirname, 'right.csv'), os.path.join(dirname, 'out.csv'), '--left-fieldname-code', 'code_left', '--right-fieldname-code', fieldname_code, '--max-candidates-per-row', '2', '--candidates-policy', 'error', '--errors', os.path.join(dirname, 'err.csv')])
+                self.assertEqual(result.exit_code, 0, result.output)
+
+                with open(os.path.join(dirname, 'err.csv')) as io_err:
+                    self.assertEqual(io_err.readline().rstrip('\n'), 'side,index,{0},UBID_Error_Name,UBID_Error_Message'.format(expected_fieldname_code))
+                    self.assertTrue(io_err.readline().startswith('left,0,{0},TooManyCandidatesError,'.format(CODES_[0])))
+
+    def test_buildingid_crossref_predicate(self):
+        bounds = numpy.array([[0, 0, 2, 2, 1, 1], [0, 0, 1, 1, 0.5, 0.5], [1, 1, 3, 3, 2, 2], [0, 0, 2, 2, 1, 1]], dtype=numpy.float64)
+        other = numpy.array([[0.5, 0.5, 1, 1, 0.75, 0.75], [0, 0, 2, 2, 1, 1], [0, 0, 2, 2, 1, 1], [0, 0, 2, 2, 1, 1]], dtype=numpy.float64)
+
+        self.assertEqual(predicate_mask(bounds, other, 'intersects').tolist(), [True, True, True, True])
+        self.assertEqual(predicate_mask(bounds, other, 'contains').tolist(), [True, False, False, True])
+        self.assertEqual(predicate_mask(bounds, other, 'within').tolist(), [False, True, False, True])
+
+        rng = random.Random(0)
+
+        rows = []
+
+        for index in range(200):
+            (latitude, longitude, ) = (38.9 + rng.uniform(0, 0.01), -77.0 + rng.uniform(0, 0.01), )
+            (height, width, ) = (rng.uniform(0, 0.002), rng.uniform(0, 0.002), ) if ((index % 4) == 0) else (rng.uniform(0, 0.0002), rng.uniform(0, 0.0002), )
+
+            rows.append((latitude, longitude, latitude + height, longitude + width, latitude + (height / 2), longitude + (width / 2), ))
+
+        (left_bounds, right_bounds, ) = (numpy.array(rows[:50], dtype=numpy.float64), numpy.array(rows[50:], dtype=numpy.float64), )
+
+        for predicate in ['contains', 'within']:
+            expected = sorted([(i, j, ) for i in range(len(left_bounds)) for j in range(len(right_bounds)) if predicate_mask(left_bounds[i:(i + 1)], right_bounds[j:(j + 1)], predicate)[0]])
+
+            self.assertTrue(len(expected) > 0)
+
+            # Query the quadtree for the right bounds with the left bounds, and vice versa (with the converse predicate).
+            matches = CrossReferencer(right_bounds).query_bounds(left_bounds, predicate=predicate, include_jaccard=False)
+
+            self.assertIsNone(matches.jaccard)
+            self.assertEqual(sorted(zip(matches.query_index.tolist(), matches.reference_index.tolist())), expected)
+
+            matches = CrossReferencer(left_bounds).query_bounds(right_bounds, predicate=('within' if (predicate == 'contains') else 'contains'))
+
+            self.assertEqual(sorted(zip(matches.reference_index.tolist(), matches.query_index.tolist())), expected)
+
+        left = pandas.DataFrame({'UBID': ['849VQJH6+95J-51-58-42-50', '849VQJH6+95J-0-0-0-0']})
+        right = pandas.DataFrame({'UBID': ['849VQJH6+95J-0-0-0-0', '849VQJH6+95J-51-58-42-50']})
+
+        data_frame = crossref_frames(left, right, predicate='contains', include_jaccard_field=False)
+
+        self.assertEqual(sorted(zip(data_frame['index_x'].tolist(), data_frame['index_y'].tolist())), [(0, 0, ), (0, 1, ), (1, 0, )])
+        self.assertNotIn('IoU', data_frame.columns)
+
+        data_frame = crossref_frames(left, right, predicate='within')
+
+        self.assertEqual(sorted(zip(data_frame['index_x'].tolist(), data_frame['index_y'].tolist())), [(0, 1, ), (1, 0, ), (1, 1, )])
+        self.assertTrue(data_frame['IoU'].notnull().all())
+
+        with self.assertRaises(ValueError):
+            crossref_frames(left, right, mode='nearest', predicate='contains')
+
+    def test_buildingid_crossref_update_frames(self):
+        def text_(data_frame):
+            return None if (data_frame is None) else data_frame.astype(str)
+
+        def pairs_(data_frame):
+            return sorted(zip(data_frame['id_x'].tolist(), data_frame['id_y'].tolist(), data_frame['index_x'].tolist(), data_frame['index_y'].tolist()))
+
+        left = pandas.DataFrame({'UBID': [CODES_[0], CODES_[1], CODES_[3], CODES_[2]], 'id': ['a', 'b', 'c', 'd']})
+        right = pandas.DataFrame({'UBID': [CODES_[1], CODES_[2], CODES_[3]], 'id': ['e', 'f', 'g']})
+
+        previous = text_(crossref_frames(left, right))
+
+        # Remove "a", modify "c" and add "h" (and move the rows), and remove "g".
+        left = pandas.DataFrame({'UBID': [CODES_[2], CODES_[1], CODES_[3], CODES_[2]], 'id': ['d', 'b', 'h', 'c']})
+        right = pandas.DataFrame({'UBID': [CODES_[1], CODES_[2]], 'id': ['e', 'f']})
+
+        (left_changed_ids, right_changed_ids, ) = ({'a', 'c', 'h'}, {'g'}, )
+
+        left_changed = left['id'].isin(left_changed_ids).values
+        right_changed = right['id'].isin(right_changed_ids).values
+
+        stats = Stats('crossref')
+
+        delta = crossref_frames(left, right, left_changed=left_changed, right_changed=right_changed, stats=stats)
+
+        self.assertEqual(stats.counters['partitions'], 1)
+        self.assertTrue(set(delta['id_x'].tolist()) <= left_changed_ids)
+
+        (data_frame, changes, ) = update_frames(previous, text_(delta), left['id'], right['id'], left_changed_ids, right_changed_ids, 'id_x', 'id_y', left_fieldname_index='index_x', right_fieldname_index='index_y')
+
+        self.assertEqual(pairs_(data_frame), pairs_(text_(crossref_frames(left, right))))
+        self.assertEqual(sorted(zip(changes['change'].tolist(), changes['id_x'].tolist(), changes['id_y'].tolist())), [('gained', 'c', 'e', ), ('gained', 'c', 'f', ), ('lost', 'a', 'e', ), ('lost', 'a', 'f', ), ('lost', 'c', 'g', )])
+
+        # Ids of the previous result must be in the current rows, or changed.
+        with self.assertRaises(ValueError):
+            update_frames(previous, text_(delta), left['id'], right['id'], {'c', 'h'}, right_changed_ids, 'id_x', 'id_y')
+
+        with self.assertRaises(ValueError):
+            crossref_frames(left, right, mode='nearest', left_changed=left_changed, right_changed=right_changed)
+
+    def test_buildingid_crossref_update_crossref_frames(self):
+        left = pandas.DataFrame({'UBID': [CODES_[0], CODES_[1], CODES_[3], CODES_[2]], 'id': [1, 2, 3, 4]})
+        right = pandas.DataFrame({'UBID': [CODES_[1], CODES_[2], CODES_[3]], 'id': [5, 6, 7]})
+
+        previous = to_csv_text(crossref_frames(left, right))
+
+        self.assertEqual(previous['id_x'].tolist()[0], '1')
+        self.assertIsNone(read_csv_text(io.StringIO('')))
+
+        # Remove 1, modify 3 and add 8 (and move the rows), and remove 7.
+        left = pandas.DataFrame({'UBID': [CODES_[2], CODES_[1], CODES_[3], CODES_[2]], 'id': [4, 2, 8, 3]})
+        right = pandas.DataFrame({'UBID': [CODES_[1], CODES_[2]], 'id': [5, 6]})
+
+        left_changed_ids = read_changed_ids([io.StringIO('id\n1\n3\n'), io.StringIO(''), io.StringIO('UBID,id\nx,8\n')], 'id')
+        right_changed_ids = read_changed_ids([io.StringIO('id;name\n7;"a;b"\n')], 'id', sep=';')
+
+        self.assertEqual((left_changed_ids, right_changed_ids, ), ({'1', '3', '8'}, {'7'}, ))
+
+        with self.assertRaises(ValueError):
+            read_changed_ids([io.StringIO('name\n1\n')], 'id')
+
+        stats = Stats('crossref')
+
+        (data_frame, changes, ) = update_crossref_frames(previous, left, right, left_changed_ids, right_changed_ids, 'id', 'id', stats=stats)
+
+        self.assertEqual(sorted(data_frame.values.tolist()), sorted(to_csv_text(crossref_frames(left, right)).values.tolist()))
+        self.assertEqual(sorted(zip(changes['change'].tolist(), changes['id_x'].tolist(), changes['id_y'].tolist())), [('gained', '3', '5', ), ('gained', '3', '6', ), ('lost', '1', '5', ), ('lost', '1', '6', ), ('lost', '3', '7', )])
+        self.assertEqual(stats.counters['rows_left_changed'], 2)
+
+        with self.assertRaises(ValueError):
+            update_crossref_frames(previous, left, right, left_changed_ids, right_changed_ids, 'name', 'id')
+
+    def test_buildingid_crossref_options_validate(self):
+        options = CrossrefOptions()
+
+        options.validate()
+
+        for (kwargs, name, ) in [
+            ({'left': options.left._replace(fieldname_geometry='WKT')}, '"left.fieldname_geometry"', ),
+            ({'right': options.right._replace(partition_field='county')}, '"right.partition_field"', ),
+            ({'mode': 'nearest', 'predicate': 'within'}, '"predicate"', ),
+            ({'shard': (0, 2, ), 'sort_order': 'ASC'}, '"sort_order"', ),
+            ({'shard': (0, 2, ), 'max_candidates': 2}, '"max_candidates"', ),
+            ({'previous': io.StringIO('')}, '"left.fieldname_id"', ),
+            ({'previous': io.StringIO(''), 'left': options.left._replace(fieldname_id='id'), 'right': options.right._replace(fieldname_id='id')}, '"left.include_fields"', ),
+            ({'left': options.left._replace(changes=(io.StringIO(''), ))}, '"previous"', ),
+            ({'left': options.left._replace(dtype={'id': 'category'})}, '"left.dtype"', ),
+            ({'fieldname_jaccard': 'index_y'}, '"index_y"', ),
+        ]:
+            with self.assertRaises(ValueError) as context:
+                options._replace(**kwargs).validate()
+
+            self.assertIn(name, str(context.exception))
+
+        # The options are named by the given function (e.g., the options of the "crossref" command).
+        with self.assertRaises(ValueError) as context:
+            options._replace(shard=(0, 2, ), sort_order='ASC').validate(option_name=crossref_option_name_)
+
+        self.assertIn('"--shard" cannot be used with options "--sort-by-jaccard", "--left-group-by-jaccard" and "--right-group-by-jaccard"', str(context.exception))
+
+        options._replace(previous=io.StringIO(''), left=options.left._replace(fieldname_id='id', include_fields=('id', )), right=options.right._replace(fieldname_id='id', include_fields=('id', ))).validate()
+
+    def test_buildingid_crossref_csv(self):
+        left = pandas.DataFrame({'UBID': [CODES_[0], CODES_[1], CODES_[3], CODES_[2]], 'id': [1, 2, 3, 4], 'use': ['Office', 'Retail', 'Office', 'Office']})
+        right = pandas.DataFrame({'UBID': [CODES_[1], CODES_[2], CODES_[3]], 'id': [5, 6, 7]})
+
+        options = CrossrefOptions()
+        options = options._replace(left=options.left._replace(include_fields=('id', 'use', ), fieldname_id='id'), right=options.right._replace(include_fields=('id', ), fieldname_id='id'))
+
+        stats = Stats('crossref')
+
+        result = crossref_csv(io.StringIO(left.to_csv(index=False)), io.StringIO(right.to_csv(index=False)), options, stats=stats)
+
+        # The fields of the input files are read as text (viz., the inferred types), so that the values are those that are written.
+        self.assertEqual(result.data_frame.to_csv(index=False), crossref_frames(left, right).to_csv(index=False))
+        self.assertIsNone(result.changes_data_frame)
+        self.assertEqual(result.errors, [])
+
+        for side in ['left', 'right', 'out']:
+            self.assertGreater(stats.counters['bytes_{0}'.format(side)], 0)
+
+        # The rows with more than the maximum number of candidates are returned with their UBIDs.
+        result = crossref_csv(io.StringIO(left.to_csv(index=False)), io.StringIO(right.to_csv(index=False)), options._replace(max_candidates=1, candidates_policy='error'))
+
+        self.assertEqual([(side, label, code, ) for (side, label, code, _, ) in result.errors], [('left', 0, CODES_[0], ), ('left', 1, CODES_[1], ), ('left', 3, CODES_[2], )])
+        self.assertIsInstance(result.errors[0][3], TooManyCandidatesError)
+
+        # For the incremental mode, the previous result is updated (see `update_crossref_frames`).
+        previous = io.StringIO(crossref_csv(io.StringIO(left.to_csv(index=False)), io.StringIO(right.to_csv(index=False)), options).data_frame.to_csv(index=False))
+
+        (left, right, ) = (left.iloc[[3, 1, 2]], right.iloc[[0, 1]], )
+
+        result = crossref_csv(io.StringIO(left.to_csv(index=False)), io.StringIO(right.to_csv(index=False)), options._replace(previous=previous, left=options.left._replace(changes=(io.StringIO('id\n1\n'), )), right=options.right._replace(changes=(io.StringIO('id\n7\n'), ))))
+
+        self.assertEqual(sorted(result.data_frame.values.tolist()), sorted(to_csv_text(crossref_frames(left.reset_index(drop=True), right.reset_index(drop=True))).values.tolist()))
+        self.assertEqual(sorted(result.changes_data_frame['change'].tolist()), ['lost', 'lost', 'lost'])
+
+        with self.assertRaises(ValueError):
+            crossref_csv(io.StringIO(left.to_csv(index=False)), io.StringIO(right.to_csv(index=False)), options._replace(right=options.right._replace(fieldname_code='code')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,15 +9,43 @@
 
 import io
 import re
+import typing
 import unittest
 
+from click.testing import CliRunner
 from openlocationcode import openlocationcode
 
 from ..context import buildingid
+from buildingid.command_line import cli
 from buildingid.command_line.dict_decoders import LatLngDictDecoder, WKBDictDecoder, WKTDictDecoder
 from buildingid.command_line.dict_encoders import BaseGeometryDictEncoder, ErrorDictEncoder
-from buildingid.command_line.dict_pipe import DictPipe
+from buildingid.command_line.dict_datum import DictDatum
+from buildingid.command_line.dict_pipe import DictDecoder, DictEncoder, DictPipe, LRUCache
 from buildingid.command_line.exceptions import FieldNotFoundError, FieldNotUniqueError
+from buildingid.stats import Stats
+
+class PointDictDecoder(DictDecoder[DictDatum]):
+    def decode(self, row: typing.Dict[str, str]) -> DictDatum:
+        return WKTDictDecoder('WKT').decode({'WKT': 'POINT ({0} {1})'.format(row['x'], row['y'])})
+
+    @property
+    def fieldnames(self) -> typing.List[str]:
+        return [
+            'x',
+            'y',
+        ]
+
+class LengthDictEncoder(DictEncoder[DictDatum]):
+    def encode(self, datum: DictDatum) -> typing.Dict[str, typing.Any]:
+        return {
+            'Length': datum.geom.length,
+        }
+
+    @property
+    def fieldnames(self) -> typing.List[str]:
+        return [
+            'Length',
+        ]
 
 class TestCSV(unittest.TestCase):
     def test_buildingid_csv_DictPipe_LatLngDictDecoder_FieldNotFoundError(self):
@@ -252,5 +280,109 @@ class TestCSV(unittest.TestCase):
         self.assertEqual('', io_out.getvalue())
         self.assertEqual('WKT,UBID_Error_Name,UBID_Error_Message\r\nx,WKTReadingError,Could not create geometry because of errors while reading input.\r\n', io_err.getvalue())
 
+    def test_buildingid_csv_DictPipe_LatLngDictDecoder_row_protocol(self):
+        decoder_in = LatLngDictDecoder('Latitude', 'Longitude')
+
+        encoder_out = BaseGeometryDictEncoder('UBID', openlocationcode.PAIR_CODE_LENGTH_)
+
+        encoder_err = ErrorDictEncoder('UBID')
+
+        dict_pipe = DictPipe(decoder_in, encoder_out, encoder_err)
+
+        io_in = io.StringIO('Longitude,x,Latitude\r\n0,1,0\r\n\r\n0\r\n0,1,0,2\r\n')
+        io_out = io.StringIO('')
+        io_err = io.StringIO('')
+
+        dict_pipe.run(io_in, io_out, io_err, args_in=[], kwargs_in={}, args_out=[], kwargs_out={})
+
+        self.assertEqual('Longitude,x,Latitude,UBID\r\n0,1,0,6FG22222+22-0-0-0-0\r\n', io_out.getvalue())
+        self.assertEqual('Longitude,x,Latitude,UBID_Error_Name,UBID_Error_Message\r\n0,,,ValueError,could not convert string to float: \'\'\r\n0,1,0,ValueError,row has more fields than header\r\n', io_err.getvalue())
+
+    def test_buildingid_csv_DictPipe_dict_adapter(self):
+        decoder_in = PointDictDecoder()
+
+        encoder_out = LengthDictEncoder()
+
+        encoder_err = ErrorDictEncoder('UBID')
+
+        dict_pipe = DictPipe(decoder_in, encoder_out, encoder_err)
+
+        io_in = io.StringIO('y,x\r\n0,0\r\n0,x\r\n')
+        io_out = io.StringIO('')
+        io_err = io.StringIO('')
+
+        dict_pipe.run(io_in, io_out, io_err, args_in=[], kwargs_in={}, args_out=[], kwargs_out={})
+
+        self.assertEqual('y,x,Length\r\n0,0,0.0\r\n', io_out.getvalue())
+        self.assertTrue(io_err.getvalue().startswith('y,x,UBID_Error_Name,UBID_Error_Message\r\n0,x,'))
+
+    def test_buildingid_csv_LRUCache(self):
+        cache = LRUCache(2)
+
+        cache.put('a', 1)
+        cache.put('b', 2)
+
+        self.assertEqual(cache.get('a'), 1)
+
+        # The least recently used entry is evicted.
+        cache.put('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses, ), (3, 1, ))
+
+        with self.assertRaises(ValueError):
+            LRUCache(0)
+
+    def test_buildingid_csv_DictPipe_cache(self):
+        value_in = 'n,WKT\r\n' + ''.join(['{0},{1}\r\n'.format(n, wktstr) for (n, wktstr, ) in enumerate(['POINT (0 0)', 'POINT (1 1)', 'POINT (0 0)', 'POINT ((', 'POINT (2 2)', 'POINT ((', 'POINT (0 0)'])])
+
+        values = []
+
+        for (cache_size, batch_size, ) in [(0, 1024, ), (1, 1, ), (2, 1024, ), (1024, 2, )]:
+            dict_pipe = DictPipe(WKTDictDecoder('WKT'), BaseGeometryDictEncoder('UBID', openlocationcode.PAIR_CODE_LENGTH_), ErrorDictEncoder('UBID'), cache_size=cache_size)
+
+            io_in = io.StringIO(value_in)
+            io_out = io.StringIO('')
+            io_err = io.StringIO('')
+
+            stats = Stats('append2csv')
+
+            dict_pipe.run(io_in, io_out, io_err, args_in=[], kwargs_in={}, args_out=[], kwargs_out={}, batch_size=batch_size, stats=stats)
+
+            values.append((io_out.getvalue(), io_err.getvalue(), ))
+
+            # Cached errors are counted for each row.
+            self.assertEqual(stats.counters['rows_err'], 2)
+            self.assertEqual(sum(stats.errors.values()), 2)
+
+            if cache_size == 0:
+                self.assertNotIn('cache_hits', stats.counters)
+            else:
+                self.assertEqual(stats.counters['cache_hits'] + stats.counters['cache_misses'], 7)
+
+                if cache_size >= 4:
+                    # Each distinct geometry is decoded and encoded once (even in the same batch).
+                    self.assertEqual(stats.counters['cache_misses'], 4)
+
+        # The output and error files are the same, with or without the cache.
+        self.assertEqual(len(set(values)), 1)
+        self.assertEqual(values[0][0].count('\r\n'), 6)
+
+    def test_buildingid_csv_append2csv_errors_dash(self):
+        value_in = 'Latitude,Longitude\r\n0,0\r\nx,0\r\n'
+
+        for args in [[], ['--errors', '-']]:
+            result = CliRunner().invoke(cli, ['append2csv', 'latlng'] + args, input=value_in)
+
+            self.assertEqual(result.exit_code, 0, result.output)
+
+            # The error file is written to the standard error stream, not to the output file.
+            self.assertEqual(len(result.stdout.splitlines()), 2)
+            self.assertNotIn('UBID_Error_Name', result.stdout)
+            self.assertIn('UBID_Error_Name', result.stderr)
+
 if __name__ == '__main__':
     unittest.main()
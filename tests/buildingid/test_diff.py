@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_diff.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import os
+import random
+import tempfile
+import unittest
+
+import pandas
+
+from ..context import buildingid
+from buildingid.command_line.diff import classify_frames, iter_diff
+
+# The number of degrees of longitude per meter (at latitude 38.9).
+DEGREES_PER_METER_ = 1.0 / 86660.0
+
+def code_(latitude, longitude, size=0.00002, height=None):
+    if height is None:
+        height = size
+
+    return buildingid.code.encode(latitude, longitude, latitude + height, longitude + size, latitude + (height / 2), longitude + (size / 2), codeLength=11)
+
+class TestDiff(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_buildingid_diff_classify_frames(self):
+        # The old rows "A" and "B" are about 5 and 10 meters east of the new
+        # row "1", and about 20 and 25 meters east of the new row "2".
+        old_data_frame = pandas.DataFrame({'UBID': [code_(38.9, -77.1 + (5 * DEGREES_PER_METER_)), code_(38.9, -77.1 + (10 * DEGREES_PER_METER_))]}, index=['A', 'B'])
+        new_data_frame = pandas.DataFrame({'UBID': [code_(38.9, -77.1), code_(38.9, -77.1 - (15 * DEGREES_PER_METER_))]}, index=['1', '2'])
+
+        pairs = classify_frames(old_data_frame, new_data_frame, max_distance=40.0)
+
+        # The nearest row of "B" is matched to "A", so that "B" is matched to its next nearest row.
+        self.assertEqual(sorted(zip(pairs['change'].tolist(), pairs['old'].tolist(), pairs['new'].tolist())), [('moved', 'A', '1', ), ('moved', 'B', '2', )])
+        self.assertTrue(all(pairs['distance'] <= 40.0))
+
+        pairs = classify_frames(old_data_frame, new_data_frame, max_distance=20.0)
+
+        self.assertEqual(sorted(zip(pairs['old'].tolist(), pairs['new'].tolist())), [('A', '1', )])
+
+        # The rows with intersecting UBID bounding boxes changed (viz., the greatest Jaccard similarity coefficient first).
+        old_data_frame = pandas.DataFrame({'UBID': [code_(38.9, -77.1, size=0.0002), code_(38.9, -77.1, size=0.00019)]})
+        new_data_frame = pandas.DataFrame({'UBID': [code_(38.9, -77.1, size=0.00019), code_(38.9, -77.0, size=0.0002)]})
+
+        pairs = classify_frames(old_data_frame, new_data_frame, jaccard_min=0.5, max_distance=0.0)
+
+        self.assertEqual(pairs['change'].tolist(), ['changed'])
+        self.assertEqual((pairs['old'].tolist(), pairs['new'].tolist(), ), ([1], [0], ))
+        self.assertEqual(pairs['jaccard'].tolist(), [1.0])
+
+        self.assertEqual(len(classify_frames(old_data_frame.iloc[0:0], new_data_frame)), 0)
+
+    def test_buildingid_diff_iter_diff_shards(self):
+        rng = random.Random(0)
+
+        (old_rows, new_rows, ) = ([], [], )
+
+        for index in range(300):
+            (latitude, longitude, ) = (38.9 + rng.uniform(0, 0.2), -77.1 + rng.uniform(0, 0.2), )
+
+            old_rows.append([str(index), code_(latitude, longitude, size=0.0001)])
+
+            change = index % 6
+
+            # Unchanged, moved (by 6 to 20 meters), changed (viz., extended north by about 3 meters) or removed.
+            if change in (0, 1, ):
+                new_rows.append([str(index), code_(latitude, longitude, size=0.0001)])
+            elif change in (2, 3, ):
+                new_rows.append([str(index), code_(latitude, longitude + (rng.uniform(6, 20) * DEGREES_PER_METER_), size=0.0001)])
+            elif change == 4:
+                new_rows.append([str(index), code_(latitude, longitude, size=0.0001, height=0.00013)])
+
+        for index in range(300, 330):
+            new_rows.append([str(index), code_(38.9 + rng.uniform(0, 0.2), -77.1 + rng.uniform(0, 0.2), size=0.0001)])
+
+        rng.shuffle(new_rows)
+
+        results = []
+
+        for shard_size in [1000, 10]:
+            dirname = os.path.join(self.tmpdir.name, str(shard_size))
+            os.mkdir(dirname)
+
+            rows = list(iter_diff(iter([['id', 'UBID']] + old_rows), iter([['id', 'UBID']] + new_rows), dirname, include_fields=['id'], shard_size=shard_size, chunk_size=50, fan_in=2))
+
+            self.assertEqual(rows[0], ['change', 'UBID_old', 'UBID_new', 'IoU', 'distance', 'id_old', 'id_new'])
+
+            # Each changed row of the old and new input files is written once.
+            self.assertEqual(sorted([row[5] for row in rows[1:] if row[5] != '']), sorted([row[0] for row in old_rows if (int(row[0]) % 6) not in (0, 1, )]))
+            self.assertEqual(sorted([row[6] for row in rows[1:] if row[6] != '']), sorted([row[0] for row in new_rows if (int(row[0]) >= 300) or ((int(row[0]) % 6) not in (0, 1, ))]))
+
+            for row in rows[1:]:
+                index = int(row[5] or row[6])
+
+                self.assertEqual(row[0], 'added' if (index >= 300) else {2: 'moved', 3: 'moved', 4: 'changed', 5: 'removed'}[index % 6], row)
+
+            results.append(sorted(rows[1:]))
+
+        self.assertEqual(results[0], results[1])
+
+if __name__ == '__main__':
+    unittest.main()
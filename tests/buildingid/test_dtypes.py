@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_dtypes.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+import pandas
+
+from click.testing import CliRunner
+
+from ..context import buildingid
+from buildingid.command_line import cli
+from buildingid.dtypes import format_bytes, infer_dtypes, parse_dtype, sample_dtypes, string_dtype
+
+CODES_ = [
+    '849VQJH6+95J-51-58-42-50',
+    '849VQJH6+95J-1-1-1-1',
+    '849VQJH6+95J-0-0-0-0',
+    '8FVC9G8F+6X-0-0-0-0',
+]
+
+class TestDtypes(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_buildingid_dtypes_infer_dtypes(self):
+        sample = pandas.DataFrame({
+            'UBID': ['a', 'a', 'b', 'c', 'd', 'e'],
+            'use': ['Office', 'Office', None, 'Retail', 'Office', 'Retail'],
+            'name': ['u', 'v', 'w', 'x', 'y', 'z'],
+            'area': [1.0, 2.5, None, 4.0, 5.0, 6.0],
+            'floors': [1, 2, 3, 4, 5, 6],
+        })
+
+        self.assertEqual(infer_dtypes(sample, ['UBID']), {
+            'UBID': string_dtype(),
+            'use': 'category',
+            'name': string_dtype(),
+        })
+
+        self.assertEqual(infer_dtypes(sample, ['UBID'], max_category_ratio=1.0)['name'], 'category')
+
+    def test_buildingid_dtypes_sample_dtypes(self):
+        path = os.path.join(self.tmpdir.name, 'sample.csv')
+
+        pandas.DataFrame({
+            'UBID': ['a', 'b', 'c', 'd'],
+            'use': ['Office', 'Office', 'Office', 'Retail'],
+            'name': ['w', 'x', 'y', 'z'],
+        }).to_csv(path, index=False)
+
+        with open(path, 'r') as f:
+            f.readline()
+
+            offset = f.tell()
+
+            # The header is given, and only the first 3 rows are sampled.
+            self.assertEqual(sample_dtypes(f, ['UBID', None], sample_size=3, header=None, names=['UBID', 'use', 'name']), {
+                'UBID': string_dtype(),
+                'use': 'category',
+                'name': string_dtype(),
+            })
+
+            # The position is restored.
+            self.assertEqual(f.tell(), offset)
+
+        (fd_r, fd_w, ) = os.pipe()
+
+        os.close(fd_w)
+
+        with os.fdopen(fd_r, 'r') as f:
+            self.assertIsNone(sample_dtypes(f))
+
+    def test_buildingid_dtypes_parse_dtype(self):
+        self.assertEqual(str(parse_dtype('category')), 'category')
+        self.assertEqual(str(parse_dtype('float32')), 'float32')
+        self.assertEqual(parse_dtype('str'), string_dtype())
+
+        with self.assertRaises(ValueError):
+            parse_dtype('bogus')
+
+        self.assertEqual(format_bytes(512), '512 B')
+        self.assertEqual(format_bytes(1536), '1.5 KiB')
+        self.assertEqual(format_bytes(3 * 1024 * 1024), '3.0 MiB')
+
+    def test_buildingid_dtypes_crossref(self):
+        paths = {}
+
+        for (name, rows, ) in [
+            ('left', [[code, 'Office' if (index % 3) else '', str(index), '{0}.5'.format(index)] for (index, code, ) in enumerate(CODES_ * 5)], ),
+            ('right', [[code, 'Retail', str(index), '{0}.25'.format(index)] for (index, code, ) in enumerate(CODES_)], ),
+        ]:
+            paths[name] = os.path.join(self.tmpdir.name, '{0}.csv'.format(name))
+
+            with open(paths[name], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['UBID', 'use', 'id', 'area'])
+                writer.writerows(rows)
+
+        outputs = []
+
+        for args in [['--infer-dtypes'], ['--no-infer-dtypes'], ['--left-dtype', 'use=category', '--right-dtype', 'id=str', '--dtype-sample-size', '3']]:
+            stats_path = os.path.join(self.tmpdir.name, 'stats.json')
+
+            result = CliRunner().invoke(cli, ['crossref', paths['left'], paths['right'], '-', '--include-left-field', 'use', '--include-left-field', 'area', '--include-right-field', 'id', '--include-right-field', 'use', '--stats', stats_path] + args)
+
+            self.assertEqual(result.exit_code, 0, result.output)
+
+            outputs.append(result.stdout_bytes)
+
+            with open(stats_path, 'r') as f:
+                counters = json.load(f)['counters']
+
+            for side in ['left', 'right', 'out']:
+                self.assertGreater(counters['bytes_{0}'.format(side)], 0)
+
+        # The values in the output file are the same.
+        self.assertEqual(len(set(outputs)), 1)
+
+        result = CliRunner().invoke(cli, ['crossref', paths['left'], paths['right'], '-', '--left-dtype', 'name=category'])
+        self.assertEqual(result.exit_code, 2)
+
+        result = CliRunner().invoke(cli, ['crossref', paths['left'], paths['right'], '-', '--include-left-field', 'use', '--left-dtype', 'use=bogus'])
+        self.assertEqual(result.exit_code, 2)
+
+if __name__ == '__main__':
+    unittest.main()
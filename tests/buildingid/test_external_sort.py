@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_external_sort.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import csv
+import os
+import random
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from ..context import buildingid
+from buildingid.command_line import cli
+from buildingid.command_line.external_sort import iter_sorted, merge_join
+
+class TestExternalSort(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_buildingid_external_sort_iter_sorted(self):
+        rng = random.Random(0)
+
+        rows = [[str(rng.randrange(100)), str(index), 'a,"b"\nc'] for index in range(1000)]
+
+        # Stable (viz., the row numbers of equal keys are in order).
+        expected = sorted(rows, key=lambda row: row[0])
+
+        for (chunk_size, fan_in, ) in [(2000, 2, ), (1000, 2, ), (7, 2, ), (100, 3, ), (1, 64, )]:
+            self.assertEqual(list(iter_sorted(rows, key=lambda row: row[0], dirname=self.tmpdir.name, chunk_size=chunk_size, fan_in=fan_in)), expected)
+
+            # The runs are deleted.
+            self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+        self.assertEqual(list(iter_sorted([], key=lambda row: row[0], dirname=self.tmpdir.name)), [])
+
+        with self.assertRaises(ValueError):
+            list(iter_sorted(rows, key=lambda row: row[0], dirname=self.tmpdir.name, fan_in=1))
+
+    def test_buildingid_external_sort_merge_join(self):
+        left = [['a', '0'], ['b', '1'], ['b', '2'], ['d', '3']]
+        right = [['b', '4'], ['c', '5'], ['d', '6'], ['d', '7'], ['e', '8']]
+
+        self.assertEqual(list(merge_join(left, right, lambda row: row[0], lambda row: row[0])), [
+            (['a', '0'], None, ),
+            (['b', '1'], ['b', '4'], ),
+            (['b', '2'], None, ),
+            (None, ['c', '5'], ),
+            (['d', '3'], ['d', '6'], ),
+            (None, ['d', '7'], ),
+            (None, ['e', '8'], ),
+        ])
+
+        self.assertEqual(list(merge_join([], right[:1], lambda row: row[0], lambda row: row[0])), [(None, ['b', '4'], )])
+
+    def test_buildingid_external_sort_diff(self):
+        old_rows = [
+            # Unchanged (in another order).
+            ['0', '849VQJH6+95J-0-0-0-0'],
+            ['1', '87C4VV4J+F2J-4-2-3-3'],
+            # Changed (viz., the same centroid cell).
+            ['2', '87C4XX88+HRX-3-2-3-3'],
+            # Moved (viz., a few meters).
+            ['3', '87C4XXQG+989-0-0-0-0'],
+            # Removed.
+            ['4', '8FVC9G8F+6X-0-0-0-0'],
+            ['5', ''],
+        ]
+
+        new_rows = [
+            ['1', '87C4VV4J+F2J-4-2-3-3'],
+            ['0', '849vqjh6+95j-0-0-0-0'],
+            ['2', '87C4XX88+HRX-4-2-3-3'],
+            ['3', '87C4XXQG+98C-0-0-0-0'],
+            # Added.
+            ['6', '87C5W3R4+9JH-4-3-4-4'],
+        ]
+
+        paths = {}
+
+        for (name, rows, ) in [('old', old_rows, ), ('new', new_rows, )]:
+            paths[name] = os.path.join(self.tmpdir.name, '{0}.csv'.format(name))
+
+            with open(paths[name], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['id', 'UBID'])
+                writer.writerows(rows)
+
+        for chunk_size in [1, 100]:
+            result = CliRunner().invoke(cli, ['diff', paths['old'], paths['new'], '-', '--include-field', 'id', '--chunk-size', str(chunk_size), '--fan-in', '2'])
+
+            self.assertEqual(result.exit_code, 0, result.output)
+
+            rows = list(csv.DictReader(result.stdout_bytes.decode('utf-8').splitlines(keepends=True)))
+
+            self.assertEqual([(row['change'], row['id_old'], row['id_new'], ) for row in rows], [
+                ('added', '', '6', ),
+                ('removed', '4', '', ),
+                ('removed', '5', '', ),
+                ('changed', '2', '2', ),
+                ('moved', '3', '3', ),
+            ])
+            self.assertTrue(0.0 < float(rows[3]['IoU']) < 1.0)
+            self.assertTrue(0.0 < float(rows[4]['distance']) <= 25.0)
+
+        result = CliRunner().invoke(cli, ['diff', paths['old'], paths['new'], '-', '--include-field', 'name'])
+        self.assertEqual(result.exit_code, 1)
+
+if __name__ == '__main__':
+    unittest.main()
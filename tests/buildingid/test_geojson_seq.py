@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_geojson_seq.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+from openlocationcode import openlocationcode
+
+from ..context import buildingid
+from buildingid.command_line import cli
+from buildingid.command_line.dict_decoders import GeoJSONDictDecoder
+from buildingid.command_line.dict_encoders import BaseGeometryDictEncoder, ErrorDictEncoder
+from buildingid.command_line.geojson_seq_pipe import GeoJSONSeqPipe
+
+class TestGeoJSONSeq(unittest.TestCase):
+    def test_buildingid_geojson_seq_GeoJSONSeqPipe(self):
+        decoder_in = GeoJSONDictDecoder()
+
+        encoder_out = BaseGeometryDictEncoder('UBID', openlocationcode.PAIR_CODE_LENGTH_)
+
+        encoder_err = ErrorDictEncoder('UBID')
+
+        geojson_seq_pipe = GeoJSONSeqPipe(decoder_in, encoder_out, encoder_err)
+
+        io_in = io.StringIO('\n'.join([
+            '{"type":"Feature","geometry":{"type":"Point","coordinates":[0,0]},"properties":{"id":1}}',
+            '',
+            '\x1e{"type":"Feature","geometry":{"type":"Point","coordinates":[0,0]},"properties":null}',
+            '{"type":"Feature","geometry":null,"properties":{"id":3}}',
+            '{"type":"Feature","geometry":{"type":"Point","coordinates":[0,0]},"properties":{"UBID":"x"}}',
+            'x',
+        ]))
+        io_out = io.StringIO('')
+        io_err = io.StringIO('')
+
+        geojson_seq_pipe.run(io_in, io_out, io_err, batch_size=2)
+
+        out_features = [json.loads(line) for line in io_out.getvalue().splitlines()]
+        err_features = [json.loads(line) for line in io_err.getvalue().splitlines()]
+
+        self.assertEqual([feature['properties'] for feature in out_features], [
+            {'id': 1, 'UBID': '6FG22222+22-0-0-0-0'},
+            {'UBID': '6FG22222+22-0-0-0-0'},
+        ])
+        self.assertEqual([feature['properties'].get('UBID_Error_Name') for feature in err_features], [
+            'ValueError',
+            'FieldNotUniqueError',
+            'JSONDecodeError',
+        ])
+        self.assertEqual(err_features[0]['properties']['id'], 3)
+
+    def test_buildingid_geojson_seq_append2geojson_OSError(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            for args in [['--input', os.path.join(dirname, 'in.geojsonl')], ['--output', os.path.join(dirname, 'x', 'out.geojsonl')]]:
+                result = CliRunner().invoke(cli, ['append2geojson'] + args, input='')
+
+                # The error is reported, rather than raised.
+                self.assertEqual(result.exit_code, 1)
+                self.assertIsInstance(result.exception, SystemExit)
+                self.assertIn('Error: [Errno 2]', result.output)
+
+if __name__ == '__main__':
+    unittest.main()
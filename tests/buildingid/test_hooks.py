@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_hooks.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import io
+import json
+import os
+import pstats
+import tempfile
+import unittest
+
+from ..context import buildingid
+from buildingid import hooks
+from buildingid.command_line.dict_decoders import LatLngDictDecoder
+from buildingid.command_line.dict_encoders import BaseGeometryDictEncoder, ErrorDictEncoder
+from buildingid.command_line.dict_pipe import DictPipe
+
+class RecordingHook(hooks.Hook):
+    def __init__(self):
+        super(RecordingHook, self).__init__()
+
+        self.calls = []
+        self.closed = False
+
+    def begin(self, name, size):
+        self.calls.append(('begin', name, size, ))
+
+    def end(self, name, size):
+        self.calls.append(('end', name, size, ))
+
+    def close(self):
+        self.closed = True
+
+class TestHooks(unittest.TestCase):
+    def test_buildingid_hooks_span_disabled(self):
+        self.assertIs(hooks.span('a', 1), hooks.span('b', 2))
+
+    def test_buildingid_hooks_installed(self):
+        hook = RecordingHook()
+
+        with hooks.installed([hook]):
+            with hooks.span('a', 2):
+                pass
+
+        self.assertEqual(hook.calls, [('begin', 'a', 2, ), ('end', 'a', 2, )])
+        self.assertTrue(hook.closed)
+        self.assertEqual(hooks.HOOKS_, [])
+
+    def test_buildingid_hooks_DictPipe(self):
+        hook = RecordingHook()
+
+        dict_pipe = DictPipe(LatLngDictDecoder('Latitude', 'Longitude'), BaseGeometryDictEncoder('UBID', 11), ErrorDictEncoder('UBID'))
+
+        io_in = io.StringIO('Latitude,Longitude\r\n1,2\r\n3,4\r\n5,6\r\n')
+
+        with hooks.installed([hook]):
+            dict_pipe.run(io_in, io.StringIO(), io.StringIO(), batch_size=2)
+
+        self.assertEqual([call for call in hook.calls if call[0] == 'begin'], [
+            ('begin', 'dict_pipe.batch', 2, ),
+            ('begin', 'dict_pipe.decode', 2, ),
+            ('begin', 'code.encode', 2, ),
+            ('begin', 'dict_pipe.batch', 1, ),
+            ('begin', 'dict_pipe.decode', 1, ),
+            ('begin', 'code.encode', 1, ),
+        ])
+
+    def test_buildingid_hooks_builtins(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            prefix = os.path.join(dirname, 'profile')
+
+            with hooks.installed(hooks.make_hooks(hooks.HOOK_NAMES, every=2, prefix=prefix)):
+                for _ in range(3):
+                    with hooks.span('a', 10):
+                        sum(range(1000))
+
+            with open('{0}.timing.json'.format(prefix), 'r') as f:
+                data = json.load(f)
+
+            self.assertEqual(data['a']['count'], 3)
+            self.assertEqual(data['a']['items'], 30)
+            self.assertEqual(sum(data['a']['buckets_us'].values()), 3)
+
+            with open('{0}.tracemalloc.txt'.format(prefix), 'r') as f:
+                lines = [line for line in f if line.startswith('[')]
+
+            self.assertEqual(len(lines), 2)
+
+            self.assertGreater(pstats.Stats('{0}.cprofile'.format(prefix)).total_calls, 0)
+
+if __name__ == '__main__':
+    unittest.main()
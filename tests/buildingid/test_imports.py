@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_imports.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from ..context import buildingid
+
+def imported_modules_(source, modules):
+    """Return the names of the given modules that are imported by the given source code (in a new Python process).
+    """
+
+    cwd = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+    completed = subprocess.run([sys.executable, '-c', '{0}\nimport json, sys\nprint(json.dumps([name for name in {1!r} if name in sys.modules]))'.format(source, list(modules))], cwd=cwd, stdout=subprocess.PIPE, check=True)
+
+    return json.loads(completed.stdout.decode('utf-8').splitlines()[-1])
+
+class TestImports(unittest.TestCase):
+    def test_buildingid_code_imports(self):
+        self.assertEqual(imported_modules_('import buildingid.code', ['pkg_resources', 'click', 'pandas', 'shapely']), [])
+
+    def test_buildingid_command_line_imports(self):
+        self.assertEqual(imported_modules_('import buildingid.command_line', ['pkg_resources', 'numpy', 'pandas', 'pyqtree', 'shapely', 'tqdm']), [])
+
+    def test_buildingid_command_line_append2csv_help_imports(self):
+        self.assertEqual(imported_modules_('from buildingid.command_line import cli\ntry:\n    cli([\'append2csv\', \'--help\'])\nexcept SystemExit:\n    pass', ['pandas', 'pyqtree', 'tqdm']), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_open_text_stream.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import os
+import tempfile
+import unittest
+
+from ..context import buildingid
+from buildingid.command_line.open_text_stream import compression_for_path, open_text_stream
+
+class TestOpenTextStream(unittest.TestCase):
+    def test_buildingid_open_text_stream_compression_for_path(self):
+        self.assertEqual(compression_for_path('in.csv'), None)
+        self.assertEqual(compression_for_path('in.csv.gz'), 'gzip')
+        self.assertEqual(compression_for_path('in.csv.BZ2'), 'bz2')
+        self.assertEqual(compression_for_path('in.csv.xz'), 'xz')
+        self.assertEqual(compression_for_path('in.csv.zst'), 'zstd')
+
+    def test_buildingid_open_text_stream_roundtrip(self):
+        value = 'WKT,UBID\r\n"POINT (0 0)",6FG22222+22-0-0-0-0\r\n'
+
+        with tempfile.TemporaryDirectory() as dirname:
+            for basename in ['out.csv', 'out.csv.gz', 'out.csv.bz2', 'out.csv.xz']:
+                path = os.path.join(dirname, basename)
+
+                with open_text_stream(path, 'w', buffer_size=16) as io_out:
+                    io_out.write(value)
+
+                # Compression is detected from the magic number, not the extension.
+                os.rename(path, path + '.data')
+
+                with open_text_stream(path + '.data', 'r', buffer_size=16) as io_in:
+                    self.assertEqual(io_in.read(), value)
+
+if __name__ == '__main__':
+    unittest.main()
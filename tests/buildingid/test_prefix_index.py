@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_prefix_index.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import csv
+import os
+import random
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from ..context import buildingid
+from buildingid.code import decode, encode
+from buildingid.command_line import cli
+from buildingid.command_line.prefix_index import PrefixIndex, intersects_, iter_records, olc_digits
+
+def rows_(count, seed=0):
+    rng = random.Random(seed)
+
+    rows = []
+
+    for index in range(count):
+        (latitude, longitude, ) = (38.5 + rng.uniform(0, 1.5), -77.5 + rng.uniform(0, 1.5), )
+        (height, width, ) = (rng.uniform(0, 0.001), rng.uniform(0, 0.001), )
+
+        code = encode(latitude, longitude, latitude + height, longitude + width, latitude + (height / 2), longitude + (width / 2), codeLength=rng.choice([6, 8, 11, 11]))
+
+        # Quoted fields with newlines and quote characters.
+        rows.append([str(index), code, 'a\n"b"' if (index % 7) == 0 else 'c'])
+
+    rows.append([str(count), 'bad', 'c'])
+
+    return rows
+
+class TestPrefixIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        self.rows = rows_(1000)
+
+        self.paths = {}
+
+        for (name, rows, ) in [('sorted', sorted(self.rows, key=lambda row: row[1]), ), ('unsorted', self.rows, )]:
+            self.paths[name] = os.path.join(self.tmpdir.name, '{0}.csv'.format(name))
+
+            with open(self.paths[name], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['id', 'UBID', 'note'])
+                writer.writerows(rows)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def query_(self, path, *args):
+        result = CliRunner().invoke(cli, ['query', path] + list(args))
+
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        rows = list(csv.reader(result.stdout_bytes.decode('utf-8').splitlines(keepends=True)))
+
+        self.assertEqual(rows[0], ['id', 'UBID', 'note'])
+
+        return sorted(rows[1:])
+
+    def expected_(self, predicate):
+        expected = []
+
+        for row in self.rows:
+            try:
+                codeArea = decode(row[1])
+            except (AssertionError, ValueError, ):
+                continue
+
+            if predicate(row[1], codeArea):
+                expected.append(row)
+
+        return sorted(expected)
+
+    def test_buildingid_prefix_index_iter_records(self):
+        data = b'a,b\n1,"x\ny"\n2,"""z"""\n3,w'
+
+        self.assertEqual([data[start:end] for (start, end, ) in iter_records(data, 0, len(data))], [b'a,b\n', b'1,"x\ny"\n', b'2,"""z"""\n', b'3,w'])
+
+    def test_buildingid_prefix_index_olc_digits(self):
+        self.assertEqual(olc_digits('849vqj00+-0-0-0-0'), '849VQJ')
+        self.assertEqual(olc_digits('849VQJH6+95J-51-58-42-50'), '849VQJH695J')
+
+    def test_buildingid_prefix_index_open(self):
+        path = self.paths['sorted']
+        index_path = path + '.bidx'
+
+        self.assertIsNone(PrefixIndex.open(index_path, path, 'UBID', [2, 4, 6, 8], ',', '"'))
+
+        index = PrefixIndex.build(index_path, path, 'UBID', [8, 2, 4, 6], ',', '"')
+        index.close()
+
+        self.assertEqual(index.meta['rows'], 1001)
+        self.assertEqual(index.meta['rows_indexed'], 1000)
+        self.assertTrue(index.meta['sorted'])
+
+        index = PrefixIndex.open(index_path, path, 'UBID', [2, 4, 6, 8], ',', '"')
+        self.assertIsNotNone(index)
+        index.close()
+
+        # Stale indexes (e.g., other levels, or the file has changed).
+        self.assertIsNone(PrefixIndex.open(index_path, path, 'UBID', [2, 4], ',', '"'))
+
+        with open(path, 'a') as f:
+            f.write('9999,849VQJH6+95J-51-58-42-50,c\n')
+
+        self.assertIsNone(PrefixIndex.open(index_path, path, 'UBID', [2, 4, 6, 8], ',', '"'))
+
+        index = PrefixIndex.build(index_path, self.paths['unsorted'], 'UBID', [2, 4, 6, 8], ',', '"')
+        index.close()
+
+        self.assertFalse(index.meta['sorted'])
+
+    def test_buildingid_prefix_index_query(self):
+        bbox = (38.9, -77.1, 39.0, -77.0, )
+
+        codeArea = decode(self.rows[0][1])
+
+        for path in self.paths.values():
+            self.assertEqual(self.query_(path, '--bbox', ','.join([str(value) for value in bbox])), self.expected_(lambda code, codeArea: intersects_(codeArea, bbox)))
+            self.assertEqual(self.query_(path, '--olc-prefix', '87c4'), self.expected_(lambda code, codeArea: olc_digits(code).startswith('87C4')))
+            self.assertEqual(self.query_(path, '--olc-prefix', '87C4VV'), self.expected_(lambda code, codeArea: olc_digits(code).startswith('87C4VV')))
+            self.assertEqual(self.query_(path, '--ubid-intersects', self.rows[0][1]), self.expected_(lambda code, other: intersects_(other, (codeArea.latitudeLo, codeArea.longitudeLo, codeArea.latitudeHi, codeArea.longitudeHi, ))))
+
+            # Small bounding boxes are looked up at the finest level.
+            self.assertEqual(self.query_(path, '--bbox', '38.5,-77.5,38.52,-77.48', '--rebuild-index', '--index-levels', '2,4'), self.expected_(lambda code, codeArea: intersects_(codeArea, (38.5, -77.5, 38.52, -77.48, ))))
+
+        result = CliRunner().invoke(cli, ['query', self.paths['sorted'], '--bbox', '1,2,3,4', '--olc-prefix', '87'])
+        self.assertEqual(result.exit_code, 2)
+
+        result = CliRunner().invoke(cli, ['query', self.paths['sorted'], '--olc-prefix', '8'])
+        self.assertEqual(result.exit_code, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_rollup.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import collections
+import csv
+import os
+import random
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from ..context import buildingid
+from buildingid.code import decode, encode
+from buildingid.command_line import cli
+from buildingid.command_line.prefix_index import olc_digits
+from buildingid.command_line.rollup import HashAggregate, olc_for_digits, parse_code
+
+class TestRollup(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_buildingid_rollup_parse_code(self):
+        for (code, ) in [
+            ('849VQJH6+95J-0-0-0-0', ),
+            ('87C4VV4J+F2J-4-2-3-3', ),
+            ('87C4XX88+HRX-3-2-3-3', ),
+            ('8FVC9G8F+6X-0-0-0-0', ),
+            ('8FVC9G8F+6XQ2-1-0-0-2', ),
+        ]:
+            (digits, area, ) = parse_code(code)
+
+            self.assertEqual(digits, olc_digits(code.split('-')[0]))
+            self.assertAlmostEqual(area, decode(code).area, places=15)
+
+        with self.assertRaises(ValueError):
+            parse_code('')
+
+        with self.assertRaises(ValueError):
+            parse_code('849VQJH6+95J')
+
+        self.assertEqual(olc_for_digits('849V'), '849V0000+')
+        self.assertEqual(olc_for_digits('849VQJH6'), '849VQJH6+')
+        self.assertEqual(olc_for_digits('849VQJH695J'), '849VQJH6+95J')
+
+    def test_buildingid_rollup_hash_aggregate(self):
+        rng = random.Random(0)
+
+        items = [((str(rng.randrange(10)), str(rng.randrange(10)), ), [1.0, float(rng.randrange(100))]) for _ in range(1000)]
+
+        expected = HashAggregate(2, self.tmpdir.name)
+        for (key, values, ) in items:
+            expected.add(key, values)
+        expected = list(expected)
+
+        self.assertEqual(len(expected), len(set(key for (key, _, ) in items)))
+
+        for (max_groups, fan_in, ) in [(1, 2, ), (7, 3, ), (50, 64, )]:
+            aggregate = HashAggregate(2, self.tmpdir.name, max_groups=max_groups, fan_in=fan_in)
+            for (key, values, ) in items:
+                aggregate.add(key, values)
+
+            self.assertGreater(len(aggregate.paths), 0)
+            self.assertEqual(list(aggregate), expected)
+
+            # The runs are deleted.
+            self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+        with self.assertRaises(ValueError):
+            HashAggregate(2, self.tmpdir.name, max_groups=0)
+
+    def test_buildingid_rollup_command(self):
+        rng = random.Random(0)
+
+        rows = []
+
+        for index in range(200):
+            latitude = 46.0 + (rng.random() * 0.1)
+            longitude = -119.0 + (rng.random() * 0.1)
+
+            rows.append([str(index), encode(latitude, longitude, latitude + 0.0001, longitude + 0.0001, latitude + 0.00005, longitude + 0.00005, codeLength=11)])
+
+        # Invalid UBID.
+        rows.append(['200', 'invalid'])
+
+        path = os.path.join(self.tmpdir.name, 'src.csv')
+
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['id', 'UBID'])
+            writer.writerows(rows)
+
+        expected = collections.defaultdict(lambda: [0, 0.0])
+
+        for (id, code, ) in rows[:-1]:
+            for code_length in [4, 6, 8]:
+                sums = expected[(code_length, olc_for_digits(olc_digits(code.split('-')[0])[:code_length]), )]
+                sums[0] += 1
+                sums[1] += float(id)
+
+        for max_groups in [1, 10, 1000]:
+            result = CliRunner().invoke(cli, ['rollup', path, '--code-lengths', '8,4,6', '--sum-field', 'id', '--max-groups', str(max_groups), '--fan-in', '2'])
+
+            self.assertEqual(result.exit_code, 0, result.output)
+
+            output = list(csv.DictReader(result.stdout_bytes.decode('utf-8').splitlines(keepends=True)))
+
+            self.assertEqual([(int(row['code_length']), row['olc'], ) for row in output], sorted(expected.keys()))
+            self.assertEqual([[int(row['count']), float(row['id_sum'])] for row in output], [expected[key] for key in sorted(expected.keys())])
+
+        result = CliRunner().invoke(cli, ['rollup', path, '--code-lengths', '3'])
+        self.assertEqual(result.exit_code, 2)
+
+        result = CliRunner().invoke(cli, ['rollup', path, '--sum-field', 'name'])
+        self.assertEqual(result.exit_code, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_server.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import asyncio
+import concurrent.futures
+import concurrent.futures.process
+import json
+import unittest
+
+from ..context import buildingid
+from buildingid.command_line.server import Server, init_worker
+
+async def request_(port, method, path, value=None, content_length=None):
+    (reader, writer, ) = await asyncio.open_connection('127.0.0.1', port)
+
+    body = b'' if (value is None) else json.dumps(value).encode('utf-8')
+
+    writer.write('{0} {1} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {2}\r\nConnection: close\r\n\r\n'.format(method, path, len(body) if (content_length is None) else content_length).encode('latin-1') + body)
+
+    await writer.drain()
+
+    response = await reader.read()
+
+    writer.close()
+
+    (head, _, body, ) = response.partition(b'\r\n\r\n')
+
+    return (int(head.split(b' ')[1]), json.loads(body.decode('utf-8')), )
+
+class TestServer(unittest.TestCase):
+    def run_server_(self, fn, **kwargs):
+        async def main_():
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                server = Server(executor, **kwargs)
+
+                asyncio_server = await server.start(host='127.0.0.1', port=0)
+
+                try:
+                    return await fn(server, asyncio_server.sockets[0].getsockname()[1])
+                finally:
+                    await server.close()
+
+        return asyncio.run(main_())
+
+    def setUp(self):
+        init_worker(11, ['849VQJH6+95J-51-58-42-50', '849VQJH6+95J-1-1-1-1', 'bad'])
+
+    def test_buildingid_server_endpoints(self):
+        async def fn(server, port):
+            (status, value, ) = await request_(port, 'POST', '/encode', {'items': [{'latitude': 1, 'longitude': 2}, {'wkt': 'POINT (2 1)'}, {}], 'code_length': 10})
+            self.assertEqual(status, 200)
+            self.assertEqual(value['results'][0], {'ubid': '6FH42222+22-0-0-0-0'})
+            self.assertEqual(value['results'][1], {'ubid': '6FH42222+22-0-0-0-0'})
+            self.assertEqual(value['results'][2]['error']['name'], 'ValueError')
+
+            (status, value, ) = await request_(port, 'POST', '/decode', {'items': ['849VQJH6+95J-51-58-42-50', 'x']})
+            self.assertEqual(status, 200)
+            self.assertAlmostEqual(value['results'][0]['north'], 37.77975)
+            self.assertEqual(value['results'][1]['error']['name'], 'ValueError')
+
+            (status, value, ) = await request_(port, 'POST', '/validate', {'items': ['849VQJH6+95J-51-58-42-50', 'x', None]})
+            self.assertEqual(value, {'results': [True, False, False]})
+
+            (status, value, ) = await request_(port, 'POST', '/match', {'items': ['849VQJH6+95J-51-58-42-50']})
+            self.assertEqual([match['index'] for match in value['results'][0]['matches']], [0, 1])
+            self.assertEqual(value['results'][0]['matches'][0]['jaccard'], 1.0)
+
+            (status, value, ) = await request_(port, 'POST', '/encode', {'nope': []})
+            self.assertEqual(status, 400)
+
+            (status, value, ) = await request_(port, 'GET', '/encode')
+            self.assertEqual(status, 405)
+
+            for content_length in ['x', '-1']:
+                (status, value, ) = await request_(port, 'POST', '/validate', {'items': []}, content_length=content_length)
+                self.assertEqual(status, 400)
+                self.assertEqual(value['error']['name'], 'RequestError')
+
+            (status, value, ) = await request_(port, 'GET', '/nope')
+            self.assertEqual(status, 404)
+
+            (status, value, ) = await request_(port, 'GET', '/stats')
+            self.assertEqual(status, 200)
+            self.assertEqual(value['endpoints']['encode']['latency']['count'], 1)
+
+        self.run_server_(fn)
+
+    def test_buildingid_server_micro_batching(self):
+        async def fn(server, port):
+            responses = await asyncio.gather(*[request_(port, 'POST', '/validate', {'items': ['849VQJH6+95J-51-58-42-50'] * (index + 1)}) for index in range(20)])
+
+            for (index, (status, value, ), ) in enumerate(responses):
+                self.assertEqual(status, 200)
+                self.assertEqual(value['results'], [True] * (index + 1))
+
+            stats = server.batchers['/validate'].to_dict()
+
+            self.assertEqual(stats['items'], sum(range(1, 21)))
+            self.assertLess(stats['batches'], 20)
+
+        self.run_server_(fn, max_batch_delay=0.05)
+
+    def test_buildingid_server_batch_error(self):
+        def fn_(batch):
+            raise concurrent.futures.process.BrokenProcessPool('worker pool is broken')
+
+        async def fn(server, port):
+            server.batchers['/validate'].fn = fn_
+
+            (status, value, ) = await request_(port, 'POST', '/validate', {'items': ['849VQJH6+95J-51-58-42-50']})
+            self.assertEqual(status, 500)
+            self.assertEqual(value, {'error': {'name': 'BrokenProcessPool', 'message': 'worker pool is broken'}})
+
+            (status, value, ) = await request_(port, 'POST', '/decode', {'items': ['849VQJH6+95J-51-58-42-50']})
+            self.assertEqual(status, 200)
+
+        self.run_server_(fn)
+
+if __name__ == '__main__':
+    unittest.main()
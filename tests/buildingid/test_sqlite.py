@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_sqlite.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import io
+import os
+import re
+import sqlite3
+import struct
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+from openlocationcode import openlocationcode
+import shapely.wkt
+
+from ..context import buildingid
+from buildingid.command_line import cli
+from buildingid.command_line.dict_decoders import GeoPackageDictDecoder, strip_geopackage_header
+from buildingid.command_line.dict_encoders import BaseGeometryDictEncoder, ErrorDictEncoder
+from buildingid.command_line.exceptions import FieldNotFoundError, FieldNotUniqueError
+from buildingid.command_line.sqlite_pipe import SQLitePipe, TableNotFoundError, find_geometry_column
+
+def geopackage_blob_(wktstr: str, envelope_indicator: int = 1) -> bytes:
+    geom = shapely.wkt.loads(wktstr)
+
+    envelope = struct.pack('<4d', geom.bounds[0], geom.bounds[2], geom.bounds[1], geom.bounds[3]) if (envelope_indicator == 1) else b''
+
+    return b'GP' + struct.pack('<BBi', 0, (envelope_indicator << 1) | 0x01, 4326) + envelope + geom.wkb
+
+class TestSQLite(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute('CREATE TABLE gpkg_geometry_columns (table_name TEXT, column_name TEXT)')
+        self.connection.execute('INSERT INTO gpkg_geometry_columns VALUES (?, ?)', ('buildings', 'geom', ))
+        self.connection.execute('CREATE TABLE buildings (fid INTEGER PRIMARY KEY, geom BLOB)')
+        self.connection.executemany('INSERT INTO buildings (fid, geom) VALUES (?, ?)', [
+            (1, geopackage_blob_('POINT (0 0)'), ),
+            (2, geopackage_blob_('POINT (0 0)', envelope_indicator=0), ),
+            (3, shapely.wkt.loads('POINT (0 0)').wkb, ),
+            (5, None, ),
+            (8, b'x', ),
+        ])
+        self.connection.commit()
+
+        self.sqlite_pipe = SQLitePipe(GeoPackageDictDecoder('geom'), BaseGeometryDictEncoder('UBID', openlocationcode.PAIR_CODE_LENGTH_), ErrorDictEncoder('UBID'))
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_buildingid_sqlite_strip_geopackage_header(self):
+        wkb = shapely.wkt.loads('POINT (1 2)').wkb
+
+        self.assertEqual(strip_geopackage_header(geopackage_blob_('POINT (1 2)')), wkb)
+        self.assertEqual(strip_geopackage_header(geopackage_blob_('POINT (1 2)', envelope_indicator=0)), wkb)
+        self.assertEqual(strip_geopackage_header(wkb), wkb)
+
+    def test_buildingid_sqlite_find_geometry_column(self):
+        self.assertEqual(find_geometry_column(self.connection, 'buildings'), 'geom')
+        self.assertEqual(find_geometry_column(self.connection, 'x'), None)
+
+    def test_buildingid_sqlite_SQLitePipe(self):
+        io_err = io.StringIO('')
+
+        (count_out, count_err, ) = self.sqlite_pipe.run(self.connection, 'buildings', io_err, batch_size=2, transaction_size=3)
+
+        self.assertEqual((count_out, count_err, ), (3, 2, ))
+        self.assertEqual(self.connection.execute('SELECT fid, UBID FROM buildings ORDER BY fid').fetchall(), [
+            (1, '6FG22222+22-0-0-0-0', ),
+            (2, '6FG22222+22-0-0-0-0', ),
+            (3, '6FG22222+22-0-0-0-0', ),
+            (5, None, ),
+            (8, None, ),
+        ])
+        self.assertEqual(io_err.getvalue().splitlines()[0:2], [
+            'rowid,UBID_Error_Name,UBID_Error_Message',
+            '5,ValueError,geometry is null',
+        ])
+        self.assertEqual(self.connection.execute('SELECT name FROM sqlite_master WHERE type = ? AND tbl_name = ?', ('index', 'buildings', )).fetchall(), [
+            ('buildings_UBID_idx', ),
+        ])
+
+        with self.assertRaisesRegex(FieldNotUniqueError, re.escape('field \'UBID\' has already been taken')):
+            self.sqlite_pipe.run(self.connection, 'buildings', io.StringIO(''))
+
+        self.sqlite_pipe.run(self.connection, 'buildings', io.StringIO(''), overwrite=True)
+
+    def test_buildingid_sqlite_SQLitePipe_errors(self):
+        with self.assertRaises(TableNotFoundError):
+            self.sqlite_pipe.run(self.connection, 'x', io.StringIO(''))
+
+        sqlite_pipe = SQLitePipe(GeoPackageDictDecoder('x'), BaseGeometryDictEncoder('UBID', openlocationcode.PAIR_CODE_LENGTH_), ErrorDictEncoder('UBID'))
+
+        with self.assertRaises(FieldNotFoundError):
+            sqlite_pipe.run(self.connection, 'buildings', io.StringIO(''))
+
+    def test_buildingid_sqlite_append2sqlite_OSError(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            path = os.path.join(dirname, 'in.gpkg')
+
+            with sqlite3.connect(path) as connection:
+                self.connection.backup(connection)
+            connection.close()
+
+            result = CliRunner().invoke(cli, ['append2sqlite', path, 'buildings', '--errors', os.path.join(dirname, 'x', 'err.csv')])
+
+            # The error is reported, rather than raised.
+            self.assertEqual(result.exit_code, 1)
+            self.assertIsInstance(result.exception, SystemExit)
+            self.assertIn('Error: [Errno 2]', result.output)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_stats.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from openlocationcode import openlocationcode
+
+from ..context import buildingid
+from buildingid.command_line.dict_decoders import LatLngDictDecoder
+from buildingid.command_line.dict_encoders import BaseGeometryDictEncoder, ErrorDictEncoder
+from buildingid.command_line.dict_pipe import DictPipe
+from buildingid.stats import NullStats, Stats
+
+class TestStats(unittest.TestCase):
+    def test_buildingid_stats_Stats(self):
+        stats = Stats('test')
+
+        with stats.stage('decode', rows=2):
+            pass
+
+        with stats.stage('decode', rows=3):
+            pass
+
+        stats.incr('rows_in', 5)
+        stats.error(ValueError())
+        stats.error(ValueError())
+
+        data = stats.to_dict()
+
+        self.assertEqual(data['name'], 'test')
+        self.assertEqual(data['stages']['decode']['calls'], 2)
+        self.assertEqual(data['stages']['decode']['rows'], 5)
+        self.assertEqual(data['counters'], {'rows_in': 5})
+        self.assertEqual(data['errors'], {'ValueError': 2})
+
+    def test_buildingid_stats_Stats_write(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            path = os.path.join(dirname, 'stats.json')
+
+            stats = Stats('test', path=path, interval=0.0)
+
+            dict_pipe = DictPipe(LatLngDictDecoder('Latitude', 'Longitude'), BaseGeometryDictEncoder('UBID', openlocationcode.PAIR_CODE_LENGTH_), ErrorDictEncoder('UBID'))
+
+            dict_pipe.run(io.StringIO('Latitude,Longitude\r\n0,0\r\nx,x\r\n0,0\r\n'), io.StringIO(''), io.StringIO(''), batch_size=2, stats=stats)
+
+            with open(path, 'r') as f:
+                data = json.load(f)
+
+            self.assertEqual(list(data['stages'].keys()), ['read', 'decode', 'encode', 'write'])
+            self.assertEqual(data['counters'], {'rows_in': 3, 'rows_out': 2, 'rows_err': 1})
+            self.assertEqual(data['errors'], {'ValueError': 1})
+
+    def test_buildingid_stats_NullStats(self):
+        stats = NullStats()
+
+        with stats.stage('decode', rows=1):
+            pass
+
+        stats.incr('rows_in')
+        stats.write()
+
+        self.assertEqual(stats.to_dict()['stages'], {})
+
+if __name__ == '__main__':
+    unittest.main()
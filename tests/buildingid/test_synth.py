@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# pnnl-buildingid: tests/buildingid/test_synth.py
+#
+# Copyright (c) 2019, Battelle Memorial Institute
+# All rights reserved.
+#
+# See LICENSE.txt and WARRANTY.txt for details.
+
+import io
+import random
+import unittest
+
+from ..context import buildingid
+from buildingid.code import isValid
+from buildingid.command_line.synth_writers import CSVSynthWriter
+from buildingid.synth import DEFAULT_BBOX, DENSITY_MODELS, iter_footprints, iter_perturbed, perturb
+
+class TestSynth(unittest.TestCase):
+    def test_buildingid_synth_iter_footprints(self):
+        (south, west, north, east, ) = DEFAULT_BBOX
+
+        for density in DENSITY_MODELS:
+            footprints = list(iter_footprints(100, seed=1, density=density))
+
+            self.assertEqual([footprint.id for footprint in footprints], list(range(100)))
+
+            for footprint in footprints:
+                self.assertTrue(footprint.geometry.is_valid)
+
+                centroid = footprint.geometry.centroid
+
+                self.assertTrue((south - 1e-9) <= centroid.y <= (north + 1e-9))
+                self.assertTrue((west - 1e-9) <= centroid.x <= (east + 1e-9))
+
+            # Deterministic for the given seed.
+            self.assertEqual([footprint.geometry.wkt for footprint in footprints], [footprint.geometry.wkt for footprint in iter_footprints(100, seed=1, density=density)])
+            self.assertNotEqual([footprint.geometry.wkt for footprint in footprints], [footprint.geometry.wkt for footprint in iter_footprints(100, seed=2, density=density)])
+
+    def test_buildingid_synth_perturb(self):
+        (footprint, ) = iter_footprints(1)
+
+        rng = random.Random(0)
+
+        self.assertEqual([(perturbed.id, perturbed.change, ) for perturbed in perturb(footprint, rng, 10)], [(10, 'none', )])
+
+        split = perturb(footprint, rng, 10, split_rate=1.0, duplicate_rate=1.0)
+
+        self.assertEqual([(perturbed.id, perturbed.source_id, perturbed.change, ) for perturbed in split], [(10, 0, 'split', ), (11, 0, 'split', ), (12, 0, 'duplicate', )])
+        self.assertAlmostEqual(split[0].geometry.area + split[1].geometry.area, footprint.geometry.area)
+        self.assertTrue(split[2].geometry.equals(footprint.geometry))
+
+        (shifted, ) = perturb(footprint, rng, 10, shift_rate=1.0, shift_distance=5.0)
+
+        self.assertEqual(shifted.change, 'shift')
+        self.assertAlmostEqual(shifted.geometry.area, footprint.geometry.area)
+        self.assertLess(shifted.geometry.centroid.distance(footprint.geometry.centroid), 0.0001)
+
+    def test_buildingid_synth_iter_perturbed(self):
+        pairs = list(iter_perturbed(iter_footprints(200), seed=0, duplicate_rate=0.1, shift_rate=0.2, split_rate=0.1))
+
+        perturbed = [footprint for (_, footprints, ) in pairs for footprint in footprints]
+
+        self.assertEqual([footprint.id for footprint in perturbed], list(range(len(perturbed))))
+        self.assertEqual(set([footprint.change for footprint in perturbed]), set(['none', 'duplicate', 'shift', 'split']))
+
+        for (footprint, footprints, ) in pairs:
+            for other in footprints:
+                self.assertEqual(other.source_id, footprint.id)
+
+    def test_buildingid_synth_CSVSynthWriter(self):
+        io_out = io.StringIO()
+
+        writer = CSVSynthWriter(io_out, 'latlng', code_length=11)
+        writer.write(list(iter_footprints(3)))
+
+        lines = io_out.getvalue().splitlines()
+
+        self.assertEqual(lines[0], 'id,Latitude,Longitude,UBID')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(isValid(lines[1].split(',')[3]))
+
+if __name__ == '__main__':
+    unittest.main()